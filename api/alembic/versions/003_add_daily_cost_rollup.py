@@ -0,0 +1,61 @@
+"""Add daily per-organization cost rollup
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-02-10
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create organization_daily_costs table
+    op.create_table(
+        'organization_daily_costs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('organizations.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('completed_searches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('cost_eur', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('total_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.UniqueConstraint('organization_id', 'day', name='uq_org_day'),
+    )
+
+    # Backfill from existing extractions (days bucketed in UTC). Costs are summed
+    # over every row, like the aggregate the rollup replaces; only completed rows
+    # are counted as completed searches.
+    op.execute("""
+        INSERT INTO organization_daily_costs
+            (id, organization_id, day, completed_searches, cost_usd, cost_eur, total_tokens)
+        SELECT
+            gen_random_uuid(),
+            organization_id,
+            (created_at AT TIME ZONE 'UTC')::date,
+            COUNT(*) FILTER (WHERE status = 'completed'),
+            COALESCE(SUM(cost_usd), 0),
+            COALESCE(SUM(cost_eur), 0),
+            COALESCE(SUM(total_tokens), 0)
+        FROM company_extractions
+        WHERE status = 'completed'
+           OR cost_usd IS NOT NULL
+           OR cost_eur IS NOT NULL
+           OR total_tokens IS NOT NULL
+        GROUP BY organization_id, (created_at AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('organization_daily_costs')
@@ -0,0 +1,48 @@
+"""Add composite and partial indexes for company_extractions cost queries
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-02-12
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Top expensive searches: organization filter + cost ordering, rows without cost excluded
+    op.create_index(
+        'idx_extraction_org_cost',
+        'company_extractions',
+        ['organization_id', sa.text('cost_eur DESC')],
+        postgresql_where=sa.text('cost_eur IS NOT NULL'),
+    )
+
+    # Organization/date range stats: cover the aggregated columns (index-only scans)
+    op.drop_index('idx_extraction_org_created', table_name='company_extractions')
+    op.create_index(
+        'idx_extraction_org_created',
+        'company_extractions',
+        ['organization_id', 'created_at'],
+        postgresql_include=['status', 'cost_eur', 'cost_usd', 'total_tokens'],
+    )
+
+    # Superseded by idx_extraction_org_cost (every cost query is scoped to an organization)
+    op.drop_index('idx_extraction_cost_eur', table_name='company_extractions')
+
+
+def downgrade() -> None:
+    op.create_index('idx_extraction_cost_eur', 'company_extractions', ['cost_eur'])
+
+    op.drop_index('idx_extraction_org_created', table_name='company_extractions')
+    op.create_index('idx_extraction_org_created', 'company_extractions', ['organization_id', 'created_at'])
+
+    op.drop_index('idx_extraction_org_cost', table_name='company_extractions')
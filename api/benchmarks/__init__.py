@@ -0,0 +1,15 @@
+"""
+Benchmarks hors ligne du pipeline d'extraction.
+
+Usage (depuis api/) :
+    python -m benchmarks run [--baseline benchmarks/baseline.json]
+    python -m benchmarks record --name acoem --query "ACOEM"
+
+CPU économisé par orjson (cpu_time_s, même corpus) :
+    JSON_BACKEND=stdlib python -m benchmarks run --save-baseline /tmp/stdlib.json
+    python -m benchmarks run --baseline /tmp/stdlib.json
+
+Test de charge (Redis et Postgres locaux, deux terminaux) :
+    python -m benchmarks serve --trace benchmarks/corpus/synthetic-simple.json
+    python -m benchmarks load --stages 1,5,10,25,50 --subscribers 2
+"""
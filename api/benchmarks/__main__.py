@@ -0,0 +1,158 @@
+"""
+Point d'entrée CLI des benchmarks hors ligne.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Le pipeline construit ses clients à l'import : des clés factices suffisent hors ligne
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("PERPLEXITY_API_KEY", "offline-benchmark")
+
+from .harness import (  # noqa: E402
+    DEFAULT_CORPUS_DIR,
+    compare_to_baseline,
+    format_comparison,
+    format_report,
+    load_corpus,
+    load_results,
+    run_corpus,
+    save_results,
+)
+
+
+def _run(args: argparse.Namespace) -> int:
+    traces = load_corpus(Path(args.corpus))
+    results = asyncio.run(run_corpus(traces, repeat=args.repeat, seed=args.seed, time_scale=args.time_scale))
+    print(format_report(results))
+
+    if args.output:
+        save_results(results, Path(args.output))
+    if args.save_baseline:
+        save_results(results, Path(args.save_baseline))
+        print(f"📌 Baseline enregistrée: {args.save_baseline}")
+
+    if args.baseline:
+        baseline = load_results(Path(args.baseline))
+        if baseline is None:
+            print(f"⚠️ Baseline introuvable: {args.baseline}")
+            return 0
+        print(format_comparison(results, baseline))
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Régressions détectées:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("✅ Aucune régression")
+    return 1 if any(row["errors"] for row in results) else 0
+
+
+def _record(args: argparse.Namespace) -> int:
+    from .recorder import record_trace
+
+    trace = asyncio.run(record_trace(
+        args.name,
+        args.query,
+        deep_search=args.deep_search,
+        include_subsidiaries=not args.no_subsidiaries,
+    ))
+    output = Path(args.output or DEFAULT_CORPUS_DIR / f"{args.name}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False, indent=2)
+    print(f"💾 Trace enregistrée: {output}")
+    return 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from .loadtest import serve
+
+    trace = load_corpus(Path(args.trace))[0]
+    asyncio.run(serve(
+        trace,
+        host=args.host,
+        port=args.port,
+        seed=args.seed,
+        time_scale=args.time_scale,
+        fake_redis=args.fake_redis,
+    ))
+    return 0
+
+
+def _load(args: argparse.Namespace) -> int:
+    from .loadtest import capacity_report, run_load
+
+    results = asyncio.run(run_load(
+        args.url,
+        [int(stage) for stage in args.stages.split(",")],
+        subscribers=args.subscribers,
+        query=args.query,
+        deep_search=args.deep_search,
+        timeout=args.timeout,
+        max_loop_lag_ms=args.max_loop_lag_ms,
+        stop_on_breach=not args.no_stop,
+    ))
+    print(capacity_report(results, args.max_loop_lag_ms, args.max_delivery_ms))
+    if args.output:
+        save_results(results, Path(args.output))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Benchmarks hors ligne du pipeline d'extraction")
+    parser.add_argument("--log-level", default="WARNING")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Rejoue le corpus hors ligne")
+    run.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR), help="Trace JSON ou répertoire de traces")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--time-scale", type=float, default=0.01, help="Facteur des latences simulées")
+    run.add_argument("--baseline", help="Résultats de référence à comparer")
+    run.add_argument("--tolerance", type=float, default=0.25, help="Dégradation relative tolérée")
+    run.add_argument("--save-baseline", help="Enregistre les résultats comme nouvelle baseline")
+    run.add_argument("--output", help="Enregistre les résultats (JSON)")
+    run.set_defaults(handler=_run)
+
+    record = subparsers.add_parser("record", help="Enregistre une trace réelle (clés API requises)")
+    record.add_argument("--name", required=True)
+    record.add_argument("--query", required=True)
+    record.add_argument("--deep-search", action="store_true")
+    record.add_argument("--no-subsidiaries", action="store_true")
+    record.add_argument("--output")
+    record.set_defaults(handler=_record)
+
+    serve = subparsers.add_parser("serve", help="Démarre l'API avec les backends simulés (test de charge)")
+    serve.add_argument("--trace", default=str(DEFAULT_CORPUS_DIR / "synthetic-simple.json"))
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8099)
+    serve.add_argument("--seed", type=int, default=0)
+    serve.add_argument("--time-scale", type=float, default=0.1, help="Facteur des latences simulées")
+    serve.add_argument("--fake-redis", action="store_true", help="Redis en mémoire au lieu du Redis local")
+    serve.set_defaults(handler=_serve)
+
+    load = subparsers.add_parser("load", help="Monte en charge une API lancée par `serve`")
+    load.add_argument("--url", default="http://127.0.0.1:8099")
+    load.add_argument("--stages", default="1,5,10,25,50", help="Paliers de concurrence (séparés par des virgules)")
+    load.add_argument("--subscribers", type=int, default=2, help="Clients WebSocket par session")
+    load.add_argument("--query", default="Acmetrix")
+    load.add_argument("--deep-search", action="store_true")
+    load.add_argument("--timeout", type=float, default=300.0, help="Durée maximale d'une session (s)")
+    load.add_argument("--max-loop-lag-ms", type=float, default=100.0)
+    load.add_argument("--max-delivery-ms", type=float, default=500.0)
+    load.add_argument("--no-stop", action="store_true", help="Exécute tous les paliers même après un dépassement")
+    load.add_argument("--output", help="Enregistre les paliers (JSON)")
+    load.set_defaults(handler=_load)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING))
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
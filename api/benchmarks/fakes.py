@@ -0,0 +1,313 @@
+"""
+Doublures déterministes des dépendances réseau du pipeline.
+
+- FakeRunner : remplace Runner.run (et Runner.run_streamed) et rejoue les sorties
+  d'agents d'une trace
+- FakeAsyncOpenAI : remplace les clients AsyncOpenAI (Perplexity, gpt-4o-search)
+- offline_transport : transport httpx simulant les sondes d'URL
+- FakeRedis : Redis en mémoire qui compte les commandes
+
+Chaque appel simulé attend une latence tirée d'une distribution configurable
+(fixed, uniform, lognormal), avec un générateur pseudo-aléatoire graine.
+"""
+
+import asyncio
+import json
+import math
+import random
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Latence par défaut d'un appel LLM simulé
+DEFAULT_LLM_LATENCY = {"dist": "lognormal", "median_ms": 1500, "sigma": 0.35}
+DEFAULT_SEARCH_LATENCY = {"dist": "lognormal", "median_ms": 4000, "sigma": 0.3}
+DEFAULT_PROBE_LATENCY = {"dist": "uniform", "min_ms": 40, "max_ms": 250}
+
+
+class LatencyModel:
+    """Tire des latences (secondes) selon une distribution, mises à l'échelle par time_scale."""
+
+    def __init__(self, seed: int = 0, time_scale: float = 1.0):
+        self.rng = random.Random(seed)
+        self.time_scale = time_scale
+
+    def sample(self, spec: Optional[Dict[str, Any]]) -> float:
+        """
+        Tire une latence.
+
+        Args:
+            spec: {"dist": "fixed", "ms": 800}, {"dist": "uniform", "min_ms", "max_ms"}
+                ou {"dist": "lognormal", "median_ms", "sigma"}
+
+        Returns:
+            Latence en secondes (déjà multipliée par time_scale)
+        """
+        if not spec:
+            return 0.0
+        dist = spec.get("dist", "fixed")
+        if dist == "uniform":
+            ms = self.rng.uniform(spec.get("min_ms", 0), spec.get("max_ms", 0))
+        elif dist == "lognormal":
+            ms = self.rng.lognormvariate(math.log(max(spec.get("median_ms", 1), 1)), spec.get("sigma", 0.0))
+        else:
+            ms = spec.get("ms", 0)
+        return ms / 1000.0 * self.time_scale
+
+    async def wait(self, spec: Optional[Dict[str, Any]]) -> None:
+        delay = self.sample(spec)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _make_usage(usage: Optional[Dict[str, int]]):
+    """Construit un agents.usage.Usage à partir d'un dict de la trace."""
+    from agents.usage import Usage
+    from openai.types.responses.response_usage import InputTokensDetails
+
+    usage = usage or {}
+    input_tokens = int(usage.get("input_tokens", 0))
+    output_tokens = int(usage.get("output_tokens", 0))
+    result = Usage(
+        requests=1,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=input_tokens + output_tokens,
+    )
+    result.input_tokens_details = InputTokensDetails(cached_tokens=int(usage.get("cached_input_tokens", 0)))
+    return result
+
+
+def _coerce_output(agent: Any, output: Any) -> Any:
+    """Convertit une sortie enregistrée dans le type de sortie de l'agent (JSON brut sinon)."""
+    if not isinstance(output, (dict, list)):
+        return output
+    raw = json.dumps(output, ensure_ascii=False)
+    schema = getattr(agent, "output_type", None)
+    try:
+        if hasattr(schema, "validate_json"):
+            return schema.validate_json(raw)
+        if hasattr(schema, "model_validate"):
+            return schema.model_validate(output)
+    except Exception:
+        pass
+    return raw
+
+
+class FakeRunner:
+    """Rejoue, par nom d'agent et dans l'ordre, les réponses enregistrées d'une trace."""
+
+    def __init__(self, agents: Dict[str, Any], latency: LatencyModel):
+        # Chaque agent peut avoir une réponse unique ou une liste (lots, segments, retries)
+        self.responses = {
+            name: value if isinstance(value, list) else [value]
+            for name, value in agents.items()
+        }
+        self.latency = latency
+        self.calls: Counter = Counter()
+
+    def _next_response(self, agent: Any) -> Dict[str, Any]:
+        name = getattr(agent, "name", "unknown")
+        responses = self.responses.get(name)
+        if not responses:
+            raise KeyError(f"Aucune réponse enregistrée pour l'agent {name!r}")
+        index = self.calls[name]
+        self.calls[name] += 1
+        return responses[min(index, len(responses) - 1)]
+
+    async def run(self, agent: Any, input: Any = None, **kwargs) -> Any:
+        response = self._next_response(agent)
+        await self.latency.wait(response.get("latency") or DEFAULT_LLM_LATENCY)
+        return SimpleNamespace(
+            final_output=_coerce_output(agent, response.get("output")),
+            context_wrapper=SimpleNamespace(usage=_make_usage(response.get("usage"))),
+        )
+
+    def run_streamed(self, agent: Any, input: Any = None, **kwargs) -> "FakeStreamedResult":
+        response = self._next_response(agent)
+        return FakeStreamedResult(
+            agent, response, self.latency.sample(response.get("latency") or DEFAULT_LLM_LATENCY)
+        )
+
+
+class FakeStreamedResult:
+    """Résultat de Runner.run_streamed : la sortie enregistrée est émise par fragments sur la latence tirée."""
+
+    CHUNK_CHARS = 64
+
+    def __init__(self, agent: Any, response: Dict[str, Any], delay: float):
+        self.agent = agent
+        self.response = response
+        self.delay = delay
+        self.final_output = None
+        self.context_wrapper = SimpleNamespace(usage=_make_usage(response.get("usage")))
+        self.is_complete = False
+
+    async def stream_events(self):
+        output = self.response.get("output")
+        text = output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)
+        chunks = [text[i:i + self.CHUNK_CHARS] for i in range(0, len(text), self.CHUNK_CHARS)] or [""]
+        step = self.delay / len(chunks)
+
+        yield SimpleNamespace(type="raw_response_event", data=SimpleNamespace(type="response.created"))
+        for chunk in chunks:
+            if self.is_complete:
+                return
+            if step > 0:
+                try:
+                    await asyncio.sleep(step)
+                except asyncio.CancelledError:
+                    # Comme le SDK : l'annulation termine le flux sans exception
+                    return
+            yield SimpleNamespace(
+                type="raw_response_event",
+                data=SimpleNamespace(type="response.output_text.delta", delta=chunk),
+            )
+        self.final_output = _coerce_output(self.agent, output)
+        self.is_complete = True
+
+    def cancel(self) -> None:
+        self.is_complete = True
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeAsyncOpenAI"):
+        self.owner = owner
+
+    async def create(self, model: str = "", **kwargs) -> Any:
+        return await self.owner.complete(model)
+
+
+class FakeAsyncOpenAI:
+    """Client AsyncOpenAI simulé : chat.completions.create renvoie le texte de recherche de la trace."""
+
+    def __init__(self, searches: Dict[str, Any], latency: LatencyModel):
+        self.searches = searches
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+        self.calls: Counter = Counter()
+
+    async def complete(self, model: str) -> Any:
+        search = self.searches.get(model) or self.searches.get("default") or {}
+        self.calls[model] += 1
+        await self.latency.wait(search.get("latency") or DEFAULT_SEARCH_LATENCY)
+
+        usage = search.get("usage") or {}
+        prompt_tokens = int(usage.get("input_tokens", 0))
+        completion_tokens = int(usage.get("output_tokens", 0))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=search.get("text", "")))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=int(usage.get("cached_input_tokens", 0))),
+            ),
+            citations=list(search.get("citations") or []),
+        )
+
+
+class ProbeCounter:
+    """Compte les requêtes HTTP simulées."""
+
+    def __init__(self):
+        self.requests = 0
+
+
+def offline_transport(urls: Dict[str, Any], latency: LatencyModel, counter: ProbeCounter) -> httpx.AsyncBaseTransport:
+    """
+    Transport httpx hors ligne pour les sondes d'accessibilité.
+
+    Args:
+        urls: {"dead": [...], "status": {url: code}, "latency": spec}
+        latency: Générateur de latences
+        counter: Compteur de requêtes
+    """
+    dead = set(urls.get("dead") or [])
+    statuses = urls.get("status") or {}
+    spec = urls.get("latency") or DEFAULT_PROBE_LATENCY
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        counter.requests += 1
+        await latency.wait(spec)
+        url = str(request.url)
+        status = statuses.get(url, 404 if url in dead else 200)
+        return httpx.Response(status, request=request)
+
+    return httpx.MockTransport(handler)
+
+
+class FakeRedis:
+    """Redis en mémoire (sous-ensemble utilisé par le status manager) qui compte les commandes."""
+
+    def __init__(self):
+        self.store: Dict[str, Any] = {}
+        self.ops: Counter = Counter()
+
+    async def ping(self) -> bool:
+        self.ops["ping"] += 1
+        return True
+
+    async def get(self, key: str) -> Any:
+        self.ops["get"] += 1
+        return self.store.get(key)
+
+    async def mget(self, *keys: str) -> List[Any]:
+        self.ops["mget"] += 1
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False, **kwargs) -> bool:
+        self.ops["set"] += 1
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    async def setex(self, key: str, ttl: int, value: Any) -> bool:
+        self.ops["setex"] += 1
+        self.store[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        self.ops["delete"] += 1
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    async def exists(self, *keys: str) -> int:
+        self.ops["exists"] += 1
+        return sum(1 for key in keys if key in self.store)
+
+    async def expire(self, key: str, ttl: int) -> bool:
+        self.ops["expire"] += 1
+        return key in self.store
+
+    async def rpush(self, key: str, *values: Any) -> int:
+        self.ops["rpush"] += 1
+        items = self.store.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[Any]:
+        self.ops["lrange"] += 1
+        items = self.store.get(key, [])
+        return items[start:None if end == -1 else end + 1]
+
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        self.ops["ltrim"] += 1
+        items = self.store.get(key, [])
+        kept = items[start:None if end == -1 else end + 1]
+        if kept:
+            self.store[key] = kept
+        else:
+            self.store.pop(key, None)
+        return True
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        import fnmatch
+        self.ops["keys"] += 1
+        return [key for key in self.store if fnmatch.fnmatch(key, pattern)]
+
+    @property
+    def total_ops(self) -> int:
+        return sum(self.ops.values())
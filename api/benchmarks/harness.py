@@ -0,0 +1,310 @@
+"""
+Rejoue un corpus de traces d'extraction hors ligne et mesure chaque exécution.
+
+Une trace (JSON) décrit l'entrée et les réponses à rejouer :
+
+    {
+      "name": "acoem-simple",
+      "input_query": "ACOEM",
+      "deep_search": false,
+      "include_subsidiaries": true,
+      "agents": {"🔍 Éclaireur": {"output": {...}, "usage": {...}, "latency": {...}}, ...},
+      "searches": {"gpt-4o-search-preview": {"text": "...", "usage": {...}}, "sonar-pro": {...}},
+      "urls": {"dead": ["https://..."], "latency": {...}}
+    }
+
+Chaque extraction passe par extract_company_data (donc orchestrate_extraction)
+avec Runner.run (et run_streamed), les clients AsyncOpenAI, httpx et Redis remplacés par les
+doublures de benchmarks.fakes.
+
+FakeRunner rejoue les sorties d'agents : les outils appelés par les agents
+(web_search_identify, web_search_quantify...) ne s'exécutent pas. Les
+"searches" de la trace alimentent la recherche du Cartographe, exécutée hors
+agent (run_subsidiary_research, structuration par segments activée pour le
+rejeu) : search_calls compte ces recherches.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+
+import httpx
+
+from .fakes import FakeAsyncOpenAI, FakeRedis, FakeRunner, LatencyModel, ProbeCounter, offline_transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_DIR = Path(__file__).parent / "corpus"
+
+# Métriques comparées à la baseline (plus petit = meilleur)
+COMPARED_METRICS = (
+    "wall_time_s",
+    "cpu_time_s",
+    "peak_alloc_kb",
+    "allocated_blocks",
+    "redis_ops",
+    "ws_messages",
+    "llm_calls",
+    "search_calls",
+    "url_probes",
+)
+# En dessous de ces valeurs absolues, les écarts relatifs sont du bruit
+NOISE_FLOOR = {"wall_time_s": 0.05, "cpu_time_s": 0.05, "peak_alloc_kb": 256, "allocated_blocks": 2000}
+
+
+def load_corpus(path: Path = DEFAULT_CORPUS_DIR) -> List[Dict[str, Any]]:
+    """Charge une trace (fichier) ou toutes les traces *.json d'un répertoire."""
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    traces = []
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            trace = json.load(f)
+        trace.setdefault("name", file.stem)
+        traces.append(trace)
+    return traces
+
+
+@contextmanager
+def offline_environment(
+    trace: Dict[str, Any],
+    latency: LatencyModel,
+    fake_redis: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Remplace toutes les dépendances réseau du pipeline pour la durée d'une trace.
+
+    Args:
+        trace: Trace à rejouer
+        latency: Générateur de latences
+        fake_redis: Remplace Redis par FakeRedis (False = Redis local de la configuration)
+
+    Yields:
+        Dict des doublures (runner, search_client, probes, redis) pour lire les compteurs
+    """
+    from agents import Runner
+    from company_agents.config.extraction_config import clear_url_cache
+    from company_agents.orchestrator.identity_index import identity_index
+    from status import status_manager
+
+    # Modules (et non les objets homonymes réexportés par les paquets)
+    search_modules = [
+        importlib.import_module(f"company_agents.{name}")
+        for name in (
+            "subs_tools.filiales_search_agent_optimized",
+            "subs_tools.web_search_identify",
+            "subs_tools.web_search_quantify",
+        )
+    ]
+    subsidiary_extractor = importlib.import_module("company_agents.subs_agents.subsidiary_extractor")
+
+    runner = FakeRunner(trace.get("agents") or {}, latency)
+    search_client = FakeAsyncOpenAI(trace.get("searches") or {}, latency)
+    probes = ProbeCounter()
+    redis = FakeRedis()
+    transport = offline_transport(trace.get("urls") or {}, latency, probes)
+
+    class OfflineAsyncClient(httpx.AsyncClient):
+        def __init__(self, *args, **kwargs):
+            kwargs["transport"] = transport
+            super().__init__(*args, **kwargs)
+
+    clear_url_cache()
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.dict("os.environ", {
+            "OPENAI_API_KEY": "offline-benchmark",
+            "PERPLEXITY_API_KEY": "offline-benchmark",
+        }))
+        stack.enter_context(mock.patch.object(Runner, "run", staticmethod(runner.run)))
+        stack.enter_context(mock.patch.object(Runner, "run_streamed", staticmethod(runner.run_streamed)))
+        stack.enter_context(mock.patch.object(httpx, "AsyncClient", OfflineAsyncClient))
+        # Chaque itération rejoue l'Éclaireur : pas d'identités mémorisées entre les runs
+        stack.enter_context(mock.patch.object(identity_index, "enabled", False))
+        stack.enter_context(mock.patch.object(subsidiary_extractor, "perplexity_client", search_client))
+        # Recherche du Cartographe hors agent (run_subsidiary_research) : rejouée par le
+        # client de recherche simulé, puis structurée par FakeRunner
+        if trace.get("searches"):
+            stack.enter_context(mock.patch.object(subsidiary_extractor, "ENABLE_CARTOGRAPHE_CHUNKING", True))
+        for module in search_modules:
+            stack.enter_context(mock.patch.object(module, "client", search_client))
+        if fake_redis:
+            stack.enter_context(mock.patch.object(status_manager, "redis_client", redis))
+            stack.enter_context(mock.patch.object(status_manager, "binary_redis_client", redis))
+        yield {"runner": runner, "search_client": search_client, "probes": probes, "redis": redis}
+    clear_url_cache()
+
+
+async def _drain_background_tasks(timeout: float = 5.0) -> None:
+    """Attend la fin des tâches de suivi temps réel lancées pendant l'extraction."""
+    pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+
+
+async def run_trace(trace: Dict[str, Any], seed: int = 0, time_scale: float = 1.0) -> Dict[str, Any]:
+    """
+    Exécute une extraction hors ligne et mesure ses coûts.
+
+    Args:
+        trace: Trace à rejouer
+        seed: Graine des latences simulées
+        time_scale: Facteur appliqué aux latences simulées (0.01 = 100x plus rapide)
+
+    Returns:
+        Métriques de l'exécution
+    """
+    from company_agents.extraction_core import extract_company_data
+    from core.serialization import JSON_BACKEND
+    from status import status_manager
+
+    session_id = f"bench-{trace['name']}-{uuid.uuid4().hex[:8]}"
+    latency = LatencyModel(seed=seed, time_scale=time_scale)
+
+    with offline_environment(trace, latency) as fakes:
+        queue = status_manager.subscribe_to_session(session_id)
+        tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            result = await extract_company_data(
+                trace["input_query"],
+                session_id=session_id,
+                include_subsidiaries=trace.get("include_subsidiaries", True),
+                deep_search=trace.get("deep_search", False),
+            )
+            error = None
+        except Exception as e:
+            result, error = {}, str(e)
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        await _drain_background_tasks()
+        peak_alloc = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        allocated_blocks = sys.getallocatedblocks() - blocks_before
+        status_manager.unsubscribe_from_session(session_id, queue)
+
+    return {
+        "trace": trace["name"],
+        "error": error,
+        "wall_time_s": round(wall_time, 4),
+        "cpu_time_s": round(cpu_time, 4),
+        "peak_alloc_kb": round(peak_alloc / 1024, 1),
+        "allocated_blocks": allocated_blocks,
+        "redis_ops": fakes["redis"].total_ops,
+        "redis_ops_by_command": dict(fakes["redis"].ops),
+        "ws_messages": queue.qsize(),
+        "llm_calls": sum(fakes["runner"].calls.values()),
+        "search_calls": sum(fakes["search_client"].calls.values()),
+        "url_probes": fakes["probes"].requests,
+        "subsidiaries": len(result.get("subsidiaries_details") or []),
+        "json_backend": JSON_BACKEND,
+    }
+
+
+async def run_corpus(
+    traces: List[Dict[str, Any]],
+    repeat: int = 3,
+    seed: int = 0,
+    time_scale: float = 1.0,
+) -> List[Dict[str, Any]]:
+    """
+    Rejoue chaque trace `repeat` fois et retient la médiane de chaque métrique.
+
+    Returns:
+        Une ligne de métriques par trace
+    """
+    summary = []
+    for trace in traces:
+        runs = [await run_trace(trace, seed=seed + i, time_scale=time_scale) for i in range(repeat)]
+        row = dict(runs[-1])
+        for metric in COMPARED_METRICS:
+            row[metric] = statistics.median(run[metric] for run in runs)
+        row["errors"] = [run["error"] for run in runs if run["error"]]
+        row.pop("error", None)
+        summary.append(row)
+        logger.info(f"⏱️ {trace['name']}: {row['wall_time_s']}s wall, {row['cpu_time_s']}s CPU")
+    return summary
+
+
+def compare_to_baseline(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    tolerance: float = 0.25,
+) -> List[str]:
+    """
+    Compare les résultats à une baseline.
+
+    Args:
+        results: Résultats de run_corpus
+        baseline: Résultats de référence (même format)
+        tolerance: Dégradation relative tolérée (0.25 = +25 %)
+
+    Returns:
+        Liste des régressions détectées (vide si aucune)
+    """
+    reference = {row["trace"]: row for row in baseline}
+    regressions = []
+    for row in results:
+        ref = reference.get(row["trace"])
+        if ref is None:
+            continue
+        if row.get("errors"):
+            regressions.append(f"{row['trace']}: erreurs d'exécution {row['errors']}")
+        for metric in COMPARED_METRICS:
+            current, previous = row.get(metric), ref.get(metric)
+            if current is None or previous is None:
+                continue
+            if current <= NOISE_FLOOR.get(metric, 0):
+                continue
+            if current > previous * (1 + tolerance):
+                regressions.append(f"{row['trace']}: {metric} {previous} → {current}")
+    return regressions
+
+
+def format_comparison(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> str:
+    """Écart relatif de chaque métrique par rapport à la baseline (gains compris)."""
+    reference = {row["trace"]: row for row in baseline}
+    lines = []
+    for row in results:
+        ref = reference.get(row["trace"])
+        if ref is None:
+            continue
+        backends = f" [{ref.get('json_backend', '?')} → {row.get('json_backend', '?')}]"
+        lines.append(f"{row['trace']}{backends if ref.get('json_backend') != row.get('json_backend') else ''}")
+        for metric in COMPARED_METRICS:
+            current, previous = row.get(metric), ref.get(metric)
+            if current is None or previous is None or current == previous:
+                continue
+            change = f"{(current - previous) / previous:+.1%}" if previous else "n/a"
+            lines.append(f"  {metric}: {previous} → {current} ({change})")
+    return "\n".join(lines)
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    """Tableau texte des résultats."""
+    header = ["trace", *COMPARED_METRICS]
+    lines = [" | ".join(header)]
+    for row in results:
+        lines.append(" | ".join(str(row.get(column, "")) for column in header))
+    return "\n".join(lines)
+
+
+def save_results(results: List[Dict[str, Any]], path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: Path) -> Optional[List[Dict[str, Any]]]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
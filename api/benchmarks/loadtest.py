@@ -0,0 +1,370 @@
+"""
+Test de charge : extractions asynchrones concurrentes et diffusion WebSocket.
+
+Deux processus :
+
+- `python -m benchmarks serve` démarre l'API (main:app) avec le backend LLM,
+  les recherches et les sondes d'URL simulés (benchmarks.fakes), Redis et
+  Postgres locaux de la configuration, et expose `/_bench/stats` (latence de
+  la boucle d'événements du LoopMonitor, RSS, commandes Redis, sessions et
+  abonnés actifs).
+- `python -m benchmarks load` monte en charge par paliers : N appels à
+  /extract-async, S clients /ws/status/{session_id} par session, puis mesure
+  la latence de livraison des messages et produit un rapport de capacité.
+
+La latence de livraison compare l'horodatage `updated_at` du message à
+l'heure de réception : le client et le serveur doivent tourner sur la même
+machine.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import resource
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from core.loop_monitor import percentile
+
+from .fakes import LatencyModel
+from .harness import offline_environment
+
+logger = logging.getLogger(__name__)
+
+# Seuils par défaut du rapport de capacité
+DEFAULT_MAX_LOOP_LAG_MS = 100.0
+DEFAULT_MAX_DELIVERY_MS = 500.0
+TERMINAL_STATUSES = {"completed", "error"}
+
+
+def _rss_bytes() -> int:
+    """Mémoire résidente courante du processus (pic si /proc est indisponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def _redis_commands() -> Optional[int]:
+    """Nombre total de commandes traitées par Redis (None si indisponible)."""
+    from status import status_manager
+
+    try:
+        client = await status_manager._get_redis()
+    except Exception:
+        return None
+    if hasattr(client, "total_ops"):
+        return client.total_ops
+    info = await client.info("stats")
+    return int(info.get("total_commands_processed", 0))
+
+
+def build_stats_router(fakes: Dict[str, Any]):
+    """Router `/_bench/stats` exposant l'état du worker pendant le test de charge."""
+    from fastapi import APIRouter
+    from core.loop_monitor import loop_monitor
+    from status import status_manager
+
+    router = APIRouter(include_in_schema=False)
+
+    @router.get("/_bench/stats")
+    async def bench_stats(reset: bool = False) -> Dict[str, Any]:
+        return {
+            "loop_lag": loop_monitor.snapshot(reset=reset),
+            "rss_bytes": _rss_bytes(),
+            "redis_commands": await _redis_commands(),
+            "active_sessions": len(status_manager.active_sessions),
+            "ws_subscribers": sum(len(queues) for queues in status_manager.subscribers.values()),
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "llm_calls": sum(fakes["runner"].calls.values()),
+        }
+
+    return router
+
+
+async def serve(
+    trace: Dict[str, Any],
+    host: str = "127.0.0.1",
+    port: int = 8099,
+    seed: int = 0,
+    time_scale: float = 0.1,
+    fake_redis: bool = False,
+) -> None:
+    """
+    Démarre l'API avec les backends simulés d'une trace (un seul worker).
+
+    Args:
+        trace: Trace rejouée pour chaque extraction
+        host: Adresse d'écoute
+        port: Port d'écoute
+        seed: Graine des latences simulées
+        time_scale: Facteur appliqué aux latences simulées
+        fake_redis: Redis en mémoire au lieu du Redis local
+    """
+    import uvicorn
+
+    latency = LatencyModel(seed=seed, time_scale=time_scale)
+    with offline_environment(trace, latency, fake_redis=fake_redis) as fakes:
+        from main import app
+
+        app.include_router(build_stats_router(fakes))
+        server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+
+        # La latence de boucle est mesurée par le moniteur du lifespan
+        logger.warning(f"🧪 API de charge sur http://{host}:{port} (trace {trace['name']}, time_scale={time_scale})")
+        await server.serve()
+
+
+def _message_lag_ms(message: Dict[str, Any], received_at: datetime) -> Optional[float]:
+    """Délai entre la dernière mise à jour portée par le message et sa réception."""
+    data = message.get("data") or {}
+    stamps = [data.get("updated_at")] + [agent.get("updated_at") for agent in data.get("agents") or []]
+    parsed = []
+    for stamp in stamps:
+        if not stamp:
+            continue
+        try:
+            parsed.append(datetime.fromisoformat(stamp))
+        except ValueError:
+            continue
+    if not parsed:
+        return None
+    return max(0.0, (received_at - max(parsed)).total_seconds() * 1000)
+
+
+async def _subscriber(ws_url: str, timeout: float, delivery: List[float]) -> Dict[str, Any]:
+    """Client WebSocket : lit les messages jusqu'au statut terminal de la session."""
+    import websockets
+
+    messages = 0
+    status = None
+    deadline = time.monotonic() + timeout
+    try:
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            while time.monotonic() < deadline:
+                raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.monotonic()))
+                received_at = datetime.now()
+                messages += 1
+                message = json.loads(raw)
+                if message.get("type") != "progress_update":
+                    continue
+                lag = _message_lag_ms(message, received_at)
+                if lag is not None:
+                    delivery.append(lag)
+                status = (message.get("data") or {}).get("overall_status")
+                if status in TERMINAL_STATUSES:
+                    break
+    except asyncio.TimeoutError:
+        status = status or "timeout"
+    except Exception as e:
+        logger.debug(f"⚠️ Client WebSocket interrompu: {e}")
+        status = status or "disconnected"
+    return {"messages": messages, "status": status}
+
+
+async def _session(
+    client: httpx.AsyncClient,
+    ws_base: str,
+    query: str,
+    deep_search: bool,
+    subscribers: int,
+    timeout: float,
+    delivery: List[float],
+) -> Dict[str, Any]:
+    """Démarre une extraction asynchrone et y attache `subscribers` clients WebSocket."""
+    started = time.perf_counter()
+    try:
+        response = await client.post("/extract-async", json={"company_name": query, "deep_search": deep_search})
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+    except Exception as e:
+        return {"status": "rejected", "error": str(e), "duration_s": time.perf_counter() - started, "messages": 0}
+
+    accept_s = time.perf_counter() - started
+    clients = await asyncio.gather(*[
+        _subscriber(f"{ws_base}/ws/status/{session_id}", timeout, delivery)
+        for _ in range(subscribers)
+    ])
+    statuses = {c["status"] for c in clients}
+    status = "completed" if statuses == {"completed"} else next(iter(statuses - {"completed"}), "unknown")
+    return {
+        "status": status,
+        "accept_s": accept_s,
+        "duration_s": time.perf_counter() - started,
+        "messages": sum(c["messages"] for c in clients),
+    }
+
+
+async def run_stage(
+    base_url: str,
+    concurrency: int,
+    subscribers: int = 2,
+    query: str = "Acmetrix",
+    deep_search: bool = False,
+    timeout: float = 300.0,
+) -> Dict[str, Any]:
+    """
+    Palier de charge : `concurrency` extractions simultanées.
+
+    Args:
+        base_url: URL de l'API lancée par `python -m benchmarks serve`
+        concurrency: Nombre d'extractions lancées simultanément
+        subscribers: Clients WebSocket par session
+        query: Entreprise demandée
+        deep_search: Pipeline avancé
+        timeout: Durée maximale d'une session (secondes)
+
+    Returns:
+        Métriques du palier
+    """
+    ws_base = base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+    delivery: List[float] = []
+    peak_rss = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        before = (await client.get("/_bench/stats", params={"reset": True})).json()
+        peak_rss = before["rss_bytes"]
+        stop = asyncio.Event()
+
+        async def poll_rss() -> None:
+            nonlocal peak_rss
+            while not stop.is_set():
+                try:
+                    stats = (await client.get("/_bench/stats")).json()
+                    peak_rss = max(peak_rss, stats["rss_bytes"])
+                except Exception:
+                    pass
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+
+        poller = asyncio.create_task(poll_rss())
+        started = time.perf_counter()
+        sessions = await asyncio.gather(*[
+            _session(client, ws_base, query, deep_search, subscribers, timeout, delivery)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await poller
+        after = (await client.get("/_bench/stats")).json()
+
+    durations = [s["duration_s"] for s in sessions if s["status"] == "completed"]
+    redis_delta = None
+    if before.get("redis_commands") is not None and after.get("redis_commands") is not None:
+        redis_delta = after["redis_commands"] - before["redis_commands"]
+
+    return {
+        "concurrency": concurrency,
+        "subscribers": subscribers,
+        "completed": len(durations),
+        "failed": concurrency - len(durations),
+        "elapsed_s": round(elapsed, 2),
+        "session_p50_s": round(percentile(durations, 50), 2),
+        "session_p95_s": round(percentile(durations, 95), 2),
+        "accept_p95_ms": round(percentile([s.get("accept_s", 0) * 1000 for s in sessions], 95), 1),
+        "ws_messages": sum(s["messages"] for s in sessions),
+        "delivery_p50_ms": round(percentile(delivery, 50), 1),
+        "delivery_p95_ms": round(percentile(delivery, 95), 1),
+        "delivery_p99_ms": round(percentile(delivery, 99), 1),
+        "loop_lag_p50_ms": after["loop_lag"]["lag_p50_ms"],
+        "loop_lag_p99_ms": after["loop_lag"]["lag_p99_ms"],
+        "loop_lag_max_ms": after["loop_lag"]["lag_max_ms"],
+        "loop_stalls": after["loop_lag"]["stalls"],
+        "redis_cmds_per_s": round(redis_delta / elapsed, 1) if redis_delta is not None and elapsed else None,
+        "redis_cmds_per_session": round(redis_delta / concurrency, 1) if redis_delta is not None else None,
+        "rss_per_session_kb": round(max(0, peak_rss - before["rss_bytes"]) / concurrency / 1024, 1),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+    }
+
+
+async def run_load(
+    base_url: str,
+    stages: List[int],
+    subscribers: int = 2,
+    query: str = "Acmetrix",
+    deep_search: bool = False,
+    timeout: float = 300.0,
+    max_loop_lag_ms: float = DEFAULT_MAX_LOOP_LAG_MS,
+    stop_on_breach: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Monte en charge palier par palier.
+
+    Args:
+        stages: Niveaux de concurrence successifs (ex: [1, 5, 10, 25, 50])
+        max_loop_lag_ms: Seuil de latence de boucle (p99) au-delà duquel le palier échoue
+        stop_on_breach: Arrête la montée en charge après le premier palier en échec
+
+    Returns:
+        Une ligne de métriques par palier exécuté
+    """
+    results = []
+    for concurrency in stages:
+        row = await run_stage(base_url, concurrency, subscribers, query, deep_search, timeout)
+        results.append(row)
+        logger.warning(
+            f"📈 {concurrency} sessions: lag p99 {row['loop_lag_p99_ms']}ms, "
+            f"livraison p95 {row['delivery_p95_ms']}ms, {row['failed']} échec(s)"
+        )
+        if stop_on_breach and (row["failed"] or row["loop_lag_p99_ms"] > max_loop_lag_ms):
+            break
+        # Laisse le serveur solder les tâches de fond avant le palier suivant
+        await asyncio.sleep(2.0)
+    return results
+
+
+def stage_passes(
+    row: Dict[str, Any],
+    max_loop_lag_ms: float = DEFAULT_MAX_LOOP_LAG_MS,
+    max_delivery_ms: float = DEFAULT_MAX_DELIVERY_MS,
+) -> bool:
+    """True si le palier respecte les seuils (aucun échec, lag et livraison bornés)."""
+    return (
+        row["failed"] == 0
+        and row["loop_lag_p99_ms"] <= max_loop_lag_ms
+        and row["delivery_p95_ms"] <= max_delivery_ms
+    )
+
+
+def capacity_report(
+    results: List[Dict[str, Any]],
+    max_loop_lag_ms: float = DEFAULT_MAX_LOOP_LAG_MS,
+    max_delivery_ms: float = DEFAULT_MAX_DELIVERY_MS,
+) -> str:
+    """
+    Rapport texte : tableau des paliers et capacité estimée par worker.
+
+    La capacité est le plus haut palier dont tous les paliers inférieurs
+    respectent aussi les seuils.
+    """
+    columns = [
+        "concurrency", "completed", "failed", "session_p95_s", "delivery_p95_ms",
+        "loop_lag_p99_ms", "loop_lag_max_ms", "redis_cmds_per_s", "rss_per_session_kb", "peak_rss_mb",
+    ]
+    lines = [" | ".join(columns)]
+    capacity = 0
+    breached = False
+    for row in results:
+        passed = stage_passes(row, max_loop_lag_ms, max_delivery_ms)
+        lines.append(" | ".join(str(row.get(c, "")) for c in columns) + ("" if passed else "  ❌"))
+        breached = breached or not passed
+        if not breached:
+            capacity = row["concurrency"]
+
+    subscribers = results[0]["subscribers"] if results else 0
+    lines.append("")
+    lines.append(
+        f"Seuils : lag de boucle p99 ≤ {max_loop_lag_ms:.0f}ms, livraison p95 ≤ {max_delivery_ms:.0f}ms, aucun échec"
+    )
+    if capacity:
+        lines.append(f"✅ Capacité estimée : {capacity} extractions simultanées ({subscribers} client(s) WS chacune) par worker")
+    else:
+        lines.append("❌ Aucun palier ne respecte les seuils")
+    return "\n".join(lines)
@@ -0,0 +1,126 @@
+"""
+Enregistre une trace d'extraction réelle (clés API requises) pour le corpus de benchmark.
+
+Les réponses de Runner.run et des clients de recherche sont capturées avec leur
+usage et leur latence observée, au format rejoué par benchmarks.harness.
+Le streaming des agents et l'index des identités sont désactivés pendant
+l'enregistrement : toutes les réponses (Éclaireur compris) passent par Runner.run.
+"""
+
+import importlib
+import time
+import uuid
+from contextlib import ExitStack
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest import mock
+
+
+def _to_jsonable(output: Any) -> Any:
+    if hasattr(output, "model_dump"):
+        return output.model_dump()
+    return output
+
+
+def _usage_dict(usage: Any) -> Dict[str, int]:
+    from company_agents.prompt_assembly import get_cached_input_tokens
+
+    if usage is None:
+        return {}
+    return {
+        "input_tokens": getattr(usage, "input_tokens", None) or getattr(usage, "prompt_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", 0) or 0,
+        "cached_input_tokens": get_cached_input_tokens(usage),
+    }
+
+
+class _RecordingClient:
+    """Proxy d'un client AsyncOpenAI qui enregistre les réponses de chat.completions.create."""
+
+    def __init__(self, client: Any, searches: Dict[str, Any]):
+        self._client = client
+        self._searches = searches
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs) -> Any:
+        started = time.perf_counter()
+        response = await self._client.chat.completions.create(**kwargs)
+        citations = [
+            getattr(c, "url", c) if not isinstance(c, str) else c
+            for c in (getattr(response, "citations", None) or [])
+        ]
+        self._searches[kwargs.get("model", "default")] = {
+            "text": response.choices[0].message.content,
+            "usage": _usage_dict(getattr(response, "usage", None)),
+            "citations": citations,
+            "latency": {"dist": "fixed", "ms": round((time.perf_counter() - started) * 1000)},
+        }
+        return response
+
+
+async def record_trace(
+    name: str,
+    input_query: str,
+    deep_search: bool = False,
+    include_subsidiaries: bool = True,
+) -> Dict[str, Any]:
+    """
+    Exécute une extraction réelle et retourne la trace correspondante.
+
+    Args:
+        name: Nom de la trace
+        input_query: Nom d'entreprise ou URL
+        deep_search: Pipeline avancé (Perplexity)
+        include_subsidiaries: Inclure l'extraction des filiales
+
+    Returns:
+        Trace au format de benchmarks.harness
+    """
+    from agents import Runner
+    from company_agents.extraction_core import extract_company_data
+
+    agents: Dict[str, List[Dict[str, Any]]] = {}
+    searches: Dict[str, Any] = {}
+    original_run = Runner.run
+
+    async def recording_run(agent: Any, input: Any = None, **kwargs) -> Any:
+        started = time.perf_counter()
+        result = await original_run(agent, input, **kwargs)
+        agents.setdefault(agent.name, []).append({
+            "output": _to_jsonable(result.final_output),
+            "usage": _usage_dict(getattr(result.context_wrapper, "usage", None)),
+            "latency": {"dist": "fixed", "ms": round((time.perf_counter() - started) * 1000)},
+        })
+        return result
+
+    tools = importlib.import_module("company_agents.subs_tools.filiales_search_agent_optimized")
+    extractor = importlib.import_module("company_agents.subs_agents.subsidiary_extractor")
+    streaming = importlib.import_module("company_agents.streaming")
+    identity = importlib.import_module("company_agents.orchestrator.identity_index")
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(Runner, "run", staticmethod(recording_run)))
+        stack.enter_context(mock.patch.object(streaming, "ENABLE_AGENT_STREAMING", False))
+        stack.enter_context(mock.patch.object(identity.identity_index, "enabled", False))
+        if tools.get_client() is not None:
+            stack.enter_context(mock.patch.object(tools, "client", _RecordingClient(tools.client, searches)))
+        if extractor.get_perplexity_client() is not None:
+            stack.enter_context(mock.patch.object(
+                extractor, "perplexity_client", _RecordingClient(extractor.perplexity_client, searches)
+            ))
+        await extract_company_data(
+            input_query,
+            session_id=f"record-{uuid.uuid4().hex[:8]}",
+            include_subsidiaries=include_subsidiaries,
+            deep_search=deep_search,
+        )
+
+    return {
+        "name": name,
+        "input_query": input_query,
+        "deep_search": deep_search,
+        "include_subsidiaries": include_subsidiaries,
+        "agents": agents,
+        "searches": searches,
+        "urls": {},
+    }
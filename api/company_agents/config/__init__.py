@@ -18,6 +18,12 @@ from .agent_config import (
     DEFAULT_TOOL_NAMES,
     DEFAULT_EXTRACTION_STEPS,
     DEFAULT_SUB_AGENTS,
+    DEFAULT_MODEL_ROUTING,
+    MODEL_ROUTING_THRESHOLDS,
+    ENABLE_MODEL_ROUTING,
+    get_default_model,
+    select_model,
+    get_escalation_model,
     get_all_tools_names,
     get_agent_info,
     get_extraction_steps,
@@ -36,6 +42,12 @@ __all__ = [
     "DEFAULT_TOOL_NAMES",
     "DEFAULT_EXTRACTION_STEPS",
     "DEFAULT_SUB_AGENTS",
+    "DEFAULT_MODEL_ROUTING",
+    "MODEL_ROUTING_THRESHOLDS",
+    "ENABLE_MODEL_ROUTING",
+    "get_default_model",
+    "select_model",
+    "get_escalation_model",
     "get_all_tools_names",
     "get_agent_info",
     "get_extraction_steps",
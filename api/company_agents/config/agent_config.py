@@ -4,8 +4,9 @@ Configuration for agents and extraction steps.
 This module contains metadata about agents, extraction steps, and tool names.
 """
 
-from typing import Dict, List, Any, Callable
+from typing import Dict, List, Any, Callable, Optional
 import importlib
+import os
 from .extraction_config import MAX_TURNS
 
 # Noms des outils disponibles
@@ -67,6 +68,89 @@ DEFAULT_AGENT_GUARDRAILS: Dict[str, List[str]] = {
 }
 
 
+# Routage des modèles par agent : trois paliers (light / default / strong).
+# "default" correspond au modèle historique de l'agent, "strong" sert à l'escalade
+# après un déclenchement de guardrail. Sans palier "light" (agent déjà sur un
+# petit modèle), les entrées simples restent sur "default".
+DEFAULT_MODEL_ROUTING: Dict[str, Dict[str, str]] = {
+    "company_analyzer": {"default": "gpt-4.1-mini", "strong": "gpt-4o"},
+    "information_extractor": {"default": "gpt-4.1-mini", "strong": "gpt-4o"},
+    "subsidiary_extractor": {"light": "gpt-4o-mini", "default": "gpt-4o", "strong": "gpt-4o"},
+    "meta_validator": {"light": "gpt-4.1-mini", "default": "gpt-4o", "strong": "gpt-4o"},
+    "data_restructurer": {"light": "gpt-4.1-mini", "default": "gpt-4o", "strong": "gpt-4o"},
+}
+
+# Seuils de complexité (caractères d'entrée, nombre de filiales)
+MODEL_ROUTING_THRESHOLDS: Dict[str, int] = {
+    "light_max_input_chars": int(os.getenv("ROUTING_LIGHT_MAX_INPUT_CHARS", "6000")),
+    "light_max_subsidiaries": int(os.getenv("ROUTING_LIGHT_MAX_SUBSIDIARIES", "3")),
+    "strong_min_input_chars": int(os.getenv("ROUTING_STRONG_MIN_INPUT_CHARS", "40000")),
+    "strong_min_subsidiaries": int(os.getenv("ROUTING_STRONG_MIN_SUBSIDIARIES", "8")),
+}
+
+# Feature flag : désactivé, chaque agent garde son modèle "default"
+ENABLE_MODEL_ROUTING = os.getenv("ENABLE_MODEL_ROUTING", "true").lower() in ("1", "true", "yes")
+
+
+def get_default_model(agent_key: str) -> str:
+    """Retourne le modèle par défaut (palier "default") d'un agent."""
+    return DEFAULT_MODEL_ROUTING.get(agent_key, {}).get("default", "gpt-4o")
+
+
+def select_model(
+    agent_key: str,
+    *,
+    input_length: int = 0,
+    subsidiaries_count: int = 0,
+    enterprise_type: Optional[str] = None,
+    deep_search: bool = False,
+) -> str:
+    """Choisit le modèle d'un agent pour un run à partir de signaux peu coûteux.
+
+    Args:
+        agent_key: Clé de l'agent (ex: "meta_validator")
+        input_length: Taille de l'entrée en caractères
+        subsidiaries_count: Nombre de filiales déjà trouvées par le Cartographe
+        enterprise_type: Type d'entreprise fourni par le Mineur ("simple" / "complex")
+        deep_search: Recherche approfondie demandée
+
+    Returns:
+        Nom du modèle à utiliser
+    """
+    tiers = DEFAULT_MODEL_ROUTING.get(agent_key)
+    if not tiers:
+        return get_default_model(agent_key)
+    if not ENABLE_MODEL_ROUTING:
+        return tiers["default"]
+
+    thresholds = MODEL_ROUTING_THRESHOLDS
+    if (
+        input_length >= thresholds["strong_min_input_chars"]
+        or subsidiaries_count >= thresholds["strong_min_subsidiaries"]
+    ):
+        return tiers["strong"]
+    if deep_search or enterprise_type == "complex":
+        return tiers["default"]
+    if (
+        input_length <= thresholds["light_max_input_chars"]
+        and subsidiaries_count <= thresholds["light_max_subsidiaries"]
+    ):
+        return tiers.get("light", tiers["default"])
+    return tiers["default"]
+
+
+def get_escalation_model(agent_key: str, current_model: Optional[str]) -> Optional[str]:
+    """Retourne le modèle d'escalade après un échec de guardrail.
+
+    Returns:
+        Le palier "strong" s'il diffère du modèle courant, sinon None
+    """
+    strong = DEFAULT_MODEL_ROUTING.get(agent_key, {}).get("strong")
+    if not ENABLE_MODEL_ROUTING or not strong or strong == current_model:
+        return None
+    return strong
+
+
 def load_guardrails(agent_key: str) -> List[Callable]:
     """Charge dynamiquement les guardrails déclarés pour un agent.
 
@@ -5,7 +5,7 @@ This module contains all the configuration settings for URL validation,
 timeouts, headers, and feature flags.
 """
 
-from typing import Dict, Set, List
+from typing import Dict, Set, List, Optional
 import os
 
 # Configuration pour la validation des URLs
@@ -35,6 +35,9 @@ ENABLE_FRESHNESS_FILTERING = True
 _DEFAULT_FALLBACK = "/,/contact,/contact/,/about,/mentions-legales,/legal,/imprint"
 ONDOMAIN_FALLBACK_PATHS: List[str] = [p.strip() for p in os.getenv("URL_FALLBACK_PATHS", _DEFAULT_FALLBACK).split(",") if p.strip()]
 
+# Sondes d'accessibilité simultanées lors de la sélection des meilleures sources
+SOURCE_PROBE_CONCURRENCY = int(os.getenv("SOURCE_PROBE_CONCURRENCY", "5"))
+
 # Configuration des tours maximum (sera resserrée côté orchestrateur)
 MAX_TURNS = {"analyze": 2, "info": 2, "subs": 3, "meta": 1}
 
@@ -54,3 +57,42 @@ def set_url_cache_status(url: str, is_accessible: bool) -> None:
 def get_url_cache_status(url: str) -> bool:
     """Récupère le statut d'accessibilité d'une URL depuis le cache."""
     return _URL_STATUS_CACHE.get(url, False)
+
+def lookup_url_cache_status(url: str) -> Optional[bool]:
+    """Statut d'accessibilité en cache d'une URL, None si elle n'a jamais été sondée."""
+    return _URL_STATUS_CACHE.get(url)
+
+# Budget de tokens par appel pour les payloads du Superviseur et du Restructurateur
+PAYLOAD_TOKEN_BUDGET = int(os.getenv("PAYLOAD_TOKEN_BUDGET", "12000"))
+# Nombre maximum de lots exécutés simultanément lors du découpage des filiales
+PAYLOAD_BATCH_CONCURRENCY = int(os.getenv("PAYLOAD_BATCH_CONCURRENCY", "4"))
+
+# Limiteur partagé des appels LLM concurrents (0 = pas de limite par minute)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+
+# Structuration du Cartographe par segments (recherche volumineuse découpée par entité/pays) :
+# recherche hors agent, puis découpage si le texte dépasse CARTOGRAPHE_CHUNK_MIN_CHARS
+ENABLE_CARTOGRAPHE_CHUNKING = os.getenv("ENABLE_CARTOGRAPHE_CHUNKING", "false").lower() in ("1", "true", "yes")
+CARTOGRAPHE_CHUNK_MAX_CHARS = int(os.getenv("CARTOGRAPHE_CHUNK_MAX_CHARS", "6000"))
+CARTOGRAPHE_CHUNK_MIN_CHARS = int(os.getenv("CARTOGRAPHE_CHUNK_MIN_CHARS", "12000"))
+
+# Recherche de filiales spéculative sur l'entrée brute, lancée pendant l'Éclaireur
+# (conservée si l'entité résolue porte le même nom normalisé)
+SPECULATIVE_SUBSIDIARY_SEARCH = os.getenv("SPECULATIVE_SUBSIDIARY_SEARCH", "false").lower() in ("1", "true", "yes")
+
+# Index local des identités résolues : l'Éclaireur est sauté pour les entreprises connues
+IDENTITY_INDEX_ENABLED = os.getenv("IDENTITY_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+IDENTITY_INDEX_MAX_AGE_DAYS = int(os.getenv("IDENTITY_INDEX_MAX_AGE_DAYS", "90"))
+IDENTITY_INDEX_MIN_CONFIDENCE = float(os.getenv("IDENTITY_INDEX_MIN_CONFIDENCE", "0.8"))
+IDENTITY_INDEX_MIN_SIMILARITY = float(os.getenv("IDENTITY_INDEX_MIN_SIMILARITY", "0.9"))
+IDENTITY_INDEX_REFRESH_S = int(os.getenv("IDENTITY_INDEX_REFRESH_S", "600"))
+
+# Streaming des sorties structurées (Cartographe, Restructurateur) : objets diffusés
+# au WebSocket et URLs sondées pendant la génération
+ENABLE_AGENT_STREAMING = os.getenv("ENABLE_AGENT_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Rétention des métriques d'agents en mémoire (secondes après la fin d'une session, plafond souple
+# du nombre de sessions : seules les sessions terminées sont évincées au-delà)
+METRICS_SESSION_TTL = int(os.getenv("METRICS_SESSION_TTL", "900"))
+METRICS_MAX_SESSIONS = int(os.getenv("METRICS_MAX_SESSIONS", "500"))
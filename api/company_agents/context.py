@@ -35,6 +35,21 @@ def get_session_context() -> str:
     return session_id if session_id else 'default-session'
 
 
+def resolve_session_id(session_id: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve the session_id to attribute work to.
+
+    Args:
+        session_id: Explicit session_id, if known ('default-session' counts as unknown)
+
+    Returns:
+        The explicit session_id, else the one from the current context, else None
+    """
+    if session_id and session_id != 'default-session':
+        return session_id
+    return current_session_id.get()
+
+
 def clear_session_context():
     """
     Clear the session context.
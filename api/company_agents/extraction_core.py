@@ -12,18 +12,23 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional
+import asyncio
 import uuid
 import logging
 import time
 
+from core.offload import run_cpu
+from core.tracing import traced, set_span_attributes
 from status import status_manager
 from services.agent_tracking_service import agent_tracking_service
 
 from .extraction_manager import orchestrate_extraction
+from .metrics.prometheus_exporter import extraction_started, extraction_finished
 
 logger = logging.getLogger(__name__)
 
 
+@traced("extract_company_data")
 async def extract_company_data(
     input_query: str,
     *,
@@ -32,6 +37,7 @@ async def extract_company_data(
     force_company_profile: Optional[str] = None,
     max_turns: int = 4,
     deep_search: bool = False,
+    speculative_search: Optional[bool] = None,
 ) -> Dict[str, Any]:
     """
     Point d'entrée principal pour l'extraction d'informations d'entreprise.
@@ -43,6 +49,8 @@ async def extract_company_data(
         force_company_profile: Forcer un profil d'entreprise spécifique
         max_turns: Nombre maximum de tours pour les agents
         deep_search: Mode de recherche approfondie (Perplexity) vs simple (GPT-4o-search)
+        speculative_search: Recherche de filiales spéculative pendant l'identification de
+            l'entité (ex: réglage de l'organisation ; None = SPECULATIVE_SUBSIDIARY_SEARCH)
 
     Returns:
         Dict contenant les informations d'entreprise extraites
@@ -50,8 +58,12 @@ async def extract_company_data(
     sid = session_id or str(uuid.uuid4())
     start_time = time.perf_counter()
 
+    search_type = "advanced" if deep_search else "simple"
+    set_span_attributes(session_id=sid, search_type=search_type, include_subsidiaries=include_subsidiaries)
+
     # Démarrage du tracking de session
     await agent_tracking_service.start_extraction_tracking(sid, input_query)
+    extraction_started()
 
     try:
         # Orchestration des agents spécialisés
@@ -60,6 +72,7 @@ async def extract_company_data(
             session_id=sid,
             include_subsidiaries=include_subsidiaries,
             deep_search=deep_search,
+            speculative_search=speculative_search,
         )
 
         # Ajout des métadonnées d'extraction
@@ -78,7 +91,7 @@ async def extract_company_data(
         )
 
         # Ajouter le type de recherche dans les métadonnées
-        metadata["search_type"] = "advanced" if deep_search else "simple"
+        metadata["search_type"] = search_type
         result["extraction_metadata"] = metadata
 
         result["extraction_date"] = datetime.now(timezone.utc).isoformat()
@@ -88,14 +101,16 @@ async def extract_company_data(
             try:
                 from services.cost_tracking_service import cost_tracking_service
 
-                # Calculer les coûts totaux
-                cost_data = cost_tracking_service.calculate_extraction_cost(
-                    result["models_usage_raw"]
+                # Calculer les coûts totaux (déportés hors de la boucle si l'usage est volumineux)
+                cost_data = await run_cpu(
+                    cost_tracking_service.calculate_extraction_cost,
+                    result["models_usage_raw"],
                 )
 
                 # Ajouter les coûts des tools (temps réel si disponible, sinon estimation)
                 real_time_tools_data = result.get("tools_usage_real_time")
-                tools_cost = cost_tracking_service.calculate_tools_cost(
+                tools_cost = await run_cpu(
+                    cost_tracking_service.calculate_tools_cost,
                     result["models_usage_raw"],
                     metadata["search_type"],
                     real_time_tools_data,
@@ -113,6 +128,10 @@ async def extract_company_data(
                     "total_tokens": cost_data["total_tokens"] + tools_cost["total_tokens"],
                     "input_tokens": cost_data["total_input_tokens"] + tools_cost["total_input_tokens"],
                     "output_tokens": cost_data["total_output_tokens"] + tools_cost["total_output_tokens"],
+                    "cached_input_tokens": (
+                        cost_data.get("total_cached_input_tokens", 0)
+                        + tools_cost.get("total_cached_input_tokens", 0)
+                    ),
                     "models_breakdown": cost_data["models_breakdown"] + tools_cost["tools_breakdown"],
                     "search_type": metadata["search_type"],
                     "exchange_rate": cost_data["exchange_rate"],
@@ -137,16 +156,28 @@ async def extract_company_data(
         await status_manager.store_extraction_results(sid, result)
         await agent_tracking_service.complete_extraction_tracking(sid, result)
         
-        # Nettoyer le tracker de tokens APRÈS le calcul des coûts
+        # Persister puis nettoyer le tracker de tokens APRÈS le calcul des coûts
         try:
             from .metrics.tool_tokens_tracker import ToolTokensTracker
-            ToolTokensTracker.clear_session(sid)
+            await ToolTokensTracker.flush_session(sid)
             logger.info(f"🧹 ToolTokensTracker nettoyé pour session: {sid}")
         except Exception as e:
             logger.warning(f"⚠️ Impossible de nettoyer ToolTokensTracker: {e}")
         
+        extraction_finished(
+            search_type, "completed", (result.get("extraction_costs") or {}).get("cost_eur", 0.0)
+        )
         return result
+    except asyncio.CancelledError:
+        logger.warning(f"⚠️ Extraction annulée [Session: {sid}]")
+        extraction_finished(search_type, "cancelled")
+        from .metrics.tool_tokens_tracker import ToolTokensTracker
+        await asyncio.shield(ToolTokensTracker.flush_session(sid))
+        raise
     except Exception as exc:
         logger.exception("❌ Échec extraction [Session: %s]", sid)
+        extraction_finished(search_type, "error")
         await agent_tracking_service.error_extraction_tracking(sid, str(exc))
+        from .metrics.tool_tokens_tracker import ToolTokensTracker
+        await ToolTokensTracker.flush_session(sid)
         raise
@@ -9,11 +9,15 @@ Vérifie que la sortie contient :
 
 import logging
 import asyncio
+import time
 from typing import Any, Dict, List, Optional
 from agents import output_guardrail, GuardrailFunctionOutput
 from urllib.parse import urlparse
 import httpx
 
+from core.tracing import start_span
+from ..metrics.prometheus_exporter import observe_url_probe
+
 logger = logging.getLogger(__name__)
 
 # Configuration pour la vérification d'accessibilité
@@ -41,6 +45,25 @@ def _is_url(text: str) -> bool:
 
 
 async def _check_url_accessibility(url: str) -> Dict[str, Any]:
+    """
+    Vérifie l'accessibilité d'une URL et enregistre la latence de la sonde.
+
+    Args:
+        url: URL à vérifier
+
+    Returns:
+        Dict avec status_code, accessible (bool), et error_message
+    """
+    started = time.perf_counter()
+    with start_span("url_probe", probe="eclaireur", url=url) as span:
+        check = await _probe_url(url)
+        if span is not None:
+            span.set_attribute("accessible", check["accessible"])
+    observe_url_probe("eclaireur", time.perf_counter() - started, check["accessible"])
+    return check
+
+
+async def _probe_url(url: str) -> Dict[str, Any]:
     """
     Vérifie l'accessibilité d'une URL via requête HTTP HEAD.
     
@@ -3,9 +3,13 @@ Hooks de cycle de vie pour les agents avec suivi WebSocket
 """
 
 import logging
-from typing import Any, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from agents import AgentHooks
 
+from core.tracing import end_span, start_detached_span
+from .prometheus_exporter import observe_tool_call
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,6 +28,8 @@ class RealtimeAgentHooks(AgentHooks):
         self.status_manager = status_manager
         self.session_id = session_id
         self.agent_name = agent_name
+        # Appels de tool en cours (début, span), par nom de tool (appels parallèles possibles)
+        self._tool_starts: Dict[str, List[Tuple[float, Any]]] = {}
     
     async def on_output_guardrail_tripwire_triggered(self, context: Any, guardrail_result: Any) -> None:
         """
@@ -73,6 +79,7 @@ class RealtimeAgentHooks(AgentHooks):
     
     async def on_agent_end(self, context: Any, result: Any) -> None:
         """Appelé à la fin de l'agent."""
+        self.end_pending_tool_spans(RuntimeError("Tool non terminé à la fin de l'agent"))
         try:
             await self.status_manager.update_agent_status_detailed(
                 session_id=self.session_id,
@@ -84,3 +91,30 @@ class RealtimeAgentHooks(AgentHooks):
         except Exception as e:
             logger.error(f"❌ Erreur dans hook end: {e}")
 
+    async def on_tool_start(self, context: Any, agent: Any, tool: Any) -> None:
+        """Appelé avant l'exécution d'un tool : mémorise l'instant de départ et ouvre son span."""
+        tool_name = getattr(tool, "name", "unknown")
+        span = start_detached_span(f"tool.{tool_name}", agent=self.agent_name, session_id=self.session_id)
+        self._tool_starts.setdefault(tool_name, []).append((time.perf_counter(), span))
+
+    async def on_tool_end(self, context: Any, agent: Any, tool: Any, result: Any) -> None:
+        """Appelé après l'exécution d'un tool : enregistre sa latence et ferme son span."""
+        tool_name = getattr(tool, "name", "unknown")
+        starts = self._tool_starts.get(tool_name)
+        if starts:
+            started, span = starts.pop(0)
+            observe_tool_call(tool_name, time.perf_counter() - started)
+            end_span(span)
+
+    def end_pending_tool_spans(self, error: Optional[BaseException] = None) -> None:
+        """
+        Termine les spans des tools restés ouverts (tool en erreur, run interrompu).
+
+        Args:
+            error: Erreur enregistrée sur chaque span terminé
+        """
+        for tool_name, starts in self._tool_starts.items():
+            for started, span in starts:
+                observe_tool_call(tool_name, time.perf_counter() - started, "error")
+                end_span(span, error)
+        self._tool_starts.clear()
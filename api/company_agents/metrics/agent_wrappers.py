@@ -5,13 +5,16 @@ Wrappers avec métriques pour tous les agents
 import asyncio
 import time
 import logging
-from typing import Dict, Any, Optional
-from agents import Runner
+from typing import Dict, Any, Optional, Tuple
 from agents.exceptions import OutputGuardrailTripwireTriggered
 
+from core.tracing import start_span
+
 from .metrics_collector import metrics_collector, MetricStatus, AgentMetrics
 from .real_time_tracker import RealTimeTracker
 from .agent_hooks import RealtimeAgentHooks
+from .prometheus_exporter import record_guardrail_trip, record_retry
+from ..prompt_assembly import check_static_prefix, get_cached_input_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +26,10 @@ async def run_agent_with_metrics(
     input_data: str,
     status_manager,
     max_turns: int = 3,
-    max_retries: int = 2
+    max_retries: int = 2,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None,
+    stream_items: Tuple[str, ...] = ()
 ) -> Dict[str, Any]:
     """
     Wrapper générique pour exécuter un agent avec métriques temps réel et retry.
@@ -36,16 +42,31 @@ async def run_agent_with_metrics(
         status_manager: Gestionnaire de statut pour WebSocket
         max_turns: Nombre maximum de tours
         max_retries: Nombre maximum de retries en cas de guardrail (default: 2)
+        model: Modèle choisi par le routage (None = modèle déclaré sur l'agent)
+        escalation_model: Modèle plus fort utilisé pour les retries après un guardrail
+        stream_items: Tableaux de la sortie structurée diffusés objet par objet
+            pendant la génération (exécution en streaming, voir company_agents.streaming)
         
     Returns:
         Dict avec résultat et métriques
     """
+    from ..streaming import run_agent_streamed
+
     # Démarrer les métriques
     agent_metrics = metrics_collector.start_agent(agent_name, session_id)
     real_time_tracker = RealTimeTracker(status_manager)
     
+    # Appliquer le modèle routé sur une copie pour ne pas modifier l'agent partagé
+    if model and model != getattr(agent, "model", None):
+        agent = agent.clone(model=model)
+        logger.info(f"🧭 Modèle routé pour {agent_name}: {model}")
+    
+    # Le préfixe statique (instructions) doit rester stable pour le cache de prompt
+    check_static_prefix(agent)
+    
     # Attacher les hooks de cycle de vie pour notifier le WebSocket
-    agent.hooks = RealtimeAgentHooks(status_manager, session_id, agent_name)
+    hooks = RealtimeAgentHooks(status_manager, session_id, agent_name)
+    agent.hooks = hooks
     
     # Démarrer le suivi temps réel en arrière-plan (ne sera jamais annulé jusqu'à la fin)
     tracking_task = asyncio.create_task(
@@ -74,6 +95,7 @@ async def run_agent_with_metrics(
                     # Étape de retry
                     retry_step = agent_metrics.add_step(f"Correction/Retry-{attempt}")
                     retry_step.status = MetricStatus.RUNNING
+                    record_retry(agent_name)
                     
                     # Extraire les infos du guardrail précédent
                     guardrail_info = {}
@@ -118,9 +140,29 @@ async def run_agent_with_metrics(
                         )
                     
                     current_input = f"{input_data}{correction_hint}"
+                    
+                    # Escalade vers un modèle plus fort dès le premier retry
+                    if attempt == 1 and escalation_model and escalation_model != getattr(agent, "model", None):
+                        agent = agent.clone(model=escalation_model)
+                        retry_step.details["escalated_model"] = escalation_model
+                        logger.info(f"⬆️ Escalade du modèle pour {agent_name}: {escalation_model}")
                 
                 # Exécution de l'agent (le tracking continue en parallèle)
-                result = await Runner.run(agent, input=current_input, max_turns=max_turns)
+                with start_span("agent.run", agent=agent_name, attempt=attempt + 1, max_turns=max_turns):
+                    try:
+                        result = await run_agent_streamed(
+                            agent,
+                            current_input,
+                            max_turns=max_turns,
+                            agent_name=agent_name,
+                            session_id=session_id,
+                            item_keys=stream_items,
+                            status_manager=status_manager,
+                        )
+                    except BaseException as run_error:
+                        # Un tool en erreur n'atteint pas on_tool_end : fermer ses spans
+                        hooks.end_pending_tool_spans(run_error)
+                        raise
 
                 # Capturer les tokens utilisés si disponibles (selon la doc OpenAI)
                 if hasattr(result, 'context_wrapper') and hasattr(result.context_wrapper, 'usage'):
@@ -164,6 +206,7 @@ async def run_agent_with_metrics(
                                 "model": model_name,
                                 "input_tokens": usage.input_tokens,
                                 "output_tokens": usage.output_tokens,
+                                "cached_input_tokens": get_cached_input_tokens(usage),
                                 "total_tokens": getattr(usage, 'total_tokens', usage.input_tokens + usage.output_tokens)
                             }
                         else:
@@ -172,6 +215,7 @@ async def run_agent_with_metrics(
                                 "model": model_name,
                                 "input_tokens": 0,
                                 "output_tokens": 0,
+                                "cached_input_tokens": 0,
                                 "total_tokens": 0
                             }
 
@@ -186,7 +230,8 @@ async def run_agent_with_metrics(
                                 tool_name=agent_name,
                                 model=model_name,
                                 input_tokens=token_info['input_tokens'],
-                                output_tokens=token_info['output_tokens']
+                                output_tokens=token_info['output_tokens'],
+                                cached_input_tokens=token_info['cached_input_tokens']
                             )
                             logger.info(f"🔧 Tokens envoyés au tracker pour {agent_name}")
                         except Exception as tracker_error:
@@ -194,8 +239,8 @@ async def run_agent_with_metrics(
 
                         logger.info(
                             f"💰 Tokens capturés pour {agent_name}: "
-                            f"{token_info['input_tokens']} in + {token_info['output_tokens']} out = "
-                            f"{token_info['total_tokens']} total (modèle: {model_name})"
+                            f"{token_info['input_tokens']} in ({token_info['cached_input_tokens']} cache) + "
+                            f"{token_info['output_tokens']} out = {token_info['total_tokens']} total (modèle: {model_name})"
                         )
                     except Exception as e:
                         logger.warning(f"⚠️ Impossible de capturer les tokens pour {agent_name}: {e}")
@@ -209,6 +254,7 @@ async def run_agent_with_metrics(
                 
             except OutputGuardrailTripwireTriggered as trip:
                 last_exception = trip
+                record_guardrail_trip(agent_name)
                 
                 # Marquer l'étape en échec (sauf si dernière tentative)
                 if attempt == 0:
@@ -313,7 +359,9 @@ async def run_company_analyzer_with_metrics(
     company_name: str,
     session_id: str,
     status_manager,
-    max_turns: int = 3
+    max_turns: int = 3,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None
 ) -> Dict[str, Any]:
     """Wrapper spécialisé pour l'agent Company Analyzer"""
     from ..subs_agents import company_analyzer
@@ -324,7 +372,9 @@ async def run_company_analyzer_with_metrics(
         session_id=session_id,
         input_data=company_name,
         status_manager=status_manager,
-        max_turns=max_turns
+        max_turns=max_turns,
+        model=model,
+        escalation_model=escalation_model
     )
 
 
@@ -332,7 +382,9 @@ async def run_information_extractor_with_metrics(
     input_data: str,
     session_id: str,
     status_manager,
-    max_turns: int = 3
+    max_turns: int = 3,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None
 ) -> Dict[str, Any]:
     """Wrapper spécialisé pour l'agent Information Extractor"""
     from ..subs_agents import information_extractor
@@ -343,7 +395,9 @@ async def run_information_extractor_with_metrics(
         session_id=session_id,
         input_data=input_data,
         status_manager=status_manager,
-        max_turns=max_turns
+        max_turns=max_turns,
+        model=model,
+        escalation_model=escalation_model
     )
 
 
@@ -351,18 +405,23 @@ async def run_meta_validator_with_metrics(
     input_data: str,
     session_id: str,
     status_manager,
-    max_turns: int = 3
+    max_turns: int = 3,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None,
+    agent_name: str = "⚖️ Superviseur"
 ) -> Dict[str, Any]:
     """Wrapper spécialisé pour l'agent Meta Validator"""
     from ..subs_agents import meta_validator
     
     return await run_agent_with_metrics(
         agent=meta_validator,
-        agent_name="⚖️ Superviseur",
+        agent_name=agent_name,
         session_id=session_id,
         input_data=input_data,
         status_manager=status_manager,
-        max_turns=max_turns
+        max_turns=max_turns,
+        model=model,
+        escalation_model=escalation_model
     )
 
 
@@ -370,16 +429,22 @@ async def run_data_restructurer_with_metrics(
     input_data: str,
     session_id: str,
     status_manager,
-    max_turns: int = 3
+    max_turns: int = 3,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None,
+    agent_name: str = "🔄 Restructurateur"
 ) -> Dict[str, Any]:
     """Wrapper spécialisé pour l'agent Data Restructurer"""
     from ..subs_agents.data_validator_optimized import data_restructurer_optimized as data_restructurer
     
     return await run_agent_with_metrics(
         agent=data_restructurer,
-        agent_name="🔄 Restructurateur",
+        agent_name=agent_name,
         session_id=session_id,
         input_data=input_data,
         status_manager=status_manager,
-        max_turns=max_turns
+        max_turns=max_turns,
+        model=model,
+        escalation_model=escalation_model,
+        stream_items=("subsidiaries_details", "commercial_presence_details")
     )
@@ -4,12 +4,19 @@ Collecteur de métriques unifié pour tous les agents
 
 import time
 import logging
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field
 from enum import Enum
 
+from ..config.extraction_config import METRICS_SESSION_TTL, METRICS_MAX_SESSIONS
+from .prometheus_exporter import observe_agent_run
+
 logger = logging.getLogger(__name__)
 
+# Intervalle minimal entre deux avertissements de sessions en cours au-delà du plafond
+_OVER_CAP_WARNING_INTERVAL_S = 60.0
+
 
 class MetricStatus(str, Enum):
     """États des agents pour les métriques"""
@@ -66,6 +73,7 @@ class AgentMetrics:
     
     def finish(self, status: MetricStatus = MetricStatus.COMPLETED, error_details: Optional[str] = None):
         """Finalise les métriques de l'agent"""
+        first_finish = self.end_time is None
         self.end_time = time.time()
         self.total_duration_ms = int((self.end_time - self.start_time) * 1000)
         self.status = status
@@ -76,6 +84,9 @@ class AgentMetrics:
         for step in self.steps:
             if step.end_time is None:
                 step.finish(MetricStatus.COMPLETED)
+
+        if first_finish:
+            observe_agent_run(self.agent_name, self.end_time - self.start_time, status.value)
     
     def get_current_step(self) -> Optional[StepMetrics]:
         """Retourne l'étape actuellement en cours"""
@@ -119,10 +130,37 @@ class AgentMetrics:
 
 
 class MetricsCollector:
-    """Collecteur centralisé de métriques pour tous les agents"""
+    """
+    Collecteur centralisé de métriques pour tous les agents.
+
+    Index à deux niveaux session → agent : le nettoyage d'une session est en O(1).
+    Les sessions terminées sont conservées METRICS_SESSION_TTL secondes (lecture
+    tardive par le suivi temps réel) puis évincées.
+
+    METRICS_MAX_SESSIONS est un plafond souple qui ne s'applique qu'aux sessions
+    terminées : au-delà, les plus anciennes sont évincées avant leur TTL. Les
+    sessions en cours ne sont jamais évincées (leur nombre est borné par la
+    concurrence des extractions) ; leur dépassement du plafond est seulement
+    journalisé, au plus une fois par minute.
+    """
     
-    def __init__(self):
-        self.active_metrics: Dict[str, AgentMetrics] = {}
+    def __init__(self, session_ttl: int = METRICS_SESSION_TTL, max_sessions: int = METRICS_MAX_SESSIONS):
+        self.session_ttl = session_ttl
+        self.max_sessions = max(1, max_sessions)
+        # session_id -> agent_name -> métriques (ordre d'insertion = ancienneté)
+        self._sessions: "OrderedDict[str, Dict[str, AgentMetrics]]" = OrderedDict()
+        # session_id -> instant de fin (ordre de fin)
+        self._finished_at: "OrderedDict[str, float]" = OrderedDict()
+        self._over_cap_warned_at: Optional[float] = None
+    
+    @property
+    def active_metrics(self) -> Dict[str, AgentMetrics]:
+        """Vue à plat "{session_id}:{agent_name}" (diagnostic uniquement)"""
+        return {
+            f"{session_id}:{agent_name}": metrics
+            for session_id, agents in self._sessions.items()
+            for agent_name, metrics in agents.items()
+        }
     
     def start_agent(self, agent_name: str, session_id: str) -> AgentMetrics:
         """Démarre le suivi des métriques pour un agent"""
@@ -131,27 +169,91 @@ class MetricsCollector:
             session_id=session_id,
             start_time=time.time()
         )
-        self.active_metrics[f"{session_id}:{agent_name}"] = metrics
+        agents = self._sessions.get(session_id)
+        if agents is None:
+            agents = self._sessions[session_id] = {}
+            self._evict()
+        agents[agent_name] = metrics
         logger.info(f"📊 Métriques démarrées pour {agent_name} (session: {session_id})")
         return metrics
     
     def get_agent_metrics(self, agent_name: str, session_id: str) -> Optional[AgentMetrics]:
         """Récupère les métriques d'un agent"""
-        return self.active_metrics.get(f"{session_id}:{agent_name}")
+        return self._sessions.get(session_id, {}).get(agent_name)
+    
+    def get_session_metrics(self, session_id: str) -> List[AgentMetrics]:
+        """Récupère les métriques de tous les agents d'une session (y compris les lots)"""
+        return list(self._sessions.get(session_id, {}).values())
+    
+    def get_session_summary(self, session_id: str) -> Dict[str, Any]:
+        """
+        Export compact des métriques d'une session.
+
+        Returns:
+            Dict avec, par agent, statut / durée / tokens, et la liste des usages
+            de tokens (models_usage) prête pour le calcul des coûts
+        """
+        agents = {}
+        models_usage = []
+        for agent_name, metrics in self._sessions.get(session_id, {}).items():
+            tokens = metrics.performance_metrics.get("tokens")
+            agents[agent_name] = {
+                "status": metrics.status.value,
+                "duration_ms": metrics.total_duration_ms,
+                "tokens": tokens,
+            }
+            if tokens:
+                models_usage.append(tokens)
+        return {
+            "session_id": session_id,
+            "agents": agents,
+            "models_usage": models_usage,
+            "total_tokens": sum(t.get("total_tokens", 0) for t in models_usage),
+        }
     
     def finish_agent(self, agent_name: str, session_id: str, status: MetricStatus = MetricStatus.COMPLETED, error_details: Optional[str] = None):
         """Finalise les métriques d'un agent"""
-        key = f"{session_id}:{agent_name}"
-        if key in self.active_metrics:
-            self.active_metrics[key].finish(status, error_details)
-            logger.info(f"📊 Métriques finalisées pour {agent_name}: {self.active_metrics[key].total_duration_ms}ms, status: {status.value}")
+        metrics = self.get_agent_metrics(agent_name, session_id)
+        if metrics is not None:
+            metrics.finish(status, error_details)
+            logger.info(f"📊 Métriques finalisées pour {agent_name}: {metrics.total_duration_ms}ms, status: {status.value}")
+    
+    def mark_session_finished(self, session_id: str):
+        """Marque une session comme terminée : elle sera évincée après le TTL"""
+        if session_id in self._sessions:
+            self._finished_at.pop(session_id, None)
+            self._finished_at[session_id] = time.time()
+        self._evict()
     
     def cleanup_session(self, session_id: str):
         """Nettoie les métriques d'une session"""
-        keys_to_remove = [key for key in self.active_metrics.keys() if key.startswith(f"{session_id}:")]
-        for key in keys_to_remove:
-            del self.active_metrics[key]
+        self._sessions.pop(session_id, None)
+        self._finished_at.pop(session_id, None)
         logger.info(f"🧹 Métriques nettoyées pour session: {session_id}")
+    
+    def _evict(self):
+        """Évince les sessions terminées expirées puis, au-delà du plafond souple, les plus anciennes terminées"""
+        now = time.time()
+        while self._finished_at:
+            session_id, finished_at = next(iter(self._finished_at.items()))
+            if now - finished_at < self.session_ttl:
+                break
+            self._finished_at.popitem(last=False)
+            self._sessions.pop(session_id, None)
+        
+        # Les sessions en cours ne sont jamais évincées
+        while len(self._sessions) > self.max_sessions and self._finished_at:
+            session_id, _ = self._finished_at.popitem(last=False)
+            self._sessions.pop(session_id, None)
+            logger.warning(f"⚠️ Plafond de {self.max_sessions} sessions atteint, métriques évincées: {session_id}")
+        
+        if len(self._sessions) > self.max_sessions and (
+            self._over_cap_warned_at is None or now - self._over_cap_warned_at >= _OVER_CAP_WARNING_INTERVAL_S
+        ):
+            self._over_cap_warned_at = now
+            logger.warning(
+                f"⚠️ {len(self._sessions)} sessions en cours dépassent le plafond souple de {self.max_sessions} sessions de métriques"
+            )
 
 
 # Instance globale du collecteur
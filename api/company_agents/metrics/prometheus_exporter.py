@@ -0,0 +1,307 @@
+"""
+Export Prometheus des métriques de performance du pipeline.
+
+Les points d'instrumentation (MetricsCollector, ToolTokensTracker, hooks
+d'agents, sondes d'URL, limiteur LLM, extraction_core) appellent les fonctions
+`observe_*` / `record_*` de ce module ; l'endpoint `/metrics` sérialise le
+registre au format d'exposition Prometheus.
+
+prometheus_client est une dépendance du projet ; s'il manque, toutes les fonctions
+d'enregistrement sont des no-op. Avec plusieurs workers (gunicorn/uvicorn),
+définir PROMETHEUS_MULTIPROC_DIR pour agréger les valeurs de tous les processus.
+"""
+
+import logging
+import os
+import re
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # pragma: no cover - installation incomplète
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Mode multi-processus : les valeurs sont écrites dans des fichiers mmap partagés
+MULTIPROCESS_MODE = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Bornes des histogrammes (secondes)
+AGENT_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOOL_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+PROBE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+DB_POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30)
+
+# Suffixe des lots parallèles ("Superviseur #2")
+_BATCH_SUFFIX_RE = re.compile(r"\s*#\d+$")
+
+
+def normalize_label(name: str) -> str:
+    """Borne la cardinalité des labels (suffixes de lot retirés, valeur par défaut)."""
+    if not name:
+        return "unknown"
+    return _BATCH_SUFFIX_RE.sub("", str(name)).strip() or "unknown"
+
+
+if PROMETHEUS_AVAILABLE:
+    _gauge_mode = {"multiprocess_mode": "livesum"} if MULTIPROCESS_MODE else {}
+
+    AGENT_DURATION = Histogram(
+        "filiale_agent_duration_seconds",
+        "Durée d'exécution des agents",
+        ["agent", "status"],
+        buckets=AGENT_BUCKETS,
+    )
+    TOOL_DURATION = Histogram(
+        "filiale_tool_duration_seconds",
+        "Durée d'exécution des tools appelés par les agents",
+        ["tool", "status"],
+        buckets=TOOL_BUCKETS,
+    )
+    TOKENS = Counter(
+        "filiale_llm_tokens",
+        "Tokens consommés par modèle (kind: input, cached_input, output)",
+        ["model", "kind"],
+    )
+    RETRIES = Counter(
+        "filiale_agent_retries",
+        "Nouvelles tentatives d'exécution des agents",
+        ["agent"],
+    )
+    GUARDRAIL_TRIPS = Counter(
+        "filiale_guardrail_trips",
+        "Déclenchements de guardrails de sortie",
+        ["agent"],
+    )
+    URL_PROBE_DURATION = Histogram(
+        "filiale_url_probe_duration_seconds",
+        "Latence des vérifications d'accessibilité d'URL",
+        ["probe", "accessible"],
+        buckets=PROBE_BUCKETS,
+    )
+    URL_CACHE = Counter(
+        "filiale_url_cache_lookups",
+        "Consultations du cache d'accessibilité des URLs",
+        ["result"],
+    )
+    LLM_QUEUE_DEPTH = Gauge(
+        "filiale_llm_queue_depth",
+        "Appels LLM en attente d'un créneau du limiteur partagé",
+        **_gauge_mode,
+    )
+    EXTRACTIONS_IN_FLIGHT = Gauge(
+        "filiale_extractions_in_flight",
+        "Extractions en cours",
+        **_gauge_mode,
+    )
+    EXTRACTIONS = Counter(
+        "filiale_extractions",
+        "Extractions terminées",
+        ["search_type", "status"],
+    )
+    LOOP_LAG = Histogram(
+        "filiale_event_loop_lag_seconds",
+        "Retard de réveil de la boucle d'événements",
+        buckets=LOOP_LAG_BUCKETS,
+    )
+    LOOP_STALLS = Counter(
+        "filiale_event_loop_stalls",
+        "Callbacks ayant bloqué la boucle d'événements au-delà du seuil",
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        "filiale_db_pool_checked_out",
+        "Connexions Postgres empruntées au pool",
+        **_gauge_mode,
+    )
+    DB_POOL_OVERFLOW = Gauge(
+        "filiale_db_pool_overflow",
+        "Connexions ouvertes au-delà de pool_size",
+        **_gauge_mode,
+    )
+    DB_POOL_WAIT = Histogram(
+        "filiale_db_pool_wait_seconds",
+        "Attente d'une connexion du pool (ouverture comprise)",
+        buckets=DB_POOL_WAIT_BUCKETS,
+    )
+    DB_POOL_TIMEOUTS = Counter(
+        "filiale_db_pool_timeouts",
+        "Attentes de connexion ayant dépassé pool_timeout",
+    )
+    EXTRACTION_COST = Counter(
+        "filiale_extraction_cost_eur",
+        "Coût cumulé des extractions (EUR)",
+        ["search_type"],
+    )
+    SPECULATIVE_SEARCHES = Counter(
+        "filiale_speculative_searches",
+        "Recherches de filiales spéculatives (outcome: hit, miss, failed, abandoned)",
+        ["outcome"],
+    )
+    SPECULATIVE_WASTED_COST = Counter(
+        "filiale_speculative_wasted_cost_eur",
+        "Coût des recherches spéculatives écartées (EUR)",
+    )
+    IDENTITY_LOOKUPS = Counter(
+        "filiale_identity_index_lookups",
+        "Recherches dans l'index local des identités (result: hit, hint, miss, stale)",
+        ["result"],
+    )
+
+
+def _safe(record):
+    """Décorateur : une erreur d'instrumentation ne doit jamais casser le pipeline."""
+    def wrapper(*args, **kwargs):
+        if not PROMETHEUS_AVAILABLE:
+            return
+        try:
+            record(*args, **kwargs)
+        except Exception as e:
+            logger.debug(f"⚠️ [Prometheus] Enregistrement ignoré ({record.__name__}): {e}")
+    wrapper.__name__ = record.__name__
+    wrapper.__doc__ = record.__doc__
+    return wrapper
+
+
+@_safe
+def observe_agent_run(agent_name: str, duration_s: float, status: str) -> None:
+    """Durée d'exécution d'un agent."""
+    AGENT_DURATION.labels(normalize_label(agent_name), status).observe(duration_s)
+
+
+@_safe
+def observe_tool_call(tool_name: str, duration_s: float, status: str = "completed") -> None:
+    """Durée d'un appel de tool."""
+    TOOL_DURATION.labels(normalize_label(tool_name), status).observe(duration_s)
+
+
+@_safe
+def record_tokens(model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> None:
+    """Tokens consommés par un appel (input inclut la part servie par le cache)."""
+    model = model or "unknown"
+    if input_tokens:
+        TOKENS.labels(model, "input").inc(input_tokens)
+    if cached_input_tokens:
+        TOKENS.labels(model, "cached_input").inc(cached_input_tokens)
+    if output_tokens:
+        TOKENS.labels(model, "output").inc(output_tokens)
+
+
+@_safe
+def record_retry(agent_name: str) -> None:
+    """Nouvelle tentative d'un agent."""
+    RETRIES.labels(normalize_label(agent_name)).inc()
+
+
+@_safe
+def record_guardrail_trip(agent_name: str) -> None:
+    """Déclenchement d'un guardrail de sortie."""
+    GUARDRAIL_TRIPS.labels(normalize_label(agent_name)).inc()
+
+
+@_safe
+def observe_url_probe(probe: str, duration_s: float, accessible: bool) -> None:
+    """Latence d'une vérification d'URL (probe: validator, eclaireur...)."""
+    URL_PROBE_DURATION.labels(probe, "true" if accessible else "false").observe(duration_s)
+
+
+@_safe
+def record_url_cache(hit: bool) -> None:
+    """Consultation du cache d'URLs."""
+    URL_CACHE.labels("hit" if hit else "miss").inc()
+
+
+@_safe
+def add_llm_queue_depth(delta: int) -> None:
+    """Variation du nombre d'appels LLM en attente."""
+    LLM_QUEUE_DEPTH.inc(delta)
+
+
+@_safe
+def extraction_started() -> None:
+    """Une extraction démarre."""
+    EXTRACTIONS_IN_FLIGHT.inc()
+
+
+@_safe
+def extraction_finished(search_type: str, status: str, cost_eur: float = 0.0) -> None:
+    """Une extraction se termine (status: completed / error / cancelled)."""
+    EXTRACTIONS_IN_FLIGHT.dec()
+    EXTRACTIONS.labels(search_type, status).inc()
+    if cost_eur:
+        EXTRACTION_COST.labels(search_type).inc(cost_eur)
+
+
+@_safe
+def record_speculative_search(outcome: str, wasted_cost_eur: float = 0.0) -> None:
+    """Issue d'une recherche de filiales spéculative."""
+    SPECULATIVE_SEARCHES.labels(outcome).inc()
+    if wasted_cost_eur:
+        SPECULATIVE_WASTED_COST.inc(wasted_cost_eur)
+
+
+@_safe
+def record_identity_lookup(result: str) -> None:
+    """Recherche dans l'index des identités."""
+    IDENTITY_LOOKUPS.labels(result).inc()
+
+
+@_safe
+def observe_loop_lag(lag_s: float) -> None:
+    """Retard mesuré de la boucle d'événements."""
+    LOOP_LAG.observe(lag_s)
+
+
+@_safe
+def record_loop_stall() -> None:
+    """Callback bloquant détecté."""
+    LOOP_STALLS.inc()
+
+
+@_safe
+def set_db_pool_usage(checked_out: int, overflow: int) -> None:
+    """Occupation courante du pool de connexions."""
+    DB_POOL_CHECKED_OUT.set(checked_out)
+    DB_POOL_OVERFLOW.set(max(0, overflow))
+
+
+@_safe
+def observe_db_pool_wait(wait_s: float) -> None:
+    """Attente d'une connexion du pool."""
+    DB_POOL_WAIT.observe(wait_s)
+
+
+@_safe
+def record_db_pool_timeout() -> None:
+    """Attente de connexion expirée."""
+    DB_POOL_TIMEOUTS.inc()
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Sérialise les métriques au format d'exposition Prometheus.
+
+    Returns:
+        Tuple (contenu, content-type)
+
+    Raises:
+        RuntimeError: Si prometheus_client n'est pas installé
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client n'est pas installé")
+    if MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
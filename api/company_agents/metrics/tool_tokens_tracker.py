@@ -1,19 +1,75 @@
 """
 Tracker global pour les tokens utilisés par les tools.
-Utilise contextvars pour associer les tokens au session_id.
+
+Chaque session possède un accumulateur (compteurs par tool et par modèle) stocké
+dans un registre au niveau du module : les écritures faites dans les tâches des
+tools sont visibles de l'orchestrateur, et chaque ajout est en O(1). Le
+session_id est résolu depuis company_agents.context lorsqu'il n'est pas fourni.
+
+Seul start_session crée un accumulateur : un usage reçu pour une session
+inconnue (déjà persistée, ou sans session_id résolu) est ignoré et journalisé,
+afin que le registre ne conserve aucune entrée jamais nettoyée.
 """
 
-from contextvars import ContextVar
-from typing import Dict, List, Any
 import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..context import resolve_session_id
+from .prometheus_exporter import record_tokens
 
 logger = logging.getLogger(__name__)
 
-# ContextVar pour stocker les tokens des tools par session
-_tool_tokens_store: ContextVar[Dict[str, List[Dict[str, Any]]]] = ContextVar(
-    'tool_tokens_store',
-    default={}
-)
+class ToolUsageCounter:
+    """Compteurs cumulés pour un couple (tool, modèle)."""
+
+    __slots__ = ("calls", "input_tokens", "cached_input_tokens", "output_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+
+
+class SessionUsage:
+    """Accumulateur d'usage des tools pour une session."""
+
+    __slots__ = ("session_id", "started_at", "counters")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.counters: Dict[Tuple[str, str], ToolUsageCounter] = {}
+
+    def add(self, tool_name: str, model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0):
+        """Ajoute un appel (O(1))."""
+        counter = self.counters.get((tool_name, model))
+        if counter is None:
+            counter = self.counters[(tool_name, model)] = ToolUsageCounter()
+        counter.calls += 1
+        counter.input_tokens += input_tokens
+        counter.cached_input_tokens += cached_input_tokens
+        counter.output_tokens += output_tokens
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Usage agrégé par (tool, modèle), au format historique du tracker."""
+        return [
+            {
+                "tool": tool_name,
+                "model": model,
+                "calls": counter.calls,
+                "input_tokens": counter.input_tokens,
+                "output_tokens": counter.output_tokens,
+                "cached_input_tokens": counter.cached_input_tokens,
+                "total_tokens": counter.input_tokens + counter.output_tokens,
+            }
+            for (tool_name, model), counter in self.counters.items()
+        ]
+
+
+# Registre des sessions en cours
+_sessions: Dict[str, SessionUsage] = {}
 
 
 class ToolTokensTracker:
@@ -22,58 +78,78 @@ class ToolTokensTracker:
     @staticmethod
     def start_session(session_id: str):
         """Démarre le tracking pour une nouvelle session."""
-        store = _tool_tokens_store.get().copy()
-        store[session_id] = []
-        _tool_tokens_store.set(store)
+        _sessions[session_id] = SessionUsage(session_id)
         logger.info(f"🔧 [ToolTracker] Session démarrée: {session_id}")
 
     @staticmethod
     def add_tool_usage(
-        session_id: str,
+        session_id: Optional[str],
         tool_name: str,
         model: str,
         input_tokens: int,
-        output_tokens: int
+        output_tokens: int,
+        cached_input_tokens: int = 0
     ):
-        """Ajoute l'usage d'un tool."""
-        store = _tool_tokens_store.get().copy()
-
-        if session_id not in store:
-            store[session_id] = []
-
-        usage = {
-            "tool": tool_name,
-            "model": model,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": input_tokens + output_tokens
-        }
+        """
+        Ajoute l'usage d'un tool (cached_input_tokens: part de l'entrée servie par le cache).
 
-        store[session_id].append(usage)
-        _tool_tokens_store.set(store)
+        Si session_id est None, il est résolu depuis le contexte de la session courante.
+        L'usage d'une session non démarrée ou déjà persistée n'est compté que dans
+        les métriques Prometheus.
+        """
+        record_tokens(model, input_tokens, output_tokens, cached_input_tokens)
+        resolved = resolve_session_id(session_id)
+        usage = _sessions.get(resolved) if resolved else None
+        if usage is None:
+            logger.warning(
+                f"⚠️ [ToolTracker] Usage ignoré pour session inconnue ou terminée "
+                f"({resolved or 'sans session'}/{tool_name}): {input_tokens + output_tokens} tokens"
+            )
+            return
+        usage.add(tool_name, model, input_tokens, output_tokens, cached_input_tokens)
 
         logger.info(
-            f"🔧 [ToolTracker] Token ajouté pour {session_id}/{tool_name}: "
-            f"{input_tokens} in + {output_tokens} out = {input_tokens + output_tokens} total"
+            f"🔧 [ToolTracker] Token ajouté pour {resolved}/{tool_name}: "
+            f"{input_tokens} in ({cached_input_tokens} cache) + {output_tokens} out = "
+            f"{input_tokens + output_tokens} total"
         )
 
+    @staticmethod
+    def get_session_usage(session_id: str) -> Optional[SessionUsage]:
+        """Retourne l'accumulateur d'une session (None si inconnue)."""
+        return _sessions.get(session_id)
+
     @staticmethod
     def get_session_tools(session_id: str) -> List[Dict[str, Any]]:
-        """Récupère tous les tokens des tools pour une session."""
-        store = _tool_tokens_store.get()
-        tools = store.get(session_id, [])
+        """Récupère l'usage des tools d'une session, agrégé par (tool, modèle)."""
+        usage = _sessions.get(session_id)
+        tools = usage.to_list() if usage else []
         logger.info(f"🔧 [ToolTracker] Récupération de {len(tools)} tools pour session {session_id}")
         return tools
 
     @staticmethod
     def clear_session(session_id: str):
         """Nettoie les données d'une session."""
-        store = _tool_tokens_store.get().copy()
-        if session_id in store:
-            del store[session_id]
-            _tool_tokens_store.set(store)
+        if _sessions.pop(session_id, None) is not None:
             logger.info(f"🔧 [ToolTracker] Session nettoyée: {session_id}")
 
+    @staticmethod
+    async def flush_session(session_id: str):
+        """Persiste l'usage de la session dans Redis puis la retire du registre."""
+        usage = _sessions.pop(session_id, None)
+        if usage is None:
+            return
+        try:
+            from status.manager import status_manager
+            await status_manager.store_tool_usage(session_id, {
+                "session_id": session_id,
+                "started_at": usage.started_at,
+                "tools": usage.to_list(),
+            })
+            logger.info(f"🔧 [ToolTracker] Session persistée et nettoyée: {session_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ [ToolTracker] Impossible de persister l'usage de {session_id}: {e}")
+
 
 # Instance globale
 tool_tokens_tracker = ToolTokensTracker()
@@ -7,7 +7,6 @@ This module handles individual agent calls, error handling, and retry logic.
 import asyncio
 import logging
 import time
-import json
 from typing import Dict, Any, Optional
 
 from agents import Runner
@@ -16,8 +15,22 @@ from ..subs_agents import (
 )
 from ..subs_agents.data_validator_optimized import data_restructurer_optimized as data_restructurer
 from ..subs_agents.subsidiary_extractor import run_cartographe_with_metrics
-from ..config.extraction_config import MAX_TURNS
+from ..config.extraction_config import MAX_TURNS, PAYLOAD_BATCH_CONCURRENCY
+from ..config.agent_config import select_model, get_escalation_model
+from ..prompt_assembly import build_agent_input, get_cached_input_tokens
+from ..rate_limiter import llm_rate_limiter
 from ..processors.data_processor import ExtractionState
+from ..processors.json_repair import parse_tolerant
+from .identity_index import identity_index
+from ..processors.payload_compactor import (
+    compact_payload,
+    split_entity_batches,
+    merge_meta_reports,
+    merge_company_infos,
+)
+from core.offload import run_cpu
+from core.serialization import dumps
+from core.tracing import start_span, traced
 from services.agent_tracking_service import agent_tracking_service
 from status import status_manager
 from ..metrics import (
@@ -29,6 +42,7 @@ from ..metrics import (
     run_meta_validator_with_metrics,
     run_data_restructurer_with_metrics
 )
+from ..metrics.prometheus_exporter import record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +69,8 @@ async def _run_agent_with_retry(
     """
     for attempt in range(max_retries + 1):
         try:
-            result = await Runner.run(agent, input=input, max_turns=max_turns)
+            with start_span("agent.run", agent=agent.name, attempt=attempt + 1, max_turns=max_turns):
+                result = await Runner.run(agent, input=input, max_turns=max_turns)
             
             # Capturer les tokens réels si session_id disponible
             if session_id and hasattr(result, 'context_wrapper') and hasattr(result.context_wrapper, 'usage'):
@@ -73,7 +88,8 @@ async def _run_agent_with_retry(
                         tool_name=agent.name,
                         model=model,
                         input_tokens=input_tokens,
-                        output_tokens=output_tokens
+                        output_tokens=output_tokens,
+                        cached_input_tokens=get_cached_input_tokens(usage)
                     )
                     
                     logger.info(
@@ -100,6 +116,7 @@ async def _run_agent_with_retry(
                 )
                 raise
             # Attendre avant de réessayer
+            record_retry(agent.name)
             await asyncio.sleep(1 * (attempt + 1))
 
 
@@ -136,12 +153,9 @@ def _final_json(result: Any) -> str:
     """
     # Priorité 1: final_output (nouveau format OpenAI Agents)
     if hasattr(result, "final_output") and result.final_output:
-        # Si c'est un objet Pydantic, le convertir en dict puis en JSON
-        if hasattr(result.final_output, "model_dump"):
-            return json.dumps(result.final_output.model_dump(), ensure_ascii=False)
-        # Si c'est déjà un dict, le convertir en JSON
-        elif isinstance(result.final_output, dict):
-            return json.dumps(result.final_output, ensure_ascii=False)
+        # Objet Pydantic ou dict : sérialisation directe (sans passer par model_dump)
+        if hasattr(result.final_output, "model_dump") or isinstance(result.final_output, dict):
+            return dumps(result.final_output)
         # Sinon, conversion en string
         else:
             return str(result.final_output)
@@ -158,42 +172,28 @@ def _final_json(result: Any) -> str:
 
 def _safe_json_loads(json_str: str) -> Optional[Dict[str, Any]]:
     """
-    Charge un JSON de manière sécurisée.
+    Charge un JSON de manière sécurisée (sortie tronquée ou mal échappée réparée).
     
     Args:
         json_str: String JSON à parser
         
     Returns:
-        Dictionnaire parsé ou None en cas d'erreur
+        Dictionnaire parsé (partiel si la sortie était tronquée) ou None en cas d'erreur
     """
-    try:
-        # Nettoyer la chaîne JSON des caractères de contrôle
-        cleaned_json = json_str.strip()
-        # Supprimer les caractères de tabulation répétés à la fin
-        cleaned_json = cleaned_json.rstrip('\t\n\r ')
-        
-        # Détecter si le JSON est tronqué (ne se termine pas par })
-        if not cleaned_json.endswith('}'):
-            # Essayer de trouver la fin du JSON en cherchant le dernier } valide
-            last_brace = cleaned_json.rfind('}')
-            if last_brace > 0:
-                cleaned_json = cleaned_json[:last_brace + 1]
-            else:
-                logger.warning("JSON tronqué sans accolade fermante")
-                return None
-        
-        # Nettoyer les caractères de contrôle dans les chaînes
-        import re
-        # Remplacer les caractères de contrôle par des espaces
-        cleaned_json = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', cleaned_json)
-        
-        return json.loads(cleaned_json)
-    except (json.JSONDecodeError, TypeError) as exc:
-        logger.warning("Erreur de parsing JSON: %s", exc)
-        logger.warning("JSON problématique (premiers 200 chars): %s", json_str[:200])
-        logger.warning("JSON problématique (derniers 200 chars): %s", json_str[-200:])
+    if not isinstance(json_str, str):
         return None
 
+    parsed = parse_tolerant(json_str)
+    if not isinstance(parsed.value, dict):
+        logger.warning("JSON illisible (premiers 200 chars): %s", json_str[:200])
+        logger.warning("JSON illisible (derniers 200 chars): %s", json_str[-200:])
+        return None
+    if not parsed.complete:
+        logger.warning(
+            "JSON tronqué réparé (%d caractères): résultat partiel conservé", len(json_str)
+        )
+    return parsed.value
+
 
 async def _safe_tracking(
     session_id: str,
@@ -345,9 +345,112 @@ async def _simulate_progressive_tracking(
             await asyncio.sleep(step_duration)
 
 
+def _route_model(agent_key: str, state: ExtractionState, input_data: str = "") -> Dict[str, Optional[str]]:
+    """
+    Choisit le modèle d'un agent pour ce run à partir de l'état d'extraction.
+    
+    Args:
+        agent_key: Clé de l'agent dans la configuration de routage
+        state: État d'extraction
+        input_data: Entrée envoyée à l'agent
+        
+    Returns:
+        Dict avec "model" et "escalation_model"
+    """
+    info_card = state.info_card if isinstance(state.info_card, dict) else {}
+    subs_report = state.subs_report if isinstance(state.subs_report, dict) else {}
+    model = select_model(
+        agent_key,
+        input_length=len(input_data or ""),
+        subsidiaries_count=len(subs_report.get("subsidiaries") or []),
+        enterprise_type=info_card.get("enterprise_type"),
+        deep_search=getattr(state, "deep_search", False),
+    )
+    logger.info("🧭 Routage %s -> %s", agent_key, model)
+    return {"model": model, "escalation_model": get_escalation_model(agent_key, model)}
+
+
+async def _run_agent_batches(
+    run_fn: Any,
+    agent_key: str,
+    agent_name: str,
+    state: ExtractionState,
+    batches: list,
+) -> list:
+    """
+    Exécute un agent sur chaque lot de payload en parallèle (concurrence bornée).
+    
+    Args:
+        run_fn: Wrapper avec métriques de l'agent
+        agent_key: Clé de l'agent pour le routage des modèles
+        agent_name: Nom affiché de l'agent (suffixé par le numéro de lot au-delà du premier)
+        state: État d'extraction
+        batches: Payloads compactés à traiter
+        
+    Returns:
+        Liste des sorties (dict) dans l'ordre des lots, {} pour les lots en échec
+    """
+    semaphore = asyncio.Semaphore(PAYLOAD_BATCH_CONCURRENCY)
+
+    async def _run_batch(index: int, batch: Dict[str, Any]) -> Dict[str, Any]:
+        input_data = build_agent_input(batch)
+        batch_name = agent_name if index == 0 else f"{agent_name} #{index + 1}"
+        async with semaphore, llm_rate_limiter:
+            result_data = await run_fn(
+                input_data=input_data,
+                session_id=state.session_id,
+                status_manager=status_manager,
+                max_turns=3,
+                agent_name=batch_name,
+                **_route_model(agent_key, state, input_data)
+            )
+
+        if result_data["status"] != "success":
+            logger.error("❌ Erreur %s (lot %d/%d): %s", agent_name, index + 1, len(batches), result_data.get("error", "Erreur inconnue"))
+            return {}
+
+        result = result_data["result"]
+        if hasattr(result, "final_output") and result.final_output:
+            raw_output = result.final_output
+            # Si c'est un objet Pydantic, le convertir en dict
+            if hasattr(raw_output, "model_dump"):
+                return raw_output.model_dump()
+            return await run_cpu(_safe_json_loads, raw_output, process_safe=True)
+
+        logger.warning("JSON %s invalide ou vide (lot %d/%d).", agent_name, index + 1, len(batches))
+        return {}
+
+    return list(await asyncio.gather(*(_run_batch(i, batch) for i, batch in enumerate(batches))))
+
+
+def _identity_hint_input(raw_input: str, match: Any) -> str:
+    """
+    Entrée de l'Éclaireur complétée par une identité approchée de l'index local.
+
+    Args:
+        raw_input: Entrée saisie
+        match: Correspondance approchée (IdentityMatch non servie)
+
+    Returns:
+        Entrée saisie suivie de la piste à vérifier
+    """
+    analyzer = match.entry.analyzer
+    hint = analyzer.get("entity_legal_name") or ""
+    if analyzer.get("target_domain"):
+        hint += f" ({analyzer['target_domain']})"
+    return (
+        f"{raw_input}\n\n"
+        f"Piste non vérifiée (nom proche déjà identifié, peut être une autre entité) : {hint}"
+    )
+
+
+@traced("agent_caller.call_company_analyzer")
 async def call_company_analyzer(state: ExtractionState) -> Dict[str, Any]:
     """
     Appelle l'agent Company Analyzer avec métriques temps réel.
+
+    L'agent n'est pas exécuté si l'identité de l'entrée est connue de l'index local
+    (domaine ou nom exact) ; un nom approché lui est seulement transmis comme piste.
     
     Args:
         state: État d'extraction
@@ -355,15 +458,47 @@ async def call_company_analyzer(state: ExtractionState) -> Dict[str, Any]:
     Returns:
         Données d'analyse de l'entreprise
     """
+    match = await identity_index.lookup(state.raw_input)
+    if match is not None and match.served:
+        analyzer_data = dict(match.entry.analyzer)
+        logger.info(
+            "🪪 Identité connue pour %s (%s, score %.2f): %s - Éclaireur non exécuté",
+            state.raw_input,
+            match.matched_on,
+            match.score,
+            analyzer_data.get("entity_legal_name"),
+        )
+        state.identity_match = match
+        state.analyzer_raw = analyzer_data
+        state.log("company_analyzer", analyzer_data)
+        await _safe_tracking(
+            state.session_id,
+            "🔍 Éclaireur",
+            message="Identité connue (index local)",
+            progress=1.0,
+        )
+        return analyzer_data
+
     logger.info("🔍 Appel de l'agent éclaireur pour: %s", state.raw_input)
+    company_input = state.raw_input
+    if match is not None:
+        state.identity_match = match
+        company_input = _identity_hint_input(state.raw_input, match)
+        logger.info(
+            "🪪 Piste de l'index pour %s (score %.2f): %s - à vérifier par l'Éclaireur",
+            state.raw_input,
+            match.score,
+            match.entry.analyzer.get("entity_legal_name"),
+        )
     
     try:
         # Exécuter l'agent avec métriques temps réel
         result_data = await run_company_analyzer_with_metrics(
-            company_name=state.raw_input,
+            company_name=company_input,
             session_id=state.session_id,
             status_manager=status_manager,
-            max_turns=3
+            max_turns=3,
+            **_route_model("company_analyzer", state, company_input)
         )
         
         if result_data["status"] != "success":
@@ -378,7 +513,7 @@ async def call_company_analyzer(state: ExtractionState) -> Dict[str, Any]:
             if hasattr(raw_output, "model_dump"):
                 analyzer_data = raw_output.model_dump()
             else:
-                analyzer_data = _safe_json_loads(raw_output)
+                analyzer_data = await run_cpu(_safe_json_loads, raw_output, process_safe=True)
         else:
             logger.warning("JSON Company Analyzer invalide ou vide.")
             analyzer_data = {}
@@ -393,6 +528,7 @@ async def call_company_analyzer(state: ExtractionState) -> Dict[str, Any]:
         return {}
 
 
+@traced("agent_caller.call_information_extractor")
 async def call_information_extractor(state: ExtractionState) -> Dict[str, Any]:
     """
     Appelle l'agent Information Extractor avec métriques temps réel.
@@ -406,10 +542,10 @@ async def call_information_extractor(state: ExtractionState) -> Dict[str, Any]:
     logger.info("⛏️ Appel de l'agent mineur pour: %s", state.target_entity)
     
     # Préparer l'entrée avec les données précédentes
-    input_data = json.dumps({
+    input_data = build_agent_input({
         "target_entity": state.target_entity,
         "analyzer_data": state.analyzer_raw,
-    }, ensure_ascii=False)
+    })
     
     try:
         # Exécuter l'agent avec métriques temps réel
@@ -417,7 +553,8 @@ async def call_information_extractor(state: ExtractionState) -> Dict[str, Any]:
             input_data=input_data,
             session_id=state.session_id,
             status_manager=status_manager,
-            max_turns=3
+            max_turns=3,
+            **_route_model("information_extractor", state, input_data)
         )
         
         if result_data["status"] != "success":
@@ -432,7 +569,7 @@ async def call_information_extractor(state: ExtractionState) -> Dict[str, Any]:
             if hasattr(raw_output, "model_dump"):
                 info_data = raw_output.model_dump()
             else:
-                info_data = _safe_json_loads(raw_output)
+                info_data = await run_cpu(_safe_json_loads, raw_output, process_safe=True)
         else:
             logger.warning("JSON Information Extractor invalide ou vide.")
             info_data = {}
@@ -449,6 +586,7 @@ async def call_information_extractor(state: ExtractionState) -> Dict[str, Any]:
         return {}
 
 
+@traced("agent_caller.call_subsidiary_extractor")
 async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
     """
     Appelle l'agent Subsidiary Extractor avec métriques temps réel.
@@ -484,13 +622,20 @@ async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
             "context": info_card.get("context") if info_card else None,
             "target_domain": target_domain,
             "website": website,
+            "has_filiales_only": info_card.get("has_filiales_only") if info_card else None,
+            "enterprise_type": info_card.get("enterprise_type") if info_card else None,
         }
         
         # Exécuter l'agent avec métriques détaillées (gère ses propres métriques)
+        routing = _route_model(
+            "subsidiary_extractor", state, build_agent_input(company_context)
+        )
         cartographe_result = await run_cartographe_with_metrics(
             company_context,
             state.session_id,
-            deep_search=state.deep_search
+            deep_search=state.deep_search,
+            model_name=routing["model"],
+            research=getattr(state, "subs_research", None)
         )
         
     except Exception as e:
@@ -504,9 +649,8 @@ async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
 
         # Convertir en dict si c'est une chaîne JSON ou un objet Pydantic
         if isinstance(subsidiary_report, str):
-            try:
-                subsidiary_report = json.loads(subsidiary_report)
-            except json.JSONDecodeError:
+            subsidiary_report = _safe_json_loads(subsidiary_report)
+            if subsidiary_report is None:
                 logger.error("❌ Impossible de parser le JSON du cartographe")
                 subsidiary_report = {}
         elif (
@@ -514,9 +658,8 @@ async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
             and "content" in subsidiary_report
             and isinstance(subsidiary_report["content"], str)
         ):
-            try:
-                subsidiary_report = json.loads(subsidiary_report["content"])
-            except json.JSONDecodeError:
+            subsidiary_report = _safe_json_loads(subsidiary_report["content"])
+            if subsidiary_report is None:
                 logger.error("❌ Impossible de parser le champ content du cartographe")
                 subsidiary_report = {}
         elif hasattr(subsidiary_report, "model_dump"):
@@ -524,6 +667,7 @@ async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
         
         state.subs_report = subsidiary_report
         state.subs_raw = subsidiary_report
+        state.subs_structuring = cartographe_result.get("structuring")
         state.log("subsidiary_extractor", subsidiary_report)
         return subsidiary_report
     else:
@@ -533,6 +677,7 @@ async def call_subsidiary_extractor(state: ExtractionState) -> Dict[str, Any]:
         return {}
 
 
+@traced("agent_caller.call_meta_validator")
 async def call_meta_validator(state: ExtractionState) -> Dict[str, Any]:
     """
     Appelle l'agent Meta Validator avec métriques temps réel.
@@ -545,38 +690,23 @@ async def call_meta_validator(state: ExtractionState) -> Dict[str, Any]:
     """
     logger.info("⚖️ Appel de l'agent superviseur")
     
-    # Préparer l'entrée avec toutes les données
-    input_data = json.dumps({
+    # Préparer l'entrée avec toutes les données (compactée, découpée en lots si trop volumineuse)
+    payload, _ = compact_payload({
         "company_info": state.info_card,
         "subsidiaries": state.subs_report,
         "analyzer_data": state.analyzer_raw,
-    }, ensure_ascii=False)
+    })
+    batches = split_entity_batches(payload)
     
     try:
-        # Exécuter l'agent avec métriques temps réel
-        result_data = await run_meta_validator_with_metrics(
-            input_data=input_data,
-            session_id=state.session_id,
-            status_manager=status_manager,
-            max_turns=3
+        # Exécuter l'agent avec métriques temps réel (un run par lot)
+        outputs = await _run_agent_batches(
+            run_meta_validator_with_metrics, "meta_validator", "⚖️ Superviseur", state, batches
         )
-        
-        if result_data["status"] != "success":
-            logger.error("❌ Erreur lors de la validation: %s", result_data.get("error", "Erreur inconnue"))
+        if not any(outputs):
+            logger.error("❌ Erreur lors de la validation: aucun lot exploitable")
             return {}
-        
-        # Extraire les données du résultat
-        result = result_data["result"]
-        if hasattr(result, "final_output") and result.final_output:
-            raw_output = result.final_output
-            # Si c'est un objet Pydantic, le convertir en dict
-            if hasattr(raw_output, "model_dump"):
-                meta_data = raw_output.model_dump()
-            else:
-                meta_data = _safe_json_loads(raw_output)
-        else:
-            logger.warning("JSON Meta Validator invalide ou vide.")
-            meta_data = {}
+        meta_data = merge_meta_reports(outputs)
 
         state.meta_report = meta_data
         state.log("meta_validator", meta_data)
@@ -587,6 +717,7 @@ async def call_meta_validator(state: ExtractionState) -> Dict[str, Any]:
         return {}
 
 
+@traced("agent_caller.call_data_restructurer")
 async def call_data_restructurer(state: ExtractionState) -> Optional[Dict[str, Any]]:
     """
     Appelle l'agent Data Restructurer avec métriques temps réel.
@@ -600,39 +731,24 @@ async def call_data_restructurer(state: ExtractionState) -> Optional[Dict[str, A
     logger.info("🔄 Appel de l'agent restructurateur")
     
     # Préparer les données à restructurer (éviter les doublons)
-    # Convertir les objets Pydantic en dictionnaires
-    input_data = json.dumps({
+    # Convertir les objets Pydantic en dictionnaires, compacter puis découper en lots
+    payload, _ = compact_payload({
         "company_info": _to_dict(state.info_card),
         "subsidiaries": _to_dict(state.subs_report),
         "analyzer_data": _to_dict(state.analyzer_raw),
         "meta_validation": _to_dict(state.meta_report),
-    }, ensure_ascii=False)
+    })
+    batches = split_entity_batches(payload)
     
     try:
-        # Exécuter l'agent avec métriques temps réel
-        result_data = await run_data_restructurer_with_metrics(
-            input_data=input_data,
-            session_id=state.session_id,
-            status_manager=status_manager,
-            max_turns=3
+        # Exécuter l'agent avec métriques temps réel (un run par lot)
+        outputs = await _run_agent_batches(
+            run_data_restructurer_with_metrics, "data_restructurer", "🔄 Restructurateur", state, batches
         )
-        
-        if result_data["status"] != "success":
-            logger.error("❌ Erreur lors de la restructuration: %s", result_data.get("error", "Erreur inconnue"))
+        if not any(outputs):
+            logger.error("❌ Erreur lors de la restructuration: aucun lot exploitable")
             return None
-        
-        # Extraire les données du résultat
-        result = result_data["result"]
-        if hasattr(result, "final_output") and result.final_output:
-            raw_output = result.final_output
-            # Si c'est un objet Pydantic, le convertir en dict
-            if hasattr(raw_output, "model_dump"):
-                company_info = raw_output.model_dump()
-            else:
-                company_info = _safe_json_loads(raw_output)
-        else:
-            logger.warning("JSON Data Restructurer invalide ou vide.")
-            company_info = {}
+        company_info = merge_company_infos(outputs)
 
         state.log("data_restructurer", company_info)
         return company_info
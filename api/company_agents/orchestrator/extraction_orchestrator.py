@@ -6,7 +6,7 @@ the execution of all agents in the extraction pipeline.
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pydantic import ValidationError
@@ -20,7 +20,12 @@ from .agent_caller import (
     call_meta_validator,
     call_data_restructurer,
 )
+from .identity_index import identity_index, identity_record
+from .speculation import SpeculativeSubsidiarySearch, should_speculate
 from ..context import set_session_context, clear_session_context
+from ..metrics import metrics_collector
+from core.offload import estimate_size, run_cpu
+from core.serialization import loads
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +44,12 @@ class ExtractionState:
     subs_raw: Optional[Dict[str, Any]] = None
     analyzer_raw: Optional[Dict[str, Any]] = None
     meta_report: Optional[Dict[str, Any]] = None
+    # Recherche de filiales déjà effectuée (texte, citations), ex: spéculative
+    subs_research: Optional[Tuple[str, Optional[List[Any]]]] = None
+    # Structuration par segments du Cartographe (segments_count, failed_segments)
+    subs_structuring: Optional[Dict[str, Any]] = None
+    # Identité trouvée dans l'index local (servie : Éclaireur non exécuté ; approchée : piste)
+    identity_match: Optional[Any] = None
     warnings: list = field(default_factory=list)
 
     def log(self, step: str, payload: Any) -> None:
@@ -89,6 +100,40 @@ def _resolve_target_entity(raw_input: str, analyzer_data: Dict[str, Any]) -> str
     return raw_input
 
 
+def _record_identity(state: ExtractionState, result: Dict[str, Any]) -> None:
+    """
+    Ajoute l'identité résolue aux métadonnées du résultat et l'indexe localement.
+
+    Args:
+        state: État d'extraction
+        result: Résultat final (extraction_metadata complété sur place)
+    """
+    analyzer_data = state.analyzer_raw if isinstance(state.analyzer_raw, dict) else {}
+    if not analyzer_data.get("entity_legal_name"):
+        return
+    info_card = state.info_card if isinstance(state.info_card, dict) else {}
+    # Une piste approchée (matched_on "fuzzy") n'est pas une identité servie :
+    # l'entrée brute ne devient pas un alias de l'entité approchée
+    match = state.identity_match
+    if match is not None and not match.served:
+        match = None
+
+    # Une identité servie par l'index garde sa date de résolution (péremption)
+    resolved_at = match.entry.resolved_at if match is not None else None
+    record = identity_record(
+        state.raw_input,
+        analyzer_data,
+        info_card.get("has_filiales_only"),
+        resolved_at=resolved_at,
+        aliases=match.entry.aliases if match is not None else (),
+    )
+    metadata = result.setdefault("extraction_metadata", {})
+    metadata["identity"] = record
+    metadata["identity_source"] = "index" if match is not None else "analyzer"
+    if match is None:
+        identity_index.record(record)
+
+
 def _should_run_meta_validation(state: ExtractionState) -> bool:
     """
     Détermine si la validation méta doit être exécutée.
@@ -106,9 +151,8 @@ def _should_run_meta_validation(state: ExtractionState) -> bool:
     # Si c'est une chaîne, la parser
     if isinstance(state.subs_report, str):
         try:
-            import json
-            state.subs_report = json.loads(state.subs_report)
-        except (json.JSONDecodeError, TypeError):
+            state.subs_report = loads(state.subs_report)
+        except (ValueError, TypeError):
             return False
     
     # Vérifier si on a un rapport de filiales valide (même avec liste vide)
@@ -122,6 +166,7 @@ async def orchestrate_extraction(
     session_id: str,
     include_subsidiaries: bool = True,
     deep_search: bool = False,
+    speculative_search: Optional[bool] = None,
 ) -> Dict[str, Any]:
     """
     Orchestrateur principal du pipeline d'extraction multi-agents.
@@ -138,6 +183,8 @@ async def orchestrate_extraction(
         session_id: ID de session unique
         include_subsidiaries: Inclure l'extraction des filiales
         deep_search: Mode de recherche approfondie (Perplexity) vs simple (GPT-4o-search)
+        speculative_search: Lancer la recherche de filiales sur l'entrée brute pendant
+            l'étape 1 (None = SPECULATIVE_SUBSIDIARY_SEARCH)
 
     Returns:
         Données d'entreprise extraites et validées
@@ -163,12 +210,20 @@ async def orchestrate_extraction(
         deep_search=deep_search,
     )
 
+    # Recherche de filiales spéculative, en parallèle des étapes 1 et 2
+    speculation = None
+    if should_speculate(raw_input, include_subsidiaries, speculative_search):
+        speculation = SpeculativeSubsidiarySearch(session_id, raw_input, deep_search)
+        speculation.start()
+
     try:
         # Étape 1: Identification de l'entité légale
         logger.info("🔍 Étape 1: Identification de l'entité légale")
         analyzer_data = await call_company_analyzer(state)
         state.target_entity = _resolve_target_entity(raw_input, analyzer_data)
         state.log("analyzer", analyzer_data)
+        if speculation is not None:
+            await speculation.check(state.target_entity)
 
         # Étape 2: Consolidation des informations clés
         logger.info("⛏️ Étape 2: Consolidation des informations clés")
@@ -178,6 +233,8 @@ async def orchestrate_extraction(
         # Étape 3: Extraction des filiales (conditionnelle)
         if state.include_subsidiaries:
             logger.info("🗺️ Étape 3: Extraction des filiales")
+            if speculation is not None:
+                state.subs_research = await speculation.result()
             await call_subsidiary_extractor(state)
             state.log("subsidiary_extractor", state.subs_report)
 
@@ -194,8 +251,13 @@ async def orchestrate_extraction(
         if restructured_company_info:
             # Utiliser les données restructurées directement
             try:
-                validated_model = CompanyInfo.model_validate(
-                    restructured_company_info
+                # Validation et export hors de la boucle pour les groupes à nombreuses filiales
+                payload_size = estimate_size(restructured_company_info)
+                validated_model = await run_cpu(
+                    CompanyInfo.model_validate,
+                    restructured_company_info,
+                    size=payload_size,
+                    process_safe=True,
                 )
 
                 # Enrichir les métadonnées avant de retourner
@@ -215,34 +277,30 @@ async def orchestrate_extraction(
                     validated_model.extraction_date = datetime.now(timezone.utc).isoformat()
 
                 # Agréger les tokens de tous les agents pour le calcul des coûts
-                from ..metrics import metrics_collector
-
                 logger.info(f"🔍 [DEBUG] Début agrégation tokens pour session {session_id}")
 
-                all_models_usage = []
-                agent_names = ["🔍 Éclaireur", "⛏️ Mineur", "🗺️ Cartographe", "⚖️ Superviseur", "🔄 Restructurateur"]
-
-                for agent_name in agent_names:
-                    agent_metrics = metrics_collector.get_agent_metrics(agent_name, session_id)
-                    logger.info(f"🔍 [DEBUG] Métriques pour {agent_name}: {agent_metrics is not None}")
-
-                    if agent_metrics:
-                        logger.info(f"🔍 [DEBUG] Performance metrics keys: {agent_metrics.performance_metrics.keys()}")
-                        if "tokens" in agent_metrics.performance_metrics:
-                            token_data = agent_metrics.performance_metrics["tokens"]
-                            all_models_usage.append(token_data)
-                            logger.info(f"💰 Ajouté {token_data['total_tokens']} tokens de {agent_name}")
-                        else:
-                            logger.warning(f"⚠️ Pas de clé 'tokens' dans performance_metrics pour {agent_name}")
+                # Export compact de la session (inclut les exécutions par lots, ex: "⚖️ Superviseur #2")
+                session_summary = metrics_collector.get_session_summary(session_id)
+                all_models_usage = session_summary["models_usage"]
+                for agent_name, agent_summary in session_summary["agents"].items():
+                    if agent_summary["tokens"]:
+                        logger.info(f"💰 Ajouté {agent_summary['tokens']['total_tokens']} tokens de {agent_name}")
+                    else:
+                        logger.warning(f"⚠️ Pas de données de tokens pour {agent_name}")
 
                 # Ajouter les données de tokens au résultat
-                result = validated_model.model_dump()
+                result = await run_cpu(validated_model.model_dump, size=payload_size)
+                if speculation is not None:
+                    result["extraction_metadata"]["speculative_search"] = speculation.report()
+                if state.subs_structuring:
+                    result["extraction_metadata"]["subsidiary_structuring"] = state.subs_structuring
+                _record_identity(state, result)
                 if all_models_usage:
                     result["models_usage_raw"] = all_models_usage
                     logger.info(f"💰 Total de {len(all_models_usage)} agents avec données de tokens")
                 else:
                     logger.warning(f"⚠️ Aucune donnée de tokens capturée pour la session {session_id}")
-                    logger.info(f"🔍 [DEBUG] Métriques disponibles dans collector: {list(metrics_collector.active_metrics.keys())}")
+                    logger.info(f"🔍 [DEBUG] Agents suivis pour la session: {list(session_summary['agents'].keys())}")
 
                 logger.info("✅ Extraction terminée avec succès pour session=%s", session_id)
                 return result
@@ -273,6 +331,10 @@ async def orchestrate_extraction(
             "raw_input": raw_input,
         }
     finally:
+        if speculation is not None:
+            await speculation.discard("abandoned")
+        # Les métriques de la session seront évincées après le TTL
+        metrics_collector.mark_session_finished(session_id)
         # Nettoyer le contexte de session
         clear_session_context()
         logger.info(f"🧹 Session context nettoyé: {session_id}")
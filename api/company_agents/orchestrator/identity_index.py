@@ -0,0 +1,367 @@
+"""
+Index local des identités d'entreprises déjà résolues.
+
+L'Éclaireur (web_search_identify + un run gpt-4.1-mini) identifie l'entité
+légale, le domaine, la relation et la société mère, y compris pour des
+entreprises déjà résolues des dizaines de fois. Chaque extraction réussie
+enregistre désormais cette identité dans extraction_metadata.identity (sortie
+de l'Éclaireur, has_filiales_only du Mineur, entrées saisies, date de
+résolution), persistée avec CompanyExtraction.extraction_data.
+
+L'index est chargé depuis ces lignes (puis rafraîchi par incréments) et
+complété en mémoire par les extractions du worker. Recherche :
+
+1. domaine exact (entrée URL ou domaine) ;
+2. nom normalisé exact (entrées saisies, entité légale) ;
+3. nom approché : index inversé de trigrammes (similarité façon pg_trgm),
+   confirmé par entity_match_score >= IDENTITY_INDEX_MIN_SIMILARITY.
+
+Seules les correspondances exactes (1 et 2) sont servies à la place de
+l'Éclaireur : un nom approché peut désigner une entité distincte
+("Crédit Agricole Nord Est" / "Crédit Agricole Nord"). Il n'est transmis
+à l'Éclaireur que comme piste à vérifier.
+
+Les identités peu sûres (confidence < IDENTITY_INDEX_MIN_CONFIDENCE) ne sont
+pas indexées ; celles résolues depuis plus de IDENTITY_INDEX_MAX_AGE_DAYS sont
+ignorées : l'Éclaireur est alors relancé et l'entrée rafraîchie. Elles sont
+retirées de l'index à chaque rafraîchissement (mémoire bornée à la fenêtre
+de IDENTITY_INDEX_MAX_AGE_DAYS).
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+from ..config.extraction_config import (
+    IDENTITY_INDEX_ENABLED,
+    IDENTITY_INDEX_MAX_AGE_DAYS,
+    IDENTITY_INDEX_MIN_CONFIDENCE,
+    IDENTITY_INDEX_MIN_SIMILARITY,
+    IDENTITY_INDEX_REFRESH_S,
+)
+from ..metrics.prometheus_exporter import record_identity_lookup
+from .speculation import entity_match_score, normalize_entity_name
+
+logger = logging.getLogger(__name__)
+
+# Similarité de trigrammes minimale d'un candidat avant confirmation
+_TRIGRAM_PREFILTER = 0.4
+# Candidats confirmés par recherche approchée
+_MAX_FUZZY_CANDIDATES = 5
+
+
+def _trigrams(name: str) -> Set[str]:
+    """Trigrammes d'un nom normalisé (mots complétés par des espaces, comme pg_trgm)."""
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _domain_key(value: Optional[str]) -> Optional[str]:
+    """Domaine comparable d'une URL ou d'un domaine saisi (sans schéma ni www.), None sinon."""
+    text = (value or "").strip().lower()
+    if not text or " " in text:
+        return None
+    host = urlparse(text if "://" in text else f"//{text}").hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host if "." in host else None
+
+
+@dataclass
+class IdentityEntry:
+    """Identité résolue d'une entreprise."""
+
+    analyzer: Dict[str, Any]
+    has_filiales_only: Optional[bool]
+    resolved_at: datetime
+    aliases: Set[str] = field(default_factory=set)
+
+    @property
+    def is_stale(self) -> bool:
+        return datetime.now(timezone.utc) - self.resolved_at > timedelta(days=IDENTITY_INDEX_MAX_AGE_DAYS)
+
+
+@dataclass
+class IdentityMatch:
+    """Résultat d'une recherche dans l'index."""
+
+    entry: IdentityEntry
+    matched_on: str
+    score: float
+
+    @property
+    def served(self) -> bool:
+        """True si l'identité peut remplacer l'Éclaireur (domaine ou nom exact)."""
+        return self.matched_on in ("domain", "name")
+
+
+def identity_record(
+    raw_input: str,
+    analyzer_data: Dict[str, Any],
+    has_filiales_only: Optional[bool],
+    resolved_at: Optional[datetime] = None,
+    aliases: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """
+    Identité à stocker dans extraction_metadata.identity.
+
+    Args:
+        raw_input: Entrée saisie
+        analyzer_data: Sortie de l'Éclaireur
+        has_filiales_only: Indicateur du Mineur
+        resolved_at: Date de résolution par l'Éclaireur (maintenant si None)
+        aliases: Autres entrées déjà associées à cette identité
+
+    Returns:
+        Dict sérialisable en JSON
+    """
+    return {
+        "aliases": sorted({raw_input, *aliases}),
+        "analyzer": analyzer_data,
+        "has_filiales_only": has_filiales_only,
+        "resolved_at": (resolved_at or datetime.now(timezone.utc)).isoformat(),
+    }
+
+
+class CompanyIdentityIndex:
+    """Index mémoire (noms, domaines, trigrammes) des identités résolues."""
+
+    def __init__(self):
+        self.enabled = IDENTITY_INDEX_ENABLED
+        self._by_name: Dict[str, IdentityEntry] = {}
+        self._by_domain: Dict[str, IdentityEntry] = {}
+        self._trigram_names: Dict[str, Set[str]] = {}
+        self._name_trigrams: Dict[str, Set[str]] = {}
+        self._lock = asyncio.Lock()
+        self._loaded_at: Optional[float] = None
+        self._watermark: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+        self.hints = 0
+        self.stale = 0
+
+    def _index_name(self, name: str, entry: IdentityEntry) -> None:
+        key = normalize_entity_name(name)
+        if not key:
+            return
+        self._by_name[key] = entry
+        if key not in self._name_trigrams:
+            grams = _trigrams(key)
+            self._name_trigrams[key] = grams
+            for gram in grams:
+                self._trigram_names.setdefault(gram, set()).add(key)
+
+    def prune(self) -> int:
+        """
+        Retire les identités périmées (noms, domaines et trigrammes).
+
+        Returns:
+            Nombre de noms et domaines retirés
+        """
+        stale_names = [key for key, entry in self._by_name.items() if entry.is_stale]
+        for key in stale_names:
+            del self._by_name[key]
+            for gram in self._name_trigrams.pop(key, ()):
+                names = self._trigram_names.get(gram)
+                if names is not None:
+                    names.discard(key)
+                    if not names:
+                        del self._trigram_names[gram]
+        stale_domains = [domain for domain, entry in self._by_domain.items() if entry.is_stale]
+        for domain in stale_domains:
+            del self._by_domain[domain]
+        return len(stale_names) + len(stale_domains)
+
+    def add(self, payload: Dict[str, Any]) -> bool:
+        """
+        Indexe une identité stockée (format identity_record).
+
+        Args:
+            payload: Contenu de extraction_metadata.identity
+
+        Returns:
+            True si l'identité a été indexée
+        """
+        analyzer = payload.get("analyzer") or {}
+        legal_name = analyzer.get("entity_legal_name")
+        try:
+            confidence = float(analyzer.get("confidence") or 0)
+            resolved_at = datetime.fromisoformat(payload["resolved_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not legal_name or confidence < IDENTITY_INDEX_MIN_CONFIDENCE:
+            return False
+        if resolved_at.tzinfo is None:
+            resolved_at = resolved_at.replace(tzinfo=timezone.utc)
+
+        aliases = {alias for alias in payload.get("aliases") or [] if isinstance(alias, str)}
+        # Une identité plus ancienne ne remplace pas une résolution plus récente
+        current = self._by_name.get(normalize_entity_name(legal_name))
+        if current is not None and current.resolved_at > resolved_at:
+            current.aliases.update(aliases)
+            entry = current
+        else:
+            entry = IdentityEntry(
+                analyzer=analyzer,
+                has_filiales_only=payload.get("has_filiales_only"),
+                resolved_at=resolved_at,
+                aliases=aliases | (current.aliases if current is not None else set()),
+            )
+
+        for name in (legal_name, *entry.aliases):
+            domain = _domain_key(name)
+            if domain:
+                self._by_domain[domain] = entry
+            else:
+                self._index_name(name, entry)
+        domain = _domain_key(analyzer.get("target_domain"))
+        if domain:
+            self._by_domain[domain] = entry
+        return True
+
+    def record(self, payload: Dict[str, Any]) -> None:
+        """Indexe l'identité d'une extraction terminée par ce worker (format identity_record)."""
+        if self.enabled:
+            self.add(payload)
+
+    async def load(self) -> int:
+        """
+        Charge les identités persistées depuis le dernier chargement.
+
+        Returns:
+            Nombre d'identités indexées
+        """
+        from sqlalchemy import select
+
+        from core.database import AsyncSessionLocal
+        from models.db_models import CompanyExtraction, ExtractionStatus
+
+        since = self._watermark or datetime.now(timezone.utc) - timedelta(days=IDENTITY_INDEX_MAX_AGE_DAYS)
+        identity = CompanyExtraction.extraction_data["extraction_metadata"]["identity"]
+        stmt = (
+            select(identity, CompanyExtraction.completed_at)
+            .where(
+                CompanyExtraction.status == ExtractionStatus.COMPLETED,
+                CompanyExtraction.completed_at > since,
+                identity.isnot(None),
+            )
+            .order_by(CompanyExtraction.completed_at)
+        )
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(stmt)).all()
+
+        indexed = 0
+        for payload, completed_at in rows:
+            if isinstance(payload, dict) and self.add(payload):
+                indexed += 1
+            self._watermark = completed_at
+        if rows:
+            logger.info(f"🪪 Index des identités: {indexed} identité(s) chargée(s), {len(self._by_name)} nom(s) indexé(s)")
+        return indexed
+
+    async def _ensure_fresh(self) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < IDENTITY_INDEX_REFRESH_S:
+            return
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < IDENTITY_INDEX_REFRESH_S:
+                return
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"⚠️ Index des identités non chargé ({e}), index mémoire seul")
+            pruned = self.prune()
+            if pruned:
+                logger.info(f"🧹 Index des identités: {pruned} nom(s)/domaine(s) périmé(s) retiré(s)")
+            # En cas d'échec, nouvel essai au prochain intervalle
+            self._loaded_at = time.monotonic()
+
+    def _fuzzy(self, key: str) -> Optional[IdentityMatch]:
+        grams = _trigrams(key)
+        if not grams:
+            return None
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._trigram_names.get(gram, ()))
+
+        candidates = []
+        for name, count in shared.items():
+            similarity = count / (len(grams) + len(self._name_trigrams[name]) - count)
+            if similarity >= _TRIGRAM_PREFILTER:
+                candidates.append((similarity, name))
+        candidates.sort(reverse=True)
+
+        best = None
+        for _, name in candidates[:_MAX_FUZZY_CANDIDATES]:
+            score = entity_match_score(key, name)
+            if score >= IDENTITY_INDEX_MIN_SIMILARITY and (best is None or score > best.score):
+                best = IdentityMatch(self._by_name[name], "fuzzy", score)
+        return best
+
+    def _match(self, raw_input: str) -> Optional[IdentityMatch]:
+        domain = _domain_key(raw_input)
+        if domain:
+            entry = self._by_domain.get(domain)
+            return IdentityMatch(entry, "domain", 1.0) if entry is not None else None
+        key = normalize_entity_name(raw_input)
+        if not key:
+            return None
+        entry = self._by_name.get(key)
+        if entry is not None:
+            return IdentityMatch(entry, "name", 1.0)
+        return self._fuzzy(key)
+
+    async def lookup(self, raw_input: str) -> Optional[IdentityMatch]:
+        """
+        Cherche l'identité d'une entrée utilisateur.
+
+        Args:
+            raw_input: Nom d'entreprise, domaine ou URL saisi
+
+        Returns:
+            IdentityMatch si une identité sûre et récente est connue, None sinon
+            (matched_on "fuzzy" : simple piste, voir IdentityMatch.served)
+        """
+        if not self.enabled:
+            return None
+        await self._ensure_fresh()
+
+        match = self._match(raw_input)
+        if match is None:
+            self.misses += 1
+            record_identity_lookup("miss")
+            return None
+        if match.entry.is_stale:
+            self.stale += 1
+            record_identity_lookup("stale")
+            return None
+        if not match.served:
+            self.hints += 1
+            record_identity_lookup("hint")
+            return match
+        self.hits += 1
+        record_identity_lookup("hit")
+        return match
+
+    def stats(self) -> Dict[str, Any]:
+        """Taille et compteurs de l'index de ce worker."""
+        return {
+            "enabled": self.enabled,
+            "names": len(self._by_name),
+            "domains": len(self._by_domain),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hints": self.hints,
+            "stale": self.stale,
+        }
+
+
+# Instance globale (chargée au premier usage)
+identity_index = CompanyIdentityIndex()
@@ -0,0 +1,259 @@
+"""
+Recherche de filiales spéculative.
+
+Pour la plupart des entrées, l'entité cible résolue après l'Éclaireur est
+l'entité légale, très proche de l'entrée brute. La recherche de filiales du
+Cartographe (gpt-4o-search ou Perplexity, l'étape la plus longue) est donc
+lancée sur l'entrée brute en parallèle de l'Éclaireur et du Mineur :
+
+- si l'entité résolue porte le même nom (après normalisation : accents,
+  ponctuation et formes juridiques ignorés), le texte de recherche est
+  réutilisé et seule la structuration reste à faire ;
+- sinon (filiale redirigée vers sa société mère, nom corrigé, entité voisine
+  comme une autre caisse régionale...), la recherche est annulée et relancée
+  normalement sur l'entité résolue. Une similarité approchée ne suffit pas :
+  "Banque Populaire Alsace" et "Banque Populaire Alpes" sont deux entités.
+
+L'issue (hit, miss, failed, abandoned) et le coût des recherches écartées sont exportés
+vers Prometheus et ajoutés aux métadonnées de l'extraction (persistées avec
+l'organisation), pour ajuster l'activation par organisation.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.extraction_config import SPECULATIVE_SUBSIDIARY_SEARCH
+from ..metrics.prometheus_exporter import record_speculative_search
+from ..metrics.tool_tokens_tracker import ToolTokensTracker
+from ..subs_agents.subsidiary_extractor import run_subsidiary_research
+
+logger = logging.getLogger(__name__)
+
+# Tools de recherche dont l'usage est imputé à la spéculation
+_SEARCH_TOOLS = ("filiales_search", "research_subsidiaries_with_perplexity")
+
+# Formes juridiques ignorées dans la comparaison des noms
+_LEGAL_FORMS = {
+    "sa", "sas", "sasu", "sarl", "eurl", "sca", "sci", "snc", "se", "ag", "gmbh", "kg",
+    "nv", "bv", "spa", "srl", "plc", "ltd", "limited", "inc", "corp", "corporation",
+    "co", "llc", "lp",
+}
+
+ResearchResult = Tuple[str, Optional[List[Any]]]
+
+
+def normalize_entity_name(name: Optional[str]) -> str:
+    """
+    Forme comparable d'un nom d'entreprise (sans accents, ponctuation ni forme juridique).
+
+    Args:
+        name: Nom saisi ou résolu
+
+    Returns:
+        Mots en minuscules séparés par des espaces
+    """
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii")
+    tokens = re.findall(r"[a-z0-9]+", text.casefold().replace(".", ""))
+    kept = [token for token in tokens if token not in _LEGAL_FORMS]
+    return " ".join(kept or tokens)
+
+
+def entity_match_score(left: Optional[str], right: Optional[str]) -> float:
+    """
+    Similarité (0-1) de deux noms d'entreprise normalisés.
+
+    Args:
+        left: Premier nom
+        right: Second nom
+
+    Returns:
+        Ratio de similarité (1.0 = noms identiques après normalisation)
+    """
+    left, right = normalize_entity_name(left), normalize_entity_name(right)
+    if not left or not right:
+        return 0.0
+    if left == right:
+        return 1.0
+    return SequenceMatcher(None, left, right).ratio()
+
+
+def entity_names_match(left: Optional[str], right: Optional[str]) -> bool:
+    """
+    Indique si deux noms désignent la même entité : noms normalisés identiques,
+    espaces ignorés ("L'Oréal SA" = "LOreal", mais "Manitou Group" ≠ "Manitou Group UK").
+
+    Args:
+        left: Premier nom
+        right: Second nom
+
+    Returns:
+        True si les noms sont équivalents
+    """
+    left, right = normalize_entity_name(left), normalize_entity_name(right)
+    return bool(left) and left.replace(" ", "") == right.replace(" ", "")
+
+
+def should_speculate(raw_input: str, include_subsidiaries: bool, enabled: Optional[bool] = None) -> bool:
+    """
+    Indique si la recherche spéculative doit être lancée pour cette extraction.
+
+    Args:
+        raw_input: Entrée brute de l'utilisateur
+        include_subsidiaries: Extraction des filiales demandée
+        enabled: Choix explicite (ex: réglage de l'organisation), None = SPECULATIVE_SUBSIDIARY_SEARCH
+
+    Returns:
+        True si la spéculation est utile
+    """
+    if enabled is None:
+        enabled = SPECULATIVE_SUBSIDIARY_SEARCH
+    # Une URL ne donne pas de nom d'entité à rechercher
+    return (
+        enabled
+        and include_subsidiaries
+        and bool(normalize_entity_name(raw_input))
+        and not raw_input.strip().lower().startswith(("http://", "https://", "www."))
+    )
+
+
+class SpeculativeSubsidiarySearch:
+    """Recherche de filiales lancée sur l'entrée brute pendant l'identification de l'entité."""
+
+    def __init__(self, session_id: str, raw_input: str, deep_search: bool = False):
+        self.session_id = session_id
+        self.company_name = raw_input.strip()
+        self.deep_search = deep_search
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+        self._research_ms: Optional[float] = None
+        self._baseline: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+        self.outcome: Optional[str] = None
+        self.match_score: Optional[float] = None
+        self.wasted_cost_eur = 0.0
+
+    def _search_usage(self) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+        """Tokens cumulés des tools de recherche de la session : (tool, modèle) -> (in, cache, out)."""
+        usage = ToolTokensTracker.get_session_usage(self.session_id)
+        if usage is None:
+            return {}
+        return {
+            key: (counter.input_tokens, counter.cached_input_tokens, counter.output_tokens)
+            for key, counter in usage.counters.items()
+            if key[0] in _SEARCH_TOOLS
+        }
+
+    def _spent_cost_eur(self) -> float:
+        """Coût des recherches enregistrées depuis le lancement de la spéculation."""
+        from services.cost_tracking_service import ModelPricing
+
+        cost = 0.0
+        for (tool_name, model), (input_tokens, cached, output_tokens) in self._search_usage().items():
+            base_in, base_cached, base_out = self._baseline.get((tool_name, model), (0, 0, 0))
+            cost += float(ModelPricing.calculate_cost_eur(
+                model, input_tokens - base_in, output_tokens - base_out, cached - base_cached
+            ))
+        return cost
+
+    def _on_research_done(self, _task: asyncio.Task) -> None:
+        self._research_ms = (time.perf_counter() - self._started_at) * 1000
+
+    def start(self) -> None:
+        """Lance la recherche (dans le contexte de session courant)."""
+        self._baseline = self._search_usage()
+        self._started_at = time.perf_counter()
+        self._task = asyncio.create_task(
+            run_subsidiary_research({"company_name": self.company_name}, self.deep_search)
+        )
+        self._task.add_done_callback(self._on_research_done)
+        logger.info(f"🔮 Recherche de filiales spéculative lancée pour: {self.company_name}")
+
+    def _finish(self, outcome: str) -> None:
+        self.outcome = outcome
+        record_speculative_search(outcome, self.wasted_cost_eur)
+
+    async def check(self, target_entity: Optional[str]) -> bool:
+        """
+        Compare l'entité résolue au nom recherché ; annule la recherche si elle ne correspond pas.
+
+        Args:
+            target_entity: Entité cible résolue après l'Éclaireur
+
+        Returns:
+            True si la recherche spéculative est conservée
+        """
+        if self._task is None or self.outcome is not None:
+            return False
+        # Score conservé pour le rapport ; seule l'égalité des noms normalisés compte
+        self.match_score = entity_match_score(self.company_name, target_entity)
+        if entity_names_match(self.company_name, target_entity):
+            return True
+
+        logger.info(
+            f"🔮 Spéculation écartée: '{self.company_name}' ≠ '{target_entity}' "
+            f"(similarité {self.match_score:.2f})"
+        )
+        await self.discard("miss")
+        return False
+
+    async def result(self) -> Optional[ResearchResult]:
+        """
+        Attend la recherche conservée par check().
+
+        Returns:
+            (texte de recherche, citations), ou None si la recherche a échoué
+        """
+        if self._task is None or self.outcome is not None:
+            return None
+        waited_from = time.perf_counter()
+        try:
+            research = await self._task
+        except Exception as e:
+            logger.warning(f"⚠️ Recherche spéculative en erreur pour {self.company_name}: {e}")
+            research = None
+        wait_ms = (time.perf_counter() - waited_from) * 1000
+
+        if research is None:
+            self._finish("failed")
+            return None
+        self._finish("hit")
+        logger.info(
+            f"🔮 Recherche spéculative réutilisée pour {self.company_name} "
+            f"({wait_ms:.0f}ms d'attente sur {self._research_ms or 0:.0f}ms de recherche)"
+        )
+        return research
+
+    async def discard(self, outcome: str = "miss") -> None:
+        """
+        Annule la recherche si elle n'a pas été utilisée.
+
+        Args:
+            outcome: Issue enregistrée (miss, ou abandoned si l'extraction s'arrête avant)
+        """
+        if self._task is None or self.outcome is not None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        # Les appels interrompus avant leur réponse ne sont pas comptés
+        try:
+            self.wasted_cost_eur = self._spent_cost_eur()
+        except Exception as e:
+            logger.debug(f"Coût de la spéculation non calculé: {e}")
+        self._finish(outcome)
+
+    def report(self) -> Dict[str, Any]:
+        """Issue de la spéculation pour les métadonnées de l'extraction."""
+        return {
+            "company_name": self.company_name,
+            "outcome": self.outcome,
+            "match_score": round(self.match_score, 3) if self.match_score is not None else None,
+            "research_ms": round(self._research_ms) if self._research_ms is not None else None,
+            "wasted_cost_eur": round(self.wasted_cost_eur, 6),
+        }
@@ -0,0 +1,307 @@
+"""
+Analyse JSON tolérante des sorties d'agents (tronquées ou mal échappées).
+
+Le parseur lit le texte en une passe, éventuellement par morceaux (feed), et
+recopie un JSON valide :
+
+- le texte avant le premier objet/tableau (prose, balises ```json) et après sa
+  fermeture est ignoré ;
+- les caractères de contrôle bruts dans les chaînes sont échappés (les autres
+  caractères, y compris \\x7f-\\x9f, sont conservés tels quels) ;
+- les virgules finales sont supprimées, True/False/None deviennent true/false/null.
+
+En cas de troncature, le résultat est coupé après la dernière valeur complète et
+les conteneurs ouverts sont refermés : une liste de filiales tronquée devient une
+liste partielle (complete=False) plutôt qu'un échec. Un élément de tableau
+incomplet est écarté en entier (pas de filiale à moitié lue) ; seuls les objets
+hors tableau peuvent être refermés partiellement.
+
+En lecture de flux, les objets des tableaux de premier niveau listés dans
+item_keys (ex: "subsidiaries") sont restitués dès leur fermeture (drain_items).
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+
+from core.serialization import loads
+
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# Caractères qui interrompent une séquence littérale dans une chaîne
+_STRING_SPECIAL = re.compile(r'["\\\x00-\x1f]')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+# États attendus dans un conteneur
+_KEY, _COLON, _VALUE, _COMMA = "key", "colon", "value", "comma"
+
+
+@dataclass
+class RepairResult:
+    """Résultat d'une analyse tolérante."""
+
+    value: Any
+    # Document refermé par l'auteur (aucune donnée perdue par troncature)
+    complete: bool
+    # Le texte a dû être corrigé (caractères de contrôle, virgules, littéraux, troncature)
+    repaired: bool
+
+
+class TolerantJSONParser:
+    """Parseur JSON incrémental qui répare troncatures et échappements manquants."""
+
+    def __init__(self, item_keys: Iterable[str] = ()):
+        self._out: List[str] = []
+        self._length = 0
+        self._stack: List[str] = []
+        self._expect: List[str] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._token: List[str] = []
+        self._pending_comma = False
+        self._started = False
+        self.done = False
+        self.repaired = False
+        # Dernier point de coupe sûr : (longueur émise, fermetures à ajouter)
+        self._safe: Optional[Tuple[int, str]] = None
+        # Capture des objets des tableaux de premier niveau surveillés
+        self._item_keys = set(item_keys)
+        self._key_chars: Optional[List[str]] = None
+        self._top_key: Optional[str] = None
+        self._capture: Optional[List[str]] = None
+        self._items: List[Tuple[str, Any]] = []
+
+    def _emit(self, text: str) -> None:
+        self._out.append(text)
+        self._length += len(text)
+        if self._capture is not None:
+            self._capture.append(text)
+        if self._key_chars is not None:
+            self._key_chars.append(text)
+
+    def _open(self, char: str) -> None:
+        # Objet d'un tableau surveillé du premier niveau : {"<clé>": [ {...} ]}
+        if (
+            char == "{"
+            and self._item_keys
+            and self._stack == ["{", "["]
+            and self._top_key in self._item_keys
+        ):
+            self._capture = []
+        self._emit(char)
+        self._stack.append(char)
+        self._expect.append(_KEY if char == "{" else _VALUE)
+        self._mark_safe()
+
+    def _close(self) -> None:
+        opener = self._stack.pop()
+        self._expect.pop()
+        self._emit(_CLOSERS[opener])
+        if self._capture is not None and len(self._stack) == 2:
+            try:
+                self._items.append((self._top_key, loads("".join(self._capture))))
+            except ValueError:
+                self.repaired = True
+            self._capture = None
+        self._value_done()
+
+    def drain_items(self) -> List[Tuple[str, Any]]:
+        """
+        Objets complets des tableaux surveillés apparus depuis le dernier appel.
+
+        Returns:
+            Liste de (clé du tableau, objet)
+        """
+        items, self._items = self._items, []
+        return items
+
+    def _mark_safe(self) -> None:
+        # Dans un élément de tableau encore ouvert, le point de coupe reste avant cet élément
+        if "[" in self._stack[:-1]:
+            return
+        closers = "".join(_CLOSERS[opener] for opener in reversed(self._stack))
+        self._safe = (self._length, closers)
+
+    def _value_done(self) -> None:
+        if not self._stack:
+            self.done = True
+        else:
+            self._expect[-1] = _COMMA
+        self._mark_safe()
+
+    def _before_value(self) -> None:
+        if self._pending_comma:
+            self._emit(",")
+            self._pending_comma = False
+
+    def _finish_token(self) -> None:
+        if not self._token:
+            return
+        token = "".join(self._token)
+        self._token = []
+        literal = _LITERALS.get(token)
+        if literal is not None:
+            if literal != token:
+                self.repaired = True
+            self._emit(literal)
+        elif _NUMBER.fullmatch(token):
+            self._emit(token)
+        else:
+            # Mot nu invalide (ex: undefined, NaN) : valeur nulle pour garder la structure
+            self.repaired = True
+            self._emit("null")
+        self._value_done()
+
+    def _feed_string(self, text: str, i: int) -> int:
+        """Recopie le contenu d'une chaîne à partir de i ; retourne la position suivante."""
+        n = len(text)
+        while i < n:
+            if self._escape:
+                self._emit(text[i])
+                self._escape = False
+                i += 1
+                continue
+            match = _STRING_SPECIAL.search(text, i)
+            if match is None:
+                self._emit(text[i:])
+                return n
+            j = match.start()
+            if j > i:
+                self._emit(text[i:j])
+            char = text[j]
+            if char == "\\":
+                self._emit(char)
+                self._escape = True
+            elif char == '"':
+                self._emit(char)
+                self._in_string = False
+                if self._string_is_key:
+                    self._expect[-1] = _COLON
+                    if self._key_chars is not None:
+                        try:
+                            self._top_key = loads("".join(self._key_chars))
+                        except ValueError:
+                            self._top_key = None
+                        self._key_chars = None
+                else:
+                    self._value_done()
+                return j + 1
+            else:
+                self.repaired = True
+                self._emit(_CONTROL_ESCAPES.get(char, f"\\u{ord(char):04x}"))
+            i = j + 1
+        return n
+
+    def feed(self, text: str) -> None:
+        """
+        Analyse un nouveau morceau de texte.
+
+        Args:
+            text: Suite du document (peut couper n'importe où, y compris dans une chaîne)
+        """
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if self._in_string:
+                i = self._feed_string(text, i)
+                continue
+
+            char = text[i]
+            i += 1
+            if not self._started:
+                if char in _CLOSERS:
+                    self._started = True
+                    self._open(char)
+                continue
+
+            if char in " \t\r\n":
+                self._finish_token()
+            elif char == '"':
+                self._finish_token()
+                if self.done:
+                    break
+                self._before_value()
+                self._in_string = True
+                self._string_is_key = self._stack[-1] == "{" and self._expect[-1] == _KEY
+                if self._string_is_key and len(self._stack) == 1 and self._item_keys:
+                    self._key_chars = []
+                self._emit(char)
+            elif char in _CLOSERS:
+                self._finish_token()
+                if self.done:
+                    break
+                self._before_value()
+                self._open(char)
+            elif char in "}]":
+                self._finish_token()
+                if self.done:
+                    break
+                if self._pending_comma:
+                    self._pending_comma = False
+                    self.repaired = True
+                self._close()
+            elif char == ":":
+                self._finish_token()
+                self._emit(char)
+                self._expect[-1] = _VALUE
+            elif char == ",":
+                self._finish_token()
+                if self.done:
+                    break
+                if self._expect[-1] == _COMMA:
+                    self._pending_comma = True
+                    self._expect[-1] = _KEY if self._stack[-1] == "{" else _VALUE
+                else:
+                    # Virgule en double ou sans valeur : ignorée
+                    self.repaired = True
+            else:
+                if not self._token:
+                    self._before_value()
+                self._token.append(char)
+
+    def result(self) -> RepairResult:
+        """
+        Valeur analysée jusqu'ici (partielle si le document n'est pas refermé).
+
+        Returns:
+            RepairResult (value=None si aucun objet/tableau exploitable)
+        """
+        if self.done:
+            try:
+                return RepairResult(loads("".join(self._out)), True, self.repaired)
+            except ValueError:
+                pass
+        if self._safe is None:
+            return RepairResult(None, False, True)
+
+        length, closers = self._safe
+        try:
+            value = loads("".join(self._out)[:length] + closers)
+        except ValueError:
+            return RepairResult(None, False, True)
+        return RepairResult(value, False, True)
+
+
+def parse_tolerant(text: str) -> RepairResult:
+    """
+    Analyse un texte JSON éventuellement tronqué ou mal formé.
+
+    Le JSON valide passe par le décodeur natif, sans surcoût.
+
+    Args:
+        text: Sortie brute d'un agent
+
+    Returns:
+        RepairResult (value=None si rien n'est récupérable)
+    """
+    try:
+        value = loads(text)
+        if isinstance(value, (dict, list)):
+            return RepairResult(value, True, False)
+    except (ValueError, TypeError):
+        pass
+
+    parser = TolerantJSONParser()
+    parser.feed(text)
+    return parser.result()
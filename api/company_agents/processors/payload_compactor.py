@@ -0,0 +1,322 @@
+"""
+Compaction des payloads envoyés au Superviseur et au Restructurateur.
+
+Estime les tokens localement (tiktoken si disponible), supprime les champs
+redondants (sources dupliquées, extraits verbeux, valeurs vides) et découpe les
+listes de filiales trop longues en lots qui tiennent dans le budget configuré.
+"""
+
+import copy
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.serialization import dumps
+
+from ..config.extraction_config import PAYLOAD_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Champs textuels verbeux pouvant être tronqués
+VERBOSE_TEXT_FIELDS = {
+    "activity",
+    "activities",
+    "context",
+    "description",
+    "rationale",
+    "business_rationale",
+    "methodology_notes",
+    "notes",
+    "recommendations",
+    "warnings",
+    "snippet",
+    "excerpt",
+    "research_text",
+}
+
+# Niveaux de compaction, du plus conservateur au plus agressif
+COMPACTION_LEVELS: List[Dict[str, Optional[int]]] = [
+    {"max_text_chars": None, "max_sources": None, "max_list_items": None},
+    {"max_text_chars": 400, "max_sources": 3, "max_list_items": 6},
+    {"max_text_chars": 200, "max_sources": 1, "max_list_items": 3},
+]
+
+# Listes d'entités pouvant être découpées en lots
+BATCHABLE_ENTITY_KEYS = ("subsidiaries", "commercial_presence")
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Charge paresseusement l'encodeur tiktoken (None si indisponible)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.debug(f"tiktoken indisponible, estimation approximative des tokens: {e}")
+            _encoding = None
+    return _encoding
+
+
+def estimate_tokens(payload: Any) -> int:
+    """
+    Estime le nombre de tokens d'un payload (texte ou structure JSON).
+
+    Args:
+        payload: Chaîne ou structure sérialisable
+
+    Returns:
+        Nombre de tokens estimé
+    """
+    text = payload if isinstance(payload, str) else dumps(payload, default=str)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Approximation : ~4 caractères par token
+    return (len(text) + 3) // 4
+
+
+def _source_key(source: Any) -> Optional[str]:
+    """Clé de déduplication d'une source (URL normalisée)."""
+    url = source.get("url") if isinstance(source, dict) else source
+    if not isinstance(url, str) or not url:
+        return None
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parsed.path.rstrip('/')}"
+
+
+def dedupe_sources(sources: List[Any], max_sources: Optional[int] = None) -> List[Any]:
+    """
+    Supprime les sources dupliquées (même URL normalisée) en conservant l'ordre.
+
+    Args:
+        sources: Liste de sources (dict avec "url" ou chaînes)
+        max_sources: Nombre maximum de sources conservées
+
+    Returns:
+        Liste dédupliquée
+    """
+    seen = set()
+    deduped = []
+    for source in sources or []:
+        key = _source_key(source)
+        if key is None or key in seen:
+            continue
+        seen.add(key)
+        deduped.append(source)
+        if max_sources is not None and len(deduped) >= max_sources:
+            break
+    return deduped
+
+
+def _truncate(value: str, max_chars: Optional[int]) -> str:
+    if max_chars is None or len(value) <= max_chars:
+        return value
+    return value[: max_chars - 1].rstrip() + "…"
+
+
+def _compact_node(node: Any, level: Dict[str, Optional[int]], key: Optional[str] = None) -> Any:
+    """Compacte récursivement un nœud selon un niveau de compaction."""
+    verbose = key in VERBOSE_TEXT_FIELDS
+
+    if isinstance(node, dict):
+        compacted = {}
+        for k, v in node.items():
+            if v is None or v == "" or v == [] or v == {}:
+                continue
+            if k == "sources" and isinstance(v, list):
+                compacted[k] = dedupe_sources(v, level["max_sources"])
+                continue
+            compacted[k] = _compact_node(v, level, k)
+        return compacted
+
+    if isinstance(node, list):
+        items = node
+        if verbose and level["max_list_items"] is not None:
+            items = items[: level["max_list_items"]]
+        return [_compact_node(item, level, key) for item in items]
+
+    if isinstance(node, str) and verbose:
+        return _truncate(node, level["max_text_chars"])
+
+    return node
+
+
+def compact_payload(
+    payload: Dict[str, Any],
+    budget_tokens: int = PAYLOAD_TOKEN_BUDGET,
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Compacte progressivement un payload jusqu'à tenir dans le budget de tokens.
+
+    Args:
+        payload: Données d'entrée de l'agent
+        budget_tokens: Budget de tokens par appel
+
+    Returns:
+        Tuple (payload compacté, tokens estimés). Si aucun niveau ne suffit,
+        retourne la version la plus compacte.
+    """
+    original_tokens = estimate_tokens(payload)
+    compacted, tokens = payload, original_tokens
+    for level in COMPACTION_LEVELS:
+        compacted = _compact_node(payload, level)
+        tokens = estimate_tokens(compacted)
+        if tokens <= budget_tokens:
+            break
+
+    if tokens < original_tokens:
+        logger.info(f"🗜️ Payload compacté: {original_tokens} → {tokens} tokens (budget: {budget_tokens})")
+    return compacted, tokens
+
+
+def split_entity_batches(
+    payload: Dict[str, Any],
+    container_key: str = "subsidiaries",
+    budget_tokens: int = PAYLOAD_TOKEN_BUDGET,
+) -> List[Dict[str, Any]]:
+    """
+    Découpe les entités (filiales, présences commerciales) d'un payload en lots sous le budget.
+
+    Le reste du payload (fiche entreprise, analyse, ...) est répété dans chaque lot.
+
+    Args:
+        payload: Payload déjà compacté
+        container_key: Clé du rapport de filiales dans le payload
+        budget_tokens: Budget de tokens par appel
+
+    Returns:
+        Liste de payloads (un seul si le payload tient déjà dans le budget)
+    """
+    report = payload.get(container_key)
+    if not isinstance(report, dict) or estimate_tokens(payload) <= budget_tokens:
+        return [payload]
+
+    entities = [
+        (entity_key, entity)
+        for entity_key in BATCHABLE_ENTITY_KEYS
+        for entity in report.get(entity_key) or []
+    ]
+    if len(entities) < 2:
+        return [payload]
+
+    base = copy.deepcopy(payload)
+    for entity_key in BATCHABLE_ENTITY_KEYS:
+        base[container_key][entity_key] = []
+    available = max(budget_tokens - estimate_tokens(base), 1)
+
+    groups: List[List[Tuple[str, Any]]] = []
+    current: List[Tuple[str, Any]] = []
+    current_tokens = 0
+    for entity_key, entity in entities:
+        entity_tokens = estimate_tokens(entity)
+        if current and current_tokens + entity_tokens > available:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append((entity_key, entity))
+        current_tokens += entity_tokens
+    if current:
+        groups.append(current)
+
+    batches = []
+    for group in groups:
+        batch = copy.deepcopy(base)
+        for entity_key, entity in group:
+            batch[container_key][entity_key].append(entity)
+        batches.append(batch)
+
+    logger.info(f"📦 {len(entities)} entités découpées en {len(batches)} lots (budget: {budget_tokens} tokens)")
+    return batches
+
+
+def _merge_unique(values: List[Any], key=None, limit: Optional[int] = None) -> List[Any]:
+    """Concatène en conservant l'ordre et en supprimant les doublons."""
+    seen = set()
+    merged = []
+    for value in values:
+        marker = key(value) if key else value
+        if isinstance(marker, (dict, list)):
+            marker = dumps(marker, sort_keys=True, default=str)
+        if marker in seen:
+            continue
+        seen.add(marker)
+        merged.append(value)
+        if limit is not None and len(merged) >= limit:
+            break
+    return merged
+
+
+def merge_meta_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fusionne les rapports du Superviseur produits lot par lot.
+
+    Les scores sont moyennés en pondérant par le nombre de filiales évaluées dans chaque lot.
+    """
+    reports = [r for r in reports if isinstance(r, dict) and r]
+    if not reports:
+        return {}
+    if len(reports) == 1:
+        return reports[0]
+
+    weights = [max(len(r.get("subsidiaries_confidence") or []), 1) for r in reports]
+    total_weight = sum(weights)
+
+    def _weighted(getter) -> float:
+        return round(sum(getter(r) * w for r, w in zip(reports, weights)) / total_weight, 4)
+
+    section_keys = ("geographic", "structure", "sources", "overall")
+    merged = dict(reports[0])
+    merged["section_scores"] = {
+        k: _weighted(lambda r, k=k: float((r.get("section_scores") or {}).get(k, 0.0)))
+        for k in section_keys
+    }
+    merged["business_coherence_score"] = _weighted(lambda r: float(r.get("business_coherence_score", 0.0)))
+    merged["requires_follow_up"] = any(r.get("requires_follow_up") for r in reports)
+    merged["conflicts"] = _merge_unique(
+        [c for r in reports for c in r.get("conflicts") or []], key=lambda c: c.get("item")
+    )
+    merged["subsidiaries_confidence"] = _merge_unique(
+        [s for r in reports for s in r.get("subsidiaries_confidence") or []],
+        key=lambda s: (s.get("subsidiary_name") or "").lower(),
+    )
+    for list_key in ("recommendations", "notes", "excluded_subsidiaries", "warnings"):
+        merged[list_key] = _merge_unique([v for r in reports for v in r.get(list_key) or []])
+    return merged
+
+
+def merge_company_infos(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fusionne les CompanyInfo produits lot par lot par le Restructurateur.
+
+    Les champs scalaires viennent du premier lot ; les listes sont concaténées,
+    dédupliquées et bornées aux limites du modèle CompanyInfo.
+    """
+    results = [r for r in results if isinstance(r, dict) and r]
+    if not results:
+        return {}
+    if len(results) == 1:
+        return results[0]
+
+    merged = dict(results[0])
+    merged["subsidiaries_details"] = _merge_unique(
+        [s for r in results for s in r.get("subsidiaries_details") or []],
+        key=lambda s: (s.get("legal_name") or "").lower(),
+        limit=10,
+    )
+    merged["commercial_presence_details"] = _merge_unique(
+        [p for r in results for p in r.get("commercial_presence_details") or []],
+        key=lambda p: ((p.get("name") or "").lower(), ((p.get("location") or {}).get("country") or "").lower()),
+        limit=20,
+    )
+    merged["sources"] = dedupe_sources([s for r in results for s in r.get("sources") or []], 7)
+    merged["methodology_notes"] = _merge_unique(
+        [n for r in results for n in r.get("methodology_notes") or []], limit=6
+    ) or None
+    return merged
@@ -5,14 +5,37 @@ This module handles filtering of sources based on accessibility,
 freshness, and deduplication.
 """
 
+import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, timedelta
 
-from .url_validator import filter_sources_by_accessibility
+from ..config.extraction_config import SOURCE_PROBE_CONCURRENCY
+from .url_validator import is_url_accessible
 
 logger = logging.getLogger(__name__)
 
+# Poids de fiabilité par tier de source (classement avant les sondes réseau)
+TIER_WEIGHTS: Dict[str, float] = {
+    "official": 1.0,
+    "financial_media": 0.8,
+    "pro_db": 0.7,
+    "other": 0.4,
+}
+
+
+def _parse_published_date(source: Any) -> Optional[datetime]:
+    """Date de publication (format YYYY-MM-DD) d'une source, None si absente ou invalide."""
+    if not isinstance(source, dict):
+        return None
+    published_date = source.get("published_date")
+    if not isinstance(published_date, str) or not published_date:
+        return None
+    try:
+        return datetime.strptime(published_date, "%Y-%m-%d")
+    except ValueError:
+        return None
+
 
 def filter_fresh_sources(
     sources: List[Dict[str, Any]], 
@@ -35,35 +58,16 @@ def filter_fresh_sources(
     fresh_sources = []
     
     for source in sources:
-        if not isinstance(source, dict):
-            fresh_sources.append(source)
-            continue
-            
-        published_date = source.get("published_date")
-        if not published_date:
-            # Si pas de date, on garde la source
-            fresh_sources.append(source)
-            continue
-            
-        try:
-            # Parser la date (format YYYY-MM-DD)
-            if isinstance(published_date, str):
-                source_date = datetime.strptime(published_date, "%Y-%m-%d")
-            else:
-                fresh_sources.append(source)
-                continue
-                
-            if source_date >= cutoff_date:
-                fresh_sources.append(source)
-            else:
-                logger.debug(
-                    "Source filtrée (trop ancienne): %s (date: %s)",
-                    source.get("url", "unknown"),
-                    published_date
-                )
-        except ValueError:
-            # Date invalide, on garde la source
+        # Sans date exploitable, on garde la source
+        source_date = _parse_published_date(source)
+        if source_date is None or source_date >= cutoff_date:
             fresh_sources.append(source)
+        else:
+            logger.debug(
+                "Source filtrée (trop ancienne): %s (date: %s)",
+                source.get("url", "unknown"),
+                source.get("published_date")
+            )
     
     return fresh_sources
 
@@ -138,6 +142,54 @@ def extract_sources_from_subsidiary(subsidiary: Dict[str, Any]) -> List[str]:
     return sources
 
 
+def _source_url(source: Any) -> Optional[str]:
+    """URL d'une source (dict ou chaîne)."""
+    if isinstance(source, dict):
+        return source.get("url")
+    if isinstance(source, str):
+        return source
+    return None
+
+
+def score_source(source: Any, max_age_months: int = 24) -> float:
+    """
+    Score de pertinence d'une source, calculé sans accès réseau.
+
+    Combine la qualité des métadonnées (validate_source_quality), la
+    fiabilité du tier et la fraîcheur de la date de publication.
+
+    Args:
+        source: Source (dict ou URL)
+        max_age_months: Âge maximum en mois (fraîcheur nulle au-delà)
+
+    Returns:
+        Score entre 0 et 3
+    """
+    if isinstance(source, str):
+        source = {"url": source}
+    quality = validate_source_quality(source)["quality_score"]
+    tier = TIER_WEIGHTS.get(source.get("tier"), 0.2) if isinstance(source, dict) else 0.0
+
+    source_date = _parse_published_date(source)
+    if source_date is None:
+        # Date inconnue : fraîcheur neutre
+        freshness = 0.5
+    else:
+        age_days = max(0, (datetime.now() - source_date).days)
+        freshness = max(0.0, 1.0 - age_days / (max_age_months * 30))
+    return quality + tier + freshness
+
+
+def rank_sources(sources: List[Any], max_age_months: int = 24) -> List[Any]:
+    """
+    Écarte les sources trop anciennes puis classe les autres par score décroissant.
+
+    Le tri est stable : à score égal, l'ordre d'origine est conservé.
+    """
+    fresh_sources = filter_fresh_sources(sources, max_age_months)
+    return sorted(fresh_sources, key=lambda source: -score_source(source, max_age_months))
+
+
 async def filter_sources_comprehensive(
     sources: List[Any],
     *,
@@ -147,7 +199,12 @@ async def filter_sources_comprehensive(
     max_sources: int = 7
 ) -> Tuple[List[Any], List[str]]:
     """
-    Filtre les sources de manière complète (accessibilité + fraîcheur).
+    Sélectionne les `max_sources` meilleures sources accessibles et fraîches.
+    
+    Les sources sont d'abord filtrées par fraîcheur et classées sans accès
+    réseau (rank_sources), puis sondées dans l'ordre du classement par
+    vagues d'au plus SOURCE_PROBE_CONCURRENCY URLs : les sondes s'arrêtent
+    dès que `max_sources` sources accessibles sont retenues.
     
     Args:
         sources: Liste des sources à filtrer
@@ -157,29 +214,52 @@ async def filter_sources_comprehensive(
         max_sources: Nombre maximum de sources
         
     Returns:
-        Tuple (sources_filtrées, urls_supprimées)
+        Tuple (sources_filtrées par score décroissant, urls_inaccessibles sondées)
     """
     if not sources:
         return [], []
     
-    # Étape 1: Filtrage par accessibilité
-    accessible_sources, inaccessible_urls = await filter_sources_by_accessibility(
-        sources, session_id=session_id, agent_name=agent_name
-    )
-    
-    # Étape 2: Filtrage par fraîcheur (si activé)
-    fresh_sources = filter_fresh_sources(accessible_sources, max_age_months)
+    # Étape 1: Fraîcheur et classement (sans réseau)
+    ranked = rank_sources(sources, max_age_months)
     
-    # Étape 3: Limitation du nombre de sources
-    final_sources = fresh_sources[:max_sources]
+    # Étape 2: Sondes paresseuses dans l'ordre du classement
+    selected: List[Any] = []
+    inaccessible_urls: List[str] = []
+    probes = 0
+    position = 0
+    while position < len(ranked) and len(selected) < max_sources:
+        wave_size = min(SOURCE_PROBE_CONCURRENCY, max_sources - len(selected))
+        wave = ranked[position:position + wave_size]
+        position += len(wave)
+
+        urls = [_source_url(source) for source in wave]
+        probed = [url for url in urls if url]
+        probes += len(probed)
+        results = iter(await asyncio.gather(*(is_url_accessible(url) for url in probed)))
+
+        for source, url in zip(wave, urls):
+            # Les sources sans URL sont conservées sans sonde
+            if not url or next(results):
+                selected.append(source)
+            else:
+                inaccessible_urls.append(url)
+                logger.info(
+                    "Source exclue (URL inaccessible) pour session=%s agent=%s : %s",
+                    session_id or "unknown",
+                    agent_name or "unknown",
+                    url,
+                )
     
+    final_sources = selected[:max_sources]
     total_removed = len(sources) - len(final_sources)
     if total_removed > 0:
         logger.info(
-            "Filtrage des sources: %d sources supprimées (inaccessibles: %d, autres: %d)",
+            "Filtrage des sources: %d sources supprimées (inaccessibles: %d, autres: %d), %d/%d URLs sondées",
             total_removed,
             len(inaccessible_urls),
-            total_removed - len(inaccessible_urls)
+            total_removed - len(inaccessible_urls),
+            probes,
+            len(sources),
         )
     
     return final_sources, inaccessible_urls
@@ -5,8 +5,10 @@ This module handles URL validation, caching, and accessibility checks
 for the extraction pipeline.
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
 import httpx
 
 from ..config.extraction_config import (
@@ -15,11 +17,17 @@ from ..config.extraction_config import (
     URL_REQUEST_HEADERS,
     get_url_cache,
     set_url_cache_status,
-    get_url_cache_status,
+    lookup_url_cache_status,
 )
+from ..metrics.prometheus_exporter import observe_url_probe, record_url_cache
+from core.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
+# Sondes en cours, partagées entre appelants (sondage anticipé pendant le streaming
+# des agents puis filtrage des sources) : une URL n'est sondée qu'une fois à la fois
+_inflight_probes: Dict[str, "asyncio.Task[bool]"] = {}
+
 
 async def is_url_accessible(url: str) -> bool:
     """
@@ -34,31 +42,48 @@ async def is_url_accessible(url: str) -> bool:
     if not url:
         return False
         
-    # Vérifier le cache d'abord
-    cached = get_url_cache_status(url)
+    # Vérifier le cache d'abord (une URL absente du cache est sondée)
+    cached = lookup_url_cache_status(url)
+    record_url_cache(cached is not None)
     if cached is not None:
         return cached
 
-    try:
-        async with httpx.AsyncClient(
-            timeout=URL_TIMEOUT_S,
-            follow_redirects=True,
-            headers=URL_REQUEST_HEADERS,
-        ) as client:
-            response = await client.head(url)
-            if (
-                response.status_code >= 400
-                and response.status_code not in URL_ALLOWED_STATUSES
-            ):
-                response = await client.get(url)
-                
-        is_accessible = (
-            response.status_code < 400 
-            or response.status_code in URL_ALLOWED_STATUSES
-        )
-    except Exception:
-        logger.debug("URL accessibility check failed for %s", url, exc_info=True)
-        is_accessible = False
+    task = _inflight_probes.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_probe_url(url))
+        _inflight_probes[url] = task
+        task.add_done_callback(lambda _: _inflight_probes.pop(url, None))
+    # Un appelant annulé n'interrompt pas la sonde des autres
+    return await asyncio.shield(task)
+
+
+async def _probe_url(url: str) -> bool:
+    """Sonde une URL (HEAD puis GET) et met le résultat en cache."""
+    started = time.perf_counter()
+    with start_span("url_probe", probe="validator", url=url) as span:
+        try:
+            async with httpx.AsyncClient(
+                timeout=URL_TIMEOUT_S,
+                follow_redirects=True,
+                headers=URL_REQUEST_HEADERS,
+            ) as client:
+                response = await client.head(url)
+                if (
+                    response.status_code >= 400
+                    and response.status_code not in URL_ALLOWED_STATUSES
+                ):
+                    response = await client.get(url)
+                    
+            is_accessible = (
+                response.status_code < 400 
+                or response.status_code in URL_ALLOWED_STATUSES
+            )
+        except Exception:
+            logger.debug("URL accessibility check failed for %s", url, exc_info=True)
+            is_accessible = False
+        if span is not None:
+            span.set_attribute("accessible", is_accessible)
+    observe_url_probe("validator", time.perf_counter() - started, is_accessible)
 
     # Mettre en cache le résultat
     set_url_cache_status(url, is_accessible)
@@ -100,55 +125,6 @@ async def validate_urls_accessibility(
     return accessible_urls, inaccessible_urls
 
 
-async def filter_sources_by_accessibility(
-    sources: Optional[List[Any]],
-    *,
-    session_id: Optional[str] = None,
-    agent_name: Optional[str] = None
-) -> Tuple[List[Any], List[str]]:
-    """
-    Filtre une liste de sources en fonction de l'accessibilité de leurs URLs.
-    
-    Args:
-        sources: Liste des sources à filtrer
-        session_id: ID de session pour le logging
-        agent_name: Nom de l'agent pour le logging
-        
-    Returns:
-        Tuple (sources_filtrées, urls_supprimées)
-    """
-    filtered_sources = []
-    removed_urls = []
-
-    if not sources:
-        return filtered_sources, removed_urls
-
-    for entry in sources:
-        if isinstance(entry, dict):
-            url = entry.get("url")
-        elif isinstance(entry, str):
-            url = entry
-        else:
-            url = None
-
-        if not url:
-            filtered_sources.append(entry)
-            continue
-
-        if await is_url_accessible(url):
-            filtered_sources.append(entry)
-        else:
-            removed_urls.append(url)
-            logger.info(
-                "Source exclue (URL inaccessible) pour session=%s agent=%s : %s",
-                session_id or "unknown",
-                agent_name or "unknown",
-                url,
-            )
-
-    return filtered_sources, removed_urls
-
-
 def get_url_cache_status(url: str) -> bool:
     """Récupère le statut d'accessibilité d'une URL depuis le cache."""
     from ..config.extraction_config import get_url_cache_status as _get_cache_status
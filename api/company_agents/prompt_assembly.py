@@ -0,0 +1,99 @@
+"""
+Assemblage des prompts compatible avec le cache de préfixe des fournisseurs.
+
+Les instructions des agents constituent le préfixe statique : elles doivent rester
+identiques octet par octet d'un run à l'autre. Toutes les données dynamiques de
+l'ExtractionState sont sérialisées de manière déterministe et placées en fin de
+message (les hints de correction des retries sont ajoutés après elles).
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from core.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Empreinte des préfixes statiques observés, par nom d'agent
+_STATIC_PREFIX_FINGERPRINTS: Dict[str, str] = {}
+
+
+def canonical_json(payload: Any) -> str:
+    """
+    Sérialise un payload de manière déterministe (clés triées, séparateurs compacts).
+
+    Args:
+        payload: Données dynamiques à sérialiser
+
+    Returns:
+        Chaîne JSON stable pour un même contenu
+    """
+    return dumps(payload, sort_keys=True, default=str)
+
+
+def build_agent_input(payload: Dict[str, Any], static_header: Optional[str] = None) -> str:
+    """
+    Construit l'entrée utilisateur d'un agent : partie statique d'abord, données dynamiques ensuite.
+
+    Args:
+        payload: Données dynamiques issues de l'état d'extraction
+        static_header: Texte constant propre à l'agent (optionnel)
+
+    Returns:
+        Entrée prête à être envoyée à Runner.run
+    """
+    dynamic_block = canonical_json(payload)
+    if static_header:
+        return f"{static_header}\n\n{dynamic_block}"
+    return dynamic_block
+
+
+def check_static_prefix(agent: Any) -> Optional[str]:
+    """
+    Vérifie que les instructions d'un agent sont statiques et stables entre deux runs.
+
+    Args:
+        agent: Agent dont on contrôle les instructions
+
+    Returns:
+        Empreinte courte du préfixe, ou None si les instructions ne sont pas une chaîne
+    """
+    name = getattr(agent, "name", "agent")
+    instructions = getattr(agent, "instructions", None)
+    if not isinstance(instructions, str):
+        logger.debug(f"🧩 Instructions non statiques pour {name}: cache de préfixe non garanti")
+        return None
+
+    fingerprint = hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]
+    previous = _STATIC_PREFIX_FINGERPRINTS.get(name)
+    if previous is not None and previous != fingerprint:
+        logger.warning(
+            f"⚠️ Préfixe statique modifié pour {name} ({previous} → {fingerprint}): "
+            f"le cache de prompt fournisseur sera invalidé"
+        )
+    _STATIC_PREFIX_FINGERPRINTS[name] = fingerprint
+    return fingerprint
+
+
+def get_cached_input_tokens(usage: Any) -> int:
+    """
+    Extrait le nombre de tokens d'entrée servis depuis le cache du fournisseur.
+
+    Gère l'usage de l'Agents SDK (input_tokens_details) et celui de
+    Chat Completions (prompt_tokens_details).
+
+    Args:
+        usage: Objet usage retourné par le SDK ou l'API
+
+    Returns:
+        Nombre de tokens d'entrée en cache (0 si indisponible)
+    """
+    if usage is None:
+        return 0
+    for attr in ("input_tokens_details", "prompt_tokens_details"):
+        details = getattr(usage, attr, None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        if isinstance(cached, int):
+            return cached
+    return 0
@@ -0,0 +1,63 @@
+"""
+Limiteur de débit partagé pour les appels LLM lancés en parallèle.
+
+Borne le nombre d'appels simultanés (sémaphore) et, si configuré, le nombre
+d'appels par minute (fenêtre glissante) pour l'ensemble du processus.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque
+
+from .config.extraction_config import LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE
+from .metrics.prometheus_exporter import add_llm_queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRateLimiter:
+    """Limiteur concurrence + requêtes/minute, utilisable avec `async with`."""
+
+    def __init__(self, max_concurrency: int, requests_per_minute: int = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = max(0, requests_per_minute)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._window: Deque[float] = deque()
+        self._window_lock = asyncio.Lock()
+
+    async def _wait_for_slot(self) -> None:
+        """Attend qu'un créneau se libère dans la fenêtre glissante d'une minute."""
+        async with self._window_lock:
+            while True:
+                now = time.monotonic()
+                while self._window and now - self._window[0] >= 60.0:
+                    self._window.popleft()
+                if len(self._window) < self.requests_per_minute:
+                    self._window.append(now)
+                    return
+                wait_s = 60.0 - (now - self._window[0])
+                logger.debug(f"⏳ Limite de {self.requests_per_minute} appels/min atteinte, attente {wait_s:.1f}s")
+                await asyncio.sleep(wait_s)
+
+    async def __aenter__(self) -> "LLMRateLimiter":
+        add_llm_queue_depth(1)
+        try:
+            await self._semaphore.acquire()
+            if self.requests_per_minute:
+                try:
+                    await self._wait_for_slot()
+                except BaseException:
+                    self._semaphore.release()
+                    raise
+        finally:
+            add_llm_queue_depth(-1)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._semaphore.release()
+
+
+# Instance globale partagée par tous les appels parallélisés
+llm_rate_limiter = LLMRateLimiter(LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE)
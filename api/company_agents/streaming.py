@@ -0,0 +1,168 @@
+"""
+Exécution en streaming des agents à sortie structurée volumineuse.
+
+Le Cartographe (SubsidiaryReport) et le Restructurateur (CompanyInfo) génèrent
+de longues listes d'objets. En streaming, le texte généré est analysé au fil de
+l'eau (TolerantJSONParser) : chaque filiale ou présence commerciale complète est
+
+- diffusée aux abonnés WebSocket de la session (message "partial_result") ;
+- l'occasion de sonder ses URLs de sources en arrière-plan, pendant que la
+  génération continue : le filtrage des sources retrouve ensuite les résultats
+  dans le cache d'URLs (ou rejoint la sonde en cours).
+
+Le résultat final reste celui du SDK (sortie validée, guardrails, usage) :
+les objets partiels ne sont qu'un aperçu.
+"""
+
+import asyncio
+import logging
+from typing import Any, Iterable, List, Optional, Set
+
+from core.serialization import dumps
+
+from .config.extraction_config import ENABLE_AGENT_STREAMING, SOURCE_PROBE_CONCURRENCY
+from .processors.json_repair import TolerantJSONParser
+from .processors.url_validator import is_url_accessible
+
+logger = logging.getLogger(__name__)
+
+# Références des sondes anticipées (évite leur collecte avant la fin)
+_background_probes: Set[asyncio.Task] = set()
+
+
+def _source_urls(item: Any) -> List[str]:
+    """URLs des sources d'un objet généré (dicts {"url": ...} ou chaînes)."""
+    urls = []
+    for source in item.get("sources") or []:
+        url = source.get("url") if isinstance(source, dict) else source
+        if isinstance(url, str) and url.startswith(("http://", "https://")):
+            urls.append(url)
+    return urls
+
+
+class PartialItemConsumer:
+    """Diffuse les objets complets d'une sortie en cours et lance la sonde de leurs URLs."""
+
+    def __init__(self, session_id: Optional[str], agent_name: str, item_keys: Iterable[str], status_manager=None):
+        self.session_id = session_id
+        self.agent_name = agent_name
+        self.item_keys = tuple(item_keys)
+        self.status_manager = status_manager
+        self._parser = TolerantJSONParser(self.item_keys)
+        self._seen: Set[str] = set()
+        self._probe_semaphore = asyncio.Semaphore(max(1, SOURCE_PROBE_CONCURRENCY))
+        self.items_published = 0
+        self.urls_probed = 0
+
+    def reset(self) -> None:
+        """Nouvelle réponse du modèle (tour suivant) : on repart d'un document vide."""
+        self._parser = TolerantJSONParser(self.item_keys)
+
+    async def feed(self, delta: str) -> None:
+        """
+        Analyse un fragment de texte généré.
+
+        Args:
+            delta: Fragment de sortie du modèle
+        """
+        self._parser.feed(delta)
+        for kind, item in self._parser.drain_items():
+            if not isinstance(item, dict):
+                continue
+            # Un même objet régénéré (nouveau tour, retry) n'est diffusé qu'une fois
+            fingerprint = dumps([kind, item], sort_keys=True, default=str)
+            if fingerprint in self._seen:
+                continue
+            self._seen.add(fingerprint)
+            await self._publish(kind, item)
+            for url in _source_urls(item):
+                self._probe_in_background(url)
+
+    async def _publish(self, kind: str, item: dict) -> None:
+        self.items_published += 1
+        if self.status_manager is None or not self.session_id:
+            return
+        try:
+            await self.status_manager.publish_partial_item(self.session_id, self.agent_name, kind, item)
+        except Exception as e:
+            logger.debug(f"Diffusion partielle impossible pour {self.agent_name}: {e}")
+
+    def _probe_in_background(self, url: str) -> None:
+        self.urls_probed += 1
+        task = asyncio.create_task(self._probe(url))
+        _background_probes.add(task)
+        task.add_done_callback(_background_probes.discard)
+
+    async def _probe(self, url: str) -> None:
+        async with self._probe_semaphore:
+            try:
+                await is_url_accessible(url)
+            except Exception:
+                logger.debug("Sonde anticipée en échec pour %s", url, exc_info=True)
+
+
+async def run_agent_streamed(
+    agent: Any,
+    input: Any,
+    *,
+    max_turns: int,
+    agent_name: str,
+    session_id: Optional[str] = None,
+    item_keys: Iterable[str] = (),
+    status_manager=None,
+) -> Any:
+    """
+    Exécute un agent en consommant sa sortie structurée au fil de la génération.
+
+    Sans item_keys (ou avec ENABLE_AGENT_STREAMING=false), équivaut à Runner.run.
+
+    Args:
+        agent: Agent à exécuter
+        input: Entrée de l'agent
+        max_turns: Nombre maximum de tours
+        agent_name: Nom de l'agent (messages WebSocket, logs)
+        session_id: ID de session des messages "partial_result"
+        item_keys: Tableaux de premier niveau dont les objets sont diffusés
+        status_manager: Gestionnaire de statut (None = pas de diffusion, sondes seulement)
+
+    Returns:
+        Résultat du SDK (final_output, context_wrapper...)
+
+    Raises:
+        Les exceptions du SDK (ex: OutputGuardrailTripwireTriggered), comme Runner.run
+        asyncio.CancelledError: Si la tâche est annulée pendant la génération
+    """
+    from agents import Runner
+
+    item_keys = tuple(item_keys)
+    if not item_keys or not ENABLE_AGENT_STREAMING:
+        return await Runner.run(agent, input=input, max_turns=max_turns)
+
+    consumer = PartialItemConsumer(session_id, agent_name, item_keys, status_manager)
+    result = Runner.run_streamed(agent, input=input, max_turns=max_turns)
+    try:
+        async for event in result.stream_events():
+            if event.type != "raw_response_event":
+                continue
+            data_type = getattr(event.data, "type", None)
+            if data_type == "response.created":
+                consumer.reset()
+            elif data_type == "response.output_text.delta":
+                await consumer.feed(event.data.delta)
+    finally:
+        # Interruption (annulation, erreur de diffusion) : le run ne doit pas continuer seul
+        if not result.is_complete:
+            result.cancel()
+
+    # stream_events() absorbe l'annulation de la tâche (fin silencieuse du flux) :
+    # elle est relancée pour ne pas poursuivre le pipeline avec final_output=None
+    task = asyncio.current_task()
+    if task is not None and task.cancelling():
+        raise asyncio.CancelledError()
+
+    if consumer.items_published:
+        logger.info(
+            f"📡 {agent_name}: {consumer.items_published} objet(s) diffusé(s) pendant la génération, "
+            f"{consumer.urls_probed} URL(s) sondée(s) en avance"
+        )
+    return result
@@ -0,0 +1,384 @@
+"""
+Structuration par segments des recherches volumineuses du Cartographe.
+
+Le texte de recherche (Perplexity ou gpt-4o-search) est découpé par entité /
+section, chaque segment est structuré en parallèle par une copie sans outil du
+Cartographe (bornée par le limiteur LLM partagé), puis un réducteur
+déterministe fusionne et déduplique les rapports en un seul SubsidiaryReport.
+
+Un segment en échec est relancé une fois ; s'il échoue encore, ses entités
+manquent au rapport : le nombre de segments perdus est renvoyé
+(ChunkedRunResult.failed_segments) et signalé dans methodology_notes.
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import Agent, Runner
+from agents.usage import Usage
+
+from core.tracing import start_span
+from company_agents.config.extraction_config import CARTOGRAPHE_CHUNK_MAX_CHARS
+from company_agents.models import SubsidiaryReport
+from company_agents.processors.payload_compactor import dedupe_sources
+from company_agents.prompt_assembly import build_agent_input
+from company_agents.rate_limiter import llm_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# En-tête statique des segments : remplace l'étape "appel de l'outil" du prompt
+CHUNK_STATIC_HEADER = (
+    "SEGMENT DE RECHERCHE FOURNI : la recherche a déjà été effectuée, n'appelle aucun outil. "
+    "Structure UNIQUEMENT les entités présentes dans `research_segment` en JSON SubsidiaryReport "
+    "(listes vides si le segment ne contient aucune entité)."
+)
+
+# Lignes qui ouvrent un nouveau bloc (titres markdown, gras, sections MAJUSCULES, éléments numérotés)
+_SECTION_RE = re.compile(r"^(#{1,6}\s|===|\*\*[^*]+\*\*\s*:?\s*$|[A-ZÉÈÀÎÔÛ][A-ZÉÈÀÎÔÛ0-9 /()'&-]{3,}:)")
+_ITEM_RE = re.compile(r"^(\d+[.)]\s|[-*]\s+\*\*)")
+
+# Limites du modèle SubsidiaryReport
+MAX_SUBSIDIARIES = 10
+MAX_COMMERCIAL_PRESENCE = 20
+MAX_PARENTS = 3
+MAX_METHODOLOGY_NOTES = 15
+
+
+@dataclass
+class ChunkedRunResult:
+    """Résultat compatible avec celui de Runner.run (final_output + context_wrapper.usage)."""
+
+    final_output: Optional[Dict[str, Any]]
+    context_wrapper: Any
+    segments_count: int = 1
+    failed_segments: int = 0
+
+
+def _chunk_instructions(instructions: str) -> str:
+    """Retire le workflow d'appel d'outil du prompt du Cartographe (conserve les règles)."""
+    marker = instructions.find("# RÈGLES CRITIQUES")
+    if marker == -1:
+        return instructions
+    first_line = instructions.strip().splitlines()[0]
+    return f"{first_line}\n\n{instructions[marker:]}"
+
+
+def structuring_agent(agent: Agent) -> Agent:
+    """Copie sans outil du Cartographe, qui structure une recherche déjà effectuée."""
+    return agent.clone(instructions=_chunk_instructions(agent.instructions), tools=[])
+
+
+def structuring_input(
+    company_context: Dict[str, Any],
+    research_text: str,
+    citations: Optional[List[Any]] = None,
+    segment: Optional[str] = None,
+) -> str:
+    """
+    Entrée du Cartographe pour structurer un texte de recherche (ou un de ses segments).
+
+    Args:
+        company_context: Contexte de l'entreprise transmis au Cartographe
+        research_text: Texte de recherche à structurer
+        citations: Citations de la recherche (pipeline avancé)
+        segment: Position du segment ("2/5"), None pour le texte entier
+
+    Returns:
+        Entrée prête à être envoyée à Runner.run
+    """
+    payload = {"company_context": company_context}
+    if segment:
+        payload["segment"] = segment
+    payload["research_segment"] = research_text
+    if citations:
+        payload["citations"] = citations
+    return build_agent_input(payload, CHUNK_STATIC_HEADER)
+
+
+def segment_research_text(text: str, max_chars: int = CARTOGRAPHE_CHUNK_MAX_CHARS) -> List[str]:
+    """
+    Découpe un texte de recherche en segments par entité ou section.
+
+    Chaque segment reprend l'en-tête de la section en cours pour que les entités
+    gardent leur classification (filiale juridique, bureau, distributeur...).
+
+    Args:
+        text: Texte brut de recherche
+        max_chars: Taille maximale indicative d'un segment
+
+    Returns:
+        Liste de segments (un seul si le texte tient dans max_chars)
+    """
+    if not text or len(text) <= max_chars:
+        return [text] if text else []
+
+    # 1. Blocs : (en-tête de section courant, lignes du bloc)
+    blocks: List[Tuple[str, List[str]]] = []
+    section = ""
+    current: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        is_section = bool(_SECTION_RE.match(stripped)) and not _ITEM_RE.match(stripped)
+        is_item = bool(_ITEM_RE.match(stripped)) and not line.startswith((" ", "\t"))
+        if (is_section or is_item) and current:
+            blocks.append((section, current))
+            current = []
+        if is_section:
+            section = stripped
+        current.append(line)
+    if current:
+        blocks.append((section, current))
+
+    # 2. Regroupement glouton des blocs sous max_chars
+    segments: List[str] = []
+    buffer: List[str] = []
+    buffer_len = 0
+    for block_section, lines in blocks:
+        block = "\n".join(lines).strip("\n")
+        if not block.strip():
+            continue
+        if buffer and buffer_len + len(block) > max_chars:
+            segments.append("\n".join(buffer))
+            buffer, buffer_len = [], 0
+        if not buffer and block_section and not block.lstrip().startswith(block_section):
+            buffer.append(block_section)
+            buffer_len += len(block_section)
+        buffer.append(block)
+        buffer_len += len(block) + 1
+    if buffer:
+        segments.append("\n".join(buffer))
+
+    logger.info(f"✂️ Recherche découpée en {len(segments)} segments ({len(text)} caractères, max {max_chars})")
+    return segments
+
+
+def _name_key(value: Optional[str]) -> str:
+    return " ".join((value or "").casefold().split())
+
+
+def _country(entity: Dict[str, Any], location_key: str) -> str:
+    return _name_key(((entity.get(location_key) or {}).get("country")))
+
+
+def _merge_entities(
+    entities: List[Dict[str, Any]],
+    key,
+    max_sources: int,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Fusionne les doublons (sources cumulées, confiance max) et borne la liste par confiance."""
+    merged: Dict[Any, Dict[str, Any]] = {}
+    order: List[Any] = []
+    for entity in entities:
+        if not isinstance(entity, dict):
+            continue
+        marker = key(entity)
+        existing = merged.get(marker)
+        if existing is None:
+            merged[marker] = dict(entity)
+            order.append(marker)
+            continue
+        base, other = existing, entity
+        if (entity.get("confidence") or 0.0) > (existing.get("confidence") or 0.0):
+            base, other = dict(entity), existing
+        for field, value in other.items():
+            if base.get(field) in (None, "", []) and value not in (None, "", []):
+                base[field] = value
+        base["sources"] = dedupe_sources(
+            (base.get("sources") or []) + (other.get("sources") or []), max_sources
+        )
+        merged[marker] = base
+
+    results = [merged[m] for m in order]
+    if len(results) > limit:
+        # Conserver les entités les plus fiables, dans l'ordre du texte
+        kept = sorted(range(len(results)), key=lambda i: (-(results[i].get("confidence") or 0.0), i))[:limit]
+        results = [results[i] for i in sorted(kept)]
+    return results
+
+
+def _unique(values: List[Any], limit: int) -> List[Any]:
+    seen = set()
+    unique = []
+    for value in values:
+        if value in seen:
+            continue
+        seen.add(value)
+        unique.append(value)
+        if len(unique) >= limit:
+            break
+    return unique
+
+
+def reduce_subsidiary_reports(company_name: str, reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fusionne de manière déterministe les SubsidiaryReport produits segment par segment.
+
+    Args:
+        company_name: Nom de l'entreprise analysée
+        reports: Rapports partiels (dicts), dans l'ordre des segments
+
+    Returns:
+        SubsidiaryReport fusionné (dict)
+    """
+    reports = [r for r in reports if isinstance(r, dict)]
+    subsidiaries = _merge_entities(
+        [s for r in reports for s in r.get("subsidiaries") or []],
+        key=lambda s: _name_key(s.get("legal_name")),
+        max_sources=10,
+        limit=MAX_SUBSIDIARIES,
+    )
+    commercial_presence = _merge_entities(
+        [p for r in reports for p in r.get("commercial_presence") or []],
+        key=lambda p: (_name_key(p.get("name")), _country(p, "location")),
+        max_sources=5,
+        limit=MAX_COMMERCIAL_PRESENCE,
+    )
+    parents = _merge_entities(
+        [p for r in reports for p in r.get("parents") or []],
+        key=lambda p: _name_key(p.get("legal_name")),
+        max_sources=7,
+        limit=MAX_PARENTS,
+    )
+
+    summaries = [r.get("extraction_summary") or {} for r in reports]
+    presence_by_type = {"office": 0, "partner": 0, "distributor": 0, "representative": 0}
+    for presence in commercial_presence:
+        if presence.get("type") in presence_by_type:
+            presence_by_type[presence["type"]] += 1
+
+    countries = [
+        ((s.get("headquarters") or {}).get("country")) for s in subsidiaries
+    ] + [((p.get("location") or {}).get("country")) for p in commercial_presence]
+
+    merged = {
+        "company_name": next((r["company_name"] for r in reports if r.get("company_name")), company_name),
+        "parent_website": next((r["parent_website"] for r in reports if r.get("parent_website")), None),
+        "parents": parents,
+        "subsidiaries": subsidiaries,
+        "commercial_presence": commercial_presence,
+        "methodology_notes": _unique(
+            [n for r in reports for n in r.get("methodology_notes") or []], MAX_METHODOLOGY_NOTES
+        ) or None,
+        "extraction_summary": {
+            "total_found": len(subsidiaries),
+            "total_commercial_presence": len(commercial_presence),
+            "presence_by_type": presence_by_type,
+            "countries_covered": _unique([c for c in countries if c], 50) or None,
+            "main_company_info": next(
+                (s["main_company_info"] for s in summaries if s.get("main_company_info")), None
+            ),
+            "methodology_used": _unique(
+                [m for s in summaries for m in s.get("methodology_used") or []], 5
+            ) or None,
+        },
+    }
+
+    try:
+        return SubsidiaryReport.model_validate(merged).model_dump()
+    except Exception as e:
+        logger.warning(f"⚠️ Rapport fusionné non conforme au schéma SubsidiaryReport: {e}")
+        return merged
+
+
+async def _structure_segment(
+    agent: Agent,
+    company_context: Dict[str, Any],
+    segment: str,
+    index: int,
+    total: int,
+    citations: Optional[List[Any]],
+) -> Tuple[Optional[Dict[str, Any]], Optional[Usage]]:
+    """Structure un segment de recherche (None en cas d'échec du segment)."""
+    agent_input = structuring_input(company_context, segment, citations, f"{index + 1}/{total}")
+    try:
+        async with llm_rate_limiter:
+            with start_span("agent.run", agent=agent.name, segment=index + 1, segments=total):
+                result = await Runner.run(agent, agent_input, max_turns=2)
+    except Exception as e:
+        logger.warning(f"⚠️ Échec de structuration du segment {index + 1}/{total}: {e}")
+        return None, None
+
+    output = result.final_output
+    if hasattr(output, "model_dump"):
+        output = output.model_dump()
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    return (output if isinstance(output, dict) else None), usage
+
+
+async def run_chunked_structuring(
+    agent: Agent,
+    company_context: Dict[str, Any],
+    research_text: str,
+    citations: Optional[List[Any]] = None,
+    max_chars: int = CARTOGRAPHE_CHUNK_MAX_CHARS,
+) -> Optional[ChunkedRunResult]:
+    """
+    Structure un texte de recherche en parallèle, segment par segment.
+
+    Args:
+        agent: Cartographe sélectionné (modèle routé inclus)
+        company_context: Contexte de l'entreprise transmis au Cartographe
+        research_text: Texte brut de recherche déjà obtenu
+        citations: Citations de la recherche (pipeline avancé)
+        max_chars: Taille maximale d'un segment
+
+    Returns:
+        ChunkedRunResult, ou None si aucun segment n'a pu être structuré
+    """
+    segments = segment_research_text(research_text, max_chars)
+    if not segments:
+        return None
+
+    structurer = structuring_agent(agent)
+    usage = Usage()
+    reports: List[Optional[Dict[str, Any]]] = [None] * len(segments)
+    pending = list(range(len(segments)))
+    # Première passe, puis une seule relance des segments en échec
+    for attempt in range(2):
+        if attempt and pending:
+            logger.warning(f"🔁 Relance de {len(pending)}/{len(segments)} segment(s) en échec")
+        outputs = await asyncio.gather(*[
+            _structure_segment(structurer, company_context, segments[i], i, len(segments), citations)
+            for i in pending
+        ])
+        for i, (report, segment_usage) in zip(pending, outputs):
+            if segment_usage is not None:
+                usage.add(segment_usage)
+            reports[i] = report
+        pending = [i for i in pending if reports[i] is None]
+        if not pending:
+            break
+
+    structured = [report for report in reports if report is not None]
+    if not structured:
+        logger.error(f"❌ Aucun des {len(segments)} segments n'a pu être structuré")
+        return None
+
+    company_name = company_context.get("company_name", "")
+    final_output = structured[0] if len(segments) == 1 else reduce_subsidiary_reports(company_name, structured)
+    if pending:
+        logger.warning(
+            f"⚠️ Structuration partielle pour {company_name}: {len(pending)}/{len(segments)} segment(s) "
+            f"perdu(s), leurs entités manquent au rapport"
+        )
+        notes = list(final_output.get("methodology_notes") or [])[:MAX_METHODOLOGY_NOTES - 1]
+        notes.append(
+            f"Structuration partielle : {len(pending)}/{len(segments)} segment(s) de recherche non structuré(s), "
+            f"entités correspondantes absentes"
+        )
+        final_output["methodology_notes"] = notes
+    logger.info(
+        f"🧩 Structuration par segments terminée pour {company_name}: "
+        f"{len(structured)}/{len(segments)} segments, {len(final_output.get('subsidiaries') or [])} filiales"
+    )
+    return ChunkedRunResult(
+        final_output=final_output,
+        context_wrapper=SimpleNamespace(usage=usage),
+        segments_count=len(segments),
+        failed_segments=len(pending),
+    )
@@ -11,7 +11,7 @@ import logging
 from typing import List, Optional, Literal
 from pydantic import BaseModel, Field, ConfigDict
 from company_agents.models import SourceRef
-from company_agents.config.agent_config import load_guardrails
+from company_agents.config.agent_config import load_guardrails, get_default_model
 from company_agents.subs_tools.web_search_identify import get_web_search_identify_tool
 
 
@@ -142,7 +142,7 @@ Tu es « 🔍 Éclaireur ». Ta mission PRINCIPALE est d'identifier la société
 """,
     tools=[web_search_identify_tool],
     output_type=company_linkage_schema,
-    model="gpt-4.1-mini",
+    model=get_default_model("company_analyzer"),
 )
 
 # Guardrails dynamiques
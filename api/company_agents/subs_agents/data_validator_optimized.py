@@ -2,6 +2,7 @@
 from agents import Agent
 from agents.agent_output import AgentOutputSchema
 from company_agents.models import CompanyInfo
+from company_agents.config.agent_config import get_default_model
 import logging
 
 logger = logging.getLogger(__name__)
@@ -282,7 +283,7 @@ data_restructurer_optimized = Agent(
     instructions=DATA_RESTRUCTURER_PROMPT_OPTIMIZED,
     tools=[],
     output_type=get_company_info_schema(),
-    model="gpt-4o",
+    model=get_default_model("data_restructurer"),
 )
 
 
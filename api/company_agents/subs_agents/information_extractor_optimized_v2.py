@@ -3,6 +3,7 @@ from agents import Agent
 from agents.agent_output import AgentOutputSchema
 import logging
 from company_agents.models import CompanyCard
+from company_agents.config.agent_config import get_default_model
 from company_agents.subs_tools.web_search_quantify import get_web_search_quantify_tool
 
 
@@ -210,5 +211,5 @@ information_extractor = Agent(
     instructions=INFORMATION_EXTRACTOR_PROMPT,
     tools=[web_search_quantify_tool],
     output_type=company_card_schema,
-    model="gpt-4.1-mini",
+    model=get_default_model("information_extractor"),
 )
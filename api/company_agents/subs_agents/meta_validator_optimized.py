@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field, ConfigDict
 from agents import Agent
 from agents.agent_output import AgentOutputSchema
 from company_agents.models import SourceRef
+from company_agents.config.agent_config import get_default_model
 import logging
 
 logger = logging.getLogger(__name__)
@@ -267,5 +268,5 @@ meta_validator_optimized = Agent(
     instructions=META_PROMPT_OPTIMIZED,
     output_type=meta_schema,
     tools=[],
-    model="gpt-4o",
+    model=get_default_model("meta_validator"),
 )
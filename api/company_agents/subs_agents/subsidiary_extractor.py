@@ -10,20 +10,28 @@ Agent Cartographe : Structure le texte brut en JSON
 """
 
 import os
-import json
 import re
 import time
 import logging
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool
 from agents.model_settings import ModelSettings
 from agents.agent_output import AgentOutputSchema
+from core.serialization import dumps
+from core.tracing import start_span, traced
 from company_agents.models import SubsidiaryReport
+from company_agents.config.agent_config import get_default_model
+from company_agents.config.extraction_config import CARTOGRAPHE_CHUNK_MIN_CHARS, ENABLE_CARTOGRAPHE_CHUNKING
+from company_agents.prompt_assembly import build_agent_input, get_cached_input_tokens
+from company_agents.streaming import run_agent_streamed
 from company_agents.metrics import metrics_collector, MetricStatus, RealTimeTracker
+from company_agents.metrics.prometheus_exporter import observe_tool_call
 from .perplexity_prompt_w_subs import PERPLEXITY_RESEARCH_SUBS_PROMPT
 from .perplexity_prompt_wo_subs import PERPLEXITY_RESEARCH_WO_SUBS_PROMPT
-from ..subs_tools.filiales_search_agent_optimized import subsidiary_search
+from ..subs_tools.filiales_search_agent_optimized import subsidiary_search, search_subsidiaries_text
+from .cartographe_chunked import run_chunked_structuring, structuring_agent, structuring_input
+from ..processors.json_repair import parse_tolerant
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
@@ -75,35 +83,20 @@ def get_perplexity_client():
 #   FONCTION OUTIL : Recherche Perplexity
 # ==========================================
 
-@function_tool
-async def research_subsidiaries_with_perplexity(
+@traced("tool.perplexity_research")
+async def perplexity_research(
     company_name: str,
     sector: Optional[str] = None,
     activities: Optional[List[str]] = None,
     website: Optional[str] = None,
     context: Optional[str] = None,
-    has_filiales_only: Optional[bool] = None,  # ← NOUVEAU : has_filiales_only direct du Mineur
-    enterprise_type: Optional[str] = None  # ← NOUVEAU : enterprise_type direct du Mineur
+    has_filiales_only: Optional[bool] = None,
+    enterprise_type: Optional[str] = None
 ) -> Dict:
     """
-    Effectue une recherche Perplexity adaptée selon le type de présence internationale.
+    Recherche Perplexity appelable hors agent (structuration par segments du Cartographe).
 
-    Args:
-        company_name: Nom de l'entreprise à rechercher
-        sector: Secteur d'activité principal (optionnel)
-        activities: Liste des activités (optionnel)
-        website: Site web officiel (optionnel)
-        context: Contexte enrichi du Mineur (optionnel)
-        has_filiales_only: True si uniquement filiales juridiques, False si mélange ou bureaux uniquement (optionnel)
-        enterprise_type: Type d'entreprise déterminé par le Mineur (optionnel)
-    
-    Returns:
-        dict avec:
-          - research_text: Texte brut de recherche
-          - citations: URLs sources trouvées
-          - status: "success" ou "error"
-          - duration_ms: Temps d'exécution
-          - error: Message d'erreur si applicable
+    Mêmes paramètres et même retour que le tool research_subsidiaries_with_perplexity.
     """
     start_time = time.time()
     logger.info(f"🔍 Recherche Perplexity pour: {company_name}")
@@ -189,14 +182,14 @@ async def research_subsidiaries_with_perplexity(
             # Envoyer au ToolTokensTracker
             try:
                 from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
-                # Utiliser un session_id par défaut si pas fourni
-                session_id = getattr(research_subsidiaries_with_perplexity, '_session_id', 'default-session')
+                # Session résolue depuis le contexte de l'extraction en cours
                 ToolTokensTracker.add_tool_usage(
-                    session_id=session_id,
+                    session_id=None,
                     tool_name='research_subsidiaries_with_perplexity',
                     model='sonar-pro',
                     input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens
+                    output_tokens=response.usage.completion_tokens,
+                    cached_input_tokens=get_cached_input_tokens(response.usage)
                 )
                 logger.info("🔧 Tokens envoyés au tracker pour research_subsidiaries_with_perplexity")
             except ImportError:
@@ -279,6 +272,47 @@ async def research_subsidiaries_with_perplexity(
         }
 
 
+@function_tool
+async def research_subsidiaries_with_perplexity(
+    company_name: str,
+    sector: Optional[str] = None,
+    activities: Optional[List[str]] = None,
+    website: Optional[str] = None,
+    context: Optional[str] = None,
+    has_filiales_only: Optional[bool] = None,  # ← NOUVEAU : has_filiales_only direct du Mineur
+    enterprise_type: Optional[str] = None  # ← NOUVEAU : enterprise_type direct du Mineur
+) -> Dict:
+    """
+    Effectue une recherche Perplexity adaptée selon le type de présence internationale.
+
+    Args:
+        company_name: Nom de l'entreprise à rechercher
+        sector: Secteur d'activité principal (optionnel)
+        activities: Liste des activités (optionnel)
+        website: Site web officiel (optionnel)
+        context: Contexte enrichi du Mineur (optionnel)
+        has_filiales_only: True si uniquement filiales juridiques, False si mélange ou bureaux uniquement (optionnel)
+        enterprise_type: Type d'entreprise déterminé par le Mineur (optionnel)
+    
+    Returns:
+        dict avec:
+          - research_text: Texte brut de recherche
+          - citations: URLs sources trouvées
+          - status: "success" ou "error"
+          - duration_ms: Temps d'exécution
+          - error: Message d'erreur si applicable
+    """
+    return await perplexity_research(
+        company_name,
+        sector=sector,
+        activities=activities,
+        website=website,
+        context=context,
+        has_filiales_only=has_filiales_only,
+        enterprise_type=enterprise_type,
+    )
+
+
 # ==========================================
 #   AGENTS CARTOGRAPHES (STRUCTURATION)
 #   → PREND TEXTE BRUT, RETOURNE JSON
@@ -687,12 +721,28 @@ def get_gpt4_llm():
         if not client:
             return None
         gpt4_llm = OpenAIChatCompletionsModel(
-            model="gpt-4o",
+            model=get_default_model("subsidiary_extractor"),
             openai_client=client,
         )
     return gpt4_llm
 
 
+# Modèles routés (un par nom de modèle, réutilisés entre les runs)
+_routed_llms: Dict[str, OpenAIChatCompletionsModel] = {}
+
+def get_routed_llm(model_name: str):
+    """Retourne le modèle Chat Completions correspondant au nom choisi par le routage."""
+    if model_name not in _routed_llms:
+        client = get_openai_client()
+        if not client:
+            return None
+        _routed_llms[model_name] = OpenAIChatCompletionsModel(
+            model=model_name,
+            openai_client=client,
+        )
+    return _routed_llms[model_name]
+
+
 # Schéma de sortie - selon la doc OpenAI Agents SDK
 subsidiary_report_schema = AgentOutputSchema(SubsidiaryReport, strict_json_schema=True)
 
@@ -733,13 +783,13 @@ def get_cartographe_advanced():
         llm = get_gpt4_llm()
         if not llm:
             return None
-    cartographe_advanced = Agent(
-        name="🗺️ Cartographe",
-        instructions=CARTOGRAPHE_ADVANCED_PROMPT,
-        tools=[research_subsidiaries_with_perplexity],  # Outil de recherche avancé
-        output_type=subsidiary_report_schema,
-                model=llm,
-            )
+        cartographe_advanced = Agent(
+            name="🗺️ Cartographe",
+            instructions=CARTOGRAPHE_ADVANCED_PROMPT,
+            tools=[research_subsidiaries_with_perplexity],  # Outil de recherche avancé
+            output_type=subsidiary_report_schema,
+            model=llm,
+        )
     return cartographe_advanced
 
 
@@ -761,10 +811,55 @@ subsidiary_extractor = get_subsidiary_extractor
 #   WRAPPER AVEC MÉTRIQUES DE PERFORMANCE
 # ==========================================
 
+async def run_subsidiary_research(
+    company_context: Dict[str, Any],
+    deep_search: bool
+) -> Optional[Tuple[str, Optional[List[Any]]]]:
+    """
+    Exécute la recherche du Cartographe hors agent (structuration par segments,
+    recherche spéculative de l'orchestrateur).
+
+    Returns:
+        Tuple (texte de recherche, citations), ou None si la recherche a échoué
+    """
+    research_kwargs = {
+        "sector": company_context.get("sector"),
+        "activities": company_context.get("activities"),
+        "website": company_context.get("website"),
+        "has_filiales_only": company_context.get("has_filiales_only"),
+    }
+    company_name = company_context.get("company_name", "")
+
+    started = time.perf_counter()
+    if deep_search:
+        research = await perplexity_research(
+            company_name,
+            context=company_context.get("context"),
+            enterprise_type=company_context.get("enterprise_type"),
+            **research_kwargs
+        )
+        ok = research.get("status") == "success"
+        observe_tool_call("perplexity_research", time.perf_counter() - started, "completed" if ok else "error")
+        if not ok:
+            logger.warning(f"⚠️ Recherche Perplexity en erreur pour {company_name}: {research.get('error')}")
+            return None
+        return research["research_text"], research.get("citations")
+
+    research_text = await search_subsidiaries_text(company_name, **research_kwargs)
+    ok = bool(research_text) and not research_text.startswith(("Erreur", "=== ERREUR"))
+    observe_tool_call("search_subsidiaries_text", time.perf_counter() - started, "completed" if ok else "error")
+    if not ok:
+        logger.warning(f"⚠️ Recherche filiales en erreur pour {company_name}")
+        return None
+    return research_text, None
+
+
 async def run_cartographe_with_metrics(
     company_context: Any,
     session_id: str = None,
-    deep_search: bool = False
+    deep_search: bool = False,
+    model_name: Optional[str] = None,
+    research: Optional[Tuple[str, Optional[List[Any]]]] = None
 ) -> Dict[str, Any]:
     """
     Exécute l'agent Cartographe avec métriques de performance en temps réel.
@@ -773,6 +868,8 @@ async def run_cartographe_with_metrics(
         company_context: Contexte de l'entreprise (dict avec company_name, sector, activities) ou string
         session_id: ID de session pour le suivi temps réel
         deep_search: Si True, utilise le pipeline avancé (Perplexity). Si False, utilise le pipeline simple (gpt-4o-search)
+        model_name: Modèle choisi par le routage (None = modèle par défaut du Cartographe)
+        research: Recherche déjà effectuée (texte, citations), ex: recherche spéculative
 
     Returns:
         Dict contenant les résultats et métriques de performance
@@ -796,10 +893,17 @@ async def run_cartographe_with_metrics(
 
     logger.info(f"🎯 Sélection pipeline: {pipeline_name}")
 
+    # Appliquer le modèle choisi par le routage sur une copie de l'agent
+    if model_name and model_name != get_default_model("subsidiary_extractor"):
+        routed_llm = get_routed_llm(model_name)
+        if routed_llm is not None:
+            selected_agent = selected_agent.clone(model=routed_llm)
+            logger.info(f"🧭 Modèle routé pour le Cartographe: {model_name}")
+
     # Gérer à la fois dict et string pour rétrocompatibilité
     if isinstance(company_context, dict):
         company_name = company_context.get("company_name", str(company_context))
-        input_data = json.dumps(company_context, ensure_ascii=False)
+        input_data = build_agent_input(company_context)
     else:
         company_name = str(company_context)
         input_data = company_name
@@ -832,13 +936,53 @@ async def run_cartographe_with_metrics(
         research_step = agent_metrics.add_step(research_name)
         research_step.status = MetricStatus.TOOL_CALLING
 
+        # Recherche puis structuration par segments en parallèle (textes volumineux)
+        result = None
+        structuring = None
+        if isinstance(company_context, dict) and (ENABLE_CARTOGRAPHE_CHUNKING or research is not None):
+            prefetched = research is not None
+            if research is None:
+                research = await run_subsidiary_research(company_context, deep_search)
+            if research is not None:
+                research_text, citations = research
+                if len(research_text) >= CARTOGRAPHE_CHUNK_MIN_CHARS:
+                    result = await run_chunked_structuring(
+                        selected_agent, company_context, research_text, citations
+                    )
+                if result is not None:
+                    structuring = {
+                        "segments_count": result.segments_count,
+                        "failed_segments": result.failed_segments,
+                    }
+                research_step.finish(MetricStatus.COMPLETED, {
+                    "research_chars": len(research_text),
+                    "segments_count": result.segments_count if result is not None else 1,
+                    "failed_segments": result.failed_segments if result is not None else 0,
+                    "prefetched": prefetched
+                })
+                research_step = agent_metrics.add_step(
+                    "Structuration par segments" if result is not None else "Structuration de la recherche"
+                )
+                if result is None:
+                    # Recherche déjà payée : structurée en un seul run, sans nouvel appel d'outil
+                    selected_agent = structuring_agent(selected_agent)
+                    input_data = structuring_input(company_context, research_text, citations)
+            else:
+                logger.warning(f"⚠️ Recherche hors agent indisponible pour {company_name}, exécution standard")
+
         # Exécution de l'agent avec suivi des étapes
-        from agents import Runner
-        result = await Runner.run(
-            selected_agent,  # ← Utiliser l'agent sélectionné selon deep_search
-            input_data,
-            max_turns=3
-        )
+        if result is None:
+            with start_span("agent.run", agent=agent_name, deep_search=deep_search, max_turns=3):
+                # Filiales diffusées et URLs sondées pendant la génération
+                result = await run_agent_streamed(
+                    selected_agent,  # ← Utiliser l'agent sélectionné selon deep_search
+                    input_data,
+                    max_turns=3,
+                    agent_name=agent_name,
+                    session_id=session_id,
+                    item_keys=("subsidiaries", "commercial_presence"),
+                    status_manager=status_manager,
+                )
 
         # Capturer les tokens utilisés si disponibles (selon la doc OpenAI)
         if hasattr(result, 'context_wrapper') and hasattr(result.context_wrapper, 'usage'):
@@ -877,6 +1021,7 @@ async def run_cartographe_with_metrics(
                         "model": model_name,
                         "input_tokens": usage.input_tokens,
                         "output_tokens": usage.output_tokens,
+                        "cached_input_tokens": get_cached_input_tokens(usage),
                         "total_tokens": getattr(usage, 'total_tokens', usage.input_tokens + usage.output_tokens)
                     }
                 else:
@@ -885,6 +1030,7 @@ async def run_cartographe_with_metrics(
                         "model": model_name,
                         "input_tokens": 0,
                         "output_tokens": 0,
+                        "cached_input_tokens": 0,
                         "total_tokens": 0
                     }
 
@@ -932,7 +1078,7 @@ async def run_cartographe_with_metrics(
                 logger.info(f"✅ Données déjà en format dictionnaire pour {company_name}")
                 
                 # Validation de taille pour éviter les JSON trop volumineux
-                json_str = json.dumps(output_data, ensure_ascii=False)
+                json_str = dumps(output_data)
                 if len(json_str) > 10000:  # Limite à 10KB
                     logger.warning(f"⚠️ JSON trop volumineux ({len(json_str)} caractères) pour {company_name}, limitation appliquée")
                     # Limiter le nombre de filiales
@@ -941,19 +1087,28 @@ async def run_cartographe_with_metrics(
                         output_data['methodology_notes'] = (output_data.get('methodology_notes', []) or [])[:5]
                         logger.info(f"✅ Limitation appliquée: 10 filiales max pour {company_name}")
             elif isinstance(output_data, str):
-                # Cas 3: Chaîne JSON à parser
-                try:
-                    output_data = json.loads(output_data)
+                # Cas 3: Chaîne JSON à parser (réparée si tronquée ou mal échappée)
+                parsed = parse_tolerant(output_data)
+                if isinstance(parsed.value, dict):
+                    if not parsed.complete:
+                        # Sortie tronquée : les filiales complètes sont conservées (5 notes max, comme Cas 2)
+                        logger.warning(f"⚠️ JSON tronqué pour {company_name}: résultat partiel conservé")
+                        notes = parsed.value.get("methodology_notes")
+                        parsed.value["methodology_notes"] = [
+                            *(notes if isinstance(notes, list) else [])[:4],
+                            f"Sortie tronquée : résultat partiel ({len(parsed.value.get('subsidiaries') or [])} filiales récupérées)",
+                        ]
+                    output_data = parsed.value
                     logger.info(f"✅ JSON parsé en dictionnaire pour {company_name}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"❌ Erreur JSON pour {company_name}: {e}")
+                else:
+                    logger.error(f"❌ Erreur JSON pour {company_name}: aucun objet JSON exploitable")
                     logger.error(f"📝 Contenu reçu: {output_data[:500]}...")
                     # 🔧 FALLBACK : Créer un objet vide en cas d'échec JSON
                     output_data = {
                         "company_name": company_name,
                         "subsidiaries": [],
                         "commercial_presence": [],
-                        "methodology_notes": [f"Erreur de parsing JSON: {str(e)}"]
+                        "methodology_notes": ["Erreur de parsing JSON: aucun objet JSON exploitable"]
                     }
                     logger.warning(f"⚠️ Fallback appliqué pour {company_name}")
             else:
@@ -1040,6 +1195,7 @@ async def run_cartographe_with_metrics(
                     "subsidiaries_count": subsidiaries_count,
                     "has_errors": has_errors,
                     "methodology_notes": methodology_notes or [],
+                    "structuring": structuring,
                     "metrics": agent_metrics.to_dict()
                 }
             else:
@@ -17,6 +17,8 @@ import logging
 import os
 from typing import Optional, List
 
+from core.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 # Client OpenAI (initialisation paresseuse)
@@ -282,8 +284,8 @@ CONFIANCE GLOBALE: 0.90
 #   FONCTION OUTIL : Recherche Filiales
 # ==========================================
 
-@function_tool
-async def subsidiary_search(
+@traced("tool.search_subsidiaries_text")
+async def search_subsidiaries_text(
     company_name: str,
     sector: Optional[str] = None,
     activities: Optional[List[str]] = None,
@@ -291,22 +293,9 @@ async def subsidiary_search(
     has_filiales_only: Optional[bool] = None
 ) -> str:
     """
-    Effectue une recherche exhaustive de filiales et implantations géographiques.
-
-    Utilise gpt-4o-search-preview avec capacités de recherche intégrées pour identifier :
-    - Filiales juridiques (entités avec personnalité juridique propre)
-    - Bureaux commerciaux et centres R&D
-    - Partenaires et distributeurs
+    Recherche de filiales appelable hors agent (structuration par segments du Cartographe).
 
-    Args:
-        company_name: Nom de l'entreprise à rechercher
-        sector: Secteur d'activité (optionnel)
-        activities: Liste des activités (optionnel)
-        website: Site web officiel (optionnel)
-        has_filiales_only: True si uniquement filiales juridiques attendues (optionnel)
-
-    Returns:
-        Texte structuré avec filiales, bureaux, partenaires et sources vérifiées
+    Mêmes paramètres et même retour que le tool subsidiary_search.
     """
     logger.info(f"🔍 Recherche filiales avec gpt-4o-search-preview: {company_name}")
 
@@ -368,6 +357,7 @@ async def subsidiary_search(
             # Envoyer au ToolTokensTracker
             try:
                 from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
+                from company_agents.prompt_assembly import get_cached_input_tokens
                 from company_agents.context import get_session_context
 
                 # Récupérer le session_id depuis le contexte
@@ -377,7 +367,8 @@ async def subsidiary_search(
                     tool_name='filiales_search',
                     model='gpt-4o-search-preview',
                     input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens
+                    output_tokens=response.usage.completion_tokens,
+                    cached_input_tokens=get_cached_input_tokens(response.usage)
                 )
                 logger.info(f"🔧 Tokens envoyés au tracker pour filiales_search (session: {session_id})")
             except ImportError:
@@ -395,6 +386,41 @@ async def subsidiary_search(
         return f"=== ERREUR DE RECHERCHE FILIALES ===\n\nImpossible d'effectuer la recherche: {str(e)}"
 
 
+@function_tool
+async def subsidiary_search(
+    company_name: str,
+    sector: Optional[str] = None,
+    activities: Optional[List[str]] = None,
+    website: Optional[str] = None,
+    has_filiales_only: Optional[bool] = None
+) -> str:
+    """
+    Effectue une recherche exhaustive de filiales et implantations géographiques.
+
+    Utilise gpt-4o-search-preview avec capacités de recherche intégrées pour identifier :
+    - Filiales juridiques (entités avec personnalité juridique propre)
+    - Bureaux commerciaux et centres R&D
+    - Partenaires et distributeurs
+
+    Args:
+        company_name: Nom de l'entreprise à rechercher
+        sector: Secteur d'activité (optionnel)
+        activities: Liste des activités (optionnel)
+        website: Site web officiel (optionnel)
+        has_filiales_only: True si uniquement filiales juridiques attendues (optionnel)
+
+    Returns:
+        Texte structuré avec filiales, bureaux, partenaires et sources vérifiées
+    """
+    return await search_subsidiaries_text(
+        company_name,
+        sector=sector,
+        activities=activities,
+        website=website,
+        has_filiales_only=has_filiales_only,
+    )
+
+
 def get_filiales_search_tool():
     """
     Retourne le tool de recherche de filiales utilisable par le subsidiary_extractor.
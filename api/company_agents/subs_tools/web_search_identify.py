@@ -307,6 +307,7 @@ async def web_search_identify(query: str) -> str:
             # Envoyer au ToolTokensTracker
             try:
                 from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
+                from company_agents.prompt_assembly import get_cached_input_tokens
                 from company_agents.context import get_session_context
 
                 # Récupérer le session_id depuis le contexte
@@ -316,7 +317,8 @@ async def web_search_identify(query: str) -> str:
                     tool_name='web_search_identify',
                     model='gpt-4o-search-preview',
                     input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens
+                    output_tokens=response.usage.completion_tokens,
+                    cached_input_tokens=get_cached_input_tokens(response.usage)
                 )
                 logger.info(f"🔧 Tokens envoyés au tracker pour web_search_identify (session: {session_id})")
             except ImportError:
@@ -355,6 +355,7 @@ async def web_search_quantify(
             # Envoyer au ToolTokensTracker
             try:
                 from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
+                from company_agents.prompt_assembly import get_cached_input_tokens
                 from company_agents.context import get_session_context
 
                 # Récupérer le session_id depuis le contexte
@@ -364,7 +365,8 @@ async def web_search_quantify(
                     tool_name='web_search_quantify',
                     model='gpt-4o-search-preview',
                     input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens
+                    output_tokens=response.usage.completion_tokens,
+                    cached_input_tokens=get_cached_input_tokens(response.usage)
                 )
                 logger.info(f"🔧 Tokens envoyés au tracker pour web_search_quantify (session: {session_id})")
             except ImportError:
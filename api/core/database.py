@@ -2,22 +2,154 @@
 Database configuration and session management.
 """
 
-from typing import AsyncGenerator
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Dict
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Profils de pool par rôle de déploiement (surchargés champ par champ par DB_POOL_*)
+POOL_PROFILES: Dict[str, Dict[str, int]] = {
+    # API : beaucoup de requêtes courtes (auth, tableaux de bord, fins d'extraction)
+    "api": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 1800},
+    # Worker : peu d'écritures groupées, attente plus longue tolérée
+    "worker": {"pool_size": 3, "max_overflow": 2, "pool_timeout": 30, "pool_recycle": 1800},
+}
+
+
+def get_pool_config() -> Dict[str, int]:
+    """Paramètres du pool : profil DB_POOL_PROFILE puis surcharges DB_POOL_* non vides."""
+    profile = POOL_PROFILES.get(settings.DB_POOL_PROFILE, POOL_PROFILES["api"])
+    overrides = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    return {key: int(overrides[key]) if overrides[key] else value for key, value in profile.items()}
+
+
+class PoolStats:
+    """Compteurs d'attente et d'expiration des emprunts de connexions."""
+
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=window)
+
+    def observe_wait(self, wait_s: float) -> None:
+        from company_agents.metrics.prometheus_exporter import observe_db_pool_wait
+
+        self.checkouts += 1
+        self.max_wait = max(self.max_wait, wait_s)
+        self.recent_waits.append(wait_s)
+        observe_db_pool_wait(wait_s)
+
+    def record_timeout(self) -> None:
+        from company_agents.metrics.prometheus_exporter import record_db_pool_timeout
+
+        self.timeouts += 1
+        record_db_pool_timeout()
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Pool asyncio qui mesure l'attente de chaque emprunt et compte les expirations."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_stats.record_timeout()
+            logger.warning(
+                f"⚠️ Pool Postgres épuisé: aucune connexion libre après {self._timeout}s "
+                f"({self.checkedout()} empruntées, overflow {self.overflow()})"
+            )
+            raise
+        finally:
+            pool_stats.observe_wait(time.perf_counter() - started)
+
+
+def _engine_options() -> Dict[str, Any]:
+    """Options de create_async_engine selon le driver et le profil de pool."""
+    if "sqlite" in settings.DATABASE_URL:
+        return {"poolclass": NullPool}
+
+    options: Dict[str, Any] = {"poolclass": InstrumentedAsyncQueuePool, **get_pool_config()}
+    if "asyncpg" in settings.DATABASE_URL:
+        options["connect_args"] = {
+            # Cache de SQLAlchemy (par connexion) et cache natif d'asyncpg
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
     future=True,
     pool_pre_ping=True,
-    poolclass=NullPool if "sqlite" in settings.DATABASE_URL else None,
+    **_engine_options(),
 )
 
+
+def _publish_pool_usage(*_args: Any) -> None:
+    from company_agents.metrics.prometheus_exporter import set_db_pool_usage
+
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "checkedout"):
+        set_db_pool_usage(pool.checkedout(), pool.overflow())
+
+
+event.listen(engine.sync_engine.pool, "checkout", _publish_pool_usage)
+event.listen(engine.sync_engine.pool, "checkin", _publish_pool_usage)
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """
+    État du pool de connexions pour le health check.
+
+    Returns:
+        Profil, occupation courante, emprunts, attentes (ms) et expirations
+    """
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+
+    waits = sorted(w * 1000 for w in pool_stats.recent_waits)
+    p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+    config = get_pool_config()
+    checked_out = pool.checkedout()
+    capacity = config["pool_size"] + config["max_overflow"]
+    return {
+        "pool": type(pool).__name__,
+        "profile": settings.DB_POOL_PROFILE,
+        **config,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "utilization": round(checked_out / capacity, 3) if capacity else None,
+        "checkouts": pool_stats.checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_p95_ms": round(p95, 2),
+        "wait_max_ms": round(pool_stats.max_wait * 1000, 2),
+    }
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
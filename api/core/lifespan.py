@@ -3,12 +3,16 @@ Gestionnaire de cycle de vie de l'application
 """
 
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from functions import setup_logging, get_version, check_openai_agents_availability
 from core.config import settings
 from core.database import init_db, close_db
+from core.tracing import shutdown_tracing
+from core.loop_monitor import loop_monitor
+from core.offload import shutdown_executors
 
 
 @asynccontextmanager
@@ -31,6 +35,10 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("✅ OPENAI_API_KEY configurée")
 
+    # Surveillance de la latence de la boucle d'événements
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
     # Initialiser la base de données
     try:
         logger.info("🗄️  Initialisation de la base de données...")
@@ -39,6 +47,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Erreur lors de l'initialisation de la base de données: {e}")
 
+    # Prédicteur de coûts (réentraîné périodiquement sur l'historique des extractions)
+    from core.database import AsyncSessionLocal
+    from services.cost_predictor import cost_predictor
+    predictor_task = asyncio.create_task(cost_predictor.run_refresh_loop(AsyncSessionLocal))
+
+    # Écriture groupée des fins d'extraction (tampon Redis)
+    from services.completion_writer import completion_writer
+    completion_writer.start()
+
     # Vérifier la configuration HubSpot OAuth
     if settings.HUBSPOT_CLIENT_ID and settings.HUBSPOT_CLIENT_SECRET:
         logger.info("✅ HubSpot OAuth configuré")
@@ -50,6 +67,15 @@ async def lifespan(app: FastAPI):
     # Arrêt
     logger.info("🛑 Arrêt de l'API Company Information Extraction")
 
+    predictor_task.cancel()
+    try:
+        await predictor_task
+    except asyncio.CancelledError:
+        pass
+
+    # Vider le tampon des fins d'extraction avant de fermer la base
+    await completion_writer.stop()
+
     # Fermer les connexions à la base de données
     try:
         logger.info("🗄️  Fermeture des connexions à la base de données...")
@@ -57,3 +83,7 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Connexions fermées")
     except Exception as e:
         logger.error(f"❌ Erreur lors de la fermeture de la base de données: {e}")
+
+    await loop_monitor.stop()
+    shutdown_executors()
+    shutdown_tracing()
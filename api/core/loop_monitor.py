@@ -0,0 +1,195 @@
+"""
+Surveillance de la boucle d'événements : latence et callbacks bloquants.
+
+Deux mécanismes complémentaires, démarrés par le lifespan :
+
+- une tâche asyncio se réveille toutes les LOOP_MONITOR_INTERVAL_MS et mesure
+  son retard de réveil (latence de boucle) ;
+- un thread de garde lit le battement de cette tâche : s'il ne progresse plus
+  depuis LOOP_SLOW_CALLBACK_MS, la boucle est bloquée par un callback
+  synchrone et la pile du thread de la boucle est capturée et journalisée
+  (une fois par blocage).
+
+Les statistiques sont exposées aux administrateurs par /health/loop (remise
+à zéro : POST /health/loop/reset) et, si prometheus_client est
+installé, par /metrics.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Nombre de frames conservées dans les piles journalisées
+STACK_DEPTH = 15
+# Fichiers ignorés pour localiser le site bloquant (bibliothèques, asyncio)
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", f"{sys.prefix}/lib", "asyncio")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile (0-100) par rang le plus proche, 0.0 si la liste est vide."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _blocking_site(frames: traceback.StackSummary) -> str:
+    """Frame applicative la plus profonde (sinon la plus profonde tout court)."""
+    for frame in reversed(frames):
+        if not any(marker in frame.filename for marker in _LIBRARY_MARKERS):
+            return f"{frame.filename}:{frame.lineno} {frame.name}"
+    if frames:
+        frame = frames[-1]
+        return f"{frame.filename}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    """Mesure la latence de la boucle d'événements et détecte les callbacks bloquants."""
+
+    def __init__(
+        self,
+        interval_ms: int = settings.LOOP_MONITOR_INTERVAL_MS,
+        slow_callback_ms: int = settings.LOOP_SLOW_CALLBACK_MS,
+        window: int = 3000,
+    ):
+        self.interval = interval_ms / 1000.0
+        self.threshold = slow_callback_ms / 1000.0
+        # Fenêtre glissante des retards (secondes), ~5 min à 100 ms
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.recent_stalls: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self.blocking_sites: Counter = Counter()
+        self.total_stalls = 0
+        self.max_lag = 0.0
+
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """Démarre la mesure (à appeler depuis la boucle surveillée)."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"🩺 Surveillance de la boucle active (intervalle {self.interval * 1000:.0f}ms, "
+            f"seuil {self.threshold * 1000:.0f}ms)"
+        )
+
+    async def stop(self) -> None:
+        """Arrête la tâche de mesure et le thread de garde."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _sample_loop(self) -> None:
+        from company_agents.metrics.prometheus_exporter import observe_loop_lag
+
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            observe_loop_lag(lag)
+
+    def _watch(self) -> None:
+        """Thread de garde : capture la pile de la boucle quand le battement s'arrête."""
+        reported_beat = None
+        while not self._stopping.wait(self.threshold / 2):
+            beat = self._heartbeat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._record_stall(blocked_for, traceback.extract_stack(frame)[-STACK_DEPTH:])
+
+    def _record_stall(self, blocked_for: float, frames: traceback.StackSummary) -> None:
+        from company_agents.metrics.prometheus_exporter import record_loop_stall
+
+        site = _blocking_site(frames)
+        self.total_stalls += 1
+        self.blocking_sites[site] += 1
+        self.recent_stalls.append({
+            "at": datetime.now().isoformat(),
+            "blocked_ms": round(blocked_for * 1000, 1),
+            "site": site,
+            "stack": [f"{f.filename}:{f.lineno} {f.name}" for f in frames],
+        })
+        record_loop_stall()
+        logger.warning(
+            f"🐢 Boucle d'événements bloquée depuis {blocked_for * 1000:.0f}ms par {site}\n"
+            + "".join(traceback.format_list(frames))
+        )
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        Statistiques de la boucle sur la fenêtre glissante.
+
+        Args:
+            reset: Vide la fenêtre et les compteurs après lecture
+
+        Returns:
+            Latences (p50/p99/max en ms), blocages récents et sites les plus fréquents
+        """
+        values = [lag * 1000 for lag in self.samples]
+        stats = {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "slow_callback_ms": self.threshold * 1000,
+            "samples": len(values),
+            "lag_p50_ms": round(percentile(values, 50), 2),
+            "lag_p99_ms": round(percentile(values, 99), 2),
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.total_stalls,
+            "top_blocking_sites": [
+                {"site": site, "count": count} for site, count in self.blocking_sites.most_common(10)
+            ],
+            "recent_stalls": list(self.recent_stalls),
+        }
+        if reset:
+            self.samples.clear()
+            self.recent_stalls.clear()
+            self.blocking_sites.clear()
+            self.total_stalls = 0
+            self.max_lag = 0.0
+        return stats
+
+
+# Instance globale (démarrée par le lifespan)
+loop_monitor = LoopMonitor()
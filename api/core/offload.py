@@ -0,0 +1,166 @@
+"""
+Exécution des traitements CPU (sérialisation, validation, calculs) hors de la boucle.
+
+`run_cpu` route chaque appel selon la taille estimée de sa charge utile :
+
+- en dessous de OFFLOAD_THRESHOLD_BYTES : exécution directe (le coût d'un
+  passage par un thread dépasserait le gain) ;
+- au-delà : pool de threads partagé. Le GIL reste pris, mais l'interpréteur
+  alterne toutes les 5 ms et la boucle continue de servir les autres sessions ;
+- au-delà de OFFLOAD_PROCESS_THRESHOLD_BYTES, si OFFLOAD_PROCESS_WORKERS > 0
+  et que l'appel est déclaré process_safe : pool de processus (vrai
+  parallélisme, au prix du pickling des arguments et du résultat).
+
+Les appels en thread conservent le contexte (contextvars : session, span de
+traçage) de l'appelant.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from core.config import settings
+from core.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Coût moyen estimé d'un nœud JSON (clé, ponctuation, scalaire)
+_NODE_BYTES = 16
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=settings.OFFLOAD_THREAD_WORKERS, thread_name_prefix="cpu-offload"
+        )
+    return _thread_pool
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+    global _process_pool
+    if settings.OFFLOAD_PROCESS_WORKERS <= 0:
+        return None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.OFFLOAD_PROCESS_WORKERS)
+    return _process_pool
+
+
+def shutdown_executors() -> None:
+    """Arrête les pools (à appeler à l'arrêt de l'application)."""
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def estimate_size(obj: Any, limit: Optional[int] = None) -> int:
+    """
+    Estime la taille sérialisée d'un objet sans le sérialiser.
+
+    Le parcours s'arrête dès que `limit` est dépassé : son coût est borné
+    quelle que soit la taille réelle de l'objet.
+
+    Args:
+        obj: str, bytes, dict/list imbriqués ou modèle Pydantic
+        limit: Taille au-delà de laquelle le parcours s'interrompt
+            (par défaut le plus haut seuil de routage actif)
+
+    Returns:
+        Taille approximative en octets (au plus ~limit)
+    """
+    if isinstance(obj, (str, bytes, bytearray)):
+        return len(obj)
+    if limit is None:
+        limit = (
+            settings.OFFLOAD_PROCESS_THRESHOLD_BYTES
+            if settings.OFFLOAD_PROCESS_WORKERS > 0
+            else settings.OFFLOAD_THRESHOLD_BYTES
+        )
+
+    total = 0
+    stack = [obj]
+    while stack and total <= limit:
+        item = stack.pop()
+        if isinstance(item, dict):
+            total += _NODE_BYTES
+            stack.extend(item.values())
+            total += sum(len(k) if isinstance(k, str) else _NODE_BYTES for k in item)
+        elif isinstance(item, (list, tuple, set)):
+            total += _NODE_BYTES
+            stack.extend(item)
+        elif isinstance(item, (str, bytes)):
+            total += len(item) + 2
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            # Modèles Pydantic / dataclasses : parcours des attributs
+            stack.extend(vars(item).values())
+        else:
+            total += _NODE_BYTES
+    return total
+
+
+def _select_executor(size: int, process_safe: bool) -> Optional[Executor]:
+    """Exécuteur adapté à la taille (None = exécution directe sur la boucle)."""
+    if size < settings.OFFLOAD_THRESHOLD_BYTES:
+        return None
+    if process_safe and size >= settings.OFFLOAD_PROCESS_THRESHOLD_BYTES:
+        pool = _get_process_pool()
+        if pool is not None:
+            return pool
+    return _get_thread_pool()
+
+
+async def run_cpu(
+    func: Callable[..., T],
+    *args: Any,
+    size: Optional[int] = None,
+    process_safe: bool = False,
+    **kwargs: Any,
+) -> T:
+    """
+    Exécute un traitement CPU, en ligne ou dans un pool selon la taille de la charge.
+
+    Args:
+        func: Fonction à exécuter (picklable si process_safe)
+        *args: Arguments positionnels
+        size: Taille de la charge en octets (estimée sur le premier argument si None)
+        process_safe: L'appel ne dépend d'aucun état du processus et peut aller dans le pool de processus
+        **kwargs: Arguments nommés
+
+    Returns:
+        Résultat de func
+    """
+    if size is None:
+        size = estimate_size(args[0]) if args else 0
+
+    executor = _select_executor(size, process_safe)
+    if executor is None:
+        return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    if isinstance(executor, ThreadPoolExecutor):
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(executor, ctx.run, call)
+    return await loop.run_in_executor(executor, call)
+
+
+async def dumps_json(obj: Any, size: Optional[int] = None) -> str:
+    """Sérialisation JSON (core.serialization) hors de la boucle pour les charges volumineuses."""
+    return await run_cpu(dumps, obj, size=size, process_safe=True)
+
+
+async def loads_json(data: str) -> Any:
+    """Désérialisation JSON (core.serialization) hors de la boucle pour les charges volumineuses."""
+    return await run_cpu(loads, data, process_safe=True)
@@ -0,0 +1,123 @@
+"""
+Sérialisation JSON centralisée du pipeline et de l'API.
+
+orjson, dépendance du projet, est utilisé par défaut (JSON_BACKEND=auto) : 5 à
+10 fois plus rapide que json, il gère nativement datetime, UUID, Enum et
+dataclasses.
+Les modèles Pydantic sont convertis par model_dump, sans aller-retour par une
+chaîne. Sans orjson (ou avec JSON_BACKEND=stdlib, utile pour comparer les
+benchmarks), le module json de la bibliothèque standard produit un résultat
+équivalent : UTF-8 non échappé, séparateurs compacts.
+"""
+
+import dataclasses
+import functools
+import json
+import logging
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Optional, Union
+
+from fastapi.responses import JSONResponse
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - installation incomplète
+    orjson = None
+
+USE_ORJSON = orjson is not None and settings.JSON_BACKEND != "stdlib"
+JSON_BACKEND = "orjson" if USE_ORJSON else "stdlib"
+
+
+def _default(obj: Any, fallback: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Conversion des types non pris en charge nativement par le sérialiseur."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (uuid.UUID, Decimal)):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if fallback is not None:
+        return fallback(obj)
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+
+def dumps_bytes(
+    obj: Any,
+    sort_keys: bool = False,
+    indent: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """
+    Sérialise en JSON UTF-8 (octets).
+
+    Args:
+        obj: Objet à sérialiser (dict, list, modèle Pydantic...)
+        sort_keys: Trier les clés (sortie déterministe)
+        indent: Indenter de 2 espaces
+        default: Conversion de dernier recours des types inconnus (ex: str)
+
+    Returns:
+        Document JSON encodé en UTF-8
+    """
+    handler = functools.partial(_default, fallback=default)
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=handler, option=option)
+        except orjson.JSONEncodeError:
+            # Entiers > 64 bits, clés non triables... : la bibliothèque standard sait faire
+            pass
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        sort_keys=sort_keys,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+        default=handler,
+    ).encode("utf-8")
+
+
+def dumps(
+    obj: Any,
+    sort_keys: bool = False,
+    indent: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Sérialise en chaîne JSON (voir dumps_bytes)."""
+    return dumps_bytes(obj, sort_keys=sort_keys, indent=indent, default=default).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    Désérialise un document JSON.
+
+    Raises:
+        json.JSONDecodeError: Document invalide (orjson.JSONDecodeError en hérite)
+    """
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON par défaut de l'application, sérialisée par dumps_bytes."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
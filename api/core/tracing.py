@@ -0,0 +1,202 @@
+"""
+Traçage distribué OpenTelemetry du pipeline d'extraction.
+
+Désactivé par défaut (OTEL_TRACING_ENABLED=false) : `start_span` et `traced`
+se réduisent alors à un test sur une variable globale. Activé, les spans sont
+exportés en OTLP (gRPC) vers le collecteur local configuré ; les paquets
+OpenTelemetry sont fournis par l'extra `tracing` (uv sync --extra tracing).
+
+Le contexte de trace est porté par contextvars : les tâches créées avec
+asyncio.create_task / asyncio.to_thread héritent donc du span courant.
+"""
+
+import functools
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace
+    OTEL_AVAILABLE = True
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    OTEL_AVAILABLE = False
+
+# Tracer actif (None = mode no-op)
+_tracer = None
+_provider = None
+
+
+def is_tracing_enabled() -> bool:
+    """True si le traçage est configuré et actif."""
+    return _tracer is not None
+
+
+def setup_tracing(app: Any = None, engine: Any = None) -> bool:
+    """
+    Configure le TracerProvider et l'export OTLP (à appeler au démarrage).
+
+    Instrumente aussi FastAPI, Redis et SQLAlchemy si les paquets
+    opentelemetry-instrumentation-* correspondants sont installés.
+
+    Args:
+        app: Application FastAPI (optionnel)
+        engine: AsyncEngine SQLAlchemy (optionnel)
+
+    Returns:
+        True si le traçage est actif
+    """
+    global _tracer, _provider
+
+    if not settings.OTEL_TRACING_ENABLED:
+        return False
+    if not OTEL_AVAILABLE:
+        logger.warning("⚠️ OTEL_TRACING_ENABLED=true mais opentelemetry n'est pas installé, traçage désactivé")
+        return False
+
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError as e:
+        logger.warning(f"⚠️ SDK/exporteur OpenTelemetry manquant ({e}), traçage désactivé")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.OTEL_SAMPLE_RATIO)),
+    )
+    _provider.add_span_processor(
+        BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT, insecure=True))
+    )
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("filiale-agents")
+
+    _instrument_libraries(app, engine)
+    logger.info(
+        f"🔭 Traçage OpenTelemetry actif → {settings.OTEL_EXPORTER_OTLP_ENDPOINT} "
+        f"(échantillonnage {settings.OTEL_SAMPLE_RATIO:.0%})"
+    )
+    return True
+
+
+def _instrument_libraries(app: Any, engine: Any) -> None:
+    """Active les instrumentations automatiques disponibles (FastAPI, Redis, SQLAlchemy)."""
+    if app is not None:
+        try:
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+            FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
+        except ImportError:
+            logger.debug("opentelemetry-instrumentation-fastapi absent")
+    try:
+        from opentelemetry.instrumentation.redis import RedisInstrumentor
+        RedisInstrumentor().instrument()
+    except ImportError:
+        logger.debug("opentelemetry-instrumentation-redis absent")
+    if engine is not None:
+        try:
+            from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+            SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine)
+        except ImportError:
+            logger.debug("opentelemetry-instrumentation-sqlalchemy absent")
+
+
+def shutdown_tracing() -> None:
+    """Exporte les spans en attente et arrête le provider."""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+def _clean_attributes(attributes: dict) -> dict:
+    """Ne garde que les attributs de type accepté par OpenTelemetry."""
+    return {
+        key: value for key, value in attributes.items()
+        if isinstance(value, (str, bool, int, float))
+    }
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Optional[Any]]:
+    """
+    Ouvre un span enfant du span courant (no-op si le traçage est inactif).
+
+    Args:
+        name: Nom du span
+        **attributes: Attributs du span (str, bool, int, float)
+
+    Yields:
+        Le span, ou None en mode no-op
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=_clean_attributes(attributes)) as span:
+        yield span
+
+
+def start_detached_span(name: str, **attributes: Any) -> Optional[Any]:
+    """
+    Démarre un span sans le rendre courant (début et fin dans deux callbacks distincts).
+
+    Returns:
+        Le span à terminer avec end_span, ou None en mode no-op
+    """
+    if _tracer is None:
+        return None
+    return _tracer.start_span(name, attributes=_clean_attributes(attributes))
+
+
+def end_span(span: Optional[Any], error: Optional[BaseException] = None) -> None:
+    """Termine un span démarré par start_detached_span."""
+    if span is None:
+        return
+    if error is not None:
+        span.record_exception(error)
+        span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+    span.end()
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """Ajoute des attributs au span courant (no-op si le traçage est inactif)."""
+    if _tracer is None:
+        return
+    trace.get_current_span().set_attributes(_clean_attributes(attributes))
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Décorateur : exécute la fonction (sync ou async) dans un span.
+
+    Args:
+        name: Nom du span (par défaut le nom qualifié de la fonction)
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with _tracer.start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
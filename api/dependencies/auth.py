@@ -2,14 +2,16 @@
 FastAPI dependencies for authentication and authorization.
 """
 
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db
+from models.auth import TokenData
 from models.db_models import User, Organization, UserRole
+from services.auth_cache import principal_cache
 from services.jwt_service import jwt_service
 
 
@@ -17,19 +19,54 @@ from services.jwt_service import jwt_service
 security = HTTPBearer()
 
 
-async def get_current_user(
+async def _load_principal(
+    token_data: TokenData,
+    db: AsyncSession
+) -> Optional[Tuple[User, Organization]]:
+    """
+    Load the user and organization of a token, from the cache or in a single query.
+
+    Args:
+        token_data: Verified token payload
+        db: Database session
+
+    Returns:
+        (user, organization) or None if the user does not exist
+    """
+    principal = await principal_cache.get(token_data)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(User, Organization)
+        .join(Organization, Organization.id == User.organization_id)
+        .where(User.id == token_data.user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    user, organization = row
+    await principal_cache.set(token_data, user, organization)
+    return user, organization
+
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> Tuple[User, Organization]:
     """
-    Get the current authenticated user from JWT token.
+    Get the current authenticated user and their organization from JWT token.
+
+    Resolved once per request and shared by get_current_user and
+    get_current_organization; served from the principal cache when possible.
 
     Args:
         credentials: HTTP Authorization credentials
         db: Database session
 
     Returns:
-        User object
+        Tuple (user, organization)
 
     Raises:
         HTTPException: If token is invalid or user not found
@@ -39,20 +76,33 @@ async def get_current_user(
     # Verify and decode token
     token_data = jwt_service.verify_token(token, token_type="access")
 
-    # Load user from database
-    result = await db.execute(
-        select(User).where(User.id == token_data.user_id)
-    )
-    user = result.scalar_one_or_none()
-
-    if user is None:
+    principal = await _load_principal(token_data, db)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+    return principal
+
+
+async def get_current_user(
+    principal: Tuple[User, Organization] = Depends(get_current_principal)
+) -> User:
+    """
+    Get the current authenticated user from JWT token.
+
+    Args:
+        principal: Current (user, organization)
+
+    Returns:
+        User object
+
+    Raises:
+        HTTPException: If token is invalid or user not found
+    """
+    return principal[0]
 
 
 async def get_current_active_user(
@@ -105,14 +155,14 @@ async def require_admin(
 
 async def get_current_organization(
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    principal: Tuple[User, Organization] = Depends(get_current_principal)
 ) -> Organization:
     """
     Get the organization of the current user.
 
     Args:
         current_user: Current active user
-        db: Database session
+        principal: Current (user, organization), loaded with the user
 
     Returns:
         Organization object
@@ -120,10 +170,7 @@ async def get_current_organization(
     Raises:
         HTTPException: If organization not found or inactive
     """
-    result = await db.execute(
-        select(Organization).where(Organization.id == current_user.organization_id)
-    )
-    organization = result.scalar_one_or_none()
+    organization = principal[1]
 
     if organization is None:
         raise HTTPException(
@@ -162,10 +209,8 @@ async def get_optional_current_user(
         token = credentials.credentials
         token_data = jwt_service.verify_token(token, token_type="access")
 
-        result = await db.execute(
-            select(User).where(User.id == token_data.user_id)
-        )
-        user = result.scalar_one_or_none()
+        principal = await _load_principal(token_data, db)
+        user = principal[0] if principal else None
 
         return user if user and user.is_active else None
 
@@ -11,6 +11,9 @@ from core.config import settings
 load_dotenv()
 from core.security import setup_cors, setup_security_headers
 from core.lifespan import lifespan
+from core.database import engine
+from core.tracing import setup_tracing
+from core.serialization import FastJSONResponse
 from middleware.logging import LoggingMiddleware
 from routers import health, extraction, websocket, tracking, auth, costs
 
@@ -22,6 +25,8 @@ app = FastAPI(
     docs_url=settings.API_DOCS_URL,
     redoc_url=settings.API_REDOC_URL,
     lifespan=lifespan,
+    # Réponses sérialisées par orjson si disponible (core.serialization)
+    default_response_class=FastJSONResponse,
 )
 
 # Configuration des middlewares
@@ -29,6 +34,9 @@ setup_cors(app)
 setup_security_headers(app)
 app.add_middleware(LoggingMiddleware)
 
+# Traçage OpenTelemetry (no-op si OTEL_TRACING_ENABLED n'est pas activé)
+setup_tracing(app, engine)
+
 # Inclusion des routers
 app.include_router(health.router)
 app.include_router(auth.router)
@@ -17,6 +17,7 @@ from .db_models import (
     OAuthToken,
     CompanyExtraction,
     OrganizationUsage,
+    OrganizationDailyCost,
     UserRole,
     PlanType,
     ExtractionStatus,
@@ -51,6 +52,7 @@ __all__ = [
     "OAuthToken",
     "CompanyExtraction",
     "OrganizationUsage",
+    "OrganizationDailyCost",
     # Enums
     "UserRole",
     "PlanType",
@@ -64,6 +64,7 @@ class TokenData(BaseModel):
     organization_id: Optional[str] = Field(None, description="Organization ID from token")
     role: Optional[str] = Field(None, description="User role from token")
     exp: Optional[datetime] = Field(None, description="Token expiration time")
+    jti: Optional[str] = Field(None, description="Unique token identifier")
 
 
 class Token(BaseModel):
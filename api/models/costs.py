@@ -81,6 +81,11 @@ class CostEstimateResponse(BaseModel):
     estimate_type: str = Field("approximate", description="Type of estimate")
     extraction_type: str = Field(..., description="Type of extraction")
     estimated_subsidiaries: int = Field(..., description="Number of subsidiaries estimated")
+    cost_eur_p90: Optional[float] = Field(None, description="Pessimistic (p90) cost in EUR (historical estimates only)")
+    estimated_processing_time: Optional[float] = Field(None, description="Estimated processing time in seconds (historical estimates only)")
+    sample_size: Optional[int] = Field(None, description="Number of past extractions the estimate is based on")
+    admission_decision: Optional[str] = Field(None, description="Budget check: 'accept', 'downgrade' or 'reject'")
+    recommended_extraction_type: Optional[str] = Field(None, description="Extraction type fitting the remaining monthly budget")
 
 
 class TopExpensiveSearch(BaseModel):
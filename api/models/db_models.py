@@ -10,6 +10,7 @@ from typing import Optional
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     Float,
@@ -21,7 +22,7 @@ from sqlalchemy import (
     Index,
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
 from core.database import Base
@@ -83,6 +84,7 @@ class Organization(Base):
     users = relationship("User", back_populates="organization", cascade="all, delete-orphan")
     extractions = relationship("CompanyExtraction", back_populates="organization", cascade="all, delete-orphan")
     usage_stats = relationship("OrganizationUsage", back_populates="organization", cascade="all, delete-orphan")
+    daily_costs = relationship("OrganizationDailyCost", back_populates="organization", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Organization {self.name} ({self.hubspot_company_id})>"
@@ -168,8 +170,8 @@ class CompanyExtraction(Base):
     company_url = Column(String(1000), nullable=True)
     extraction_type = Column(Enum(ExtractionType), nullable=False)
 
-    # Store complete extraction results as JSONB
-    extraction_data = Column(JSONB, nullable=True)
+    # Store complete extraction results as JSONB (deferred: only loaded on explicit access)
+    extraction_data = deferred(Column(JSONB, nullable=True))
 
     status = Column(Enum(ExtractionStatus), default=ExtractionStatus.PENDING, nullable=False)
     error_message = Column(Text, nullable=True)
@@ -194,9 +196,22 @@ class CompanyExtraction(Base):
 
     # Indexes for better query performance
     __table_args__ = (
-        Index("idx_extraction_org_created", "organization_id", "created_at"),
+        # Covering index: stats aggregates are answered from the index alone
+        Index(
+            "idx_extraction_org_created",
+            "organization_id",
+            "created_at",
+            postgresql_include=["status", "cost_eur", "cost_usd", "total_tokens"],
+        ),
         Index("idx_extraction_user_created", "user_id", "created_at"),
         Index("idx_extraction_status", "status"),
+        # Top expensive searches per organization (rows without cost excluded)
+        Index(
+            "idx_extraction_org_cost",
+            "organization_id",
+            cost_eur.desc(),
+            postgresql_where=cost_eur.isnot(None),
+        ),
     )
 
     def __repr__(self):
@@ -234,3 +249,39 @@ class OrganizationUsage(Base):
 
     def __repr__(self):
         return f"<OrganizationUsage {self.organization_id} - {self.month.strftime('%Y-%m')}>"
+
+
+class OrganizationDailyCost(Base):
+    """
+    Daily cost rollup per organization.
+    Incremented when an extraction completes (costs are only recorded on
+    completion, so the sums match the per-row aggregate it replaces); days are
+    bucketed on the extraction creation date (UTC), like the cost statistics
+    filters.
+    """
+
+    __tablename__ = "organization_daily_costs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+
+    day = Column(Date, nullable=False)
+
+    completed_searches = Column(Integer, default=0, nullable=False)
+    cost_usd = Column(Float, default=0.0, nullable=False)
+    cost_eur = Column(Float, default=0.0, nullable=False)
+    total_tokens = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Relationships
+    organization = relationship("Organization", back_populates="daily_costs")
+
+    # Unique constraint: one record per organization per day
+    __table_args__ = (
+        UniqueConstraint("organization_id", "day", name="uq_org_day"),
+    )
+
+    def __repr__(self):
+        return f"<OrganizationDailyCost {self.organization_id} - {self.day.isoformat()}>"
@@ -132,6 +132,7 @@ async def hubspot_callback(
 
         # Commit all changes
         await db.commit()
+        await auth_service.invalidate_cached_principals(user, organization)
 
         # Step 7: Generate JWT tokens
         jwt_tokens = jwt_service.create_tokens_for_user(
@@ -247,6 +248,7 @@ async def logout(
     """
     # TODO: Optionally add token to blacklist in Redis
     # TODO: Optionally revoke HubSpot OAuth token
+    await auth_service.logout_user(current_user.id)
 
     return {
         "message": "Successfully logged out",
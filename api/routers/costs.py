@@ -25,6 +25,7 @@ from models.costs import (
     ModelUsageDetail
 )
 from services.cost_tracking_service import cost_tracking_service
+from services.cost_predictor import cost_predictor
 
 
 router = APIRouter(prefix="/costs", tags=["Cost Tracking"])
@@ -144,7 +145,9 @@ async def get_top_expensive_searches(
 @router.post("/estimate", response_model=CostEstimateResponse)
 async def estimate_extraction_cost(
     request: CostEstimateRequest,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    organization: Organization = Depends(get_current_organization),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Estimate the cost of an extraction before running it.
@@ -159,6 +162,11 @@ async def estimate_extraction_cost(
     - Number of subsidiaries found
     - Search depth required
 
+    When enough completed extractions exist, the estimate is predicted from
+    their recorded usage (`estimate_type: "historical"`). If the organization
+    has a monthly budget, the response also says whether the extraction fits
+    the remaining budget, possibly by downgrading advanced to simple.
+
     **Permissions**: Any authenticated user can request estimates.
     """
     estimate = cost_tracking_service.estimate_search_cost(
@@ -167,6 +175,23 @@ async def estimate_extraction_cost(
         subsidiaries_count=request.subsidiaries_count
     )
 
+    monthly_budget = cost_tracking_service.get_monthly_budget_eur(organization)
+    if monthly_budget is not None:
+        now = datetime.now()
+        stats = await cost_tracking_service.get_monthly_costs(
+            organization_id=str(organization.id),
+            year=now.year,
+            month=now.month,
+            db=db
+        )
+        admission = cost_predictor.admit(
+            request.extraction_type,
+            estimate["estimated_subsidiaries"],
+            monthly_budget - stats["total_cost_eur"]
+        )
+        estimate["admission_decision"] = admission["decision"]
+        estimate["recommended_extraction_type"] = admission["extraction_type"]
+
     return CostEstimateResponse(**estimate)
 
 
@@ -190,7 +215,9 @@ async def get_extraction_cost_detail(
     """
     # Load extraction - try by ID first, then by session_id
     result = await db.execute(
-        select(CompanyExtraction).where(
+        select(CompanyExtraction)
+        .options(cost_tracking_service.cost_projection())
+        .where(
             (CompanyExtraction.id == extraction_id) | 
             (CompanyExtraction.session_id == extraction_id)
         )
@@ -255,7 +282,9 @@ async def get_extraction_cost_by_session(
     """
     # Load extraction by session_id
     result = await db.execute(
-        select(CompanyExtraction).where(CompanyExtraction.session_id == session_id)
+        select(CompanyExtraction)
+        .options(cost_tracking_service.cost_projection())
+        .where(CompanyExtraction.session_id == session_id)
     )
     extraction = result.scalar_one_or_none()
 
@@ -354,12 +383,20 @@ async def get_budget_status(
         db=db
     )
 
-    # Get organization budget (if set)
-    monthly_budget = organization.max_searches_per_month  # You may want to add a budget_eur field
+    # Get organization budget (settings["monthly_budget_eur"], if set)
+    monthly_budget = cost_tracking_service.get_monthly_budget_eur(organization)
+
+    remaining_budget = None
+    usage_percentage = None
+    next_search = None
+    if monthly_budget is not None:
+        remaining_budget = max(monthly_budget - stats["total_cost_eur"], 0.0)
+        usage_percentage = (
+            round(stats["total_cost_eur"] / monthly_budget * 100, 2) if monthly_budget > 0 else 100.0
+        )
+        # Admission check for a typical advanced search (may be downgraded to simple)
+        next_search = cost_predictor.admit("advanced", 5, remaining_budget)
 
-    # Calculate budget info
-    # Note: You should add a monthly_budget_eur field to Organization model
-    # For now, we'll return basic info
     return {
         "organization_id": str(organization.id),
         "organization_name": organization.name,
@@ -368,13 +405,14 @@ async def get_budget_status(
         "total_searches": stats["total_searches"],
         "completed_searches": stats["completed_searches"],
         "average_cost_per_search_eur": stats["average_cost_per_search_eur"],
-        # Budget info (to be implemented)
-        "has_budget_limit": False,  # Set to True when monthly_budget_eur is added
-        "monthly_budget_eur": None,  # Add this field to Organization
-        "remaining_budget_eur": None,
-        "budget_usage_percentage": None,
-        "warning_threshold_reached": False,  # 80% of budget
-        "limit_reached": False  # 100% of budget
+        # Budget info
+        "has_budget_limit": monthly_budget is not None,
+        "monthly_budget_eur": monthly_budget,
+        "remaining_budget_eur": remaining_budget,
+        "budget_usage_percentage": usage_percentage,
+        "warning_threshold_reached": usage_percentage is not None and usage_percentage >= 80,  # 80% of budget
+        "limit_reached": usage_percentage is not None and usage_percentage >= 100,  # 100% of budget
+        "next_search_admission": next_search
     }
 
 
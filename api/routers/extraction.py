@@ -6,16 +6,17 @@ import uuid
 import asyncio
 import logging
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
 from core.models import (
     CompanyExtractionRequest,
     URLExtractionRequest,
     AsyncExtractionResponse,
 )
 from company_agents.models import CompanyInfo
+from core.serialization import FastJSONResponse
 from company_agents.extraction_core import extract_company_data
 from services.validation_service import validate_extraction_input
 from services.agent_tracking_service import agent_tracking_service
+from services.completion_writer import build_completion_record, completion_writer
 from functions import validate_company_name, clean_company_name
 
 
@@ -43,44 +44,10 @@ async def _run_extraction_background(
             deep_search=deep_search,
         )
 
-        # Sauvegarder les coûts dans la base de données
+        # Persister la fin d'extraction (coûts, statut, données) via le tampon d'écriture groupée
         try:
-            from core.database import AsyncSessionLocal
-            from models.db_models import CompanyExtraction, ExtractionType, ExtractionStatus
-
-            # Extraire les données de coût du résultat
-            extraction_costs = result.get("extraction_costs", {})
-
-            if extraction_costs:
-                async with AsyncSessionLocal() as db:
-                    # Vérifier si une extraction existe déjà pour ce session_id
-                    from sqlalchemy import select
-                    stmt = select(CompanyExtraction).where(CompanyExtraction.session_id == session_id)
-                    db_result = await db.execute(stmt)
-                    existing_extraction = db_result.scalar_one_or_none()
-
-                    if existing_extraction:
-                        # Mettre à jour l'extraction existante
-                        existing_extraction.cost_usd = extraction_costs.get("cost_usd")
-                        existing_extraction.cost_eur = extraction_costs.get("cost_eur")
-                        existing_extraction.total_tokens = extraction_costs.get("total_tokens")
-                        existing_extraction.input_tokens = extraction_costs.get("input_tokens")
-                        existing_extraction.output_tokens = extraction_costs.get("output_tokens")
-                        existing_extraction.models_usage = {
-                            "models_breakdown": extraction_costs.get("models_breakdown", []),
-                            "total_cost_usd": extraction_costs.get("cost_usd"),
-                            "total_cost_eur": extraction_costs.get("cost_eur"),
-                            "total_tokens": extraction_costs.get("total_tokens"),
-                            "exchange_rate": extraction_costs.get("exchange_rate", 0.92)
-                        }
-                        existing_extraction.status = ExtractionStatus.COMPLETED
-                        existing_extraction.processing_time = result.get("extraction_metadata", {}).get("processing_time", 0) / 1000  # Convert ms to seconds
-
-                        await db.commit()
-                        logger.info(f"💾 Coûts mis à jour dans DB pour session {session_id}: {extraction_costs.get('cost_eur'):.4f}€")
-                    else:
-                        logger.warning(f"⚠️ Aucune extraction trouvée pour session {session_id}")
-
+            if result.get("extraction_costs"):
+                await completion_writer.submit(build_completion_record(session_id, result))
         except Exception as cost_error:
             logger.error(f"❌ Erreur lors de la sauvegarde des coûts pour {session_id}: {cost_error}", exc_info=True)
 
@@ -258,7 +225,7 @@ async def extract_company_info_async(request: CompanyExtractionRequest):
             status="started",
             message=f"Extraction démarrée pour {company_name}",
         )
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=202,
             content=payload.model_dump(),
             headers={"Location": f"/status/{session_id}"},
@@ -317,7 +284,7 @@ async def extract_company_from_url_async(request: URLExtractionRequest):
             status="started",
             message="Extraction démarrée depuis URL",
         )
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=202,
             content=payload.model_dump(),
             headers={"Location": f"/status/{session_id}"},
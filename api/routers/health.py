@@ -6,9 +6,14 @@ import os
 import httpx
 import logging
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from core.models import HealthCheckResponse
+from core.loop_monitor import loop_monitor
+from core.database import get_pool_status
 from functions import get_version, check_openai_agents_availability
+from company_agents.metrics.prometheus_exporter import PROMETHEUS_AVAILABLE, render_latest
+from dependencies.auth import require_admin
+from models.db_models import User
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +44,33 @@ async def health_check():
     )
 
 
+@router.get("/health/loop")
+async def event_loop_health(current_user: User = Depends(require_admin)):
+    """Latence de la boucle d'événements et callbacks bloquants récents (avec leur pile) - admin"""
+    return loop_monitor.snapshot()
+
+
+@router.post("/health/loop/reset")
+async def reset_event_loop_health(current_user: User = Depends(require_admin)):
+    """Renvoie puis vide les statistiques de la boucle d'événements - admin"""
+    return loop_monitor.snapshot(reset=True)
+
+
+@router.get("/health/db")
+async def database_pool_health():
+    """Occupation du pool de connexions Postgres, attentes et expirations d'emprunt"""
+    return get_pool_status()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Métriques du pipeline au format d'exposition Prometheus"""
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus_client n'est pas installé")
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
+
 @router.get("/credits")
 async def get_openai_credits():
     """Retourne les crédits OpenAI restants et informations de facturation"""
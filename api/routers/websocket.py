@@ -3,11 +3,11 @@ Routes WebSocket pour le suivi en temps réel
 """
 
 import logging
-from fastapi import APIRouter, WebSocket, HTTPException
+from fastapi import APIRouter, WebSocket, HTTPException, Request, Response
 from services.websocket_service import (
     handle_websocket_connection,
     get_session_status,
-    get_extraction_results,
+    get_extraction_results_payload,
     list_active_sessions,
 )
 
@@ -36,15 +36,25 @@ async def get_session_status_endpoint(session_id: str):
 
 
 @router.get("/results/{session_id}")
-async def get_extraction_results_endpoint(session_id: str):
+async def get_extraction_results_endpoint(session_id: str, request: Request):
     """
     Récupère les données d'extraction finales d'une session terminée
+
+    Les résultats compressés dans Redis sont envoyés tels quels aux clients
+    qui acceptent l'encodage (Accept-Encoding: gzip ou zstd).
     """
     try:
-        return await get_extraction_results(session_id)
+        body, encoding = await get_extraction_results_payload(
+            session_id, request.headers.get("accept-encoding", "")
+        )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 @router.get("/sessions")
 async def list_active_sessions_endpoint():
@@ -8,6 +8,7 @@ from .websocket_service import (
     handle_websocket_connection,
     get_session_status,
     get_extraction_results,
+    get_extraction_results_payload,
     list_active_sessions,
 )
 
@@ -18,5 +19,6 @@ __all__ = [
     "handle_websocket_connection",
     "get_session_status",
     "get_extraction_results",
+    "get_extraction_results_payload",
     "list_active_sessions",
 ]
@@ -0,0 +1,249 @@
+"""
+Cache of authenticated principals (user + organization).
+
+Authenticated requests would otherwise load the user and the organization
+from Postgres on every call. Principals are cached per access token
+(user id + jti, or exp for tokens issued without jti):
+
+- a per-worker LRU with a short TTL (AUTH_CACHE_LOCAL_TTL) serves hot
+  clients without any I/O;
+- Redis (AUTH_CACHE_TTL) shares entries between workers.
+
+Entries never outlive the token. Invalidation bumps a per-user or
+per-organization version in Redis: stale Redis entries are ignored, and
+other workers' local entries expire within AUTH_CACHE_LOCAL_TTL.
+"""
+
+import enum
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import Date, DateTime, Enum
+
+from core.config import settings
+from core.serialization import dumps, loads
+from models.auth import TokenData
+from models.db_models import Organization, User
+
+logger = logging.getLogger(__name__)
+
+_PRINCIPAL_KEY = "auth:principal:{user_id}:{token_key}"
+_USER_VERSION_KEY = "auth:user_ver:{user_id}"
+_ORG_VERSION_KEY = "auth:org_ver:{organization_id}"
+
+
+def _row_from_model(instance: Any) -> Dict[str, Any]:
+    """Serialize the column values of an ORM instance to JSON-compatible types."""
+    row = {}
+    for column in instance.__table__.columns:
+        value = getattr(instance, column.key)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        row[column.key] = value
+    return row
+
+
+def _model_from_row(model: Any, row: Dict[str, Any]) -> Any:
+    """Rebuild a transient (session-less) ORM instance from a serialized row."""
+    values = {}
+    for column in model.__table__.columns:
+        value = row.get(column.key)
+        if value is not None:
+            column_type = column.type
+            if isinstance(column_type, Enum) and column_type.enum_class is not None:
+                value = column_type.enum_class(value)
+            elif isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Date):
+                value = date.fromisoformat(value)
+            elif getattr(column_type, "as_uuid", False):
+                value = uuid.UUID(value)
+        values[column.key] = value
+    return model(**values)
+
+
+class PrincipalCache:
+    """Two-level (local LRU + Redis) cache of authenticated user/organization pairs."""
+
+    def __init__(self, max_entries: int = settings.AUTH_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (expires_at monotonic, user row, organization row)
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any], Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self._keys_by_org: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _token_key(token_data: TokenData) -> str:
+        if token_data.jti:
+            return token_data.jti
+        return str(int(token_data.exp.timestamp())) if token_data.exp else "noexp"
+
+    @staticmethod
+    def _ttl(token_data: TokenData, ttl: int) -> int:
+        """TTL capped by the token's remaining lifetime."""
+        if token_data.exp is None:
+            return ttl
+        return min(ttl, int(token_data.exp.timestamp() - time.time()))
+
+    @staticmethod
+    async def _redis():
+        from status import status_manager
+        return await status_manager._get_redis()
+
+    def _key(self, token_data: TokenData) -> str:
+        return _PRINCIPAL_KEY.format(user_id=token_data.user_id, token_key=self._token_key(token_data))
+
+    def _build(self, user_row: Dict[str, Any], org_row: Dict[str, Any]) -> Tuple[User, Organization]:
+        # Fresh instances per request: callers can never mutate a shared cached object
+        return _model_from_row(User, user_row), _model_from_row(Organization, org_row)
+
+    def _store_local(self, key: str, ttl: int, user_row: Dict[str, Any], org_row: Dict[str, Any]) -> None:
+        if ttl <= 0:
+            return
+        self._local[key] = (time.monotonic() + ttl, user_row, org_row)
+        self._local.move_to_end(key)
+        self._keys_by_user.setdefault(user_row["id"], set()).add(key)
+        self._keys_by_org.setdefault(org_row["id"], set()).add(key)
+        while len(self._local) > self.max_entries:
+            self._drop_local({next(iter(self._local))})
+
+    def _drop_local(self, keys: Set[str]) -> None:
+        for key in keys:
+            entry = self._local.pop(key, None)
+            if entry is None:
+                continue
+            _, user_row, org_row = entry
+            for index, owner in ((self._keys_by_user, user_row["id"]), (self._keys_by_org, org_row["id"])):
+                owned = index.get(owner)
+                if owned is not None:
+                    owned.discard(key)
+                    if not owned:
+                        del index[owner]
+
+    async def get(self, token_data: TokenData) -> Optional[Tuple[User, Organization]]:
+        """
+        Look up the principal of an access token.
+
+        Args:
+            token_data: Verified token payload
+
+        Returns:
+            (user, organization) transient instances, or None on miss
+        """
+        if not settings.AUTH_CACHE_ENABLED:
+            return None
+
+        key = self._key(token_data)
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, user_row, org_row = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(key)
+                self.hits += 1
+                return self._build(user_row, org_row)
+            self._drop_local({key})
+
+        try:
+            redis = await self._redis()
+            raw, user_version, org_version = await redis.mget(
+                key,
+                _USER_VERSION_KEY.format(user_id=token_data.user_id),
+                _ORG_VERSION_KEY.format(organization_id=token_data.organization_id),
+            )
+        except Exception as e:
+            logger.debug(f"Auth cache: Redis unavailable ({e})")
+            self.misses += 1
+            return None
+
+        if raw:
+            cached = loads(raw)
+            if (
+                cached["user_version"] == int(user_version or 0)
+                and cached["org_version"] == int(org_version or 0)
+                and cached["organization"]["id"] == token_data.organization_id
+            ):
+                self.redis_hits += 1
+                self._store_local(
+                    key,
+                    self._ttl(token_data, settings.AUTH_CACHE_LOCAL_TTL),
+                    cached["user"],
+                    cached["organization"],
+                )
+                return self._build(cached["user"], cached["organization"])
+
+        self.misses += 1
+        return None
+
+    async def set(self, token_data: TokenData, user: User, organization: Organization) -> None:
+        """Cache the principal loaded from the database for this token."""
+        if not settings.AUTH_CACHE_ENABLED:
+            return
+
+        key = self._key(token_data)
+        user_row = _row_from_model(user)
+        org_row = _row_from_model(organization)
+        self._store_local(key, self._ttl(token_data, settings.AUTH_CACHE_LOCAL_TTL), user_row, org_row)
+
+        ttl = self._ttl(token_data, settings.AUTH_CACHE_TTL)
+        if ttl <= 0:
+            return
+        try:
+            redis = await self._redis()
+            user_version, org_version = await redis.mget(
+                _USER_VERSION_KEY.format(user_id=user_row["id"]),
+                _ORG_VERSION_KEY.format(organization_id=org_row["id"]),
+            )
+            payload = {
+                "user": user_row,
+                "organization": org_row,
+                "user_version": int(user_version or 0),
+                "org_version": int(org_version or 0),
+            }
+            await redis.setex(key, ttl, dumps(payload))
+        except Exception as e:
+            logger.debug(f"Auth cache: could not store principal in Redis ({e})")
+
+    async def invalidate_user(self, user_id: Any) -> None:
+        """Evict every cached principal of a user (logout, role or status change)."""
+        user_id = str(user_id)
+        self._drop_local(set(self._keys_by_user.get(user_id, ())))
+        await self._bump_version(_USER_VERSION_KEY.format(user_id=user_id))
+
+    async def invalidate_organization(self, organization_id: Any) -> None:
+        """Evict every cached principal of an organization."""
+        organization_id = str(organization_id)
+        self._drop_local(set(self._keys_by_org.get(organization_id, ())))
+        await self._bump_version(_ORG_VERSION_KEY.format(organization_id=organization_id))
+
+    async def _bump_version(self, version_key: str) -> None:
+        try:
+            redis = await self._redis()
+            await redis.incr(version_key)
+            # Outlives every entry it guards
+            await redis.expire(version_key, max(settings.AUTH_CACHE_TTL, 60) * 2)
+        except Exception as e:
+            logger.warning(f"⚠️ Auth cache: could not invalidate {version_key} in Redis ({e})")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters of this worker."""
+        return {
+            "entries": len(self._local),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+        }
+
+
+# Global instance
+principal_cache = PrincipalCache()
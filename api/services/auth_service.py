@@ -16,6 +16,7 @@ from fastapi import HTTPException, status
 from core.config import settings
 from models.db_models import Organization, User, OAuthToken, UserRole
 from models.auth import HubSpotUserInfo
+from services.auth_cache import principal_cache
 
 
 class AuthService:
@@ -355,6 +356,29 @@ class AuthService:
         await db.flush()
         return user
 
+    async def invalidate_cached_principals(self, user: User, organization: Organization) -> None:
+        """
+        Evict the cached principals of a user and their organization.
+
+        Must be called after the session commits: an eviction made before the
+        commit lets a concurrent request re-cache the old rows.
+
+        Args:
+            user: User object
+            organization: Organization object
+        """
+        await principal_cache.invalidate_organization(organization.id)
+        await principal_cache.invalidate_user(user.id)
+
+    async def logout_user(self, user_id: Any) -> None:
+        """
+        Evict the cached principals of a user on logout.
+
+        Args:
+            user_id: User ID
+        """
+        await principal_cache.invalidate_user(user_id)
+
     async def store_oauth_tokens(
         self,
         user: User,
@@ -0,0 +1,345 @@
+"""
+Write-behind persistence of extraction completion records.
+
+Finishing an extraction used to cost one database transaction (select,
+update, rollup upsert, commit). Completion records are now appended to a
+Redis list and written by a background flusher in batches:
+
+- one bulk UPDATE by primary key for the whole batch;
+- one daily rollup upsert per (organization, day) instead of one per extraction.
+
+The flusher runs every COMPLETION_FLUSH_INTERVAL_MS, or earlier once
+COMPLETION_FLUSH_BATCH_SIZE records are pending. A Redis lock ensures a single
+flusher across workers; it is renewed on every batch and released only by its
+owner. Each batch is moved atomically to a processing list, which is cleared
+only after the transaction commits: a crash or a lost lock leaves the batch
+there and the next flusher replays it first. Replays are harmless because
+rows that are already completed are not rolled up twice.
+
+Without Redis (or with COMPLETION_WRITE_BEHIND_ENABLED=false, or when no
+flusher runs in the process) records are written immediately.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+
+from core.config import settings
+from core.offload import dumps_json
+from core.serialization import loads
+
+logger = logging.getLogger(__name__)
+
+_BUFFER_KEY = "completions:pending"
+_PROCESSING_KEY = "completions:processing"
+_FLUSH_LOCK_KEY = "completions:flush_lock"
+# Renewed on every batch; an expired lock only causes an idempotent replay
+_FLUSH_LOCK_TTL_MS = 30_000
+
+# Claim a batch for the lock owner: an unacknowledged batch is replayed first,
+# otherwise up to ARGV[2] records move from the buffer to the processing list.
+# Returns false (None) when the lock is no longer held.
+_CLAIM_BATCH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+local items = redis.call('LRANGE', KEYS[3], 0, -1)
+if #items == 0 then
+    items = redis.call('LRANGE', KEYS[2], 0, tonumber(ARGV[2]) - 1)
+    if #items > 0 then
+        redis.call('LTRIM', KEYS[2], #items, -1)
+        redis.call('RPUSH', KEYS[3], unpack(items))
+    end
+end
+return items
+"""
+
+# Acknowledge the committed batch (clear the processing list) if the lock is still held
+_ACK_BATCH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Release the lock only if it is still ours
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Upper bound of the retry delay while the database is unavailable
+_MAX_BACKOFF_S = 30.0
+
+
+def build_completion_record(session_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the completion record of a finished extraction.
+
+    Args:
+        session_id: Extraction session id
+        result: Result returned by extract_company_data
+
+    Returns:
+        JSON-serializable record (costs, status, processing time, extraction data)
+    """
+    extraction_costs = result.get("extraction_costs", {})
+    return {
+        "session_id": session_id,
+        "cost_usd": extraction_costs.get("cost_usd"),
+        "cost_eur": extraction_costs.get("cost_eur"),
+        "total_tokens": extraction_costs.get("total_tokens"),
+        "input_tokens": extraction_costs.get("input_tokens"),
+        "output_tokens": extraction_costs.get("output_tokens"),
+        "models_usage": {
+            "models_breakdown": extraction_costs.get("models_breakdown", []),
+            "total_cost_usd": extraction_costs.get("cost_usd"),
+            "total_cost_eur": extraction_costs.get("cost_eur"),
+            "total_tokens": extraction_costs.get("total_tokens"),
+            "exchange_rate": extraction_costs.get("exchange_rate", 0.92),
+            "search_type": extraction_costs.get("search_type"),
+        },
+        # ms -> seconds
+        "processing_time": result.get("extraction_metadata", {}).get("processing_time", 0) / 1000,
+        "extraction_data": result,
+        "completed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def write_completion_records(records: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Persist a batch of completion records in a single transaction.
+
+    Args:
+        records: Completion records (the last record wins for a repeated session)
+
+    Returns:
+        (rows updated, records without a matching extraction row)
+    """
+    from core.database import AsyncSessionLocal
+    from models.db_models import CompanyExtraction, ExtractionStatus
+    from services.cost_tracking_service import cost_tracking_service
+
+    by_session = {record["session_id"]: record for record in records}
+
+    async with AsyncSessionLocal() as db:
+        stmt = (
+            select(
+                CompanyExtraction.id,
+                CompanyExtraction.session_id,
+                CompanyExtraction.organization_id,
+                CompanyExtraction.created_at,
+                CompanyExtraction.status,
+            )
+            .where(CompanyExtraction.session_id.in_(list(by_session)))
+            .with_for_update()
+        )
+        rows = (await db.execute(stmt)).all()
+
+        updates = []
+        rollups: Dict[Tuple[Any, Any], Dict[str, Any]] = defaultdict(
+            lambda: {"completed_searches": 0, "cost_usd": 0.0, "cost_eur": 0.0, "total_tokens": 0}
+        )
+        for row in rows:
+            record = by_session[row.session_id]
+            updates.append({
+                "id": row.id,
+                "status": ExtractionStatus.COMPLETED,
+                "cost_usd": record["cost_usd"],
+                "cost_eur": record["cost_eur"],
+                "total_tokens": record["total_tokens"],
+                "input_tokens": record["input_tokens"],
+                "output_tokens": record["output_tokens"],
+                "models_usage": record["models_usage"],
+                "processing_time": record["processing_time"],
+                "extraction_data": record["extraction_data"],
+                "completed_at": datetime.fromisoformat(record["completed_at"]),
+            })
+
+            # Daily rollup once per extraction (replayed records are already completed)
+            if row.status != ExtractionStatus.COMPLETED:
+                created_at = row.created_at or datetime.now(timezone.utc)
+                rollup = rollups[(row.organization_id, created_at.astimezone(timezone.utc).date())]
+                rollup["completed_searches"] += 1
+                rollup["cost_usd"] += record["cost_usd"] or 0.0
+                rollup["cost_eur"] += record["cost_eur"] or 0.0
+                rollup["total_tokens"] += record["total_tokens"] or 0
+
+        if updates:
+            await db.execute(update(CompanyExtraction), updates)
+        for (organization_id, day), totals in rollups.items():
+            await cost_tracking_service.add_daily_costs(
+                organization_id=organization_id, day=day, db=db, **totals
+            )
+        await db.commit()
+
+    missing = len(by_session) - len(rows)
+    if missing:
+        known = {row.session_id for row in rows}
+        logger.warning(
+            f"⚠️ No extraction row for {missing} completed session(s): "
+            f"{', '.join(sorted(set(by_session) - known)[:10])}"
+        )
+    return len(rows), missing
+
+
+class CompletionWriter:
+    """Redis-buffered, batched writer of extraction completion records."""
+
+    def __init__(self):
+        self.interval = settings.COMPLETION_FLUSH_INTERVAL_MS / 1000.0
+        self.batch_size = settings.COMPLETION_FLUSH_BATCH_SIZE
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.buffered = 0
+        self.written = 0
+        self.direct_writes = 0
+        self.batches = 0
+        self.failed_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @staticmethod
+    async def _redis():
+        from status import status_manager
+        return await status_manager._get_redis()
+
+    def start(self) -> None:
+        """Start the background flusher (call from the application's event loop)."""
+        if self._task is not None or not settings.COMPLETION_WRITE_BEHIND_ENABLED:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"🗃️ Write-behind completion persistence enabled "
+            f"(every {self.interval * 1000:.0f}ms or {self.batch_size} records)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the flusher and drain what is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Completion records left in Redis at shutdown ({e}); the next flusher will write them")
+
+    async def submit(self, record: Dict[str, Any]) -> None:
+        """
+        Queue a completion record for persistence.
+
+        Args:
+            record: Record built by build_completion_record
+        """
+        if self._task is not None:
+            try:
+                redis = await self._redis()
+                pending = await redis.rpush(_BUFFER_KEY, await dumps_json(record))
+                self.buffered += 1
+                if pending >= self.batch_size:
+                    self._wake.set()
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Completion buffer unavailable ({e}), writing {record['session_id']} directly")
+
+        await write_completion_records([record])
+        self.direct_writes += 1
+
+    async def flush(self) -> int:
+        """
+        Write every buffered record, batch by batch.
+
+        Returns:
+            Number of records written and acknowledged (0 if another worker holds the lock)
+        """
+        redis = await self._redis()
+        token = uuid.uuid4().hex
+        if not await redis.set(_FLUSH_LOCK_KEY, token, nx=True, px=_FLUSH_LOCK_TTL_MS):
+            return 0
+
+        flushed = 0
+        try:
+            while True:
+                raw_records = await redis.eval(
+                    _CLAIM_BATCH_SCRIPT, 3, _FLUSH_LOCK_KEY, _BUFFER_KEY, _PROCESSING_KEY,
+                    token, self.batch_size, _FLUSH_LOCK_TTL_MS,
+                )
+                if raw_records is None:
+                    logger.warning("⚠️ Completion flush lock lost, the next flusher will resume")
+                    break
+                if not raw_records:
+                    break
+
+                records = []
+                for raw in raw_records:
+                    try:
+                        records.append(loads(raw))
+                    except (TypeError, ValueError):
+                        logger.error(f"❌ Dropping malformed completion record: {str(raw)[:200]}")
+
+                if records:
+                    updated, _ = await write_completion_records(records)
+                    self.written += updated
+                    self.batches += 1
+                # The batch stays in the processing list (and is replayed) unless we still hold the lock
+                if not await redis.eval(_ACK_BATCH_SCRIPT, 2, _FLUSH_LOCK_KEY, _PROCESSING_KEY, token, _FLUSH_LOCK_TTL_MS):
+                    logger.warning(
+                        f"⚠️ Completion flush lock lost after commit, {len(raw_records)} record(s) will be replayed"
+                    )
+                    break
+                flushed += len(raw_records)
+        finally:
+            await redis.eval(_RELEASE_LOCK_SCRIPT, 1, _FLUSH_LOCK_KEY, token)
+
+        if flushed:
+            logger.info(f"💾 {flushed} completion record(s) persisted")
+        return flushed
+
+    async def _run(self) -> None:
+        delay = self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                await self.flush()
+                delay = self.interval
+            except Exception as e:
+                self.failed_flushes += 1
+                delay = min(max(delay * 2, 1.0), _MAX_BACKOFF_S)
+                logger.error(f"❌ Completion flush failed, retrying in {delay:.0f}s: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of this worker."""
+        return {
+            "running": self.running,
+            "buffered": self.buffered,
+            "written": self.written,
+            "direct_writes": self.direct_writes,
+            "batches": self.batches,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+# Global instance (flusher started by the lifespan)
+completion_writer = CompletionWriter()
@@ -0,0 +1,314 @@
+"""
+Data-driven cost and latency predictor for extractions.
+
+Fits, per pipeline ("simple" / "advanced"), one least-squares line per model and
+per metric (tokens, cost, processing time) against the number of subsidiaries,
+using the `models_usage` breakdowns stored on completed CompanyExtraction rows.
+The fitted coefficients live in memory and are refreshed periodically, so
+predictions are plain arithmetic.
+"""
+
+import asyncio
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.db_models import CompanyExtraction, ExtractionStatus
+
+logger = logging.getLogger(__name__)
+
+# Number of most recent completed extractions used for fitting
+PREDICTOR_SAMPLE_SIZE = int(os.getenv("COST_PREDICTOR_SAMPLE_SIZE", "2000"))
+# Minimum number of samples per pipeline before predictions replace the static estimate
+PREDICTOR_MIN_SAMPLES = int(os.getenv("COST_PREDICTOR_MIN_SAMPLES", "10"))
+# Refresh interval of the in-memory model (seconds)
+PREDICTOR_REFRESH_INTERVAL = int(os.getenv("COST_PREDICTOR_REFRESH_INTERVAL", "900"))
+
+# z-score used for the pessimistic (p90) cost bound
+P90_Z = 1.2816
+
+PIPELINES = ("simple", "advanced")
+BREAKDOWN_METRICS = ("input_tokens", "cached_input_tokens", "output_tokens", "cost_usd", "cost_eur")
+
+
+@dataclass(frozen=True)
+class LinearFit:
+    """y = intercept + slope * x, with the residual standard deviation."""
+
+    intercept: float
+    slope: float
+    residual_std: float = 0.0
+
+    def predict(self, x: float) -> float:
+        return max(self.intercept + self.slope * x, 0.0)
+
+
+def fit_line(xs: Sequence[float], ys: Sequence[float]) -> LinearFit:
+    """
+    Ordinary least squares fit of ys against xs.
+
+    Falls back to the mean (slope 0) when xs has no variance.
+    """
+    n = len(xs)
+    if n == 0:
+        return LinearFit(0.0, 0.0)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    slope = (
+        sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        if var_x > 0 else 0.0
+    )
+    intercept = mean_y - slope * mean_x
+    residuals = [y - (intercept + slope * x) for x, y in zip(xs, ys)]
+    residual_std = math.sqrt(sum(r * r for r in residuals) / max(n - 2, 1)) if n > 1 else 0.0
+    return LinearFit(intercept, slope, residual_std)
+
+
+@dataclass
+class PipelineModel:
+    """Fitted coefficients for one pipeline."""
+
+    sample_size: int
+    cost_eur: LinearFit
+    processing_time: LinearFit
+    # model name -> metric -> fit
+    breakdown: Dict[str, Dict[str, LinearFit]] = field(default_factory=dict)
+
+
+def detect_pipeline(models_usage: Dict[str, Any]) -> str:
+    """Return the pipeline of a stored extraction (explicit search_type, else sonar usage)."""
+    search_type = models_usage.get("search_type")
+    if search_type in PIPELINES:
+        return search_type
+    for entry in models_usage.get("models_breakdown") or []:
+        if "sonar" in str(entry.get("model", "")).lower():
+            return "advanced"
+    return "simple"
+
+
+def fit_pipeline(samples: List[Dict[str, Any]]) -> PipelineModel:
+    """
+    Fit a PipelineModel from samples.
+
+    Args:
+        samples: Dicts with subsidiaries_count, cost_eur, processing_time and
+            breakdown ({model: {metric: value}}, models summed per extraction)
+
+    Returns:
+        Fitted PipelineModel
+    """
+    xs = [float(s["subsidiaries_count"]) for s in samples]
+    timed = [(x, s["processing_time"]) for x, s in zip(xs, samples) if s.get("processing_time")]
+
+    models = sorted({model for s in samples for model in s["breakdown"]})
+    breakdown = {
+        model: {
+            metric: fit_line(xs, [float(s["breakdown"].get(model, {}).get(metric, 0)) for s in samples])
+            for metric in BREAKDOWN_METRICS
+        }
+        for model in models
+    }
+    return PipelineModel(
+        sample_size=len(samples),
+        cost_eur=fit_line(xs, [float(s["cost_eur"]) for s in samples]),
+        processing_time=fit_line([t[0] for t in timed], [float(t[1]) for t in timed]),
+        breakdown=breakdown,
+    )
+
+
+def _aggregate_breakdown(entries: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Sum breakdown entries by model name."""
+    per_model: Dict[str, Dict[str, float]] = {}
+    for entry in entries:
+        model = entry.get("model")
+        if not model:
+            continue
+        totals = per_model.setdefault(model, {metric: 0.0 for metric in BREAKDOWN_METRICS})
+        for metric in BREAKDOWN_METRICS:
+            totals[metric] += float(entry.get(metric) or 0)
+    return per_model
+
+
+class CostPredictor:
+    """In-memory cost/latency predictor, refreshed from the database."""
+
+    def __init__(self):
+        self._models: Dict[str, PipelineModel] = {}
+        self.fitted_at: Optional[datetime] = None
+
+    def is_ready(self, extraction_type: str) -> bool:
+        """True if enough history exists to predict this pipeline."""
+        model = self._models.get(extraction_type)
+        return model is not None and model.sample_size >= PREDICTOR_MIN_SAMPLES
+
+    def fit(self, rows: Iterable[Tuple[Dict[str, Any], int, Optional[float], Optional[float]]]) -> None:
+        """
+        Fit all pipelines.
+
+        Args:
+            rows: (models_usage, subsidiaries_count, processing_time, cost_eur) tuples
+        """
+        samples: Dict[str, List[Dict[str, Any]]] = {pipeline: [] for pipeline in PIPELINES}
+        for models_usage, subsidiaries_count, processing_time, cost_eur in rows:
+            if not isinstance(models_usage, dict) or cost_eur is None:
+                continue
+            samples[detect_pipeline(models_usage)].append({
+                "subsidiaries_count": subsidiaries_count or 0,
+                "processing_time": processing_time,
+                "cost_eur": cost_eur,
+                "breakdown": _aggregate_breakdown(models_usage.get("models_breakdown") or []),
+            })
+
+        self._models = {
+            pipeline: fit_pipeline(pipeline_samples)
+            for pipeline, pipeline_samples in samples.items()
+            if pipeline_samples
+        }
+        self.fitted_at = datetime.now(timezone.utc)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Refit from the most recent completed extractions (cost columns only).
+
+        Args:
+            db: Database session
+        """
+        result = await db.execute(
+            select(
+                CompanyExtraction.models_usage,
+                CompanyExtraction.subsidiaries_count,
+                CompanyExtraction.processing_time,
+                CompanyExtraction.cost_eur,
+            )
+            .where(CompanyExtraction.status == ExtractionStatus.COMPLETED)
+            .where(CompanyExtraction.models_usage.isnot(None))
+            .order_by(CompanyExtraction.created_at.desc())
+            .limit(PREDICTOR_SAMPLE_SIZE)
+        )
+        self.fit(result.all())
+        logger.info(
+            "Cost predictor refreshed: "
+            + ", ".join(f"{p}={m.sample_size} samples" for p, m in self._models.items())
+        )
+
+    async def run_refresh_loop(self, session_factory, interval: int = PREDICTOR_REFRESH_INTERVAL) -> None:
+        """
+        Refresh the predictor forever (to be run as a background task).
+
+        Args:
+            session_factory: Async session factory (e.g. AsyncSessionLocal)
+            interval: Seconds between refreshes
+        """
+        while True:
+            try:
+                async with session_factory() as db:
+                    await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cost predictor refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def predict(self, extraction_type: str, subsidiaries_count: int) -> Optional[Dict[str, Any]]:
+        """
+        Predict cost and latency of an extraction.
+
+        Args:
+            extraction_type: "simple" or "advanced"
+            subsidiaries_count: Expected number of subsidiaries
+
+        Returns:
+            Estimate in the calculate_extraction_cost format, plus
+            cost_eur_p90, estimated_processing_time and sample_size;
+            None if the pipeline has not enough history
+        """
+        if not self.is_ready(extraction_type):
+            return None
+        model = self._models[extraction_type]
+        x = float(subsidiaries_count)
+
+        models_breakdown = []
+        for model_name, fits in model.breakdown.items():
+            values = {metric: fits[metric].predict(x) for metric in BREAKDOWN_METRICS}
+            models_breakdown.append({
+                "model": model_name,
+                "input_tokens": int(round(values["input_tokens"])),
+                "cached_input_tokens": int(round(values["cached_input_tokens"])),
+                "output_tokens": int(round(values["output_tokens"])),
+                "cost_usd": round(values["cost_usd"], 6),
+                "cost_eur": round(values["cost_eur"], 6),
+            })
+
+        total_input = sum(m["input_tokens"] for m in models_breakdown)
+        total_output = sum(m["output_tokens"] for m in models_breakdown)
+        total_cost_eur = sum(m["cost_eur"] for m in models_breakdown)
+        total_cost_usd = sum(m["cost_usd"] for m in models_breakdown)
+
+        from services.cost_tracking_service import ModelPricing
+
+        return {
+            "total_input_tokens": total_input,
+            "total_cached_input_tokens": sum(m["cached_input_tokens"] for m in models_breakdown),
+            "total_output_tokens": total_output,
+            "total_tokens": total_input + total_output,
+            "total_cost_usd": round(total_cost_usd, 6),
+            "total_cost_eur": round(total_cost_eur, 6),
+            "models_breakdown": models_breakdown,
+            "exchange_rate": float(ModelPricing.USD_TO_EUR_RATE),
+            "cost_eur_p90": round(total_cost_eur + P90_Z * model.cost_eur.residual_std, 6),
+            "estimated_processing_time": round(model.processing_time.predict(x), 1),
+            "sample_size": model.sample_size,
+        }
+
+    def admit(
+        self,
+        extraction_type: str,
+        subsidiaries_count: int,
+        remaining_budget_eur: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Decide whether an extraction fits the remaining budget.
+
+        The pessimistic (p90) cost is compared to the remaining budget; an
+        advanced request that does not fit is downgraded to simple if that fits.
+
+        Args:
+            extraction_type: Requested pipeline ("simple" or "advanced")
+            subsidiaries_count: Expected number of subsidiaries
+            remaining_budget_eur: Remaining monthly budget (None = no limit)
+
+        Returns:
+            Dict with decision ("accept" / "downgrade" / "reject"),
+            extraction_type to run and predicted_cost_eur
+        """
+        from services.cost_tracking_service import CostTrackingService
+
+        def _p90(pipeline: str) -> float:
+            prediction = self.predict(pipeline, subsidiaries_count)
+            if prediction is not None:
+                return prediction["cost_eur_p90"]
+            return CostTrackingService.estimate_search_cost(
+                pipeline, subsidiaries_count > 0, subsidiaries_count
+            )["total_cost_eur"]
+
+        requested_cost = _p90(extraction_type)
+        if remaining_budget_eur is None or requested_cost <= remaining_budget_eur:
+            return {"decision": "accept", "extraction_type": extraction_type, "predicted_cost_eur": requested_cost}
+
+        if extraction_type == "advanced":
+            simple_cost = _p90("simple")
+            if simple_cost <= remaining_budget_eur:
+                return {"decision": "downgrade", "extraction_type": "simple", "predicted_cost_eur": simple_cost}
+
+        return {"decision": "reject", "extraction_type": extraction_type, "predicted_cost_eur": requested_cost}
+
+
+# Global instance
+cost_predictor = CostPredictor()
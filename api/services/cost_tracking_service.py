@@ -3,14 +3,16 @@ Cost tracking service for AI model usage.
 Tracks token usage and calculates costs for each extraction.
 """
 
-from datetime import datetime
+from datetime import date, datetime, timezone
 from typing import Dict, Any, Optional, List
 from decimal import Decimal
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 import logging
 
-from models.db_models import CompanyExtraction
+from models.db_models import CompanyExtraction, ExtractionStatus, OrganizationDailyCost
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,7 @@ class ModelPricing:
     GPT_4O = {
         "name": "gpt-4o",
         "input_price_per_1m": 2.50,  # $2.50 per 1M input tokens
+        "cached_input_price_per_1m": 1.25,  # $1.25 per 1M cached input tokens
         "output_price_per_1m": 10.00,  # $10.00 per 1M output tokens
     }
 
@@ -32,6 +35,7 @@ class ModelPricing:
     GPT_4O_MINI = {
         "name": "gpt-4o-mini",
         "input_price_per_1m": 0.15,  # $0.15 per 1M input tokens
+        "cached_input_price_per_1m": 0.075,  # $0.075 per 1M cached input tokens
         "output_price_per_1m": 0.60,  # $0.60 per 1M output tokens
     }
 
@@ -39,6 +43,7 @@ class ModelPricing:
     GPT_4O_SEARCH = {
         "name": "gpt-4o-search-preview",
         "input_price_per_1m": 2.50,  # Same as GPT-4o
+        "cached_input_price_per_1m": 2.50,  # No cache discount on search models
         "output_price_per_1m": 10.00,
     }
 
@@ -46,6 +51,7 @@ class ModelPricing:
     SONAR_PRO = {
         "name": "sonar-pro",
         "input_price_per_1m": 3.00,  # $3.00 per 1M input tokens (Perplexity pricing)
+        "cached_input_price_per_1m": 3.00,  # No prompt caching on Perplexity
         "output_price_per_1m": 15.00,  # $15.00 per 1M output tokens
     }
 
@@ -86,15 +92,17 @@ class ModelPricing:
         cls,
         model_name: str,
         input_tokens: int,
-        output_tokens: int
+        output_tokens: int,
+        cached_input_tokens: int = 0
     ) -> Decimal:
         """
         Calculate cost in USD for token usage.
 
         Args:
             model_name: Name of the AI model
-            input_tokens: Number of input tokens
+            input_tokens: Number of input tokens (cached tokens included)
             output_tokens: Number of output tokens
+            cached_input_tokens: Part of input_tokens served from the prompt cache
 
         Returns:
             Cost in USD as Decimal
@@ -103,11 +111,20 @@ class ModelPricing:
         if not pricing:
             return Decimal("0")
 
+        # Cached tokens are billed at the discounted rate
+        cached_input_tokens = max(0, min(cached_input_tokens or 0, input_tokens))
+        uncached_input_tokens = input_tokens - cached_input_tokens
+        cached_price = pricing.get("cached_input_price_per_1m", pricing["input_price_per_1m"])
+
         # Calculate costs (price is per 1M tokens)
         input_cost = (
-            Decimal(str(input_tokens))
+            Decimal(str(uncached_input_tokens))
             * Decimal(str(pricing["input_price_per_1m"]))
             / Decimal("1000000")
+        ) + (
+            Decimal(str(cached_input_tokens))
+            * Decimal(str(cached_price))
+            / Decimal("1000000")
         )
         output_cost = (
             Decimal(str(output_tokens))
@@ -123,20 +140,24 @@ class ModelPricing:
         cls,
         model_name: str,
         input_tokens: int,
-        output_tokens: int
+        output_tokens: int,
+        cached_input_tokens: int = 0
     ) -> Decimal:
         """
         Calculate cost in EUR for token usage.
 
         Args:
             model_name: Name of the AI model
-            input_tokens: Number of input tokens
+            input_tokens: Number of input tokens (cached tokens included)
             output_tokens: Number of output tokens
+            cached_input_tokens: Part of input_tokens served from the prompt cache
 
         Returns:
             Cost in EUR as Decimal
         """
-        cost_usd = cls.calculate_cost_usd(model_name, input_tokens, output_tokens)
+        cost_usd = cls.calculate_cost_usd(
+            model_name, input_tokens, output_tokens, cached_input_tokens
+        )
         cost_eur = cost_usd * cls.USD_TO_EUR_RATE
         return cost_eur.quantize(Decimal("0.000001"))  # 6 decimal places
 
@@ -144,6 +165,39 @@ class ModelPricing:
 class CostTrackingService:
     """Service for tracking and analyzing extraction costs."""
 
+    # Columns needed by cost list/detail views (never the extraction_data payload)
+    COST_COLUMNS = (
+        CompanyExtraction.id,
+        CompanyExtraction.organization_id,
+        CompanyExtraction.session_id,
+        CompanyExtraction.company_name,
+        CompanyExtraction.extraction_type,
+        CompanyExtraction.created_at,
+        CompanyExtraction.cost_eur,
+        CompanyExtraction.cost_usd,
+        CompanyExtraction.total_tokens,
+        CompanyExtraction.input_tokens,
+        CompanyExtraction.output_tokens,
+        CompanyExtraction.subsidiaries_count,
+        CompanyExtraction.processing_time,
+    )
+
+    @staticmethod
+    def cost_projection(include_models_usage: bool = True):
+        """
+        Loader option restricting a CompanyExtraction query to cost columns.
+
+        Args:
+            include_models_usage: Also load the models_usage JSONB breakdown
+
+        Returns:
+            load_only() option to pass to Select.options()
+        """
+        columns = CostTrackingService.COST_COLUMNS
+        if include_models_usage:
+            columns = columns + (CompanyExtraction.models_usage,)
+        return load_only(*columns)
+
     @staticmethod
     def calculate_extraction_cost(
         models_usage: List[Dict[str, Any]]
@@ -157,6 +211,7 @@ class CostTrackingService:
                     {
                         "model": "gpt-4o",
                         "input_tokens": 1000,
+                        "cached_input_tokens": 800,
                         "output_tokens": 500
                     },
                     {
@@ -170,6 +225,7 @@ class CostTrackingService:
             Dictionary with cost breakdown:
             {
                 "total_input_tokens": 3000,
+                "total_cached_input_tokens": 800,
                 "total_output_tokens": 1500,
                 "total_tokens": 4500,
                 "total_cost_usd": 0.0625,
@@ -179,6 +235,7 @@ class CostTrackingService:
             }
         """
         total_input_tokens = 0
+        total_cached_input_tokens = 0
         total_output_tokens = 0
         total_cost_usd = Decimal("0")
         total_cost_eur = Decimal("0")
@@ -187,16 +244,18 @@ class CostTrackingService:
         for usage in models_usage:
             model_name = usage.get("model", "gpt-4o-mini")
             input_tokens = usage.get("input_tokens", 0)
+            cached_input_tokens = usage.get("cached_input_tokens", 0)
             output_tokens = usage.get("output_tokens", 0)
 
             cost_usd = ModelPricing.calculate_cost_usd(
-                model_name, input_tokens, output_tokens
+                model_name, input_tokens, output_tokens, cached_input_tokens
             )
             cost_eur = ModelPricing.calculate_cost_eur(
-                model_name, input_tokens, output_tokens
+                model_name, input_tokens, output_tokens, cached_input_tokens
             )
 
             total_input_tokens += input_tokens
+            total_cached_input_tokens += cached_input_tokens
             total_output_tokens += output_tokens
             total_cost_usd += cost_usd
             total_cost_eur += cost_eur
@@ -204,6 +263,7 @@ class CostTrackingService:
             model_breakdown.append({
                 "model": model_name,
                 "input_tokens": input_tokens,
+                "cached_input_tokens": cached_input_tokens,
                 "output_tokens": output_tokens,
                 "cost_usd": float(cost_usd),
                 "cost_eur": float(cost_eur)
@@ -211,6 +271,7 @@ class CostTrackingService:
 
         return {
             "total_input_tokens": total_input_tokens,
+            "total_cached_input_tokens": total_cached_input_tokens,
             "total_output_tokens": total_output_tokens,
             "total_tokens": total_input_tokens + total_output_tokens,
             "total_cost_usd": float(total_cost_usd),
@@ -242,6 +303,7 @@ class CostTrackingService:
             logger.info("💰 Utilisation des données de coûts en temps réel")
             return {
                 "total_input_tokens": real_time_data.get("input_tokens", 0),
+                "total_cached_input_tokens": real_time_data.get("cached_input_tokens", 0),
                 "total_output_tokens": real_time_data.get("output_tokens", 0),
                 "total_tokens": real_time_data.get("input_tokens", 0) + real_time_data.get("output_tokens", 0),
                 "total_cost_usd": float(real_time_data.get("cost_usd", 0)),
@@ -450,6 +512,7 @@ class CostTrackingService:
         logger.info("💰 Calcul des coûts basé sur les données réelles")
         
         total_input_tokens = 0
+        total_cached_input_tokens = 0
         total_output_tokens = 0
         total_cost_usd = Decimal("0")
         total_cost_eur = Decimal("0")
@@ -470,24 +533,35 @@ class CostTrackingService:
                 continue
                 
             group_input_tokens = sum(t.get("input_tokens", 0) for t in tool_group)
+            group_cached_input_tokens = sum(t.get("cached_input_tokens", 0) for t in tool_group)
             group_output_tokens = sum(t.get("output_tokens", 0) for t in tool_group)
-            group_total_tokens = sum(t.get("total_tokens", 0) for t in tool_group)
+            group_calls = sum(t.get("calls", 1) for t in tool_group)
             
-            # Calculer le coût basé sur le modèle utilisé
+            # Calculer le coût de chaque entrée (tool, modèle) avec son propre modèle
             model_name = tool_group[0].get("model", "gpt-4o-search-preview")
-            group_cost_usd = ModelPricing.calculate_cost_usd(
-                model_name, group_input_tokens, group_output_tokens
+            group_cost_usd = sum(
+                (
+                    ModelPricing.calculate_cost_usd(
+                        t.get("model", model_name),
+                        t.get("input_tokens", 0),
+                        t.get("output_tokens", 0),
+                        t.get("cached_input_tokens", 0)
+                    )
+                    for t in tool_group
+                ),
+                Decimal("0")
             )
             group_cost_eur = group_cost_usd * ModelPricing.USD_TO_EUR_RATE
             
             # Ajouter les coûts des appels de recherche web ($10.00 pour 1000 appels)
             if tool_name == "web_search":
-                web_search_calls = len(tool_group)
+                web_search_calls = group_calls
                 calls_cost_usd = Decimal(str((web_search_calls / 1000) * 10.00))
                 group_cost_usd += calls_cost_usd
                 group_cost_eur += calls_cost_usd * ModelPricing.USD_TO_EUR_RATE
             
             total_input_tokens += group_input_tokens
+            total_cached_input_tokens += group_cached_input_tokens
             total_output_tokens += group_output_tokens
             total_cost_usd += group_cost_usd
             total_cost_eur += group_cost_eur
@@ -495,20 +569,22 @@ class CostTrackingService:
             tools_breakdown.append({
                 "model": f"{model_name} ({tool_name})",
                 "input_tokens": group_input_tokens,
+                "cached_input_tokens": group_cached_input_tokens,
                 "output_tokens": group_output_tokens,
                 "cost_usd": float(group_cost_usd),
                 "cost_eur": float(group_cost_eur),
-                "calls": len(tool_group),
+                "calls": group_calls,
                 "real_data": True
             })
             
             logger.info(
                 f"💰 {tool_name}: {group_input_tokens} in + {group_output_tokens} out = "
-                f"{group_cost_eur:.4f}€ ({len(tool_group)} appels)"
+                f"{group_cost_eur:.4f}€ ({group_calls} appels)"
             )
         
         return {
             "total_input_tokens": total_input_tokens,
+            "total_cached_input_tokens": total_cached_input_tokens,
             "total_output_tokens": total_output_tokens,
             "total_tokens": total_input_tokens + total_output_tokens,
             "total_cost_usd": float(total_cost_usd),
@@ -536,7 +612,15 @@ class CostTrackingService:
         Returns:
             Dictionary with cost statistics
         """
-        query = select(CompanyExtraction).where(
+        query = select(
+            func.count().label("total_searches"),
+            func.count().filter(
+                CompanyExtraction.status == ExtractionStatus.COMPLETED
+            ).label("completed_searches"),
+            func.coalesce(func.sum(CompanyExtraction.cost_eur), 0).label("total_cost_eur"),
+            func.coalesce(func.sum(CompanyExtraction.cost_usd), 0).label("total_cost_usd"),
+            func.coalesce(func.sum(CompanyExtraction.total_tokens), 0).label("total_tokens"),
+        ).where(
             CompanyExtraction.organization_id == organization_id
         )
 
@@ -545,25 +629,32 @@ class CostTrackingService:
         if end_date:
             query = query.where(CompanyExtraction.created_at <= end_date)
 
-        result = await db.execute(query)
-        extractions = result.scalars().all()
+        row = (await db.execute(query)).one()
 
-        total_cost_eur = Decimal("0")
-        total_cost_usd = Decimal("0")
-        total_tokens = 0
-        total_searches = len(extractions)
-        completed_searches = 0
-
-        for extraction in extractions:
-            if extraction.cost_eur:
-                total_cost_eur += Decimal(str(extraction.cost_eur))
-            if extraction.cost_usd:
-                total_cost_usd += Decimal(str(extraction.cost_usd))
-            if extraction.total_tokens:
-                total_tokens += extraction.total_tokens
-            if extraction.status.value == "completed":
-                completed_searches += 1
+        return CostTrackingService._build_cost_stats(
+            organization_id,
+            total_searches=row.total_searches,
+            completed_searches=row.completed_searches,
+            total_cost_eur=row.total_cost_eur,
+            total_cost_usd=row.total_cost_usd,
+            total_tokens=row.total_tokens,
+            start_date=start_date,
+            end_date=end_date
+        )
 
+    @staticmethod
+    def _build_cost_stats(
+        organization_id: str,
+        total_searches: int,
+        completed_searches: int,
+        total_cost_eur: float,
+        total_cost_usd: float,
+        total_tokens: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Build the cost statistics dictionary from aggregated values."""
+        total_cost_eur = Decimal(str(total_cost_eur or 0))
         avg_cost_per_search_eur = (
             total_cost_eur / Decimal(str(completed_searches))
             if completed_searches > 0
@@ -575,13 +666,61 @@ class CostTrackingService:
             "total_searches": total_searches,
             "completed_searches": completed_searches,
             "total_cost_eur": float(total_cost_eur),
-            "total_cost_usd": float(total_cost_usd),
-            "total_tokens": total_tokens,
+            "total_cost_usd": float(total_cost_usd or 0),
+            "total_tokens": int(total_tokens or 0),
             "average_cost_per_search_eur": float(avg_cost_per_search_eur),
             "start_date": start_date.isoformat() if start_date else None,
             "end_date": end_date.isoformat() if end_date else None
         }
 
+    @staticmethod
+    async def add_daily_costs(
+        organization_id: Any,
+        day: date,
+        completed_searches: int,
+        cost_usd: float,
+        cost_eur: float,
+        total_tokens: int,
+        db: AsyncSession
+    ) -> None:
+        """
+        Increment the daily cost rollup of an organization (single upsert).
+
+        Called by the completion writer for each batch of completions of the
+        same organization and day. The caller commits.
+
+        Args:
+            organization_id: Organization UUID
+            day: Rollup day (UTC extraction creation date)
+            completed_searches: Number of completed extractions to add
+            cost_usd: Cost to add in USD
+            cost_eur: Cost to add in EUR
+            total_tokens: Tokens to add
+            db: Database session
+        """
+        values = {
+            "organization_id": organization_id,
+            "day": day,
+            "completed_searches": completed_searches,
+            "cost_usd": cost_usd,
+            "cost_eur": cost_eur,
+            "total_tokens": total_tokens,
+        }
+        table = OrganizationDailyCost.__table__
+        stmt = insert(OrganizationDailyCost).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_org_day",
+            set_={
+                "completed_searches": table.c.completed_searches + completed_searches,
+                "cost_usd": table.c.cost_usd + cost_usd,
+                "cost_eur": table.c.cost_eur + cost_eur,
+                "total_tokens": table.c.total_tokens + total_tokens,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+        logger.debug(f"Daily cost rollup updated for organization {organization_id} ({day.isoformat()})")
+
     @staticmethod
     async def get_monthly_costs(
         organization_id: str,
@@ -601,21 +740,44 @@ class CostTrackingService:
         Returns:
             Dictionary with monthly cost statistics
         """
-        from datetime import date
         from calendar import monthrange
 
         # Get first and last day of month
         first_day = date(year, month, 1)
         last_day = date(year, month, monthrange(year, month)[1])
 
-        start_datetime = datetime.combine(first_day, datetime.min.time())
-        end_datetime = datetime.combine(last_day, datetime.max.time())
+        start_datetime = datetime.combine(first_day, datetime.min.time(), tzinfo=timezone.utc)
+        end_datetime = datetime.combine(last_day, datetime.max.time(), tzinfo=timezone.utc)
+
+        # Costs come from the daily rollup (at most 31 small rows)
+        rollup = (await db.execute(
+            select(
+                func.coalesce(func.sum(OrganizationDailyCost.completed_searches), 0).label("completed_searches"),
+                func.coalesce(func.sum(OrganizationDailyCost.cost_eur), 0).label("total_cost_eur"),
+                func.coalesce(func.sum(OrganizationDailyCost.cost_usd), 0).label("total_cost_usd"),
+                func.coalesce(func.sum(OrganizationDailyCost.total_tokens), 0).label("total_tokens"),
+            )
+            .where(OrganizationDailyCost.organization_id == organization_id)
+            .where(OrganizationDailyCost.day.between(first_day, last_day))
+        )).one()
+
+        # All searches (including pending/failed) are counted on the (organization_id, created_at) index
+        total_searches = (await db.execute(
+            select(func.count())
+            .select_from(CompanyExtraction)
+            .where(CompanyExtraction.organization_id == organization_id)
+            .where(CompanyExtraction.created_at.between(start_datetime, end_datetime))
+        )).scalar_one()
 
-        return await CostTrackingService.get_organization_costs(
+        return CostTrackingService._build_cost_stats(
             organization_id,
-            start_datetime,
-            end_datetime,
-            db
+            total_searches=total_searches,
+            completed_searches=rollup.completed_searches,
+            total_cost_eur=rollup.total_cost_eur,
+            total_cost_usd=rollup.total_cost_usd,
+            total_tokens=rollup.total_tokens,
+            start_date=start_datetime,
+            end_date=end_datetime
         )
 
     @staticmethod
@@ -637,6 +799,7 @@ class CostTrackingService:
         """
         query = (
             select(CompanyExtraction)
+            .options(CostTrackingService.cost_projection())
             .where(CompanyExtraction.organization_id == organization_id)
             .where(CompanyExtraction.cost_eur.isnot(None))
             .order_by(CompanyExtraction.cost_eur.desc())
@@ -680,6 +843,19 @@ class CostTrackingService:
         Returns:
             Dictionary with cost estimate
         """
+        # Prefer the predictor fitted on historical extractions when it has enough data
+        from services.cost_predictor import cost_predictor
+
+        estimated_subsidiaries = subsidiaries_count if has_subsidiaries else 0
+        prediction = cost_predictor.predict(extraction_type, estimated_subsidiaries)
+        if prediction is not None:
+            return {
+                **prediction,
+                "estimate_type": "historical",
+                "extraction_type": extraction_type,
+                "estimated_subsidiaries": estimated_subsidiaries
+            }
+
         # Base extraction (Company Analyzer + Information Extractor)
         # Estimate: ~5K input + ~2K output tokens with gpt-4o-mini
         base_usage = [
@@ -721,6 +897,24 @@ class CostTrackingService:
             "estimated_subsidiaries": subsidiaries_count if has_subsidiaries else 0
         }
 
+    @staticmethod
+    def get_monthly_budget_eur(organization: Any) -> Optional[float]:
+        """
+        Get the monthly budget of an organization (settings["monthly_budget_eur"]).
+
+        Args:
+            organization: Organization model
+
+        Returns:
+            Budget in EUR, or None if no budget is configured
+        """
+        budget = (organization.settings or {}).get("monthly_budget_eur")
+        try:
+            return float(budget) if budget is not None else None
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid monthly_budget_eur for organization {organization.id}: {budget!r}")
+            return None
+
     async def get_extraction_cost(self, session_id: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
         """
         Get cost information for a specific extraction by session_id.
@@ -733,7 +927,9 @@ class CostTrackingService:
             Dictionary with cost information or None if not found
         """
         result = await db.execute(
-            select(CompanyExtraction).where(CompanyExtraction.session_id == session_id)
+            select(CompanyExtraction)
+            .options(CostTrackingService.cost_projection())
+            .where(CompanyExtraction.session_id == session_id)
         )
         extraction = result.scalar_one_or_none()
         
@@ -2,6 +2,7 @@
 JWT Service for token generation and validation.
 """
 
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
@@ -42,6 +43,7 @@ class JWTService:
         to_encode.update({
             "exp": expire,
             "iat": datetime.utcnow(),
+            "jti": uuid.uuid4().hex,
             "type": "access"
         })
 
@@ -128,7 +130,8 @@ class JWTService:
                 email=payload.get("email"),
                 organization_id=payload.get("organization_id"),
                 role=payload.get("role"),
-                exp=datetime.fromtimestamp(payload.get("exp")) if payload.get("exp") else None
+                exp=datetime.fromtimestamp(payload.get("exp")) if payload.get("exp") else None,
+                jti=payload.get("jti")
             )
 
             return token_data
@@ -2,12 +2,13 @@
 Service de gestion WebSocket
 """
 
-import json
 import asyncio
 import logging
 from datetime import datetime
+from typing import Optional, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
-from status import status_manager
+from core.serialization import dumps, dumps_bytes
+from status import status_manager, codec
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +26,7 @@ async def handle_websocket_connection(websocket: WebSocket, session_id: str) ->
         logger.info(f"📡 Connexion WebSocket pour session temporaire: {session_id}")
         # Pour les sessions temporaires, on attend que la vraie session soit créée
         await websocket.send_text(
-            json.dumps(
+            dumps(
                 {
                     "type": "waiting",
                     "message": "En attente de l'initialisation de la session...",
@@ -43,7 +44,7 @@ async def handle_websocket_connection(websocket: WebSocket, session_id: str) ->
         # Envoyer l'état initial s'il existe
         progress = await status_manager.get_session_progress(session_id)
         if progress:
-            initial_state = json.dumps(progress.to_dict())
+            initial_state = dumps(progress.to_dict())
             await websocket.send_text(initial_state)
 
         # Boucle d'écoute des mises à jour avec heartbeat amélioré
@@ -57,7 +58,7 @@ async def handle_websocket_connection(websocket: WebSocket, session_id: str) ->
                 # Envoyer un ping pour maintenir la connexion (toutes les 25s si pas d'activité)
                 now = datetime.now()
                 if (now - last_ping).total_seconds() >= 25:
-                    ping_message = json.dumps(
+                    ping_message = dumps(
                         {"type": "ping", "timestamp": now.isoformat()}
                     )
                     await websocket.send_text(ping_message)
@@ -105,6 +106,31 @@ async def get_extraction_results(session_id: str) -> dict:
     return extraction_data
 
 
+async def get_extraction_results_payload(
+    session_id: str, accept_encoding: str = ""
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Récupère les résultats d'une session sous forme de corps JSON prêt à envoyer
+
+    Les octets stockés sont transmis sans désérialisation (compressés si le client
+    accepte l'encodage). Les charges msgpack sont décodées puis resérialisées.
+
+    Returns:
+        (corps JSON, Content-Encoding ou None)
+    """
+    data = await status_manager.get_raw_extraction_results(session_id)
+    if not data:
+        raise ValueError(
+            f"Aucune donnée d'extraction trouvée pour la session {session_id}"
+        )
+
+    payload = codec.http_payload(data, accept_encoding)
+    if payload is None:
+        extraction_data = await status_manager.get_extraction_results(session_id)
+        payload = dumps_bytes(extraction_data), None
+    return payload
+
+
 async def list_active_sessions() -> list:
     """
     Liste toutes les sessions actives
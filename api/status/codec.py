@@ -0,0 +1,196 @@
+"""
+Format de stockage des charges Redis (results:* et session:*).
+
+Chaque valeur écrite commence par un en-tête de 4 octets :
+
+    0xFA | version | sérialiseur | compression
+
+- sérialiseur : JSON (core.serialization) ou msgpack ;
+- compression : aucune (sous REDIS_COMPRESS_MIN_BYTES), gzip, ou zstd.
+
+msgpack et zstandard sont des dépendances du projet ; s'ils manquent, l'écriture
+se replie sur JSON et gzip.
+
+0xFA ne peut pas commencer un document JSON UTF-8 : les valeurs écrites avant
+ce format (JSON brut) sont relues telles quelles.
+
+Les charges JSON compressées peuvent être servies sans désérialisation aux
+clients qui acceptent l'encodage (voir http_payload).
+"""
+
+import gzip
+import logging
+from typing import Any, Optional, Tuple, Union
+
+from core.config import settings
+from core.serialization import dumps_bytes, loads
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - installation incomplète
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - installation incomplète
+    zstandard = None
+
+MAGIC = 0xFA
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+SERIALIZER_JSON = 1
+SERIALIZER_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_GZIP = 1
+COMPRESSION_ZSTD = 2
+
+# Nom de l'encodage HTTP (Content-Encoding) de chaque compression
+HTTP_ENCODINGS = {COMPRESSION_GZIP: "gzip", COMPRESSION_ZSTD: "zstd"}
+
+_GZIP_LEVEL = 5
+_ZSTD_LEVEL = 3
+
+
+def _serializer_id() -> int:
+    if settings.REDIS_PAYLOAD_SERIALIZER == "msgpack":
+        if msgpack is not None:
+            return SERIALIZER_MSGPACK
+        logger.warning("⚠️ msgpack non installé, sérialisation JSON des charges Redis")
+    return SERIALIZER_JSON
+
+
+def _compression_id() -> int:
+    choice = settings.REDIS_PAYLOAD_COMPRESSION
+    if choice == "none":
+        return COMPRESSION_NONE
+    if choice in ("zstd", "auto") and zstandard is not None:
+        return COMPRESSION_ZSTD
+    if choice == "zstd":
+        logger.warning("⚠️ zstandard non installé, compression gzip des charges Redis")
+    return COMPRESSION_GZIP
+
+
+def _serialize(obj: Any, serializer: int) -> bytes:
+    if serializer == SERIALIZER_MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True, default=str)
+    return dumps_bytes(obj)
+
+
+def _deserialize(body: bytes, serializer: int) -> Any:
+    if serializer == SERIALIZER_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Charge Redis msgpack illisible: msgpack n'est pas installé")
+        return msgpack.unpackb(body, raw=False)
+    return loads(body)
+
+
+def _compress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(body)
+    if compression == COMPRESSION_GZIP:
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL, mtime=0)
+    return body
+
+
+def _decompress(body: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError("Charge Redis zstd illisible: zstandard n'est pas installé")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(body)
+    return body
+
+
+def _parse_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """(sérialiseur, compression) d'une valeur encodée, None pour du JSON hérité."""
+    if len(data) < HEADER_SIZE or data[0] != MAGIC:
+        return None
+    if data[1] != FORMAT_VERSION:
+        raise ValueError(f"Version de format Redis inconnue: {data[1]}")
+    return data[2], data[3]
+
+
+def encode(obj: Any) -> bytes:
+    """
+    Encode une charge pour Redis (en-tête + corps sérialisé, compressé si volumineux).
+
+    Args:
+        obj: dict/list sérialisable en JSON
+
+    Returns:
+        Octets à stocker
+    """
+    serializer = _serializer_id()
+    body = _serialize(obj, serializer)
+    compression = COMPRESSION_NONE
+    if len(body) >= settings.REDIS_COMPRESS_MIN_BYTES:
+        compression = _compression_id()
+        body = _compress(body, compression)
+    return bytes((MAGIC, FORMAT_VERSION, serializer, compression)) + body
+
+
+def decode(data: Union[bytes, str]) -> Any:
+    """
+    Décode une valeur Redis, encodée par encode() ou JSON hérité.
+
+    Args:
+        data: Valeur lue dans Redis
+
+    Returns:
+        Objet désérialisé
+    """
+    if isinstance(data, str):
+        return loads(data)
+    header = _parse_header(data)
+    if header is None:
+        return loads(data)
+    serializer, compression = header
+    return _deserialize(_decompress(data[HEADER_SIZE:], compression), serializer)
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name)
+    return accepted
+
+
+def http_payload(data: Union[bytes, str], accept_encoding: str = "") -> Optional[Tuple[bytes, Optional[str]]]:
+    """
+    Corps HTTP JSON d'une valeur Redis, sans la désérialiser.
+
+    Le corps compressé est renvoyé tel quel si le client accepte son encodage ;
+    sinon il est seulement décompressé.
+
+    Args:
+        data: Valeur lue dans Redis
+        accept_encoding: En-tête Accept-Encoding de la requête
+
+    Returns:
+        (corps, Content-Encoding ou None), ou None si la charge n'est pas du JSON (msgpack)
+    """
+    if isinstance(data, str):
+        return data.encode("utf-8"), None
+    header = _parse_header(data)
+    if header is None:
+        return data, None
+    serializer, compression = header
+    if serializer != SERIALIZER_JSON:
+        return None
+
+    body = data[HEADER_SIZE:]
+    encoding = HTTP_ENCODINGS.get(compression)
+    if encoding is None:
+        return body, None
+    if encoding in _accepted_encodings(accept_encoding):
+        return body, encoding
+    return _decompress(body, compression), None
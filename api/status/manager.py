@@ -3,13 +3,16 @@ Gestionnaire principal des états des agents
 """
 
 import asyncio
-import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Callable
 
 import redis.asyncio as aioredis
 from core.config import settings
+from core.tracing import traced
+from core.offload import run_cpu
+from core.serialization import dumps
+from . import codec
 from .models import AgentStatus, AgentState, ExtractionProgress
 
 logger = logging.getLogger(__name__)
@@ -23,6 +26,8 @@ class AgentStatusManager:
         self.subscribers: Dict[str, List[asyncio.Queue]] = {}
         # Connexion Redis
         self.redis_client: Optional[aioredis.Redis] = None
+        # Connexion Redis sans décodage pour les charges binaires (results:*, session:*)
+        self.binary_redis_client: Optional[aioredis.Redis] = None
         # Sessions actives en mémoire
         self.active_sessions: Dict[str, ExtractionProgress] = {}
         # Timers pour les étapes
@@ -56,6 +61,18 @@ class AgentStatusManager:
                 raise
         return self.redis_client
 
+    async def _get_binary_redis(self) -> aioredis.Redis:
+        """Obtient la connexion Redis des charges encodées par status.codec (lazy loading)"""
+        if self.binary_redis_client is None:
+            self.binary_redis_client = aioredis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                decode_responses=False,
+            )
+        return self.binary_redis_client
+
     async def create_session(
         self, session_id: str, company_name: str
     ) -> ExtractionProgress:
@@ -127,13 +144,14 @@ class AgentStatusManager:
 
         return progress
 
+    @traced("redis.save_progress")
     async def _save_to_redis(
         self, session_id: str, progress: ExtractionProgress
     ) -> bool:
         """Sauvegarde les données en Redis"""
         try:
-            redis = await self._get_redis()
-            data = json.dumps(progress.to_dict(), ensure_ascii=False)
+            redis = await self._get_binary_redis()
+            data = codec.encode(progress.to_dict())
             await redis.setex(f"session:{session_id}", 7200, data)  # 2h TTL
             return True
         except Exception as e:
@@ -145,26 +163,53 @@ class AgentStatusManager:
     ) -> None:
         """Notifie tous les abonnés WebSocket d'une mise à jour"""
         if session_id in self.subscribers:
-            message = {
+            await self._broadcast(session_id, {
                 "type": "progress_update",
                 "session_id": session_id,
                 "data": progress.to_dict(),
-            }
-            message_str = json.dumps(message, ensure_ascii=False)
+            })
 
-            # Envoyer à toutes les connexions WebSocket
-            disconnected_queues = []
-            for queue in self.subscribers[session_id]:
-                try:
-                    await queue.put(message_str)
-                except Exception as e:
-                    logger.warning(f"⚠️ Queue WebSocket fermée: {e}")
-                    disconnected_queues.append(queue)
+    async def publish_partial_item(
+        self, session_id: str, agent_name: str, kind: str, item: dict
+    ) -> None:
+        """
+        Diffuse un objet complet lu dans la sortie en cours de génération d'un agent.
 
-            # Nettoyer les queues fermées
-            for queue in disconnected_queues:
-                self.subscribers[session_id].remove(queue)
+        Les objets partiels ne sont pas stockés : seul le résultat final fait foi.
 
+        Args:
+            session_id: ID de session
+            agent_name: Agent qui génère la sortie
+            kind: Tableau d'origine (ex: "subsidiaries", "commercial_presence")
+            item: Objet tel que généré (non validé)
+        """
+        if session_id in self.subscribers:
+            await self._broadcast(session_id, {
+                "type": "partial_result",
+                "session_id": session_id,
+                "agent": agent_name,
+                "kind": kind,
+                "data": item,
+            })
+
+    async def _broadcast(self, session_id: str, message: dict) -> None:
+        """Envoie un message à toutes les connexions WebSocket d'une session"""
+        message_str = dumps(message)
+
+        # Envoyer à toutes les connexions WebSocket
+        disconnected_queues = []
+        for queue in self.subscribers.get(session_id, []):
+            try:
+                await queue.put(message_str)
+            except Exception as e:
+                logger.warning(f"⚠️ Queue WebSocket fermée: {e}")
+                disconnected_queues.append(queue)
+
+        # Nettoyer les queues fermées
+        for queue in disconnected_queues:
+            self.subscribers[session_id].remove(queue)
+
+    @traced("redis.get_session")
     async def _get_session(self, session_id: str) -> Optional[ExtractionProgress]:
         """Récupère une session depuis Redis ou le cache local"""
         # D'abord vérifier le cache local
@@ -173,10 +218,10 @@ class AgentStatusManager:
         
         # Sinon, récupérer depuis Redis
         try:
-            redis = await self._get_redis()
+            redis = await self._get_binary_redis()
             data = await redis.get(f"session:{session_id}")
             if data:
-                session_data = json.loads(data)
+                session_data = codec.decode(data)
                 progress = ExtractionProgress.from_dict(session_data)
                 self.active_sessions[session_id] = progress
                 return progress
@@ -185,11 +230,12 @@ class AgentStatusManager:
         
         return None
 
+    @traced("redis.save_session")
     async def _save_session(self, session_id: str, progress: ExtractionProgress) -> bool:
         """Sauvegarde une session en Redis"""
         try:
-            redis = await self._get_redis()
-            data = json.dumps(progress.to_dict(), ensure_ascii=False)
+            redis = await self._get_binary_redis()
+            data = codec.encode(progress.to_dict())
             await redis.setex(f"session:{session_id}", 7200, data)  # 2h TTL
             return True
         except Exception as e:
@@ -269,23 +315,39 @@ class AgentStatusManager:
 
             logger.info(f"✅ Session terminée: {session_id}")
 
+    @traced("redis.store_extraction_results")
     async def store_extraction_results(self, session_id: str, extraction_data: dict):
         """Stocke les données d'extraction finales dans Redis"""
         try:
-            redis = await self._get_redis()
-            data = json.dumps(extraction_data, ensure_ascii=False)
+            redis = await self._get_binary_redis()
+            data = await run_cpu(codec.encode, extraction_data, process_safe=True)
             await redis.setex(f"results:{session_id}", 86400, data)  # 24h TTL
             logger.info(f"💾 Résultats stockés pour session: {session_id}")
         except Exception as e:
             logger.error(f"❌ Erreur stockage résultats session {session_id}: {e}")
 
+    @traced("redis.store_tool_usage")
+    async def store_tool_usage(self, session_id: str, usage: dict):
+        """Stocke l'usage des tools (tokens par tool et modèle) d'une session dans Redis"""
+        redis = await self._get_redis()
+        await redis.setex(f"tool_usage:{session_id}", 86400, dumps(usage))  # 24h TTL
+
+    @traced("redis.get_extraction_results")
     async def get_extraction_results(self, session_id: str) -> Optional[dict]:
         """Récupère les données d'extraction finales depuis Redis"""
+        data = await self.get_raw_extraction_results(session_id)
+        if data:
+            try:
+                return await run_cpu(codec.decode, data, size=len(data), process_safe=True)
+            except Exception as e:
+                logger.error(f"❌ Erreur décodage résultats session {session_id}: {e}")
+        return None
+
+    async def get_raw_extraction_results(self, session_id: str) -> Optional[bytes]:
+        """Récupère les résultats tels que stockés (format status.codec ou JSON hérité)"""
         try:
-            redis = await self._get_redis()
-            data = await redis.get(f"results:{session_id}")
-            if data:
-                return json.loads(data)
+            redis = await self._get_binary_redis()
+            return await redis.get(f"results:{session_id}")
         except Exception as e:
             logger.error(f"❌ Erreur récupération résultats session {session_id}: {e}")
         return None
@@ -564,6 +626,7 @@ class AgentStatusManager:
             f"🔄 Agent détaillé mis à jour: {agent_name} -> {status.value} ({progress:.1%}) - Étape {current_step}/{total_steps}: {step_name}"
         )
 
+    @traced("redis.cleanup_old_sessions")
     async def cleanup_old_sessions(self, max_age_minutes: int = 60):
         """Nettoie les anciennes sessions (Redis gère automatiquement TTL)"""
         try:
@@ -449,6 +449,13 @@ export function AgentProgress({
               return;
             }
 
+            // Aperçus de filiales en cours de génération (partial_result) et
+            // autres messages typés : ce ne sont pas des états de progression
+            if (data?.type && data.type !== "progress_update") {
+              console.log("⏭️ [DEBUG] Message ignoré par la progression:", data.type);
+              return;
+            }
+
             console.log("📡 [DEBUG] Mise à jour des agents reçue:", data);
 
             // Gérer les deux formats de messages WebSocket
@@ -0,0 +1,97 @@
+"""
+Fixtures partagées des tests
+"""
+
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from models.db_models import ExtractionStatus
+
+
+class FakeExtractionDatabase:
+    """Table company_extractions et rollup journalier en mémoire (écritures visibles au commit)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.rollups = defaultdict(lambda: {"completed_searches": 0, "cost_usd": 0.0, "cost_eur": 0.0, "total_tokens": 0})
+        self.commits = 0
+        self.fail_commit = False
+
+    def add_extraction(self, session_id, organization_id, created_at, status=ExtractionStatus.RUNNING, **values):
+        row = SimpleNamespace(
+            id=f"id-{session_id}",
+            session_id=session_id,
+            organization_id=organization_id,
+            created_at=created_at,
+            status=status,
+            cost_usd=None,
+            cost_eur=None,
+            total_tokens=None,
+        )
+        for key, value in values.items():
+            setattr(row, key, value)
+        self.rows[session_id] = row
+        return row
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    """AsyncSession minimale : SELECT ... WHERE session_id IN (...), UPDATE en masse par id, commit"""
+
+    def __init__(self, database):
+        self.database = database
+        self._updates = []
+        self._rollups = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        if params is not None:
+            self._updates.extend(params)
+            return None
+        session_ids = stmt.whereclause.right.value
+        rows = [SimpleNamespace(**vars(self.database.rows[sid])) for sid in session_ids if sid in self.database.rows]
+        return SimpleNamespace(all=lambda: rows)
+
+    async def commit(self):
+        if self.database.fail_commit:
+            raise ConnectionError("database unavailable")
+        by_id = {row.id: row for row in self.database.rows.values()}
+        for values in self._updates:
+            row = by_id[values["id"]]
+            for key, value in values.items():
+                setattr(row, key, value)
+        for key, totals in self._rollups:
+            for field, value in totals.items():
+                self.database.rollups[key][field] += value
+        self.database.commits += 1
+        self._updates, self._rollups = [], []
+
+
+@pytest.fixture
+def extraction_db(monkeypatch):
+    """Remplace la base par FakeExtractionDatabase pour write_completion_records"""
+    from core import database
+    from services.cost_tracking_service import CostTrackingService
+
+    fake = FakeExtractionDatabase()
+
+    async def add_daily_costs(organization_id, day, completed_searches, cost_usd, cost_eur, total_tokens, db):
+        db._rollups.append(((organization_id, day), {
+            "completed_searches": completed_searches,
+            "cost_usd": cost_usd,
+            "cost_eur": cost_eur,
+            "total_tokens": total_tokens,
+        }))
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", fake.session)
+    monkeypatch.setattr(CostTrackingService, "add_daily_costs", staticmethod(add_daily_costs))
+    return fake
@@ -0,0 +1,61 @@
+"""
+Tests des spans de tools ouverts par les hooks d'agent
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from company_agents.metrics import agent_hooks
+from company_agents.metrics.agent_hooks import RealtimeAgentHooks
+
+
+class FakeStatusManager:
+    async def update_agent_status_detailed(self, **kwargs):
+        return None
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Remplace les spans détachés : enregistre (nom, erreur) à la fermeture"""
+    ended = []
+    monkeypatch.setattr(agent_hooks, "start_detached_span", lambda name, **attributes: name)
+    monkeypatch.setattr(agent_hooks, "end_span", lambda span, error=None: ended.append((span, error)))
+    return ended
+
+
+class TestToolSpans:
+    """Tests de la fermeture des spans de tools"""
+
+    @pytest.mark.asyncio
+    async def test_completed_tool_closes_its_span(self, spans):
+        """Vérifie la fermeture sans erreur d'un tool terminé"""
+        hooks = RealtimeAgentHooks(FakeStatusManager(), "s1", "Éclaireur")
+        tool = SimpleNamespace(name="search")
+        await hooks.on_tool_start(None, None, tool)
+        await hooks.on_tool_end(None, None, tool, "ok")
+
+        assert spans == [("tool.search", None)]
+        hooks.end_pending_tool_spans(RuntimeError("boom"))
+        assert len(spans) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_tool_span_is_closed_with_the_error(self, spans):
+        """Vérifie qu'un tool sans on_tool_end est fermé avec l'erreur du run"""
+        hooks = RealtimeAgentHooks(FakeStatusManager(), "s1", "Éclaireur")
+        await hooks.on_tool_start(None, None, SimpleNamespace(name="search"))
+        error = RuntimeError("tool en erreur")
+        hooks.end_pending_tool_spans(error)
+
+        assert spans == [("tool.search", error)]
+        assert hooks._tool_starts == {}
+
+    @pytest.mark.asyncio
+    async def test_agent_end_closes_pending_spans(self, spans):
+        """Vérifie que la fin de l'agent ferme les spans encore ouverts en erreur"""
+        hooks = RealtimeAgentHooks(FakeStatusManager(), "s1", "Éclaireur")
+        await hooks.on_tool_start(None, None, SimpleNamespace(name="search"))
+        await hooks.on_agent_end(None, None)
+
+        assert len(spans) == 1 and spans[0][1] is not None
+        assert hooks._tool_starts == {}
@@ -0,0 +1,153 @@
+"""
+Tests du cache des principals authentifiés (LRU local + Redis)
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.config import settings
+from models.auth import TokenData
+from models.db_models import Organization, PlanType, User, UserRole
+from services.auth_cache import PrincipalCache, _model_from_row, _row_from_model
+
+
+class FakeRedis:
+    """Redis minimal : get/mget/setex/incr/expire, TTL enregistrés"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    async def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+        self.ttls[key] = ttl
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key) or 0) + 1
+        return self.values[key]
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+
+def _principal():
+    organization = Organization(
+        id=uuid.uuid4(), hubspot_company_id="hub-1", name="Groupe", domain="groupe.fr",
+        plan_type=PlanType.FREE, max_searches_per_month=10, is_active=True, settings={"a": 1},
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc), updated_at=datetime(2025, 1, 2, tzinfo=timezone.utc),
+    )
+    user = User(
+        id=uuid.uuid4(), organization_id=organization.id, hubspot_user_id="u-1", email="a@groupe.fr",
+        role=UserRole.ADMIN, is_active=True, last_login_at=None,
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc), updated_at=datetime(2025, 1, 2, tzinfo=timezone.utc),
+    )
+    return user, organization
+
+
+def _token(user, organization, expires_in=3600, jti="jti-1"):
+    return TokenData(
+        user_id=str(user.id),
+        organization_id=str(organization.id),
+        exp=datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        jti=jti,
+    )
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+
+    async def get_redis():
+        return fake
+
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", True)
+    monkeypatch.setattr(PrincipalCache, "_redis", staticmethod(get_redis))
+    return fake
+
+
+class TestRowRoundTrip:
+    """Tests de la sérialisation des lignes ORM"""
+
+    def test_model_from_row_rebuilds_transient_instance(self):
+        """Vérifie la reconstruction des UUID, enums, dates et JSON sans session"""
+        user, organization = _principal()
+        rebuilt = _model_from_row(User, _row_from_model(user))
+        assert rebuilt is not user
+        assert rebuilt.id == user.id and isinstance(rebuilt.id, uuid.UUID)
+        assert rebuilt.role is UserRole.ADMIN
+        assert rebuilt.created_at == user.created_at
+        assert rebuilt.last_login_at is None
+
+        rebuilt_org = _model_from_row(Organization, _row_from_model(organization))
+        assert rebuilt_org.plan_type is PlanType.FREE
+        assert rebuilt_org.settings == {"a": 1}
+
+
+class TestPrincipalCache:
+    """Tests des accès, de l'invalidation et des TTL"""
+
+    @pytest.mark.asyncio
+    async def test_miss_then_local_and_redis_hits(self, redis):
+        """Vérifie le miss initial, le hit local puis le hit Redis d'un autre worker"""
+        user, organization = _principal()
+        token = _token(user, organization)
+        cache = PrincipalCache()
+
+        assert await cache.get(token) is None
+        await cache.set(token, user, organization)
+
+        cached_user, cached_org = await cache.get(token)
+        assert cached_user.email == user.email and cached_org.id == organization.id
+        assert cached_user is not user
+
+        other_worker = PrincipalCache()
+        assert (await other_worker.get(token))[0].id == user.id
+        assert (cache.stats()["hits"], cache.stats()["misses"], other_worker.stats()["redis_hits"]) == (1, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_version_bump_invalidates_every_worker(self, redis):
+        """Vérifie que l'invalidation par version écarte les entrées Redis des autres workers"""
+        user, organization = _principal()
+        token = _token(user, organization)
+        cache, other_worker = PrincipalCache(), PrincipalCache()
+        await cache.set(token, user, organization)
+
+        await cache.invalidate_user(user.id)
+        assert await cache.get(token) is None
+        assert await other_worker.get(token) is None
+
+        await cache.set(token, user, organization)
+        await other_worker.invalidate_organization(organization.id)
+        assert await PrincipalCache().get(token) is None
+
+    @pytest.mark.asyncio
+    async def test_ttl_is_capped_by_token_expiry(self, redis, monkeypatch):
+        """Vérifie que les entrées ne survivent pas au token"""
+        monkeypatch.setattr(settings, "AUTH_CACHE_TTL", 300)
+        user, organization = _principal()
+        cache = PrincipalCache()
+
+        short = _token(user, organization, expires_in=20, jti="short")
+        await cache.set(short, user, organization)
+        assert 0 < redis.ttls[cache._key(short)] <= 20
+
+        expired = _token(user, organization, expires_in=-5, jti="expired")
+        await cache.set(expired, user, organization)
+        assert cache._key(expired) not in redis.values
+        assert await cache.get(expired) is None
+
+    @pytest.mark.asyncio
+    async def test_token_of_another_organization_is_not_served(self, redis):
+        """Vérifie qu'un token pointant vers une autre organisation ne réutilise pas l'entrée"""
+        user, organization = _principal()
+        token = _token(user, organization)
+        await PrincipalCache().set(token, user, organization)
+
+        moved = token.model_copy(update={"organization_id": str(uuid.uuid4())})
+        assert await PrincipalCache().get(moved) is None
+
@@ -0,0 +1,22 @@
+"""
+Tests du rejeu hors ligne des traces de benchmark
+"""
+
+import pytest
+
+from benchmarks.harness import DEFAULT_CORPUS_DIR, load_corpus, run_trace
+
+
+class TestReplay:
+    """Tests de run_trace sur le corpus livré"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("trace", load_corpus(DEFAULT_CORPUS_DIR), ids=lambda trace: trace["name"])
+    async def test_trace_replays_research_through_search_fake(self, trace):
+        """Vérifie le rejeu sans erreur et le passage de la recherche par le client simulé"""
+        metrics = await run_trace(trace, time_scale=0.001)
+
+        assert metrics["error"] is None
+        assert metrics["search_calls"] >= 1
+        assert metrics["llm_calls"] >= 4
+        assert metrics["subsidiaries"] > 0
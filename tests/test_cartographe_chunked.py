@@ -0,0 +1,238 @@
+"""
+Tests pour la structuration par segments du Cartographe et le limiteur LLM partagé
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from company_agents import rate_limiter
+from company_agents.rate_limiter import LLMRateLimiter
+from company_agents.subs_agents import cartographe_chunked
+from company_agents.subs_agents.cartographe_chunked import (
+    CHUNK_STATIC_HEADER,
+    reduce_subsidiary_reports,
+    run_chunked_structuring,
+    segment_research_text,
+    structuring_input,
+)
+
+
+def _subsidiary(name: str, confidence: float, url: str, city=None) -> dict:
+    return {
+        "legal_name": name,
+        "type": "subsidiary",
+        "headquarters": {"city": city, "country": "France"},
+        "confidence": confidence,
+        "sources": [{"title": "Registre", "url": url}],
+    }
+
+
+def _research_text(entities: int) -> str:
+    lines = ["FILIALES JURIDIQUES:"]
+    for i in range(entities):
+        lines.append(f"{i + 1}. Filiale {i} SAS")
+        lines.append("   Activité : distribution " + "x" * 200)
+    return "\n".join(lines)
+
+
+class FakeAgent:
+    """Agent minimal : clone() conserve les attributs passés"""
+
+    def __init__(self, name="Cartographe", instructions="Tu es le Cartographe.\n# WORKFLOW\nappelle l'outil\n# RÈGLES CRITIQUES\nrègles", tools=("search",)):
+        self.name = name
+        self.instructions = instructions
+        self.tools = list(tools)
+
+    def clone(self, **kwargs):
+        values = {"name": self.name, "instructions": self.instructions, "tools": self.tools}
+        values.update(kwargs)
+        return FakeAgent(**values)
+
+
+class TestSegmentation:
+    """Tests du découpage du texte de recherche"""
+
+    def test_short_text_is_a_single_segment(self):
+        """Vérifie qu'un texte court n'est pas découpé"""
+        assert segment_research_text("Filiale A", max_chars=100) == ["Filiale A"]
+        assert segment_research_text("", max_chars=100) == []
+
+    def test_segments_respect_budget_and_keep_section_header(self):
+        """Vérifie la taille des segments et la reprise de l'en-tête de section"""
+        text = _research_text(12)
+        segments = segment_research_text(text, max_chars=1000)
+
+        assert len(segments) > 1
+        assert all(len(segment) <= 1000 + 300 for segment in segments)
+        assert all(segment.startswith("FILIALES JURIDIQUES:") for segment in segments)
+        # Aucune entité perdue ni dupliquée
+        joined = "\n".join(segments)
+        assert all(joined.count(f"Filiale {i} SAS") == 1 for i in range(12))
+
+
+class TestReducer:
+    """Tests de la fusion déterministe des rapports partiels"""
+
+    def test_duplicates_are_merged_with_sources_and_max_confidence(self):
+        """Vérifie la fusion des doublons (sources cumulées, confiance max, champs complétés)"""
+        reports = [
+            {"company_name": "Groupe", "subsidiaries": [_subsidiary("Filiale A", 0.6, "https://a.fr/1")]},
+            {"company_name": "Groupe", "subsidiaries": [_subsidiary("filiale  a", 0.9, "https://a.fr/2", city="Lyon")]},
+        ]
+        merged = reduce_subsidiary_reports("Groupe", reports)
+
+        assert len(merged["subsidiaries"]) == 1
+        subsidiary = merged["subsidiaries"][0]
+        assert subsidiary["confidence"] == 0.9
+        assert subsidiary["headquarters"]["city"] == "Lyon"
+        assert {s["url"] for s in subsidiary["sources"]} == {"https://a.fr/1", "https://a.fr/2"}
+        assert merged["extraction_summary"]["total_found"] == 1
+
+    def test_subsidiaries_are_capped_by_confidence_in_text_order(self):
+        """Vérifie la limite de 10 filiales, les plus fiables, dans l'ordre du texte"""
+        reports = [{
+            "company_name": "Groupe",
+            "subsidiaries": [_subsidiary(f"Filiale {i}", i / 20, f"https://f.fr/{i}") for i in range(15)],
+        }]
+        names = [s["legal_name"] for s in reduce_subsidiary_reports("Groupe", reports)["subsidiaries"]]
+        assert names == [f"Filiale {i}" for i in range(5, 15)]
+
+
+class TestChunkedStructuring:
+    """Tests de la structuration parallèle avec un Runner simulé"""
+
+    @pytest.fixture
+    def runner(self, monkeypatch):
+        calls = []
+
+        async def run(agent, agent_input, max_turns):
+            calls.append((agent, agent_input))
+            index = len(calls)
+            if "FAIL" in agent_input:
+                raise RuntimeError("segment en erreur")
+            output = {"company_name": "Groupe", "subsidiaries": [_subsidiary(f"Filiale {index}", 0.8, f"https://f.fr/{index}")]}
+            return SimpleNamespace(final_output=output, context_wrapper=SimpleNamespace(usage=None))
+
+        monkeypatch.setattr(cartographe_chunked, "Runner", SimpleNamespace(run=run))
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_segments_run_on_a_tool_less_clone(self, runner):
+        """Vérifie que chaque segment est structuré sans outil ni workflow de recherche"""
+        result = await run_chunked_structuring(
+            FakeAgent(), {"company_name": "Groupe"}, _research_text(12), max_chars=1000
+        )
+
+        assert result.segments_count == len(runner) > 1
+        assert len(result.final_output["subsidiaries"]) == len(runner)
+        agent, agent_input = runner[0]
+        assert agent.tools == []
+        assert "# WORKFLOW" not in agent.instructions
+        assert agent_input.startswith(CHUNK_STATIC_HEADER)
+        assert f'"segment":"1/{len(runner)}"' in agent_input
+
+    @pytest.mark.asyncio
+    async def test_failed_segments_are_retried_once_then_reported(self, runner):
+        """Vérifie la relance unique d'un segment en échec puis son signalement"""
+        text = _research_text(12).replace("Filiale 0 SAS", "Filiale 0 FAIL")
+        result = await run_chunked_structuring(FakeAgent(), {"company_name": "Groupe"}, text, max_chars=1000)
+
+        assert len(runner) == result.segments_count + 1
+        assert result.failed_segments == 1
+        assert len(result.final_output["subsidiaries"]) == result.segments_count - 1
+        assert f"1/{result.segments_count} segment(s)" in result.final_output["methodology_notes"][-1]
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_recovered_by_retry(self, monkeypatch):
+        """Vérifie qu'un segment réussi à la relance n'est pas compté en échec"""
+        attempts = []
+
+        async def run(agent, agent_input, max_turns):
+            attempts.append(agent_input)
+            if '"segment":"1/' in agent_input and len([a for a in attempts if '"segment":"1/' in a]) == 1:
+                raise RuntimeError("erreur transitoire")
+            index = len(attempts)
+            output = {"company_name": "Groupe", "subsidiaries": [_subsidiary(f"Filiale {index}", 0.8, f"https://f.fr/{index}")]}
+            return SimpleNamespace(final_output=output, context_wrapper=SimpleNamespace(usage=None))
+
+        monkeypatch.setattr(cartographe_chunked, "Runner", SimpleNamespace(run=run))
+        result = await run_chunked_structuring(FakeAgent(), {"company_name": "Groupe"}, _research_text(12), max_chars=1000)
+
+        assert result.failed_segments == 0
+        assert len(result.final_output["subsidiaries"]) == result.segments_count
+        assert not result.final_output.get("methodology_notes")
+
+    @pytest.mark.asyncio
+    async def test_returns_none_when_every_segment_fails(self, runner):
+        """Vérifie le retour None si aucun segment n'est structuré"""
+        assert await run_chunked_structuring(FakeAgent(), {"company_name": "Groupe"}, "FAIL", max_chars=1000) is None
+
+    def test_structuring_input_for_whole_text(self):
+        """Vérifie l'entrée de structuration d'un texte entier (sans position de segment)"""
+        agent_input = structuring_input({"company_name": "Groupe"}, "texte", citations=["https://c.fr"])
+        assert agent_input.startswith(CHUNK_STATIC_HEADER)
+        assert '"segment"' not in agent_input
+        assert '"citations":["https://c.fr"]' in agent_input
+
+
+class TestLLMRateLimiter:
+    """Tests du limiteur d'appels LLM"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Vérifie qu'au plus max_concurrency appels s'exécutent simultanément"""
+        limiter = LLMRateLimiter(max_concurrency=2)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[call() for _ in range(6)])
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_requests_per_minute_window(self, monkeypatch):
+        """Vérifie l'attente d'un créneau quand la fenêtre d'une minute est pleine"""
+        clock = [1000.0]
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: clock[0])
+        monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+        limiter = LLMRateLimiter(max_concurrency=5, requests_per_minute=2)
+
+        for _ in range(2):
+            async with limiter:
+                clock[0] += 1
+        assert sleeps == []
+
+        async with limiter:
+            pass
+        assert sleeps == [pytest.approx(58.0)]
+
+    @pytest.mark.asyncio
+    async def test_slot_is_released_when_waiting_is_cancelled(self, monkeypatch):
+        """Vérifie que l'annulation pendant l'attente libère le sémaphore"""
+        limiter = LLMRateLimiter(max_concurrency=1, requests_per_minute=1)
+
+        async def cancelled_wait():
+            raise asyncio.CancelledError()
+
+        async with limiter:
+            pass
+        monkeypatch.setattr(limiter, "_wait_for_slot", cancelled_wait)
+        with pytest.raises(asyncio.CancelledError):
+            async with limiter:
+                pass
+        assert not limiter._semaphore.locked()
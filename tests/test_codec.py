@@ -0,0 +1,93 @@
+"""
+Tests du format de stockage des charges Redis
+"""
+
+import gzip
+import json
+
+import pytest
+
+from core.config import settings
+from status import codec
+
+PAYLOAD = {"company_name": "Groupe", "subsidiaries": [{"legal_name": f"Filiale {i}", "city": "Lyon"} for i in range(50)]}
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """Configure sérialiseur, compression et seuil de compression"""
+    def apply(serializer="json", compression="auto", min_bytes=1024):
+        monkeypatch.setattr(settings, "REDIS_PAYLOAD_SERIALIZER", serializer)
+        monkeypatch.setattr(settings, "REDIS_PAYLOAD_COMPRESSION", compression)
+        monkeypatch.setattr(settings, "REDIS_COMPRESS_MIN_BYTES", min_bytes)
+    return apply
+
+
+class TestRoundTrip:
+    """Tests encode/decode"""
+
+    @pytest.mark.parametrize("serializer,compression,expected", [
+        ("json", "none", (codec.SERIALIZER_JSON, codec.COMPRESSION_NONE)),
+        ("json", "gzip", (codec.SERIALIZER_JSON, codec.COMPRESSION_GZIP)),
+        ("json", "zstd", (codec.SERIALIZER_JSON, codec.COMPRESSION_ZSTD)),
+        ("msgpack", "auto", (codec.SERIALIZER_MSGPACK, codec.COMPRESSION_ZSTD)),
+    ])
+    def test_round_trip(self, configure, serializer, compression, expected):
+        """Vérifie l'en-tête et la relecture pour chaque combinaison"""
+        configure(serializer, compression)
+        data = codec.encode(PAYLOAD)
+        assert (data[0], data[1]) == (codec.MAGIC, codec.FORMAT_VERSION)
+        assert (data[2], data[3]) == expected
+        assert codec.decode(data) == PAYLOAD
+
+    def test_small_payloads_are_not_compressed(self, configure):
+        """Vérifie l'absence de compression sous le seuil"""
+        configure(min_bytes=10_000)
+        data = codec.encode({"a": 1})
+        assert data[3] == codec.COMPRESSION_NONE
+        assert codec.decode(data) == {"a": 1}
+
+    def test_legacy_json_is_read_as_is(self):
+        """Vérifie la relecture des valeurs JSON écrites avant l'en-tête"""
+        legacy = json.dumps(PAYLOAD)
+        assert codec.decode(legacy) == PAYLOAD
+        assert codec.decode(legacy.encode("utf-8")) == PAYLOAD
+
+    def test_unknown_format_version_is_rejected(self, configure):
+        """Vérifie l'erreur sur une version de format inconnue"""
+        configure()
+        data = bytearray(codec.encode(PAYLOAD))
+        data[1] = codec.FORMAT_VERSION + 1
+        with pytest.raises(ValueError, match="Version de format"):
+            codec.decode(bytes(data))
+
+
+class TestHttpPayload:
+    """Tests de la négociation Accept-Encoding"""
+
+    def test_compressed_body_is_served_when_accepted(self, configure):
+        """Vérifie le renvoi du corps compressé tel quel si l'encodage est accepté"""
+        configure(compression="gzip")
+        body, encoding = codec.http_payload(codec.encode(PAYLOAD), "br, gzip;q=0.8")
+        assert encoding == "gzip"
+        assert json.loads(gzip.decompress(body)) == PAYLOAD
+
+    @pytest.mark.parametrize("accept_encoding", ["", "br", "gzip;q=0", "gzip; q=0.0, br"])
+    def test_body_is_decompressed_otherwise(self, configure, accept_encoding):
+        """Vérifie la décompression si l'encodage est absent ou refusé (q=0)"""
+        configure(compression="gzip")
+        body, encoding = codec.http_payload(codec.encode(PAYLOAD), accept_encoding)
+        assert encoding is None
+        assert json.loads(body) == PAYLOAD
+
+    def test_zstd_body_and_legacy_values(self, configure):
+        """Vérifie le renvoi zstd accepté et le JSON hérité renvoyé tel quel"""
+        configure(compression="zstd")
+        assert codec.http_payload(codec.encode(PAYLOAD), "zstd")[1] == "zstd"
+        assert codec.http_payload(b'{"a":1}', "gzip") == (b'{"a":1}', None)
+        assert codec.http_payload('{"a":1}') == (b'{"a":1}', None)
+
+    def test_msgpack_is_not_served_directly(self, configure):
+        """Vérifie qu'une charge msgpack doit être désérialisée avant l'envoi"""
+        configure(serializer="msgpack")
+        assert codec.http_payload(codec.encode(PAYLOAD), "gzip, zstd") is None
@@ -0,0 +1,205 @@
+"""
+Tests de la persistance différée des fins d'extraction (tampon Redis et flusher)
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from core.serialization import dumps
+from models.db_models import ExtractionStatus
+from services import completion_writer as writer_module
+from services.completion_writer import CompletionWriter
+
+
+class FakeRedis:
+    """Redis minimal : chaînes, listes et les scripts Lua du flusher réimplémentés en Python"""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+        # Appelé avant l'acquittement d'un lot (simulation de perte du verrou)
+        self.before_ack = None
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        if self.values.get(keys[0]) != args[0]:
+            return None if script == writer_module._CLAIM_BATCH_SCRIPT else 0
+        if script == writer_module._CLAIM_BATCH_SCRIPT:
+            pending, processing = self.lists.setdefault(keys[1], []), self.lists.setdefault(keys[2], [])
+            if not processing:
+                processing.extend(pending[:args[1]])
+                del pending[:args[1]]
+            return list(processing)
+        if script == writer_module._ACK_BATCH_SCRIPT:
+            if self.before_ack is not None:
+                self.before_ack(self)
+                if self.values.get(keys[0]) != args[0]:
+                    return 0
+            self.lists.pop(keys[1], None)
+            return 1
+        if script == writer_module._RELEASE_LOCK_SCRIPT:
+            del self.values[keys[0]]
+            return 1
+        raise AssertionError("script inconnu")
+
+
+def _record(session_id: str, cost_eur: float = 0.1, tokens: int = 1000) -> dict:
+    return {
+        "session_id": session_id,
+        "cost_usd": cost_eur / 0.92,
+        "cost_eur": cost_eur,
+        "total_tokens": tokens,
+        "input_tokens": tokens // 2,
+        "output_tokens": tokens // 2,
+        "models_usage": {},
+        "processing_time": 1.0,
+        "extraction_data": {},
+        "completed_at": datetime(2025, 3, 15, tzinfo=timezone.utc).isoformat(),
+    }
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+
+    async def get_redis():
+        return fake
+
+    monkeypatch.setattr(CompletionWriter, "_redis", staticmethod(get_redis))
+    return fake
+
+
+@pytest.fixture
+def writer(redis):
+    writer = CompletionWriter()
+    writer.batch_size = 2
+    return writer
+
+
+def _buffer(redis, *records):
+    redis.lists.setdefault(writer_module._BUFFER_KEY, []).extend(dumps(record) for record in records)
+
+
+def _add_rows(extraction_db, *session_ids, status=ExtractionStatus.RUNNING):
+    for session_id in session_ids:
+        extraction_db.add_extraction(session_id, "org-a", datetime(2025, 3, 3, tzinfo=timezone.utc), status=status)
+
+
+def _rollup(extraction_db):
+    return extraction_db.rollups[("org-a", datetime(2025, 3, 3).date())]
+
+
+class TestFlush:
+    """Tests du flusher"""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_every_batch_and_releases_lock(self, extraction_db, redis, writer):
+        """Vérifie l'écriture par lots, le vidage des listes et la libération du verrou"""
+        _add_rows(extraction_db, "s1", "s2", "s3")
+        _buffer(redis, _record("s1"), _record("s2"), _record("s3"))
+
+        assert await writer.flush() == 3
+        assert writer.batches == 2
+        assert all(row.status == ExtractionStatus.COMPLETED for row in extraction_db.rows.values())
+        assert not redis.lists.get(writer_module._BUFFER_KEY)
+        assert not redis.lists.get(writer_module._PROCESSING_KEY)
+        assert writer_module._FLUSH_LOCK_KEY not in redis.values
+
+    @pytest.mark.asyncio
+    async def test_another_flusher_holding_the_lock_skips(self, extraction_db, redis, writer):
+        """Vérifie qu'un second flusher ne lit pas le tampon pendant que le verrou est pris"""
+        _add_rows(extraction_db, "s1")
+        _buffer(redis, _record("s1"))
+        redis.values[writer_module._FLUSH_LOCK_KEY] = "other-worker"
+
+        assert await writer.flush() == 0
+        assert len(redis.lists[writer_module._BUFFER_KEY]) == 1
+        assert redis.values[writer_module._FLUSH_LOCK_KEY] == "other-worker"
+
+
+class TestReplay:
+    """Tests du rejeu des lots non acquittés"""
+
+    @pytest.mark.asyncio
+    async def test_failed_commit_keeps_batch_for_replay(self, extraction_db, redis, writer):
+        """Vérifie qu'un lot non commité reste en traitement puis est rejoué une seule fois"""
+        _add_rows(extraction_db, "s1", "s2", "s3")
+        _buffer(redis, _record("s1"), _record("s2"), _record("s3"))
+
+        extraction_db.fail_commit = True
+        with pytest.raises(ConnectionError):
+            await writer.flush()
+        assert len(redis.lists[writer_module._PROCESSING_KEY]) == 2
+        assert writer_module._FLUSH_LOCK_KEY not in redis.values
+
+        extraction_db.fail_commit = False
+        assert await writer.flush() == 3
+        assert _rollup(extraction_db)["completed_searches"] == 3
+
+    @pytest.mark.asyncio
+    async def test_lost_lock_leaves_batch_to_the_next_flusher(self, extraction_db, redis, writer):
+        """Vérifie qu'un flusher ayant perdu le verrou n'acquitte pas son lot, rejoué sans double rollup"""
+        _add_rows(extraction_db, "s1", "s2")
+        _buffer(redis, _record("s1"), _record("s2"))
+
+        def steal_lock(fake):
+            fake.values[writer_module._FLUSH_LOCK_KEY] = "other-worker"
+
+        redis.before_ack = steal_lock
+        assert await writer.flush() == 0
+        assert len(redis.lists[writer_module._PROCESSING_KEY]) == 2
+        assert redis.values[writer_module._FLUSH_LOCK_KEY] == "other-worker"
+
+        redis.before_ack = None
+        del redis.values[writer_module._FLUSH_LOCK_KEY]
+        assert await writer.flush() == 2
+        assert _rollup(extraction_db)["completed_searches"] == 2
+
+
+class TestRecords:
+    """Tests de l'écriture des enregistrements"""
+
+    @pytest.mark.asyncio
+    async def test_duplicate_session_last_record_wins(self, extraction_db, redis, writer):
+        """Vérifie qu'une session répétée dans un lot est écrite une fois avec le dernier enregistrement"""
+        _add_rows(extraction_db, "s1")
+        _buffer(redis, _record("s1", cost_eur=0.1), _record("s1", cost_eur=0.3))
+
+        await writer.flush()
+
+        assert extraction_db.rows["s1"].cost_eur == 0.3
+        assert _rollup(extraction_db)["completed_searches"] == 1
+        assert _rollup(extraction_db)["cost_eur"] == pytest.approx(0.3)
+
+    @pytest.mark.asyncio
+    async def test_completed_rows_are_not_rolled_up_again(self, extraction_db, redis, writer):
+        """Vérifie que le rollup n'est compté qu'au passage à COMPLETED"""
+        _add_rows(extraction_db, "done", status=ExtractionStatus.COMPLETED)
+        _add_rows(extraction_db, "s1")
+        _buffer(redis, _record("done", cost_eur=0.5), _record("s1", cost_eur=0.1))
+
+        await writer.flush()
+
+        assert extraction_db.rows["done"].cost_eur == 0.5
+        assert _rollup(extraction_db)["completed_searches"] == 1
+        assert _rollup(extraction_db)["cost_eur"] == pytest.approx(0.1)
+
+    @pytest.mark.asyncio
+    async def test_malformed_records_are_dropped(self, extraction_db, redis, writer):
+        """Vérifie qu'un enregistrement illisible est écarté sans bloquer le lot"""
+        _add_rows(extraction_db, "s1")
+        redis.lists[writer_module._BUFFER_KEY] = ["{pas du json", dumps(_record("s1"))]
+
+        assert await writer.flush() == 2
+        assert extraction_db.rows["s1"].status == ExtractionStatus.COMPLETED
@@ -0,0 +1,163 @@
+"""
+Tests du prédicteur de coût et de latence des extractions
+"""
+
+import asyncio
+
+import pytest
+
+from services import cost_predictor as predictor_module
+from services.cost_predictor import CostPredictor, PREDICTOR_MIN_SAMPLES, fit_line
+from services.cost_tracking_service import CostTrackingService
+
+
+def _history(count: int, pipeline: str = "simple", noise: float = 0.0, scale: float = 1.0):
+    """Extractions synthétiques : coût = (0.02 + 0.005 * filiales) * scale, durée = 30 + 4 * filiales"""
+    rows = []
+    for i in range(count):
+        subsidiaries = i % 10
+        jitter = noise if i % 2 else -noise
+        cost_eur = (0.02 + 0.005 * subsidiaries) * scale + jitter
+        models_usage = {
+            "search_type": pipeline,
+            "models_breakdown": [
+                {"model": "gpt-4o", "input_tokens": 1000 + 200 * subsidiaries, "output_tokens": 300,
+                 "cost_usd": cost_eur / 0.92, "cost_eur": cost_eur},
+            ],
+        }
+        rows.append((models_usage, subsidiaries, 30.0 + 4 * subsidiaries, cost_eur))
+    return rows
+
+
+class TestFit:
+    """Tests de l'ajustement par moindres carrés"""
+
+    def test_fit_line_recovers_exact_coefficients(self):
+        """Vérifie les coefficients d'une droite exacte et un résidu nul"""
+        fit = fit_line([0, 1, 2, 3], [1.0, 3.0, 5.0, 7.0])
+        assert fit.intercept == pytest.approx(1.0)
+        assert fit.slope == pytest.approx(2.0)
+        assert fit.residual_std == pytest.approx(0.0)
+
+    def test_fit_line_without_variance_uses_mean(self):
+        """Vérifie le repli sur la moyenne quand x est constant"""
+        fit = fit_line([2, 2, 2], [1.0, 2.0, 3.0])
+        assert fit.slope == 0.0
+        assert fit.predict(10) == pytest.approx(2.0)
+
+    def test_predictions_follow_synthetic_history(self):
+        """Vérifie la prédiction coût/tokens/durée sur un historique synthétique"""
+        predictor = CostPredictor()
+        predictor.fit(_history(50))
+
+        prediction = predictor.predict("simple", 4)
+        assert prediction["total_cost_eur"] == pytest.approx(0.04, abs=1e-6)
+        assert prediction["total_input_tokens"] == 1800
+        assert prediction["estimated_processing_time"] == pytest.approx(46.0)
+        assert prediction["cost_eur_p90"] == pytest.approx(prediction["total_cost_eur"], abs=1e-6)
+        assert prediction["sample_size"] == 50
+
+    def test_p90_adds_residual_spread(self):
+        """Vérifie que la borne p90 dépasse la prédiction quand l'historique est bruité"""
+        predictor = CostPredictor()
+        predictor.fit(_history(50, noise=0.01))
+        prediction = predictor.predict("simple", 4)
+        assert prediction["cost_eur_p90"] > prediction["total_cost_eur"]
+
+    def test_rows_without_cost_or_usage_are_ignored(self):
+        """Vérifie que les lignes incomplètes ne sont pas utilisées"""
+        predictor = CostPredictor()
+        predictor.fit(_history(PREDICTOR_MIN_SAMPLES) + [(None, 3, 10.0, 0.5), ({"search_type": "simple"}, 3, 10.0, None)])
+        assert predictor.predict("simple", 0)["sample_size"] == PREDICTOR_MIN_SAMPLES
+
+
+class TestFallback:
+    """Tests du repli sans historique suffisant"""
+
+    def test_no_prediction_without_enough_history(self):
+        """Vérifie l'absence de prédiction en dessous du nombre minimal d'échantillons"""
+        predictor = CostPredictor()
+        assert predictor.predict("simple", 3) is None
+        predictor.fit(_history(PREDICTOR_MIN_SAMPLES - 1))
+        assert not predictor.is_ready("simple")
+        assert predictor.predict("simple", 3) is None
+        # Historique d'un seul pipeline
+        assert predictor.predict("advanced", 3) is None
+
+    def test_static_estimate_is_used_without_history(self, monkeypatch):
+        """Vérifie que estimate_search_cost garde l'estimation statique sans historique"""
+        monkeypatch.setattr(predictor_module, "cost_predictor", CostPredictor())
+        estimate = CostTrackingService.estimate_search_cost("simple", True, 3)
+        assert estimate.get("estimate_type") != "historical"
+        assert estimate["total_cost_eur"] > 0
+
+
+class TestAdmission:
+    """Tests de l'admission selon le budget restant"""
+
+    @pytest.fixture
+    def predictor(self):
+        predictor = CostPredictor()
+        predictor.fit(_history(50, "simple") + _history(50, "advanced", scale=10))
+        return predictor
+
+    def test_accepts_within_budget_or_without_limit(self, predictor):
+        """Vérifie l'acceptation dans le budget ou sans limite"""
+        assert predictor.admit("simple", 4, 1.0)["decision"] == "accept"
+        assert predictor.admit("advanced", 4, None)["decision"] == "accept"
+
+    def test_downgrades_advanced_when_only_simple_fits(self, predictor):
+        """Vérifie le passage en simple si seule la recherche simple tient dans le budget"""
+        admission = predictor.admit("advanced", 4, 0.1)
+        assert admission == {"decision": "downgrade", "extraction_type": "simple", "predicted_cost_eur": pytest.approx(0.04, abs=1e-6)}
+
+    def test_rejects_when_nothing_fits(self, predictor):
+        """Vérifie le refus quand même la recherche simple dépasse le budget"""
+        assert predictor.admit("advanced", 4, 0.01)["decision"] == "reject"
+        assert predictor.admit("simple", 4, 0.01)["decision"] == "reject"
+
+    def test_uses_static_estimate_without_history(self):
+        """Vérifie que l'admission sans historique s'appuie sur l'estimation statique"""
+        admission = CostPredictor().admit("simple", 3, 0.0)
+        assert admission["decision"] == "reject"
+        assert admission["predicted_cost_eur"] == CostTrackingService.estimate_search_cost("simple", True, 3)["total_cost_eur"]
+
+
+class TestRefreshLoop:
+    """Tests de la boucle de rafraîchissement"""
+
+    @pytest.mark.asyncio
+    async def test_loop_survives_refresh_errors(self, monkeypatch):
+        """Vérifie que la boucle continue après un échec de rafraîchissement"""
+        predictor = CostPredictor()
+        attempts = []
+
+        async def refresh(db):
+            attempts.append(db)
+            if len(attempts) == 1:
+                raise ConnectionError("database unavailable")
+            predictor.fit(_history(PREDICTOR_MIN_SAMPLES))
+
+        class Session:
+            async def __aenter__(self):
+                return "db"
+
+            async def __aexit__(self, *exc):
+                return False
+
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                raise asyncio.CancelledError()
+
+        monkeypatch.setattr(predictor, "refresh", refresh)
+        monkeypatch.setattr(predictor_module.asyncio, "sleep", fake_sleep)
+
+        with pytest.raises(asyncio.CancelledError):
+            await predictor.run_refresh_loop(Session, interval=5)
+
+        assert len(attempts) == 2
+        assert sleeps == [5, 5]
+        assert predictor.is_ready("simple")
@@ -0,0 +1,46 @@
+"""
+Tests de l'accès aux routes de santé
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.loop_monitor import loop_monitor
+from dependencies.auth import get_current_active_user
+from models.db_models import UserRole
+from routers.health import router
+
+
+@pytest.fixture
+def client_as():
+    """Client HTTP authentifié avec le rôle donné (None = sans authentification)"""
+    def build(role=None):
+        app = FastAPI()
+        app.include_router(router)
+        if role is not None:
+            app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(role=role)
+        return TestClient(app)
+    return build
+
+
+class TestLoopHealth:
+    """Tests de /health/loop"""
+
+    def test_anonymous_and_non_admin_are_rejected(self, client_as):
+        """Vérifie que les piles et la remise à zéro sont réservées aux administrateurs"""
+        assert client_as().get("/health/loop").status_code in (401, 403)
+        assert client_as(UserRole.MEMBER).get("/health/loop").status_code == 403
+        assert client_as(UserRole.MEMBER).post("/health/loop/reset").status_code == 403
+
+    def test_get_does_not_reset(self, client_as, monkeypatch):
+        """Vérifie que seule la route POST vide les statistiques"""
+        monkeypatch.setattr(loop_monitor, "total_stalls", 3)
+        client = client_as(UserRole.ADMIN)
+
+        assert client.get("/health/loop", params={"reset": True}).json()["stalls"] == 3
+        assert loop_monitor.total_stalls == 3
+        assert client.post("/health/loop/reset").json()["stalls"] == 3
+        assert loop_monitor.total_stalls == 0
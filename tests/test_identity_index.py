@@ -0,0 +1,212 @@
+"""
+Tests de l'index local des identités d'entreprises
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from company_agents.orchestrator import agent_caller
+from company_agents.orchestrator import identity_index as identity_module
+from company_agents.orchestrator.extraction_orchestrator import ExtractionState, _record_identity
+from company_agents.orchestrator.identity_index import CompanyIdentityIndex, identity_record
+
+
+def _payload(legal_name, confidence=0.95, domain=None, aliases=(), days_ago=1):
+    analyzer = {"entity_legal_name": legal_name, "confidence": confidence}
+    if domain:
+        analyzer["target_domain"] = domain
+    return {
+        "aliases": list(aliases),
+        "analyzer": analyzer,
+        "has_filiales_only": False,
+        "resolved_at": (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat(),
+    }
+
+
+@pytest.fixture
+def index():
+    """Index en mémoire seule (pas de chargement depuis la base)"""
+    index = CompanyIdentityIndex()
+    index.enabled = True
+    index._loaded_at = time.monotonic()
+    index.add(_payload("Crédit Agricole Nord Est", domain="https://www.ca-nord-est.fr", aliases=["CA Nord Est"]))
+    index.add(_payload("Groupe SEB", domain="groupeseb.com"))
+    return index
+
+
+class TestMatch:
+    """Tests de _match et _fuzzy"""
+
+    @pytest.mark.parametrize("raw_input,matched_on", [
+        ("ca-nord-est.fr", "domain"),
+        ("https://www.ca-nord-est.fr/contact", "domain"),
+        ("Credit Agricole Nord Est SA", "name"),
+        ("ca nord est", "name"),
+    ])
+    def test_exact_matches_are_served(self, index, raw_input, matched_on):
+        """Vérifie les correspondances exactes sur domaine, nom légal et alias"""
+        match = index._match(raw_input)
+        assert (match.matched_on, match.score, match.served) == (matched_on, 1.0, True)
+        assert match.entry.analyzer["entity_legal_name"] == "Crédit Agricole Nord Est"
+
+    def test_unknown_domain_does_not_fall_back_to_names(self, index):
+        """Vérifie qu'un domaine inconnu n'est pas cherché parmi les noms"""
+        assert index._match("ca-nord.fr") is None
+        assert index._match("Banque Postale") is None
+
+    @pytest.mark.parametrize("raw_input", ["Credit Agricole Nord", "Groupe SEO"])
+    def test_close_names_are_only_hints(self, index, raw_input):
+        """Vérifie qu'un nom proche d'une autre entité n'est qu'une piste"""
+        match = index._match(raw_input)
+        assert match.matched_on == "fuzzy"
+        assert match.score >= identity_module.IDENTITY_INDEX_MIN_SIMILARITY
+        assert not match.served
+
+    def test_fuzzy_below_similarity_is_ignored(self, index):
+        """Vérifie qu'un nom trop éloigné n'est pas proposé"""
+        assert index._fuzzy("credit mutuel nord") is None
+        assert index._fuzzy("") is None
+
+
+class TestAdd:
+    """Tests de add()"""
+
+    def test_identity_record_merges_aliases(self):
+        """Vérifie le format stocké dans extraction_metadata.identity"""
+        record = identity_record("SEB", {"entity_legal_name": "Groupe SEB"}, True, aliases=["groupeseb.com"])
+        assert record["aliases"] == ["SEB", "groupeseb.com"]
+        assert record["has_filiales_only"] is True
+
+    def test_low_confidence_is_not_indexed(self, index):
+        """Vérifie le plancher de confiance"""
+        floor = identity_module.IDENTITY_INDEX_MIN_CONFIDENCE
+        assert not index.add(_payload("Manitou Group", confidence=floor - 0.01))
+        assert index._match("Manitou Group") is None
+        assert index.add(_payload("Manitou Group", confidence=floor))
+        assert index._match("Manitou Group").matched_on == "name"
+
+    def test_invalid_payloads_are_rejected(self, index):
+        """Vérifie le rejet sans nom légal ou sans date de résolution"""
+        assert not index.add(_payload(None))
+        assert not index.add({"analyzer": {"entity_legal_name": "X", "confidence": 1}})
+
+    def test_older_resolution_does_not_replace_newer(self, index):
+        """Vérifie qu'une identité plus ancienne ne fait qu'ajouter ses alias"""
+        newer = _payload("Groupe SEB", domain="groupeseb.com", days_ago=1)
+        newer["analyzer"]["sector"] = "récent"
+        older = _payload("Groupe SEB", domain="groupeseb.com", aliases=["SEB"], days_ago=30)
+        older["analyzer"]["sector"] = "ancien"
+        index.add(newer)
+        index.add(older)
+
+        entry = index._match("SEB").entry
+        assert entry.analyzer["sector"] == "récent"
+        assert "SEB" in entry.aliases
+
+    def test_newer_resolution_keeps_known_aliases(self, index):
+        """Vérifie qu'une résolution plus récente remplace l'entrée en gardant ses alias"""
+        index.add(_payload("Crédit Agricole Nord Est", domain="ca-nord-est.fr", days_ago=0))
+        entry = index._match("ca-nord-est.fr").entry
+        assert entry.resolved_at > datetime.now(timezone.utc) - timedelta(hours=1)
+        assert "CA Nord Est" in entry.aliases
+        assert index._match("CA Nord Est").entry is entry
+
+
+class TestLookup:
+    """Tests de lookup (compteurs et péremption)"""
+
+    @pytest.mark.asyncio
+    async def test_hit_hint_and_miss_are_counted(self, index):
+        """Vérifie les compteurs hit, piste et miss"""
+        assert (await index.lookup("groupeseb.com")).served
+        assert not (await index.lookup("Groupe SEO")).served
+        assert await index.lookup("Banque Postale") is None
+        stats = index.stats()
+        assert (stats["hits"], stats["hints"], stats["misses"], stats["stale"]) == (1, 1, 1, 0)
+
+    @pytest.mark.asyncio
+    async def test_stale_identity_is_not_returned(self, index):
+        """Vérifie qu'une identité trop ancienne est ignorée"""
+        index.add(_payload("Manitou Group", days_ago=identity_module.IDENTITY_INDEX_MAX_AGE_DAYS + 1))
+        assert index._match("Manitou Group").entry.is_stale
+        assert await index.lookup("Manitou Group") is None
+        assert index.stale == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_prunes_stale_identities(self, index, monkeypatch):
+        """Vérifie le retrait des identités périmées (noms, domaines, trigrammes) au rafraîchissement"""
+        async def load():
+            return 0
+
+        index.add(_payload("Manitou Group", domain="manitou.com", days_ago=identity_module.IDENTITY_INDEX_MAX_AGE_DAYS + 1))
+        assert "manitou group" in index._name_trigrams
+        monkeypatch.setattr(index, "load", load)
+        index._loaded_at = None
+
+        await index._ensure_fresh()
+
+        assert "manitou group" not in index._by_name
+        assert "manitou.com" not in index._by_domain
+        assert "manitou group" not in index._name_trigrams
+        assert all("manitou group" not in names for names in index._trigram_names.values())
+        assert index._match("Groupe SEB").served
+        assert index._fuzzy("groupe seo") is not None
+
+    @pytest.mark.asyncio
+    async def test_disabled_index_returns_nothing(self, index):
+        """Vérifie qu'un index désactivé ne répond pas"""
+        index.enabled = False
+        assert await index.lookup("groupeseb.com") is None
+
+
+class TestAnalyzerCall:
+    """Tests de l'usage de l'index par l'Éclaireur et l'orchestrateur"""
+
+    @pytest.fixture
+    def analyzer_inputs(self, monkeypatch, index):
+        """Éclaireur simulé : enregistre ses entrées puis échoue"""
+        inputs = []
+
+        async def run_company_analyzer_with_metrics(company_name, **kwargs):
+            inputs.append(company_name)
+            return {"status": "error", "error": "simulé"}
+
+        monkeypatch.setattr(agent_caller, "identity_index", index)
+        monkeypatch.setattr(agent_caller, "run_company_analyzer_with_metrics", run_company_analyzer_with_metrics)
+        monkeypatch.setattr(agent_caller, "_route_model", lambda *args: {})
+        return inputs
+
+    @pytest.mark.asyncio
+    async def test_exact_match_skips_analyzer(self, analyzer_inputs):
+        """Vérifie que l'Éclaireur n'est pas exécuté sur une identité servie"""
+        state = ExtractionState(session_id="s1", raw_input="Groupe SEB")
+        data = await agent_caller.call_company_analyzer(state)
+        assert data["entity_legal_name"] == "Groupe SEB"
+        assert analyzer_inputs == []
+
+    @pytest.mark.asyncio
+    async def test_fuzzy_match_is_passed_as_hint(self, analyzer_inputs):
+        """Vérifie qu'un nom approché lance l'Éclaireur avec la piste"""
+        state = ExtractionState(session_id="s1", raw_input="Credit Agricole Nord")
+        await agent_caller.call_company_analyzer(state)
+        assert len(analyzer_inputs) == 1
+        assert analyzer_inputs[0].startswith("Credit Agricole Nord\n")
+        assert "Crédit Agricole Nord Est (https://www.ca-nord-est.fr)" in analyzer_inputs[0]
+        assert state.identity_match.matched_on == "fuzzy"
+
+    def test_fuzzy_hint_is_not_aliased(self, monkeypatch, index):
+        """Vérifie que l'entrée brute n'est pas ajoutée aux alias de l'entité approchée"""
+        monkeypatch.setattr(identity_module.identity_index, "enabled", False)
+        state = ExtractionState(session_id="s1", raw_input="Credit Agricole Nord")
+        state.identity_match = index._match("Credit Agricole Nord")
+        state.analyzer_raw = {"entity_legal_name": "Crédit Agricole Nord de France", "confidence": 0.9}
+        result = {}
+
+        _record_identity(state, result)
+
+        metadata = result["extraction_metadata"]
+        assert metadata["identity_source"] == "analyzer"
+        assert metadata["identity"]["aliases"] == ["Credit Agricole Nord"]
+        assert "Credit Agricole Nord" not in index._match("CA Nord Est").entry.aliases
@@ -0,0 +1,112 @@
+"""
+Tests de l'analyse JSON tolérante des sorties d'agents
+"""
+
+import json
+
+import pytest
+
+from company_agents.processors.json_repair import TolerantJSONParser, parse_tolerant
+
+
+class TestValidInput:
+    """Tests du JSON déjà valide"""
+
+    def test_valid_json_is_not_repaired(self):
+        """Vérifie que le JSON valide passe par le décodeur natif"""
+        result = parse_tolerant('{"a": [1, 2]}')
+        assert (result.value, result.complete, result.repaired) == ({"a": [1, 2]}, True, False)
+
+    def test_surrounding_prose_is_ignored(self):
+        """Vérifie que le texte autour du document (balises ```json) est ignoré"""
+        result = parse_tolerant('Voici le résultat :\n```json\n{"a": 1}\n```\nFin.')
+        assert result.value == {"a": 1}
+        assert result.complete
+
+
+class TestTruncation:
+    """Tests des sorties tronquées"""
+
+    def test_incomplete_array_element_is_dropped(self):
+        """Vérifie qu'un élément de tableau tronqué est écarté en entier"""
+        result = parse_tolerant('[{"a":1},{"b":')
+        assert result.value == [{"a": 1}]
+        assert not result.complete and result.repaired
+
+    def test_nested_incomplete_element_is_dropped(self):
+        """Vérifie qu'une filiale tronquée dans un sous-tableau n'est pas conservée à moitié"""
+        text = '{"company_name": "Groupe", "subsidiaries": [{"legal_name": "A", "sources": [{"url": "https://a.fr"}]}, {"legal_name": "B", "sources": [{"url": "https://b'
+        assert parse_tolerant(text).value == {
+            "company_name": "Groupe",
+            "subsidiaries": [{"legal_name": "A", "sources": [{"url": "https://a.fr"}]}],
+        }
+
+    def test_scalars_are_cut_after_last_complete_value(self):
+        """Vérifie la coupe après la dernière valeur complète"""
+        assert parse_tolerant('[1, 2, "ab').value == [1, 2]
+        assert parse_tolerant('{"a": 1, "b": "tron').value == {"a": 1}
+        assert parse_tolerant('{"hq": {"city": "Lyon", "country": "Fr').value == {"hq": {"city": "Lyon"}}
+
+    def test_nothing_recoverable(self):
+        """Vérifie value=None sans objet ni tableau"""
+        assert parse_tolerant("aucun JSON ici").value is None
+
+
+class TestRepairs:
+    """Tests des corrections"""
+
+    def test_raw_control_characters_are_escaped(self):
+        """Vérifie l'échappement des caractères de contrôle bruts dans les chaînes"""
+        result = parse_tolerant('{"a": "ligne 1\nligne 2\ttab\x01"}')
+        assert result.value == {"a": "ligne 1\nligne 2\ttab\x01"}
+        assert result.complete and result.repaired
+
+    def test_c1_and_delete_characters_are_kept(self):
+        """Vérifie que \\x7f-\\x9f sont conservés tels quels"""
+        text = '{"a": "x\x7fy\x85z\x9f", "b": "\n"}'
+        assert parse_tolerant(text).value == {"a": "x\x7fy\x85z\x9f", "b": "\n"}
+
+    def test_trailing_and_duplicate_commas_are_removed(self):
+        """Vérifie la suppression des virgules finales ou en double"""
+        assert parse_tolerant('{"a": [1, 2,], "b": 3,}').value == {"a": [1, 2], "b": 3}
+        assert parse_tolerant("[1,, 2]").value == [1, 2]
+
+    def test_python_literals_are_converted(self):
+        """Vérifie la conversion True/False/None et des mots nus invalides"""
+        result = parse_tolerant('{"a": True, "b": False, "c": None, "d": undefined}')
+        assert result.value == {"a": True, "b": False, "c": None, "d": None}
+        assert result.repaired
+
+
+class TestStreaming:
+    """Tests de la lecture par morceaux"""
+
+    DOCUMENT = json.dumps({
+        "company_name": "Groupe",
+        "subsidiaries": [{"legal_name": f"Filiale {i}", "tags": ["a", "b"]} for i in range(3)],
+        "commercial_presence": [{"country": "France"}],
+    })
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+    def test_chunked_feed_matches_whole_document(self, chunk_size):
+        """Vérifie qu'un découpage arbitraire donne le même résultat"""
+        parser = TolerantJSONParser()
+        for start in range(0, len(self.DOCUMENT), chunk_size):
+            parser.feed(self.DOCUMENT[start:start + chunk_size])
+        result = parser.result()
+        assert result.value == json.loads(self.DOCUMENT)
+        assert result.complete
+
+    def test_drain_items_yields_objects_as_they_close(self):
+        """Vérifie la restitution des objets surveillés dès leur fermeture"""
+        parser = TolerantJSONParser(item_keys=["subsidiaries"])
+        cut = self.DOCUMENT.index("Filiale 1") + 5
+        parser.feed(self.DOCUMENT[:cut])
+        assert parser.drain_items() == [("subsidiaries", {"legal_name": "Filiale 0", "tags": ["a", "b"]})]
+        assert parser.drain_items() == []
+
+        parser.feed(self.DOCUMENT[cut:])
+        drained = parser.drain_items()
+        assert [item["legal_name"] for _, item in drained] == ["Filiale 1", "Filiale 2"]
+        # Les tableaux non surveillés ne sont pas restitués
+        assert all(key == "subsidiaries" for key, _ in drained)
@@ -0,0 +1,55 @@
+"""
+Tests de l'éviction des sessions du collecteur de métriques
+"""
+
+import importlib
+import logging
+
+from company_agents.metrics.metrics_collector import MetricsCollector
+
+# Le paquet réexporte l'instance sous le nom du module
+collector_module = importlib.import_module("company_agents.metrics.metrics_collector")
+
+
+class TestEviction:
+    """Tests de l'éviction par TTL et par plafond"""
+
+    def test_finished_sessions_expire_after_ttl(self, monkeypatch):
+        """Vérifie l'éviction des sessions terminées après le TTL"""
+        clock = [1000.0]
+        monkeypatch.setattr(collector_module.time, "time", lambda: clock[0])
+        collector = MetricsCollector(session_ttl=60, max_sessions=10)
+        collector.start_agent("Éclaireur", "s1")
+        collector.mark_session_finished("s1")
+
+        clock[0] += 61
+        collector.start_agent("Éclaireur", "s2")
+
+        assert collector.get_session_metrics("s1") == []
+        assert collector.get_session_metrics("s2")
+
+    def test_cap_evicts_oldest_finished_sessions_only(self):
+        """Vérifie qu'au-delà du plafond seules les sessions terminées sont évincées"""
+        collector = MetricsCollector(session_ttl=3600, max_sessions=2)
+        collector.start_agent("Éclaireur", "live")
+        collector.start_agent("Éclaireur", "done")
+        collector.mark_session_finished("done")
+        collector.start_agent("Éclaireur", "new")
+
+        assert collector.get_session_metrics("done") == []
+        assert collector.get_session_metrics("live")
+        assert collector.get_session_metrics("new")
+
+    def test_live_sessions_are_kept_beyond_cap(self, caplog, monkeypatch):
+        """Vérifie que les sessions en cours ne sont jamais évincées et que le dépassement est journalisé une fois par minute"""
+        clock = [1000.0]
+        monkeypatch.setattr(collector_module.time, "time", lambda: clock[0])
+        collector = MetricsCollector(session_ttl=3600, max_sessions=2)
+        with caplog.at_level(logging.WARNING):
+            for session_id in ("s1", "s2", "s3", "s4", "s5"):
+                collector.start_agent("Éclaireur", session_id)
+            clock[0] += 61
+            collector.start_agent("Éclaireur", "s6")
+
+        assert all(collector.get_session_metrics(f"s{i}") for i in range(1, 7))
+        assert caplog.text.count("sessions en cours dépassent le plafond") == 2
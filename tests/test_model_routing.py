@@ -0,0 +1,83 @@
+"""
+Tests pour le routage des modèles par complexité d'entrée
+"""
+
+import pytest
+
+from company_agents.config import agent_config
+from company_agents.config.agent_config import (
+    DEFAULT_MODEL_ROUTING,
+    MODEL_ROUTING_THRESHOLDS,
+    get_escalation_model,
+    select_model,
+)
+
+
+@pytest.fixture(autouse=True)
+def routing_enabled(monkeypatch):
+    monkeypatch.setattr(agent_config, "ENABLE_MODEL_ROUTING", True)
+
+
+class TestSelectModel:
+    """Tests du choix de palier"""
+
+    def test_small_input_uses_light_tier(self):
+        """Vérifie qu'une entrée courte avec peu de filiales passe sur le palier light"""
+        assert select_model("meta_validator", input_length=1000, subsidiaries_count=1) == "gpt-4.1-mini"
+
+    def test_light_thresholds_are_inclusive(self):
+        """Vérifie les bornes du palier light"""
+        limit_chars = MODEL_ROUTING_THRESHOLDS["light_max_input_chars"]
+        limit_subs = MODEL_ROUTING_THRESHOLDS["light_max_subsidiaries"]
+        tiers = DEFAULT_MODEL_ROUTING["meta_validator"]
+
+        assert select_model("meta_validator", input_length=limit_chars, subsidiaries_count=limit_subs) == tiers["light"]
+        assert select_model("meta_validator", input_length=limit_chars + 1) == tiers["default"]
+        assert select_model("meta_validator", subsidiaries_count=limit_subs + 1) == tiers["default"]
+
+    def test_strong_thresholds(self):
+        """Vérifie le passage au palier strong sur l'une ou l'autre borne"""
+        tiers = DEFAULT_MODEL_ROUTING["subsidiary_extractor"]
+        strong_chars = MODEL_ROUTING_THRESHOLDS["strong_min_input_chars"]
+        strong_subs = MODEL_ROUTING_THRESHOLDS["strong_min_subsidiaries"]
+
+        assert select_model("subsidiary_extractor", input_length=strong_chars) == tiers["strong"]
+        assert select_model("subsidiary_extractor", subsidiaries_count=strong_subs) == tiers["strong"]
+        assert select_model("subsidiary_extractor", input_length=strong_chars - 1) == tiers["default"]
+
+    def test_complex_or_deep_search_never_light(self):
+        """Vérifie qu'une entreprise complexe ou une recherche approfondie reste sur default"""
+        tiers = DEFAULT_MODEL_ROUTING["data_restructurer"]
+        assert select_model("data_restructurer", enterprise_type="complex") == tiers["default"]
+        assert select_model("data_restructurer", deep_search=True) == tiers["default"]
+
+    def test_agent_without_light_tier_stays_on_default(self):
+        """Vérifie qu'un agent sans palier light garde son modèle par défaut"""
+        assert "light" not in DEFAULT_MODEL_ROUTING["company_analyzer"]
+        assert select_model("company_analyzer", input_length=10) == DEFAULT_MODEL_ROUTING["company_analyzer"]["default"]
+
+    def test_unknown_agent_and_disabled_routing(self, monkeypatch):
+        """Vérifie le repli sur le modèle par défaut"""
+        assert select_model("unknown_agent", input_length=10) == "gpt-4o"
+
+        monkeypatch.setattr(agent_config, "ENABLE_MODEL_ROUTING", False)
+        strong_chars = MODEL_ROUTING_THRESHOLDS["strong_min_input_chars"]
+        assert select_model("meta_validator", input_length=strong_chars) == DEFAULT_MODEL_ROUTING["meta_validator"]["default"]
+
+
+class TestEscalationModel:
+    """Tests de l'escalade après un guardrail"""
+
+    def test_escalates_to_strong_tier(self):
+        """Vérifie l'escalade vers le palier strong"""
+        assert get_escalation_model("company_analyzer", "gpt-4.1-mini") == "gpt-4o"
+
+    def test_no_escalation_when_already_strong(self):
+        """Vérifie qu'on ne relance pas sur le même modèle"""
+        assert get_escalation_model("subsidiary_extractor", "gpt-4o") is None
+
+    def test_no_escalation_for_unknown_agent_or_disabled_routing(self, monkeypatch):
+        """Vérifie l'absence d'escalade hors routage"""
+        assert get_escalation_model("unknown_agent", "gpt-4o-mini") is None
+        monkeypatch.setattr(agent_config, "ENABLE_MODEL_ROUTING", False)
+        assert get_escalation_model("company_analyzer", "gpt-4.1-mini") is None
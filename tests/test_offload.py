@@ -0,0 +1,95 @@
+"""
+Tests du routage des traitements CPU (en ligne, pool de threads, pool de processus)
+"""
+
+import contextvars
+import os
+import threading
+
+import pytest
+
+from core import offload
+from core.config import settings
+from core.offload import estimate_size, run_cpu
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def _worker_info(value):
+    """Identifie l'exécution (processus, thread, contexte) : fonction picklable"""
+    return os.getpid(), threading.current_thread().name, _request_id.get(), value
+
+
+@pytest.fixture
+def thresholds(monkeypatch):
+    """Seuils réduits : thread dès 100 octets, processus dès 1000 octets"""
+    monkeypatch.setattr(settings, "OFFLOAD_THRESHOLD_BYTES", 100)
+    monkeypatch.setattr(settings, "OFFLOAD_PROCESS_THRESHOLD_BYTES", 1000)
+    monkeypatch.setattr(settings, "OFFLOAD_PROCESS_WORKERS", 0)
+    yield monkeypatch
+    offload.shutdown_executors()
+
+
+class TestEstimateSize:
+    """Tests de l'estimation de taille"""
+
+    def test_strings_and_bytes_use_their_length(self):
+        """Vérifie que str/bytes renvoient leur longueur exacte"""
+        assert estimate_size("abc") == 3
+        assert estimate_size(b"abcd") == 4
+
+    def test_nested_structures_grow_with_content(self):
+        """Vérifie que l'estimation croît avec le contenu"""
+        small = estimate_size({"a": "x"}, limit=10_000)
+        large = estimate_size({"a": "x" * 500, "b": [1, 2, 3]}, limit=10_000)
+        assert 0 < small < large
+
+    def test_walk_stops_once_limit_is_exceeded(self):
+        """Vérifie l'arrêt du parcours dès que la limite est dépassée"""
+        payload = [{"name": "x" * 100} for _ in range(10_000)]
+        size = estimate_size(payload, limit=500)
+        assert 500 < size < 1000
+
+
+class TestRunCpu:
+    """Tests du routage de run_cpu"""
+
+    @pytest.mark.asyncio
+    async def test_small_payload_runs_inline(self, thresholds):
+        """Vérifie l'exécution directe sous le seuil"""
+        pid, thread_name, _, value = await run_cpu(_worker_info, "petit")
+        assert (pid, thread_name, value) == (os.getpid(), threading.current_thread().name, "petit")
+
+    @pytest.mark.asyncio
+    async def test_large_payload_runs_in_thread_with_context(self, thresholds):
+        """Vérifie le passage en thread et la conservation des contextvars"""
+        token = _request_id.set("session-1")
+        try:
+            pid, thread_name, request_id, _ = await run_cpu(_worker_info, "x" * 200)
+        finally:
+            _request_id.reset(token)
+        assert pid == os.getpid()
+        assert thread_name.startswith("cpu-offload")
+        assert request_id == "session-1"
+
+    @pytest.mark.asyncio
+    async def test_process_pool_requires_process_safe_and_workers(self, thresholds):
+        """Vérifie que le pool de processus n'est utilisé que si activé et l'appel process_safe"""
+        payload = "x" * 2000
+        # Pas de workers : repli sur le pool de threads
+        pid, _, _, _ = await run_cpu(_worker_info, payload, process_safe=True)
+        assert pid == os.getpid()
+
+        thresholds.setattr(settings, "OFFLOAD_PROCESS_WORKERS", 1)
+        pid, thread_name, _, _ = await run_cpu(_worker_info, payload)
+        assert pid == os.getpid() and thread_name.startswith("cpu-offload")
+
+        pid, _, _, value = await run_cpu(_worker_info, payload, process_safe=True)
+        assert pid != os.getpid()
+        assert value == payload
+
+    @pytest.mark.asyncio
+    async def test_explicit_size_overrides_estimate(self, thresholds):
+        """Vérifie que size explicite prime sur l'estimation"""
+        _, thread_name, _, _ = await run_cpu(_worker_info, "petit", size=500)
+        assert thread_name.startswith("cpu-offload")
@@ -0,0 +1,87 @@
+"""
+Tests pour la compaction des payloads du Superviseur et du Restructurateur
+"""
+
+from company_agents.processors.payload_compactor import (
+    compact_payload,
+    dedupe_sources,
+    estimate_tokens,
+    merge_meta_reports,
+    split_entity_batches,
+)
+
+
+def _payload(count: int) -> dict:
+    subsidiaries = [
+        {
+            "legal_name": f"Filiale {i}",
+            "activity": "Distribution " * 80,
+            "headquarters": {"city": "Lyon", "country": "France", "sources": None},
+            "sources": [
+                {"title": "Site", "url": "https://www.groupe.com/filiales/"},
+                {"title": "Site", "url": "https://groupe.com/filiales"},
+                {"title": "Registre", "url": f"https://registre.fr/{i}"},
+            ],
+        }
+        for i in range(count)
+    ]
+    return {
+        "company_info": {"company_name": "Groupe", "sources": []},
+        "subsidiaries": {"company_name": "Groupe", "subsidiaries": subsidiaries, "commercial_presence": []},
+        "analyzer_data": None,
+    }
+
+
+class TestPayloadCompactor:
+    """Tests de la compaction et du découpage en lots"""
+
+    def test_dedupe_sources_normalizes_urls(self):
+        """Vérifie que www. et le slash final ne créent pas de doublons"""
+        sources = _payload(1)["subsidiaries"]["subsidiaries"][0]["sources"]
+        assert [s["url"] for s in dedupe_sources(sources)] == [
+            "https://www.groupe.com/filiales/",
+            "https://registre.fr/0",
+        ]
+
+    def test_compaction_respects_budget_and_drops_empty_fields(self):
+        """Vérifie que le payload compacté tient dans le budget et sans valeurs vides"""
+        payload = _payload(5)
+        compacted, tokens = compact_payload(payload, budget_tokens=1500)
+
+        assert tokens <= 1500
+        assert tokens == estimate_tokens(compacted)
+        assert "analyzer_data" not in compacted
+        assert "sources" not in compacted["subsidiaries"]["subsidiaries"][0]["headquarters"]
+
+    def test_large_lists_are_split_into_batches(self):
+        """Vérifie le découpage en lots sans perte d'entités"""
+        compacted, _ = compact_payload(_payload(40), budget_tokens=3000)
+        batches = split_entity_batches(compacted, budget_tokens=3000)
+
+        assert len(batches) > 1
+        names = [s["legal_name"] for b in batches for s in b["subsidiaries"]["subsidiaries"]]
+        assert names == [f"Filiale {i}" for i in range(40)]
+        assert all(b["company_info"] == compacted["company_info"] for b in batches)
+
+    def test_merge_meta_reports_weights_scores(self):
+        """Vérifie la fusion des rapports du Superviseur"""
+        merged = merge_meta_reports([
+            {
+                "company_name": "Groupe",
+                "section_scores": {"overall": 1.0},
+                "subsidiaries_confidence": [{"subsidiary_name": "A"}],
+                "notes": ["ok"],
+            },
+            {
+                "company_name": "Groupe",
+                "section_scores": {"overall": 0.0},
+                "subsidiaries_confidence": [{"subsidiary_name": "B"}, {"subsidiary_name": "C"}],
+                "notes": ["ok", "à vérifier"],
+                "requires_follow_up": True,
+            },
+        ])
+
+        assert merged["section_scores"]["overall"] == round(1 / 3, 4)
+        assert [s["subsidiary_name"] for s in merged["subsidiaries_confidence"]] == ["A", "B", "C"]
+        assert merged["notes"] == ["ok", "à vérifier"]
+        assert merged["requires_follow_up"] is True
@@ -0,0 +1,104 @@
+"""
+Tests pour l'assemblage des prompts compatible cache et la facturation des tokens en cache
+"""
+
+import logging
+from decimal import Decimal
+from types import SimpleNamespace
+
+from company_agents import prompt_assembly
+from company_agents.prompt_assembly import (
+    build_agent_input,
+    canonical_json,
+    check_static_prefix,
+    get_cached_input_tokens,
+)
+from services.cost_tracking_service import CostTrackingService, ModelPricing
+
+
+class TestCanonicalJson:
+    """Tests de la sérialisation déterministe"""
+
+    def test_key_order_does_not_change_output(self):
+        """Vérifie qu'un même contenu donne la même chaîne quel que soit l'ordre des clés"""
+        left = {"b": 1, "a": {"y": [1, 2], "x": None}}
+        right = {"a": {"x": None, "y": [1, 2]}, "b": 1}
+        assert canonical_json(left) == canonical_json(right)
+
+    def test_non_json_values_are_stringified(self):
+        """Vérifie que les valeurs non sérialisables passent par str()"""
+        assert canonical_json({"value": Decimal("1.5")}) == canonical_json({"value": "1.5"})
+
+    def test_static_header_comes_first(self):
+        """Vérifie que la partie statique précède les données dynamiques"""
+        text = build_agent_input({"company": "Acme"}, static_header="Analyse")
+        assert text.startswith("Analyse\n\n")
+        assert text.endswith(canonical_json({"company": "Acme"}))
+
+
+class TestStaticPrefix:
+    """Tests du contrôle des préfixes statiques"""
+
+    def setup_method(self):
+        prompt_assembly._STATIC_PREFIX_FINGERPRINTS.clear()
+
+    def test_stable_instructions_keep_fingerprint(self, caplog):
+        """Vérifie qu'un préfixe inchangé garde son empreinte sans avertissement"""
+        agent = SimpleNamespace(name="Cartographe", instructions="Tu es le Cartographe.")
+        with caplog.at_level(logging.WARNING):
+            first = check_static_prefix(agent)
+            second = check_static_prefix(agent)
+        assert first == second
+        assert len(first) == 16
+        assert not caplog.records
+
+    def test_changed_instructions_warn(self, caplog):
+        """Vérifie l'avertissement quand les instructions changent entre deux runs"""
+        check_static_prefix(SimpleNamespace(name="Mineur", instructions="v1"))
+        with caplog.at_level(logging.WARNING):
+            check_static_prefix(SimpleNamespace(name="Mineur", instructions="v2"))
+        assert "Préfixe statique modifié" in caplog.text
+
+    def test_dynamic_instructions_are_not_fingerprinted(self):
+        """Vérifie que des instructions calculées (callable) ne sont pas suivies"""
+        agent = SimpleNamespace(name="Dynamique", instructions=lambda ctx, agent: "prompt")
+        assert check_static_prefix(agent) is None
+        assert "Dynamique" not in prompt_assembly._STATIC_PREFIX_FINGERPRINTS
+
+
+class TestCachedTokenPricing:
+    """Tests de la facturation des tokens d'entrée en cache"""
+
+    def test_cached_tokens_from_sdk_and_chat_usage(self):
+        """Vérifie la lecture des tokens en cache des deux formats d'usage"""
+        sdk_usage = SimpleNamespace(input_tokens_details=SimpleNamespace(cached_tokens=700))
+        chat_usage = SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=300))
+        assert get_cached_input_tokens(sdk_usage) == 700
+        assert get_cached_input_tokens(chat_usage) == 300
+        assert get_cached_input_tokens(None) == 0
+
+    def test_cached_tokens_use_discounted_rate(self):
+        """Vérifie que les tokens en cache sont facturés au tarif réduit"""
+        full = ModelPricing.calculate_cost_usd("gpt-4o", 1_000_000, 0)
+        cached = ModelPricing.calculate_cost_usd("gpt-4o", 1_000_000, 0, cached_input_tokens=1_000_000)
+        pricing = ModelPricing.get_pricing("gpt-4o")
+
+        assert full == Decimal(str(pricing["input_price_per_1m"])).quantize(Decimal("0.000001"))
+        assert cached == Decimal(str(pricing["cached_input_price_per_1m"])).quantize(Decimal("0.000001"))
+
+    def test_cached_tokens_are_capped_by_input(self):
+        """Vérifie qu'un compteur de cache incohérent ne rend pas le coût négatif"""
+        capped = ModelPricing.calculate_cost_usd("gpt-4o", 1000, 0, cached_input_tokens=5000)
+        assert capped == ModelPricing.calculate_cost_usd("gpt-4o", 1000, 0, cached_input_tokens=1000)
+
+    def test_tools_cost_reports_cached_tokens(self):
+        """Vérifie que le coût réel des tools remonte les tokens en cache"""
+        tools = [
+            {"tool": "web_search", "model": "gpt-4o-search-preview", "input_tokens": 1000,
+             "cached_input_tokens": 400, "output_tokens": 200, "calls": 1},
+            {"tool": "filiales_search", "model": "gpt-4o-search-preview", "input_tokens": 2000,
+             "cached_input_tokens": 600, "output_tokens": 300, "calls": 1},
+        ]
+        result = CostTrackingService._calculate_real_tools_cost(tools, "simple")
+        assert result["total_cached_input_tokens"] == 1000
+        assert result["total_input_tokens"] == 3000
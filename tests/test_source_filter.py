@@ -0,0 +1,93 @@
+"""
+Tests du classement des sources et des sondes paresseuses
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from company_agents.processors import source_filter
+from company_agents.processors.source_filter import (
+    filter_sources_comprehensive,
+    rank_sources,
+    score_source,
+)
+
+
+def _source(name: str, tier: str = "official", age_days=None, title: str = "Titre") -> dict:
+    source = {"url": f"https://{name}.fr", "title": title, "tier": tier}
+    if age_days is not None:
+        source["published_date"] = (datetime.now() - timedelta(days=age_days)).strftime("%Y-%m-%d")
+    return source
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Remplace les sondes réseau : les URLs contenant 'dead' sont inaccessibles"""
+    calls = []
+
+    async def is_url_accessible(url):
+        calls.append(url)
+        return "dead" not in url
+
+    monkeypatch.setattr(source_filter, "is_url_accessible", is_url_accessible)
+    monkeypatch.setattr(source_filter, "SOURCE_PROBE_CONCURRENCY", 2)
+    return calls
+
+
+class TestScoring:
+    """Tests du score et du classement sans réseau"""
+
+    def test_score_combines_quality_tier_and_freshness(self):
+        """Vérifie que tier, métadonnées et fraîcheur augmentent le score"""
+        assert score_source(_source("a", "official")) > score_source(_source("a", "other"))
+        assert score_source(_source("a", age_days=10)) > score_source(_source("a", age_days=600))
+        assert score_source(_source("a")) > score_source(_source("a", title=""))
+        assert score_source(_source("a", age_days=0)) == pytest.approx(3.0, abs=0.01)
+
+    def test_plain_url_is_scored(self):
+        """Vérifie qu'une URL seule est notée comme une source sans métadonnées"""
+        assert 0 < score_source("https://a.fr") < score_source(_source("a"))
+
+    def test_rank_drops_stale_sources_and_sorts_stably(self):
+        """Vérifie l'exclusion des sources trop anciennes et le tri stable par score"""
+        sources = [
+            _source("other1", "other"),
+            _source("stale", age_days=1000),
+            _source("official1"),
+            _source("other2", "other"),
+            _source("official2"),
+        ]
+        ranked = [source["url"] for source in rank_sources(sources, max_age_months=24)]
+        assert ranked == ["https://official1.fr", "https://official2.fr", "https://other1.fr", "https://other2.fr"]
+
+
+class TestLazyProbing:
+    """Tests de l'arrêt des sondes après max_sources sources accessibles"""
+
+    @pytest.mark.asyncio
+    async def test_probing_stops_after_max_sources(self, probes):
+        """Vérifie que seules les meilleures sources sont sondées"""
+        sources = [_source(f"other{i}", "other") for i in range(6)] + [_source("official1"), _source("official2")]
+        selected, removed = await filter_sources_comprehensive(sources, max_sources=2)
+
+        assert [source["url"] for source in selected] == ["https://official1.fr", "https://official2.fr"]
+        assert removed == []
+        assert probes == ["https://official1.fr", "https://official2.fr"]
+
+    @pytest.mark.asyncio
+    async def test_dead_links_trigger_another_wave(self, probes):
+        """Vérifie qu'une URL inaccessible est remplacée par la suivante du classement"""
+        sources = [_source("dead1"), _source("ok1"), _source("ok2", "other"), _source("ok3", "other")]
+        selected, removed = await filter_sources_comprehensive(sources, max_sources=2)
+
+        assert [source["url"] for source in selected] == ["https://ok1.fr", "https://ok2.fr"]
+        assert removed == ["https://dead1.fr"]
+        assert "https://ok3.fr" not in probes
+
+    @pytest.mark.asyncio
+    async def test_sources_without_url_are_kept_unprobed(self, probes):
+        """Vérifie que les sources sans URL sont retenues sans sonde"""
+        selected, _ = await filter_sources_comprehensive([{"title": "Rapport annuel", "tier": "official"}], max_sources=2)
+        assert len(selected) == 1
+        assert probes == []
@@ -0,0 +1,117 @@
+"""
+Tests de la recherche de filiales spéculative
+"""
+
+import asyncio
+
+import pytest
+
+from company_agents.metrics import tool_tokens_tracker
+from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
+from company_agents.orchestrator import speculation as speculation_module
+from company_agents.orchestrator.speculation import (
+    SpeculativeSubsidiarySearch,
+    entity_names_match,
+    normalize_entity_name,
+    should_speculate,
+)
+from services.cost_tracking_service import ModelPricing
+
+
+class TestNames:
+    """Tests de la normalisation et de la correspondance des noms"""
+
+    def test_normalize_drops_accents_punctuation_and_legal_forms(self):
+        """Vérifie la forme comparable d'un nom"""
+        assert normalize_entity_name("L'Oréal S.A.") == "l oreal"
+        assert normalize_entity_name("Saint-Gobain SAS") == "saint gobain"
+        # Un nom réduit à une forme juridique est conservé
+        assert normalize_entity_name("SAS") == "sas"
+        assert normalize_entity_name(None) == ""
+
+    @pytest.mark.parametrize("left,right", [
+        ("L'Oréal", "L'OREAL SA"),
+        ("Saint Gobain", "Saint-Gobain"),
+        ("LOreal", "L'Oréal"),
+    ])
+    def test_equivalent_names_match(self, left, right):
+        """Vérifie la correspondance des variantes d'écriture d'un même nom"""
+        assert entity_names_match(left, right)
+
+    @pytest.mark.parametrize("left,right", [
+        ("Banque Populaire Alsace", "Banque Populaire Alpes"),
+        ("Manitou Group", "Manitou Group UK"),
+        ("Credit Agricole Nord Est", "Credit Agricole Nord"),
+        ("Groupe SEB", "Groupe SEO"),
+        ("", ""),
+    ])
+    def test_distinct_entities_do_not_match(self, left, right):
+        """Vérifie que des entités voisines ne sont pas confondues"""
+        assert not entity_names_match(left, right)
+
+    def test_should_speculate_without_chunking(self):
+        """Vérifie l'activation hors structuration par segments, et jamais pour une URL"""
+        assert should_speculate("Groupe SEB", True, enabled=True)
+        assert not should_speculate("https://groupeseb.com", True, enabled=True)
+        assert not should_speculate("Groupe SEB", False, enabled=True)
+        assert not should_speculate("Groupe SEB", True, enabled=False)
+
+
+@pytest.fixture
+def research(monkeypatch):
+    """Recherche simulée : consomme des tokens de recherche puis attend d'être libérée"""
+    release = asyncio.Event()
+    monkeypatch.setattr(tool_tokens_tracker, "_sessions", {})
+    ToolTokensTracker.start_session("s1")
+    # Usage antérieur à la spéculation (non imputé)
+    ToolTokensTracker.add_tool_usage("s1", "filiales_search", "gpt-4o-search-preview", 1000, 100)
+
+    async def run_subsidiary_research(company_context, deep_search):
+        ToolTokensTracker.add_tool_usage("s1", "filiales_search", "gpt-4o-search-preview", 2000, 500)
+        ToolTokensTracker.add_tool_usage("s1", "other_tool", "gpt-4o", 9999, 9999)
+        await release.wait()
+        return "FILIALES: ...", ["https://a.fr"]
+
+    monkeypatch.setattr(speculation_module, "run_subsidiary_research", run_subsidiary_research)
+    return release
+
+
+class TestSpeculativeSearch:
+    """Tests de check, result et discard"""
+
+    @pytest.mark.asyncio
+    async def test_matching_entity_reuses_research(self, research):
+        """Vérifie la réutilisation de la recherche quand l'entité résolue correspond"""
+        search = SpeculativeSubsidiarySearch("s1", " L'Oréal ")
+        search.start()
+        assert await search.check("L'OREAL SA")
+        research.set()
+
+        assert await search.result() == ("FILIALES: ...", ["https://a.fr"])
+        assert search.report()["outcome"] == "hit"
+        assert search.report()["wasted_cost_eur"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_near_miss_is_discarded_with_wasted_cost(self, research):
+        """Vérifie l'annulation sur une entité voisine et le coût des seules recherches lancées"""
+        search = SpeculativeSubsidiarySearch("s1", "Banque Populaire Alsace")
+        search.start()
+        await asyncio.sleep(0)
+
+        assert not await search.check("Banque Populaire Alpes")
+        assert search._task.cancelled()
+        assert search.outcome == "miss"
+        assert search.match_score > 0.85
+        expected = float(ModelPricing.calculate_cost_eur("gpt-4o-search-preview", 2000, 500))
+        assert search.wasted_cost_eur == pytest.approx(expected)
+        assert await search.result() is None
+
+    @pytest.mark.asyncio
+    async def test_discard_is_recorded_once(self, research):
+        """Vérifie qu'une spéculation abandonnée n'est comptée qu'une fois"""
+        search = SpeculativeSubsidiarySearch("s1", "Groupe SEB")
+        search.start()
+        await search.discard("abandoned")
+        await search.discard("miss")
+        assert search.outcome == "abandoned"
+        assert not await search.check("Groupe SEB")
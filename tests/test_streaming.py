@@ -0,0 +1,97 @@
+"""
+Tests de l'exécution en streaming des agents
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from company_agents import streaming
+
+
+class FakeStreamedResult:
+    """RunResultStreaming minimal : comme le SDK, stream_events() s'arrête sans erreur si la tâche est annulée"""
+
+    def __init__(self, events=()):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        for event in events:
+            self.queue.put_nowait(event)
+        self.is_complete = False
+        self.cancelled = False
+        self.final_output = None
+
+    async def stream_events(self):
+        while not self.is_complete:
+            try:
+                item = await self.queue.get()
+            except asyncio.CancelledError:
+                break
+            yield item
+
+    def cancel(self):
+        self.cancelled = True
+        self.is_complete = True
+
+
+def _delta(text):
+    return SimpleNamespace(type="raw_response_event", data=SimpleNamespace(type="response.output_text.delta", delta=text))
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """Remplace Runner.run_streamed par un run dont les événements sont contrôlés par le test"""
+    from agents import Runner
+
+    results = []
+
+    def run_streamed(agent, input, max_turns):
+        results.append(FakeStreamedResult([_delta('{"subsidiaries": [')]))
+        return results[-1]
+
+    monkeypatch.setattr(streaming, "ENABLE_AGENT_STREAMING", True)
+    monkeypatch.setattr(Runner, "run_streamed", staticmethod(run_streamed))
+    return results
+
+
+def _run(**kwargs):
+    return streaming.run_agent_streamed(
+        object(), "Groupe", max_turns=3, agent_name="🗺️ Cartographe", item_keys=["subsidiaries"], **kwargs
+    )
+
+
+class TestCancellation:
+    """Tests de l'arrêt d'un run en cours"""
+
+    @pytest.mark.asyncio
+    async def test_cancellation_propagates_and_stops_run(self, streamed):
+        """Vérifie que l'annulation pendant la génération est relancée et arrête le run"""
+        task = asyncio.create_task(_run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert streamed[0].cancelled
+
+    @pytest.mark.asyncio
+    async def test_consumer_error_stops_run(self, streamed, monkeypatch):
+        """Vérifie que le run est arrêté si l'analyse du flux échoue"""
+        async def feed(self, delta):
+            raise ValueError("analyse impossible")
+
+        monkeypatch.setattr(streaming.PartialItemConsumer, "feed", feed)
+        with pytest.raises(ValueError):
+            await _run()
+        assert streamed[0].cancelled
+
+    @pytest.mark.asyncio
+    async def test_completed_run_is_returned(self, streamed):
+        """Vérifie qu'un run terminé normalement est renvoyé sans annulation"""
+        task = asyncio.create_task(_run())
+        await asyncio.sleep(0.01)
+        streamed[0].is_complete = True
+        streamed[0].queue.put_nowait(_delta("]}"))
+
+        assert await task is streamed[0]
+        assert not streamed[0].cancelled
@@ -0,0 +1,95 @@
+"""
+Tests du tracker de tokens des tools
+"""
+
+import asyncio
+
+import pytest
+
+from company_agents import extraction_core
+from company_agents.context import clear_session_context, set_session_context
+from company_agents.metrics import tool_tokens_tracker
+from company_agents.metrics.tool_tokens_tracker import ToolTokensTracker
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Remplace la persistance Redis de l'usage des tools"""
+    from status.manager import status_manager
+
+    usages = {}
+
+    async def store_tool_usage(session_id, usage):
+        usages[session_id] = usage
+
+    monkeypatch.setattr(status_manager, "store_tool_usage", store_tool_usage)
+    monkeypatch.setattr(tool_tokens_tracker, "_sessions", {})
+    return usages
+
+
+class TestSessionRegistry:
+    """Tests du registre des sessions"""
+
+    def test_usage_is_aggregated_per_tool_and_model(self, stored):
+        """Vérifie l'agrégation des appels par (tool, modèle)"""
+        ToolTokensTracker.start_session("s1")
+        ToolTokensTracker.add_tool_usage("s1", "search", "gpt-4o", 100, 20, cached_input_tokens=40)
+        ToolTokensTracker.add_tool_usage("s1", "search", "gpt-4o", 50, 10)
+
+        assert ToolTokensTracker.get_session_tools("s1") == [{
+            "tool": "search", "model": "gpt-4o", "calls": 2, "input_tokens": 150,
+            "output_tokens": 30, "cached_input_tokens": 40, "total_tokens": 180,
+        }]
+
+    def test_session_is_resolved_from_context(self, stored):
+        """Vérifie la résolution du session_id depuis le contexte courant"""
+        ToolTokensTracker.start_session("s1")
+        set_session_context("s1")
+        try:
+            ToolTokensTracker.add_tool_usage(None, "search", "gpt-4o", 10, 5)
+        finally:
+            clear_session_context()
+        assert ToolTokensTracker.get_session_usage("s1").counters
+
+    def test_unknown_or_unresolved_sessions_create_no_entry(self, stored):
+        """Vérifie qu'un usage sans session démarrée n'ajoute aucune entrée au registre"""
+        ToolTokensTracker.add_tool_usage("inconnue", "search", "gpt-4o", 10, 5)
+        ToolTokensTracker.add_tool_usage(None, "search", "gpt-4o", 10, 5)
+        assert tool_tokens_tracker._sessions == {}
+
+    @pytest.mark.asyncio
+    async def test_writes_after_flush_are_dropped(self, stored):
+        """Vérifie qu'un usage reçu après la persistance ne recrée pas la session"""
+        ToolTokensTracker.start_session("s1")
+        ToolTokensTracker.add_tool_usage("s1", "search", "gpt-4o", 10, 5)
+        await ToolTokensTracker.flush_session("s1")
+        ToolTokensTracker.add_tool_usage("s1", "search", "gpt-4o", 10, 5)
+
+        assert tool_tokens_tracker._sessions == {}
+        assert stored["s1"]["tools"][0]["calls"] == 1
+
+
+class TestCancellation:
+    """Tests de la persistance de l'usage à l'annulation d'une extraction"""
+
+    @pytest.mark.asyncio
+    async def test_cancelled_extraction_flushes_session(self, stored, monkeypatch):
+        """Vérifie que l'annulation persiste et retire la session du registre"""
+        from services.agent_tracking_service import agent_tracking_service
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def cancelled_orchestration(*args, **kwargs):
+            ToolTokensTracker.start_session("s1")
+            ToolTokensTracker.add_tool_usage("s1", "search", "gpt-4o", 10, 5)
+            raise asyncio.CancelledError()
+
+        monkeypatch.setattr(agent_tracking_service, "start_extraction_tracking", noop)
+        monkeypatch.setattr(extraction_core, "orchestrate_extraction", cancelled_orchestration)
+
+        with pytest.raises(asyncio.CancelledError):
+            await extraction_core.extract_company_data("Groupe", session_id="s1")
+
+        assert tool_tokens_tracker._sessions == {}
+        assert stored["s1"]["tools"][0]["calls"] == 1
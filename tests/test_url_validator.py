@@ -0,0 +1,55 @@
+"""
+Tests du cache d'accessibilité des URLs et des sondes
+"""
+
+import pytest
+
+from company_agents.config.extraction_config import (
+    clear_url_cache,
+    get_url_cache_status,
+    lookup_url_cache_status,
+    set_url_cache_status,
+)
+from company_agents.processors import url_validator
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Remplace la sonde réseau : les URLs contenant 'dead' sont inaccessibles"""
+    calls = []
+
+    async def probe(url):
+        calls.append(url)
+        accessible = "dead" not in url
+        set_url_cache_status(url, accessible)
+        return accessible
+
+    clear_url_cache()
+    monkeypatch.setattr(url_validator, "_probe_url", probe)
+    yield calls
+    clear_url_cache()
+
+
+class TestUrlCache:
+    """Tests de la sémantique du cache d'accessibilité"""
+
+    def test_cache_miss_semantics(self, probes):
+        """Vérifie qu'une URL absente vaut False pour get_url_cache_status et None pour lookup"""
+        assert get_url_cache_status("https://a.fr") is False
+        assert lookup_url_cache_status("https://a.fr") is None
+        set_url_cache_status("https://a.fr", False)
+        assert lookup_url_cache_status("https://a.fr") is False
+
+    @pytest.mark.asyncio
+    async def test_uncached_urls_are_probed_once(self, probes):
+        """Vérifie qu'une URL jamais sondée est sondée puis servie depuis le cache"""
+        assert await url_validator.is_url_accessible("https://a.fr") is True
+        assert await url_validator.is_url_accessible("https://a.fr") is True
+        assert probes == ["https://a.fr"]
+
+    @pytest.mark.asyncio
+    async def test_cached_dead_links_are_not_probed(self, probes):
+        """Vérifie qu'un lien mort en cache est rejeté sans sonde"""
+        set_url_cache_status("https://a.fr", False)
+        assert await url_validator.is_url_accessible("https://a.fr") is False
+        assert probes == []